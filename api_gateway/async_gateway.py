@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步API网关
+
+基于 asyncio 的网关运行模式（ASGI应用 + aiohttp 客户端连接池），与同步网关功能一致：
+- 等待后端响应时不占用线程，慢接口（如阅卷结果导出）不会拖住其他请求
+- 沿用同步网关的配置结构（services / upstream / rate_limiting / caching），
+  复用 RateLimiter、ResponseCache 与路由解析
+- 每个服务一个长连接池；小响应读入内存并可缓存，大响应或长度未知的响应按块转发
+
+启动：
+    python api_gateway/async_gateway.py
+    uvicorn api_gateway.async_gateway:create_app --factory --port 8000
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    import uvicorn
+    HAS_UVICORN = True
+except ImportError:
+    HAS_UVICORN = False
+
+# 导入项目模块
+sys.path.append(str(Path(__file__).parent.parent))
+from api_gateway.gateway import (
+    APIGateway, create_rate_limiter, create_token_manager, identify_user, resolve_service_route,
+    runtime_metrics, summarize_instance_health, NOT_MODIFIED_HEADERS, CONDITIONAL_HEADERS
+)
+from api_gateway.backends import BackendPool
+from api_gateway.metrics import GatewayMetrics, RequestTiming
+from api_gateway.rate_limiter import rate_limit_rules
+from api_gateway.upstream import (
+    DEFAULT_UPSTREAM_CONFIG, HOP_BY_HOP_HEADERS, filter_request_headers, service_urls
+)
+from api_gateway.response_cache import ResponseCache, build_cache_key, etag_matches, has_authorization
+from api_gateway.single_flight import (
+    AsyncSingleFlight, SharedResponse, DEFAULT_COALESCING_CONFIG, coalescing_key
+)
+
+
+class AsyncGateway:
+    """异步API网关（ASGI应用）"""
+
+    def __init__(self, config_path: str = "config/gateway.json", config: Dict = None):
+        if not HAS_AIOHTTP:
+            raise RuntimeError("aiohttp模块未安装，异步网关不可用")
+        self.logger = logging.getLogger(__name__)
+        self.config_path = Path(config_path)
+        self.config = config if config is not None else self.load_config()
+        self.upstream_config = dict(DEFAULT_UPSTREAM_CONFIG, **self.config.get("upstream", {}))
+
+        self.rate_limiter = create_rate_limiter(self.config["rate_limiting"])
+        self.token_manager = create_token_manager(self.config["auth"])
+        self.cache = ResponseCache(self.config["caching"])
+        self.single_flight = AsyncSingleFlight()
+        self.coalescing_config = dict(DEFAULT_COALESCING_CONFIG, **self.config.get("coalescing", {}))
+        self.metrics = GatewayMetrics(self.config.get("metrics"))
+        self.backends = BackendPool(self.config.get("resilience"))
+        self.api_stats = defaultdict(int)
+        self.start_time = time.time()
+
+        self._clients: Dict[str, "aiohttp.ClientSession"] = {}
+        self._background = set()
+
+    def load_config(self) -> Dict:
+        """加载配置（与同步网关使用同一配置文件）"""
+        if self.config_path.exists():
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.error(f"加载配置失败: {e}")
+        return APIGateway.get_default_config()
+
+    def client(self, service_name: str) -> "aiohttp.ClientSession":
+        """获取服务的异步连接池（首次使用时在事件循环内创建）"""
+        client = self._clients.get(service_name)
+        if client is None:
+            service_config = self.config["services"].get(service_name, {})
+            pool_size = service_config.get("pool_size", self.upstream_config["pool_size"])
+            connector = aiohttp.TCPConnector(
+                limit=pool_size if self.upstream_config["pool_block"] else 0, limit_per_host=0)
+            # 不保存上游Cookie、不解压响应体、不自动添加 Accept-Encoding（按原始字节转发）
+            client = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                                           auto_decompress=False,
+                                           skip_auto_headers=("User-Agent", "Accept-Encoding"))
+            self._clients[service_name] = client
+        return client
+
+    @staticmethod
+    def timeout(seconds: float) -> "aiohttp.ClientTimeout":
+        """连接与单次读取超时（与 requests 的 timeout 含义一致，不限制流式转发总时长）"""
+        return aiohttp.ClientTimeout(total=None, sock_connect=seconds, sock_read=seconds)
+
+    @staticmethod
+    def response_headers(upstream_response) -> List[Tuple[str, str]]:
+        """上游响应头（保留同名头部，去掉逐跳头部）"""
+        headers = []
+        for name, value in upstream_response.raw_headers:
+            name = name.decode("latin-1")
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                headers.append((name, value.decode("latin-1")))
+        return headers
+
+    async def aclose(self):
+        """关闭连接池并等待后台任务"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.close()
+
+    # ---- ASGI 入口 ----
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        start = time.perf_counter()
+        status = await self.dispatch(scope, receive, send)
+        duration = time.perf_counter() - start
+        self.logger.info(f"{scope['method']} {scope['path']} -> {status} in {duration:.3f}s")
+
+        self.api_stats[f"{scope['method']}:{scope['path']}"] += 1
+        self.api_stats["total_requests"] += 1
+
+        timing = scope.get("gateway.timing")
+        if timing is None:
+            self.metrics.record_unrouted(scope["method"], status)
+        else:
+            self.metrics.finish(timing, scope["method"], status, timing.cache_result)
+
+    async def lifespan(self, receive, send):
+        """ASGI生命周期：启动时记录时间，停止时释放连接池"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start_time = time.time()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def dispatch(self, scope, receive, send) -> int:
+        path = scope["path"]
+        if path == "/health":
+            return await self.send_json(send, 200, {
+                "status": "healthy",
+                "timestamp": datetime.now().isoformat(),
+                "services": await self.check_services_health()
+            })
+        if path == "/stats":
+            return await self.send_json(send, 200, {
+                "api_stats": dict(self.api_stats),
+                "cache": self.cache.stats(),
+                "rate_limiting": self.rate_limiter.stats(),
+                "coalescing": self.single_flight.stats(),
+                "backends": self.backends.stats(self.config["services"]),
+                "services": list(self.config["services"].keys()),
+                "uptime": time.time() - self.start_time
+            })
+        if path == "/metrics":
+            body = self.metrics.render(runtime_metrics(self))
+            return await self.send_response(send, 200, [("Content-Type", "text/plain; version=0.0.4")],
+                                            body.encode("utf-8"))
+        return await self.handle_request(scope, receive, send)
+
+    # ---- 响应发送 ----
+
+    @staticmethod
+    async def send_response(send, status: int, headers: List[Tuple[str, str]], body: bytes = b"") -> int:
+        """发送完整响应（Content-Length 按响应体重新计算）"""
+        raw_headers = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                       for name, value in headers if name.lower() != "content-length"]
+        if status != 304:
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+        return status
+
+    async def send_json(self, send, status: int, data: Dict) -> int:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return await self.send_response(send, status, [("Content-Type", "application/json")], body)
+
+    async def send_cached(self, send, entry, request_headers: Dict[str, str], x_cache: str = None) -> int:
+        """发送缓存响应，客户端条件请求匹配时返回304"""
+        now = time.time()
+        if etag_matches(request_headers.get("if-none-match"), entry.etag):
+            self.cache.record_not_modified()
+            status, body = 304, b""
+            headers = [(name, value) for name, value in entry.headers if name.lower() in NOT_MODIFIED_HEADERS]
+        else:
+            status, body, headers = entry.status, entry.body, list(entry.headers)
+        headers.append(("Age", str(entry.age(now))))
+        headers.append(("X-Cache", x_cache or ("HIT" if now < entry.expires_at else "STALE")))
+        return await self.send_response(send, status, headers, body)
+
+    # ---- 请求处理 ----
+
+    @staticmethod
+    def request_headers(scope) -> Dict[str, str]:
+        """请求头（名称小写，同名头部以逗号合并）"""
+        headers: Dict[str, str] = {}
+        for name, value in scope.get("headers", []):
+            name, value = name.decode("latin-1"), value.decode("latin-1")
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        return headers
+
+    @staticmethod
+    async def read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def handle_request(self, scope, receive, send) -> int:
+        """处理代理请求（流程与同步网关一致）"""
+        method = scope["method"]
+        headers = self.request_headers(scope)
+        try:
+            # 1. 身份验证
+            user_id = None
+            if self.config["auth"]["enabled"]:
+                if not headers.get("authorization"):
+                    return await self.send_json(send, 401, {"error": "Missing authorization header"})
+                user_id = identify_user(self.token_manager, headers["authorization"])
+
+            # 2. 路由解析
+            service_name, service_path = resolve_service_route(self.config["services"], scope["path"])
+            if not service_name:
+                return await self.send_json(send, 404, {"error": "Service not found"})
+            prefix = self.config["services"][service_name]["prefix"]
+            timing = scope["gateway.timing"] = self.metrics.start(
+                service_name, self.metrics.route_label(prefix, scope["path"]))
+            cacheable = method == "GET" and self.config["caching"]["enabled"]
+            send = self.observe_response(send, timing, cacheable)
+
+            # 3. 请求限流
+            if self.config["rate_limiting"]["enabled"]:
+                if not await self.check_rate_limit(service_name, scope, user_id):
+                    self.metrics.record_rate_limited(service_name)
+                    return await self.send_json(send, 429, {"error": "Rate limit exceeded"})
+
+            # 4. 缓存检查
+            query_string = scope.get("query_string", b"")
+            cache_key = None
+            if cacheable:
+                cache_key = build_cache_key(service_name, service_path,
+                                            parse_qsl(query_string.decode("latin-1"), keep_blank_values=True),
+                                            headers.get("accept-encoding", ""))
+                entry, revalidate = self.cache.get(cache_key)
+                if entry is not None:
+                    if revalidate:
+                        self.spawn(self.revalidate_cache(cache_key, entry, service_name, service_path,
+                                                         query_string,
+                                                         self.upstream_headers(headers, conditional=False)))
+                    return await self.send_cached(send, entry, headers)
+
+                # 5. 缓存未命中：相同请求合并为一次转发
+                if self.coalescing_config["enabled"]:
+                    return await self.fetch_coalesced(send, scope, headers, service_name,
+                                                      service_path, cache_key)
+
+            # 5. 转发请求
+            body = await self.read_body(receive) if method in ("POST", "PUT", "PATCH") else None
+            return await self.forward_request(send, scope, headers, service_name, service_path,
+                                              body, cache_key)
+        except Exception as e:
+            self.logger.error(f"处理请求失败: {e}")
+            return await self.send_json(send, 500, {"error": "Internal server error"})
+
+    @staticmethod
+    def observe_response(send, timing: RequestTiming, cacheable: bool):
+        """包装 send：记录响应头发出时间与缓存结果"""
+        async def observed_send(message):
+            if message["type"] == "http.response.start":
+                timing.headers_at = time.perf_counter()
+                if cacheable:
+                    timing.cache_result = next(
+                        (value.decode("latin-1") for name, value in message["headers"] if name == b"x-cache"),
+                        "MISS")
+            await send(message)
+        return observed_send
+
+    async def check_rate_limit(self, service_name: str, scope, user_id: str = None) -> bool:
+        """检查请求限流（Redis限流在线程池中执行，不阻塞事件循环）"""
+        client_id = scope["client"][0] if scope.get("client") else "unknown"
+        rules = rate_limit_rules(self.config, service_name, scope["path"], client_id, user_id)
+
+        if self.rate_limiter.redis_client:
+            return await asyncio.get_running_loop().run_in_executor(None, self.rate_limiter.allow_all, rules)
+        return self.rate_limiter.allow_all(rules)
+
+    @staticmethod
+    def build_upstream_url(base_url: str, service_path: str, query_string: bytes) -> str:
+        url = f"{base_url}/{service_path}".rstrip('/')
+        if query_string:
+            url += f"?{query_string.decode('latin-1')}"
+        return url
+
+    @staticmethod
+    def upstream_headers(headers: Dict[str, str], conditional: bool = True) -> Dict[str, str]:
+        upstream_headers = filter_request_headers(headers)
+        if not conditional:
+            for name in CONDITIONAL_HEADERS:
+                upstream_headers.pop(name.lower(), None)
+        return upstream_headers
+
+    def should_stream(self, headers) -> bool:
+        length = headers.get("content-length")
+        if length is None or not length.isdigit():
+            return True
+        return int(length) > self.upstream_config["stream_threshold"]
+
+    async def fetch_coalesced(self, send, scope, headers: Dict[str, str], service_name: str,
+                              service_path: str, cache_key: str) -> int:
+        """转发缓存未命中的GET请求，并发的相同请求只由领头请求转发"""
+        vary_headers = self.coalescing_config["vary_headers"]
+        share_uncached = any(name.lower() == "authorization" for name in vary_headers)
+        key = coalescing_key(cache_key, vary_headers, headers)
+        future, leader = self.single_flight.join(key)
+        if not leader:
+            shared = await self.single_flight.wait(future, self.coalescing_config["timeout"])
+            if shared is not None:
+                return await self.send_shared(send, shared, headers)
+            # 等待超时或结果不可共享，自行转发
+            return await self.forward_request(send, scope, headers, service_name, service_path,
+                                              None, cache_key)
+
+        def publish(shared: SharedResponse):
+            # 响应体读完即公布，不必等领头请求发送完毕
+            if shared.entry is not None or share_uncached:
+                self.single_flight.complete(key, future, shared)
+
+        try:
+            return await self.forward_request(send, scope, headers, service_name, service_path,
+                                              None, cache_key, publish)
+        finally:
+            self.single_flight.complete(key, future)
+
+    async def send_shared(self, send, shared: SharedResponse, request_headers: Dict[str, str]) -> int:
+        """发送领头请求公布的结果"""
+        if shared.entry is not None:
+            return await self.send_cached(send, shared.entry, request_headers, "COALESCED")
+        return await self.send_response(send, shared.status, shared.headers + [("X-Cache", "COALESCED")],
+                                        shared.body)
+
+    async def forward_request(self, send, scope, headers: Dict[str, str], service_name: str,
+                              service_path: str, body: Optional[bytes], cache_key: Optional[str],
+                              publish: Callable[[SharedResponse], None] = None) -> int:
+        """转发请求到后端服务
+
+        cache_key 不为空时不转发条件头部，取到完整的200响应后写入缓存。
+        publish 不为空时，完整读取的响应交给它公布给合并等待的请求（流式响应不公布）。
+        后端实例由断路器与负载均衡选出，metrics.routes 中配置的路由按实例在该路由上的延迟自适应超时，其余使用服务配置的 timeout。
+        """
+        service_config = self.config["services"][service_name]
+        backend = self.backends.select(service_name, service_config)
+        if backend is None:
+            self.logger.warning(f"断路器开启，拒绝请求: {service_name}")
+            retry_after = str(self.backends.retry_after(service_name, service_config))
+            body = json.dumps({"error": "Service unavailable"}).encode("utf-8")
+            return await self.send_response(send, 503, [("Content-Type", "application/json"),
+                                                        ("Retry-After", retry_after)], body)
+        timing = scope.get("gateway.timing")
+        max_timeout = service_config.get("timeout", 30)
+        route = self.metrics.timeout_route(service_config["prefix"], scope["path"])
+        timeout = backend.timeout(max_timeout, route)
+        url = self.build_upstream_url(backend.url, service_path, scope.get("query_string", b""))
+        started = time.perf_counter()
+        error = None
+        try:
+            upstream_response = await self.client(service_name).request(
+                scope["method"], url, data=body, allow_redirects=False, timeout=self.timeout(timeout),
+                headers=self.upstream_headers(headers, conditional=cache_key is None))
+        except asyncio.TimeoutError:
+            self.logger.error(f"请求超时: {service_name} {url}（{timeout:.1f}秒）")
+            error = (504, "Service timeout")
+        except (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError):
+            self.logger.error(f"连接失败: {service_name} {url}")
+            error = (503, "Service unavailable")
+        except Exception as e:
+            self.logger.error(f"转发请求失败: {e}")
+            error = (502, "Service error")
+        # 上游耗时：流式响应只计到响应头，完整读取的响应计到读完
+        elapsed = time.perf_counter() - started
+        backend.record(upstream_response.status if error is None else None, elapsed, route,
+                       timed_out=error is not None and error[0] == 504, adaptive=timeout < max_timeout)
+        if timing is not None:
+            timing.upstream += elapsed
+        if error is not None:
+            return await self.send_json(send, error[0], {"error": error[1]})
+
+        status = upstream_response.status
+        response_headers = self.response_headers(upstream_response)
+
+        if not self.should_stream(upstream_response.headers):
+            started = time.perf_counter()
+            try:
+                content = await upstream_response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                upstream_response.close()
+                self.logger.error(f"读取响应失败: {service_name} {url}: {e}")
+                backend.breaker.record_failure()
+                content = None
+            if timing is not None:
+                timing.upstream += time.perf_counter() - started
+            if content is None:
+                return await self.send_json(send, 502, {"error": "Service error"})
+            upstream_response.release()
+
+            entry = None
+            if cache_key is not None and status == 200:
+                entry = self.cache.store(cache_key, scope["path"], status, response_headers,
+                                         content, upstream_response.headers,
+                                         authorized=has_authorization(headers))
+            if publish is not None:
+                publish(SharedResponse(status, response_headers, content, entry))
+            if entry is not None:
+                return await self.send_cached(send, entry, headers, "MISS")
+            return await self.send_response(send, status, response_headers, content)
+
+        # 按块转发原始字节，读完后连接放回连接池，中断时关闭连接
+        completed = False
+        try:
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                    for name, value in response_headers]})
+            async for chunk in upstream_response.content.iter_chunked(self.upstream_config["chunk_size"]):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            completed = True
+        except Exception as e:
+            self.logger.error(f"转发响应中断: {service_name} {url}: {e}")
+        finally:
+            if completed:
+                upstream_response.release()
+            else:
+                upstream_response.close()
+        return status
+
+    def spawn(self, coroutine):
+        """启动后台任务（保留引用，避免任务被回收）"""
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def revalidate_cache(self, cache_key: str, entry, service_name: str, service_path: str,
+                               query_string: bytes, headers: Dict[str, str]):
+        """后台向后端重新验证过期缓存"""
+        service_config = self.config["services"][service_name]
+        backend = self.backends.select(service_name, service_config)
+        if backend is None:
+            self.cache.abandon_revalidation(cache_key)
+            return
+
+        url = self.build_upstream_url(backend.url, service_path, query_string)
+        max_timeout = service_config.get("timeout", 30)
+        route = self.metrics.timeout_route(service_config["prefix"], entry.route)
+        timeout = backend.timeout(max_timeout, route)
+        started = time.perf_counter()
+        try:
+            try:
+                upstream_response = await self.client(service_name).get(
+                    url, allow_redirects=False, timeout=self.timeout(timeout),
+                    headers=dict(headers, **{"if-none-match": entry.etag}))
+            except Exception as e:
+                backend.record(None, time.perf_counter() - started, route,
+                               timed_out=isinstance(e, asyncio.TimeoutError),
+                               adaptive=timeout < max_timeout)
+                raise
+            backend.record(upstream_response.status, time.perf_counter() - started, route)
+            authorized = has_authorization(headers)
+            async with upstream_response:
+                if upstream_response.status == 304:
+                    self.cache.refresh(cache_key, entry.route, upstream_response.headers, authorized=authorized)
+                elif upstream_response.status == 200 and not self.should_stream(upstream_response.headers):
+                    content = await upstream_response.read()
+                    self.cache.store(cache_key, entry.route, 200, self.response_headers(upstream_response),
+                                     content, upstream_response.headers, authorized=authorized)
+                else:
+                    self.cache.abandon_revalidation(cache_key)
+        except Exception as e:
+            self.logger.warning(f"后台刷新缓存失败 {cache_key}: {e}")
+            self.cache.abandon_revalidation(cache_key)
+
+    async def check_service_health(self, service_name: str) -> Dict:
+        urls = service_urls(self.config["services"][service_name])
+        instances = await asyncio.gather(*(self.check_instance_health(service_name, url) for url in urls))
+        return summarize_instance_health(urls, list(instances))
+
+    async def check_instance_health(self, service_name: str, base_url: str) -> Dict:
+        circuit = self.backends.backend(service_name, base_url).breaker.state
+        try:
+            start = time.perf_counter()
+            timeout = aiohttp.ClientTimeout(total=self.upstream_config["health_timeout"])
+            async with self.client(service_name).get(f"{base_url}/health", timeout=timeout) as response:
+                await response.read()
+                return {
+                    "status": "healthy" if response.status == 200 else "unhealthy",
+                    "response_time": time.perf_counter() - start,
+                    "circuit": circuit
+                }
+        except Exception as e:
+            return {
+                "status": "unreachable",
+                "error": str(e) or type(e).__name__,
+                "circuit": circuit
+            }
+
+    async def check_services_health(self) -> Dict:
+        """并发检查所有服务健康状态"""
+        service_names = list(self.config["services"])
+        results = await asyncio.gather(*(self.check_service_health(name) for name in service_names))
+        return dict(zip(service_names, results))
+
+    def run(self):
+        """以 uvicorn 启动异步网关"""
+        if not HAS_UVICORN:
+            raise RuntimeError("uvicorn模块未安装，无法启动异步网关")
+        gateway_config = self.config["gateway"]
+        host = gateway_config.get("host", "0.0.0.0")
+        port = gateway_config.get("port", 8000)
+        self.logger.info(f"启动异步API网关: {host}:{port}")
+        uvicorn.run(self, host=host, port=port, log_level="warning")
+
+
+def create_app(config_path: str = "config/gateway.json") -> AsyncGateway:
+    """ASGI应用工厂（uvicorn --factory）"""
+    return AsyncGateway(config_path)
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    gateway = AsyncGateway()
+
+    print("🌐 异步API网关启动中...")
+    print(f"配置文件: {gateway.config_path}")
+    print(f"服务数量: {len(gateway.config['services'])}")
+
+    try:
+        gateway.run()
+    except KeyboardInterrupt:
+        print("\n🛑 异步API网关已停止")
+    except RuntimeError as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后端实例管理：断路器、自适应超时与负载均衡
+
+每个服务可配置一个或多个后端实例（services.<name>.url 为地址或地址列表），
+每个实例各自维护：
+- 断路器：连续失败（连接失败、超时、5xx）达到阈值后开启，开启期间直接拒绝，
+  恢复时间过后进入半开状态，只放行少量探测请求，探测成功则关闭、失败则重新开启
+- 自适应超时：按 (实例, 路由标签) 分别统计延迟，取延迟分位数与近期延迟均值中的较大者
+  乘以倍数得到超时时间，限制在最小超时与服务配置的 timeout 之间；样本不足时使用配置的
+  timeout。同一实例上的慢路由（如导出）不会被快路由的延迟分布拖短超时。
+  只有 metrics.routes 中显式配置的路由才自适应（路由标签为None时使用配置的 timeout），
+  断路器未关闭时（半开探测）也使用配置的 timeout
+- 自适应超时（低于配置的 timeout）到期只说明请求比该路由平时慢，不计为断路器失败；
+  只有连接失败、5xx 和按配置的 timeout 到期的请求计为失败
+- 超时的请求按实际等待时间记为延迟样本（真实延迟至少这么长）；延迟整体变慢时，
+  连续超时会推高近期延迟均值，超时随之增长，而不是一直按旧的分位数超时、
+  直到断路器开启后再也没有新样本
+- 延迟均值：按指数移动平均计算，作为负载均衡权重
+
+选择实例时跳过断路器开启的实例，其余实例按延迟倒数加权随机选择。
+common/error_handler.circuit_breaker 装饰器的状态挂在函数上、所有调用共用一个计数，
+无法按实例区分，也没有半开探测，这里按实例单独实现。
+"""
+
+import time
+import random
+import threading
+from typing import Dict, List, Optional
+
+from api_gateway.metrics import BUCKET_COUNT, LatencyHistogram, bucket_index
+from api_gateway.upstream import service_urls
+
+DEFAULT_RESILIENCE_CONFIG = {
+    "circuit_breaker": {
+        "enabled": True,
+        "failure_threshold": 5,     # 连续失败次数
+        "recovery_timeout": 30,     # 开启后多久进入半开状态（秒）
+        "half_open_max_calls": 1,   # 半开状态同时放行的探测请求数
+    },
+    "adaptive_timeout": {
+        "enabled": True,
+        "quantile": 0.99,
+        "multiplier": 3.0,          # 超时 = 延迟分位数 × 倍数
+        "min_timeout": 2.0,         # 自适应超时下限（秒），上限为服务的 timeout
+        "min_samples": 50,          # 样本不足时使用服务的 timeout
+        "window": 1000,             # 每累计这么多样本淘汰一轮旧样本
+    },
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def merge_resilience_config(config: Dict = None) -> Dict:
+    """合并默认配置（两级字典逐项合并）"""
+    config = config or {}
+    return {section: dict(defaults, **config.get(section, {}))
+            for section, defaults in DEFAULT_RESILIENCE_CONFIG.items()}
+
+
+class CircuitBreaker:
+    """单个实例的断路器（线程安全）"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30,
+                 half_open_max_calls: int = 1, enabled: bool = True):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def available(self, now: float = None) -> bool:
+        """是否可能放行请求（不占用探测名额）"""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN:
+            return now - self.opened_at >= self.recovery_timeout
+        return self.probes < self.half_open_max_calls or now - self.opened_at >= self.recovery_timeout
+
+    def allow(self, now: float = None) -> bool:
+        """放行请求；半开状态占用一个探测名额，之后必须调用 record_success/record_failure"""
+        if not self.enabled:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self.opened_at = now
+                self.probes = 0
+            if self.probes >= self.half_open_max_calls:
+                if now - self.opened_at < self.recovery_timeout:
+                    return False
+                # 探测请求迟迟没有结果，重新开放探测名额
+                self.opened_at = now
+                self.probes = 0
+            self.probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probes = 0
+
+    def record_failure(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = now
+                self.probes = 0
+                self.times_opened += 1
+
+    def retry_after(self, now: float = None) -> float:
+        """距离进入半开状态的秒数"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.recovery_timeout - (now - self.opened_at)) if self.state == OPEN else 0.0
+
+
+def ewma_update(average: Optional[float], value: float, alpha: float) -> float:
+    return value if average is None else average + alpha * (value - average)
+
+
+class RouteLatency:
+    """单个实例上某个路由标签的延迟分布与自适应超时（由 Backend 加锁调用）"""
+
+    RECOMPUTE_EVERY = 16
+
+    def __init__(self, timeout_config: Dict):
+        self.timeout_config = timeout_config
+        self.recent = None
+        # 当前窗口与上一窗口的延迟分桶，分位数按两者合计计算
+        self._current = [0] * BUCKET_COUNT
+        self._previous = [0] * BUCKET_COUNT
+        self._samples = 0
+        self._quantile = None
+
+    def record(self, latency: float, alpha: float):
+        self.recent = ewma_update(self.recent, latency, alpha)
+        self._current[bucket_index(int(latency * 1e6))] += 1
+        self._samples += 1
+        if self._samples % self.timeout_config["window"] == 0:
+            self._previous, self._current = self._current, [0] * BUCKET_COUNT
+        if self._samples % self.RECOMPUTE_EVERY == 0 or self._quantile is None:
+            self._recompute()
+
+    def _recompute(self):
+        histogram = LatencyHistogram(list(self._previous))
+        histogram.merge(self._current, 0.0)
+        if histogram.count >= self.timeout_config["min_samples"]:
+            self._quantile = histogram.quantile(self.timeout_config["quantile"])
+
+    def timeout(self, max_timeout: float) -> float:
+        if self._quantile is None:
+            return max_timeout
+        # 分位数反映长期分布，近期均值在延迟整体变慢时更快上升
+        adaptive = max(self._quantile, self.recent) * self.timeout_config["multiplier"]
+        return min(max_timeout, max(self.timeout_config["min_timeout"], adaptive))
+
+
+class Backend:
+    """后端实例：断路器、延迟统计与按路由的自适应超时"""
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, url: str, config: Dict):
+        self.url = url.rstrip('/')
+        self.breaker = CircuitBreaker(**config["circuit_breaker"])
+        self.timeout_config = config["adaptive_timeout"]
+        self.ewma = None
+        self.routes: Dict[str, RouteLatency] = {}
+        self._lock = threading.Lock()
+
+    def record(self, status: Optional[int], latency: float, route: Optional[str] = "",
+               timed_out: bool = False, adaptive: bool = False):
+        """记录一次转发结果
+
+        status 为None表示连接失败或超时；timed_out 为True时 latency 是等待到超时的时间，
+        作为延迟样本记录（连接失败的耗时不代表响应延迟，不记录）。
+        adaptive 为True表示本次使用的超时低于服务配置的 timeout，此时超时不计为断路器失败。
+        route 为None时只更新实例的延迟均值，不按路由统计。
+        """
+        if status is not None and status < 500:
+            self.breaker.record_success()
+        elif not (timed_out and adaptive):
+            self.breaker.record_failure()
+        if status is None and not timed_out:
+            return
+
+        with self._lock:
+            self.ewma = ewma_update(self.ewma, latency, self.EWMA_ALPHA)
+            if route is None:
+                return
+            route_latency = self.routes.get(route)
+            if route_latency is None:
+                route_latency = self.routes[route] = RouteLatency(self.timeout_config)
+            route_latency.record(latency, self.EWMA_ALPHA)
+
+    def timeout(self, max_timeout: float, route: Optional[str] = "") -> float:
+        """本次请求的超时时间（秒）"""
+        route_latency = self.routes.get(route)
+        if (not self.timeout_config["enabled"] or route_latency is None
+                or self.breaker.state != CLOSED):
+            return max_timeout
+        return route_latency.timeout(max_timeout)
+
+    def weight(self, default_latency: float) -> float:
+        return 1.0 / max(0.001, self.ewma if self.ewma is not None else default_latency)
+
+    def stats(self, max_timeout: float) -> Dict:
+        return {
+            "url": self.url,
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "times_opened": self.breaker.times_opened,
+            "latency_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+            "timeouts": {route: round(self.timeout(max_timeout, route), 3) for route in list(self.routes)},
+        }
+
+
+class BackendPool:
+    """按服务管理后端实例（实例在首次使用时创建，服务配置可随时修改）"""
+
+    def __init__(self, config: Dict = None):
+        self.config = merge_resilience_config(config)
+        self._backends: Dict[tuple, Backend] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def backend(self, service_name: str, url: str) -> Backend:
+        key = (service_name, url)
+        backend = self._backends.get(key)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(key)
+                if backend is None:
+                    backend = self._backends[key] = Backend(url, self.config)
+        return backend
+
+    def backends(self, service_name: str, service_config: Dict) -> List[Backend]:
+        return [self.backend(service_name, url) for url in service_urls(service_config)]
+
+    def select(self, service_name: str, service_config: Dict) -> Optional[Backend]:
+        """选择一个实例并占用断路器名额，全部实例不可用时返回None"""
+        now = time.monotonic()
+        candidates = [backend for backend in self.backends(service_name, service_config)
+                      if backend.breaker.available(now)]
+        latencies = [backend.ewma for backend in candidates if backend.ewma is not None]
+        default_latency = sum(latencies) / len(latencies) if latencies else 0.1
+
+        while candidates:
+            if len(candidates) == 1:
+                backend = candidates[0]
+            else:
+                backend = random.choices(candidates, [b.weight(default_latency) for b in candidates])[0]
+            if backend.breaker.allow(now):
+                return backend
+            candidates.remove(backend)  # 探测名额已被其他请求占用
+
+        self.rejected += 1
+        return None
+
+    def retry_after(self, service_name: str, service_config: Dict) -> int:
+        """所有实例都开启断路器时，最早恢复探测的秒数"""
+        waits = [backend.breaker.retry_after() for backend in self.backends(service_name, service_config)]
+        return max(1, int(min(waits) + 0.999)) if waits else 1
+
+    def stats(self, services: Dict) -> Dict:
+        """各服务实例的断路器状态、延迟与当前超时"""
+        return {
+            "rejected": self.rejected,
+            "services": {
+                name: [backend.stats(service_config.get("timeout", 30))
+                       for backend in self.backends(name, service_config)]
+                for name, service_config in services.items()
+            },
+        }
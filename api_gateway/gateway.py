@@ -12,6 +12,7 @@ API网关
 - 错误处理
 """
 
+import sys
 import json
 import time
 import logging
@@ -19,62 +20,115 @@ import hashlib
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, g
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from functools import wraps
 import requests
 import redis
-from collections import defaultdict, deque
+from collections import defaultdict
 
+# 导入项目模块
+sys.path.append(str(Path(__file__).parent.parent))
+from api_gateway.upstream import (
+    UpstreamPool, DEFAULT_UPSTREAM_CONFIG, filter_request_headers, filter_response_headers, service_urls
+)
+from api_gateway.response_cache import (
+    ResponseCache, DEFAULT_CACHE_CONFIG, build_cache_key, etag_matches, has_authorization
+)
+from api_gateway.rate_limiter import RateLimiter, rate_limit_rules
+from api_gateway.single_flight import (
+    SingleFlight, SharedResponse, DEFAULT_COALESCING_CONFIG, coalescing_key
+)
+from api_gateway.metrics import GatewayMetrics, DEFAULT_METRICS_CONFIG
+from api_gateway.backends import BackendPool, DEFAULT_RESILIENCE_CONFIG, OPEN
+from common.security_manager import TokenManager, TokenDenylist
 
-class RateLimiter:
-    """请求限流器"""
-    
-    def __init__(self, redis_client=None):
-        self.redis_client = redis_client
-        self.local_cache = defaultdict(deque)
-        self.window_size = 60  # 1分钟窗口
-    
-    def is_allowed(self, key: str, limit: int, window: int = None) -> bool:
-        """检查是否允许请求"""
-        window = window or self.window_size
-        now = time.time()
-        
-        if self.redis_client:
-            return self._redis_rate_limit(key, limit, window, now)
-        else:
-            return self._local_rate_limit(key, limit, window, now)
-    
-    def _redis_rate_limit(self, key: str, limit: int, window: int, now: float) -> bool:
-        """Redis实现的限流"""
-        try:
-            pipe = self.redis_client.pipeline()
-            pipe.zremrangebyscore(key, 0, now - window)
-            pipe.zcard(key)
-            pipe.zadd(key, {str(now): now})
-            pipe.expire(key, window)
-            results = pipe.execute()
-            
-            current_requests = results[1]
-            return current_requests < limit
-        except:
-            return True  # Redis失败时允许请求
+# 命中缓存返回304时保留的响应头
+NOT_MODIFIED_HEADERS = frozenset(["etag", "cache-control", "expires", "vary", "last-modified"])
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+
+def resolve_service_route(services: Dict, path: str) -> tuple:
+    """按服务前缀解析路由，返回 (服务名, 服务内路径)"""
+    path = path.lstrip('/')
+    for service_name, service_config in services.items():
+        prefix = service_config["prefix"].lstrip('/')
+        if path.startswith(prefix):
+            service_path = path[len(prefix):].lstrip('/')
+            return service_name, service_path
     
-    def _local_rate_limit(self, key: str, limit: int, window: int, now: float) -> bool:
-        """本地内存实现的限流"""
-        requests_queue = self.local_cache[key]
-        
-        # 清理过期请求
-        while requests_queue and requests_queue[0] < now - window:
-            requests_queue.popleft()
-        
-        # 检查是否超限
-        if len(requests_queue) >= limit:
-            return False
-        
-        # 添加当前请求
-        requests_queue.append(now)
-        return True
+    return None, None
+
+
+def runtime_metrics(gateway) -> List:
+    """导出时读取的组件状态指标（缓存容量、请求合并、限流键、后端实例状态）"""
+    cache_stats = gateway.cache.stats()
+    flight_stats = gateway.single_flight.stats()
+    open_circuits, timeouts = {}, {}
+    for service_name, service_config in gateway.config["services"].items():
+        for backend in gateway.backends.backends(service_name, service_config):
+            labels = (("service", service_name), ("instance", backend.url))
+            open_circuits[labels] = 1 if backend.breaker.state == OPEN else 0
+            for route in list(backend.routes):
+                timeouts[labels + (("route", route),)] = backend.timeout(service_config.get("timeout", 30), route)
+    return [
+        ("gateway_cache_bytes", "gauge", "响应缓存占用字节数", {(): cache_stats["bytes"]}),
+        ("gateway_cache_entries", "gauge", "响应缓存条目数", {(): cache_stats["entries"]}),
+        ("gateway_cache_evictions_total", "counter", "响应缓存淘汰次数", {(): cache_stats["evictions"]}),
+        ("gateway_coalesced_requests_total", "counter", "请求合并节省的上游调用数",
+         {(): flight_stats["coalesced"]}),
+        ("gateway_rate_limit_keys", "gauge", "本地限流键数量", {(): gateway.rate_limiter.stats()["keys"]}),
+        ("gateway_backend_circuit_open", "gauge", "后端实例断路器是否开启", open_circuits),
+        ("gateway_backend_timeout_seconds", "gauge", "后端实例各路由当前的转发超时", timeouts),
+        ("gateway_circuit_rejected_total", "counter", "断路器开启时直接拒绝的请求数",
+         {(): gateway.backends.rejected}),
+    ]
+
+
+def summarize_instance_health(urls: List[str], instances: List[Dict]) -> Dict:
+    """汇总服务各实例的健康状态：单实例原样返回，多实例时部分健康为 degraded"""
+    if len(instances) == 1:
+        return instances[0]
+    healthy = sum(1 for instance in instances if instance["status"] == "healthy")
+    status = "healthy" if healthy == len(instances) else "degraded" if healthy else "unreachable"
+    return {"status": status, "instances": dict(zip(urls, instances))}
+
+
+def create_rate_limiter(limits_config: Dict) -> RateLimiter:
+    """按配置创建限流器（配置了 redis_url 时多个网关实例共享限额）"""
+    redis_client = None
+    if limits_config.get("redis_url"):
+        redis_client = redis.Redis.from_url(limits_config["redis_url"], socket_timeout=0.5)
+    return RateLimiter(redis_client, window_size=limits_config.get("window_size", 60))
+
+
+# 旧版默认配置中的占位密钥，用它签名等于公开密钥
+PLACEHOLDER_SECRETS = ("your-secret-key",)
+
+
+def create_token_manager(auth_config: Dict) -> TokenManager:
+    """按配置创建签名令牌验证器
+
+    jwt_secret 为空或仍是占位值时由 TokenManager 读取环境变量 PHRL_TOKEN_SECRET
+    （环境变量也未设置时使用随机密钥，其他进程签发的令牌无法识别用户，按用户限流不生效）；
+    启用认证时撤销记录通过 revocation_db 与签发令牌的进程共享，未启用时不创建撤销库。
+    """
+    secret = auth_config.get("jwt_secret")
+    if secret in PLACEHOLDER_SECRETS:
+        secret = None
+    denylist = None
+    if auth_config.get("enabled") and auth_config.get("revocation_db"):
+        denylist = TokenDenylist(db_path=auth_config["revocation_db"])
+    return TokenManager(secret or None, signed=True, denylist=denylist)
+
+
+def identify_user(token_manager: TokenManager, auth_header: Optional[str]) -> Optional[str]:
+    """从签名令牌中取得用户ID（非签名令牌或验证失败时返回None）"""
+    if not auth_header:
+        return None
+    token_data = token_manager.verify_token(auth_header.replace('Bearer ', ''))
+    return token_data["user_id"] if token_data else None
 
 
 class APIGateway:
@@ -89,10 +143,19 @@ class APIGateway:
         self.load_config()
         
         # 初始化组件
-        self.rate_limiter = RateLimiter()
-        self.cache = {}
+        self.rate_limiter = create_rate_limiter(self.config["rate_limiting"])
+        self.token_manager = create_token_manager(self.config["auth"])
+        self.cache = ResponseCache(self.config["caching"])
+        self.single_flight = SingleFlight()
+        self.coalescing_config = dict(DEFAULT_COALESCING_CONFIG, **self.config.get("coalescing", {}))
+        self.metrics = GatewayMetrics(self.config.get("metrics"))
+        self.backends = BackendPool(self.config.get("resilience"))
         self.service_registry = {}
         self.api_stats = defaultdict(int)
+        self.upstream = UpstreamPool(self.config["services"], self.config.get("upstream"))
+        self.health_executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.config["services"])), thread_name_prefix="gateway-health")
+        self.revalidate_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gateway-revalidate")
         
         # 设置路由
         self.setup_routes()
@@ -125,7 +188,8 @@ class APIGateway:
             self.config = self.get_default_config()
             self.save_config()
     
-    def get_default_config(self) -> Dict:
+    @staticmethod
+    def get_default_config() -> Dict:
         """获取默认配置"""
         return {
             "gateway": {
@@ -133,6 +197,7 @@ class APIGateway:
                 "port": 8000,
                 "debug": False
             },
+            "upstream": dict(DEFAULT_UPSTREAM_CONFIG),
             "services": {
                 "question_bank": {
                     "url": "http://localhost:5000",
@@ -167,19 +232,23 @@ class APIGateway:
             },
             "auth": {
                 "enabled": True,
-                "jwt_secret": "your-secret-key",
+                "jwt_secret": "",
+                "revocation_db": "data/revoked_tokens.db",
                 "token_expiry": 3600
             },
             "rate_limiting": {
                 "enabled": True,
                 "default_limit": 100,
-                "window_size": 60
+                "window_size": 60,
+                "routes": {},
+                "user_limit": 0,
+                "users": {},
+                "redis_url": ""
             },
-            "caching": {
-                "enabled": True,
-                "default_ttl": 300,
-                "max_size": 1000
-            }
+            "caching": dict(DEFAULT_CACHE_CONFIG),
+            "coalescing": dict(DEFAULT_COALESCING_CONFIG),
+            "metrics": dict(DEFAULT_METRICS_CONFIG),
+            "resilience": {section: dict(values) for section, values in DEFAULT_RESILIENCE_CONFIG.items()}
         }
     
     def save_config(self):
@@ -210,6 +279,13 @@ class APIGateway:
             self.api_stats[f"{request.method}:{request.path}"] += 1
             self.api_stats["total_requests"] += 1
             
+            timing = g.get("timing")
+            if timing is None:
+                self.metrics.record_unrouted(request.method, response.status_code)
+            else:
+                cache_result = response.headers.get("X-Cache", "MISS") if g.get("cacheable") else None
+                self.metrics.finish(timing, request.method, response.status_code, cache_result)
+            
             return response
         
         @self.app.route('/health')
@@ -226,10 +302,20 @@ class APIGateway:
             """获取统计信息"""
             return jsonify({
                 "api_stats": dict(self.api_stats),
+                "cache": self.cache.stats(),
+                "rate_limiting": self.rate_limiter.stats(),
+                "coalescing": self.single_flight.stats(),
+                "backends": self.backends.stats(self.config["services"]),
                 "services": list(self.config["services"].keys()),
                 "uptime": time.time() - self.start_time if hasattr(self, 'start_time') else 0
             })
         
+        @self.app.route('/metrics')
+        def get_metrics():
+            """Prometheus 文本格式指标"""
+            body = self.metrics.render(runtime_metrics(self))
+            return Response(body, mimetype="text/plain; version=0.0.4")
+        
         # 动态路由处理
         @self.app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'])
         def proxy_request(path):
@@ -240,36 +326,40 @@ class APIGateway:
         """处理请求"""
         try:
             # 1. 身份验证
+            user_id = None
             if self.config["auth"]["enabled"]:
                 auth_result = self.authenticate_request()
                 if not auth_result["success"]:
                     return jsonify({"error": auth_result["message"]}), 401
+                user_id = auth_result.get("user_id")
             
             # 2. 路由解析
             service_name, service_path = self.resolve_route(path)
             if not service_name:
                 return jsonify({"error": "Service not found"}), 404
+            prefix = self.config["services"][service_name]["prefix"]
+            g.timing = self.metrics.start(service_name, self.metrics.route_label(prefix, request.path))
             
             # 3. 请求限流
             if self.config["rate_limiting"]["enabled"]:
-                if not self.check_rate_limit(service_name):
+                if not self.check_rate_limit(service_name, user_id):
+                    self.metrics.record_rate_limited(service_name)
                     return jsonify({"error": "Rate limit exceeded"}), 429
             
             # 4. 缓存检查
-            cache_key = self.get_cache_key(service_name, service_path, request.args)
-            if request.method == "GET" and self.config["caching"]["enabled"]:
-                cached_response = self.get_cached_response(cache_key)
-                if cached_response:
+            cacheable = g.cacheable = request.method == "GET" and self.config["caching"]["enabled"]
+            if cacheable:
+                cache_key = self.get_cache_key(service_name, service_path, request.args,
+                                               request.headers.get("Accept-Encoding", ""))
+                cached_response = self.get_cached_response(cache_key, service_name, service_path)
+                if cached_response is not None:
                     return cached_response
+                
+                # 5. 缓存未命中：相同请求合并为一次转发，响应写入缓存
+                return self.fetch_cacheable(service_name, service_path, cache_key)
             
             # 5. 转发请求
-            response = self.forward_request(service_name, service_path)
-            
-            # 6. 缓存响应
-            if request.method == "GET" and response.status_code == 200:
-                self.cache_response(cache_key, response)
-            
-            return response
+            return self.forward_request(service_name, service_path)
             
         except Exception as e:
             self.logger.error(f"处理请求失败: {e}")
@@ -282,135 +372,274 @@ class APIGateway:
             return {"success": False, "message": "Missing authorization header"}
         
         try:
-            # 简化的JWT验证（实际应该使用专业的JWT库）
-            token = auth_header.replace('Bearer ', '')
-            # 这里应该验证JWT token
-            return {"success": True, "user_id": "user123"}
+            # 签名令牌可识别用户（用于按用户限流），其他令牌暂按原方式放行
+            return {"success": True, "user_id": identify_user(self.token_manager, auth_header)}
         except Exception as e:
             return {"success": False, "message": f"Invalid token: {e}"}
     
     def resolve_route(self, path: str) -> tuple:
         """解析路由"""
-        for service_name, service_config in self.config["services"].items():
-            prefix = service_config["prefix"].lstrip('/')
-            if path.startswith(prefix):
-                service_path = path[len(prefix):].lstrip('/')
-                return service_name, service_path
-        
-        return None, None
+        return resolve_service_route(self.config["services"], path)
     
-    def check_rate_limit(self, service_name: str) -> bool:
-        """检查请求限流"""
-        service_config = self.config["services"].get(service_name, {})
-        limit = service_config.get("rate_limit", self.config["rate_limiting"]["default_limit"])
-        
-        client_id = request.remote_addr
-        key = f"rate_limit:{service_name}:{client_id}"
-        
-        return self.rate_limiter.is_allowed(key, limit)
+    def check_rate_limit(self, service_name: str, user_id: str = None) -> bool:
+        """检查请求限流（服务、路由、用户限额需同时满足）"""
+        rules = rate_limit_rules(self.config, service_name, request.path, request.remote_addr, user_id)
+        return self.rate_limiter.allow_all(rules)
     
-    def get_cache_key(self, service_name: str, path: str, params: Dict) -> str:
+    def get_cache_key(self, service_name: str, path: str, params, accept_encoding: str = "") -> str:
         """生成缓存键"""
-        params_str = json.dumps(sorted(params.items())) if params else ""
-        return hashlib.md5(f"{service_name}:{path}:{params_str}".encode()).hexdigest()
+        items = params.items(multi=True) if hasattr(params, "getlist") else params.items()
+        return build_cache_key(service_name, path, items, accept_encoding)
     
-    def get_cached_response(self, cache_key: str):
-        """获取缓存响应"""
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            ttl = self.config["caching"]["default_ttl"]
-            
-            if time.time() - timestamp < ttl:
-                self.logger.info(f"Cache hit: {cache_key}")
-                return jsonify(cached_data)
-            else:
-                # 缓存过期
-                del self.cache[cache_key]
+    def build_cached_response(self, entry) -> Response:
+        """由缓存项构建响应，客户端条件请求匹配时返回304"""
+        now = time.time()
+        if etag_matches(request.headers.get("If-None-Match"), entry.etag):
+            self.cache.record_not_modified()
+            response = Response(status=304, headers=[
+                (name, value) for name, value in entry.headers if name.lower() in NOT_MODIFIED_HEADERS])
+        else:
+            response = Response(entry.body, status=entry.status, headers=entry.headers)
+        response.headers["Age"] = str(entry.age(now))
+        response.headers["X-Cache"] = "HIT" if now < entry.expires_at else "STALE"
+        return response
+    
+    def get_cached_response(self, cache_key: str, service_name: str, service_path: str) -> Optional[Response]:
+        """获取缓存响应，旧值窗口内的缓存在后台重新验证"""
+        entry, revalidate = self.cache.get(cache_key)
+        if entry is None:
+            return None
         
-        return None
+        if revalidate:
+            headers = filter_request_headers(request.headers)
+            for name in CONDITIONAL_HEADERS:
+                headers.pop(name, None)
+            self.revalidate_executor.submit(self.revalidate_cache, cache_key, entry, service_name,
+                                            service_path, request.query_string, headers)
+        return self.build_cached_response(entry)
     
-    def cache_response(self, cache_key: str, response):
-        """缓存响应"""
+    def revalidate_cache(self, cache_key: str, entry, service_name: str, service_path: str,
+                         query_string: bytes, headers: Dict):
+        """后台向后端重新验证过期缓存（带 If-None-Match，未变化时只延长新鲜期）"""
+        service_config = self.config["services"][service_name]
+        backend = self.backends.select(service_name, service_config)
+        if backend is None:
+            self.cache.abandon_revalidation(cache_key)
+            return
+        
+        url = self.build_upstream_url(backend.url, service_path, query_string)
+        max_timeout = service_config.get("timeout", 30)
+        route = self.metrics.timeout_route(service_config["prefix"], entry.route)
+        timeout = backend.timeout(max_timeout, route)
+        started = time.perf_counter()
         try:
-            if len(self.cache) >= self.config["caching"]["max_size"]:
-                # 简单的LRU：删除最旧的缓存
-                oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-                del self.cache[oldest_key]
-            
-            self.cache[cache_key] = (response.get_json(), time.time())
-            self.logger.info(f"Cached response: {cache_key}")
+            try:
+                upstream_response = self.upstream.request(
+                    service_name, "GET", url, headers=dict(headers, **{"If-None-Match": entry.etag}),
+                    timeout=timeout)
+            except Exception as e:
+                backend.record(None, time.perf_counter() - started, route,
+                               timed_out=isinstance(e, requests.exceptions.Timeout),
+                               adaptive=timeout < max_timeout)
+                raise
+            backend.record(upstream_response.status_code, time.perf_counter() - started, route)
+            authorized = has_authorization(headers)
+            if upstream_response.status_code == 304:
+                self.upstream.read_body(upstream_response)
+                self.cache.refresh(cache_key, entry.route, upstream_response.headers, authorized=authorized)
+            elif upstream_response.status_code == 200 and not self.upstream.should_stream(upstream_response):
+                body = self.upstream.read_body(upstream_response)
+                self.cache.store(cache_key, entry.route, 200,
+                                 filter_response_headers(upstream_response.headers),
+                                 body, upstream_response.headers, authorized=authorized)
+            else:
+                upstream_response.close()
+                self.cache.abandon_revalidation(cache_key)
+        except Exception as e:
+            self.logger.warning(f"后台刷新缓存失败 {cache_key}: {e}")
+            self.cache.abandon_revalidation(cache_key)
+    
+    def cache_response(self, cache_key: str, response: Response):
+        """缓存响应，返回缓存项（不可缓存时为None）"""
+        try:
+            return self.cache.store(cache_key, request.path, response.status_code,
+                                    list(response.headers.items()), response.get_data(),
+                                    response.headers, authorized=has_authorization(request.headers))
         except Exception as e:
             self.logger.warning(f"缓存响应失败: {e}")
+            return None
     
-    def forward_request(self, service_name: str, service_path: str):
-        """转发请求到后端服务"""
-        service_config = self.config["services"][service_name]
-        base_url = service_config["url"]
-        timeout = service_config.get("timeout", 30)
+    def forward_and_cache(self, service_name: str, service_path: str, cache_key: str,
+                          share_uncached: bool = False):
+        """转发可缓存的请求并写入缓存，返回 (响应, 可共享给等待方的结果)
         
-        # 构建完整URL
+        可缓存的请求不转发条件头部，取完整响应写入缓存后由网关判断304。
+        未写入缓存的响应只在 share_uncached（合并键包含用户凭据）时共享，流式响应不共享。
+        """
+        response = self.forward_request(service_name, service_path, conditional=False)
+        if response.is_streamed:
+            return response, None
+        
+        entry = self.cache_response(cache_key, response) if response.status_code == 200 else None
+        if entry is not None:
+            response = self.build_cached_response(entry)
+            response.headers["X-Cache"] = "MISS"
+            return response, SharedResponse(entry.status, entry.headers, entry.body, entry)
+        if share_uncached:
+            return response, SharedResponse(response.status_code, list(response.headers.items()),
+                                            response.get_data())
+        return response, None
+    
+    def fetch_cacheable(self, service_name: str, service_path: str, cache_key: str) -> Response:
+        """转发缓存未命中的GET请求，并发的相同请求只由领头请求转发"""
+        coalescing = self.coalescing_config
+        if not coalescing["enabled"]:
+            return self.forward_and_cache(service_name, service_path, cache_key)[0]
+        
+        vary_headers = coalescing["vary_headers"]
+        share_uncached = any(name.lower() == "authorization" for name in vary_headers)
+        key = coalescing_key(cache_key, vary_headers, request.headers)
+        call, leader = self.single_flight.join(key)
+        if not leader:
+            shared = self.single_flight.wait(call, coalescing["timeout"])
+            if shared is not None:
+                return self.build_shared_response(shared)
+            # 等待超时或结果不可共享，自行转发
+            return self.forward_and_cache(service_name, service_path, cache_key, share_uncached)[0]
+        
+        shared = None
+        try:
+            response, shared = self.forward_and_cache(service_name, service_path, cache_key, share_uncached)
+            return response
+        finally:
+            self.single_flight.complete(key, call, shared)
+    
+    def build_shared_response(self, shared: SharedResponse) -> Response:
+        """由领头请求公布的结果构建响应"""
+        if shared.entry is not None:
+            response = self.build_cached_response(shared.entry)
+        else:
+            response = Response(shared.body, status=shared.status, headers=shared.headers)
+        response.headers["X-Cache"] = "COALESCED"
+        return response
+    
+    def error_response(self, message: str, status: int) -> Response:
+        """错误响应"""
+        response = jsonify({"error": message})
+        response.status_code = status
+        return response
+    
+    def build_upstream_url(self, base_url: str, service_path: str, query_string: bytes) -> str:
+        """构建后端完整URL"""
         url = f"{base_url}/{service_path}".rstrip('/')
-        if request.query_string:
-            url += f"?{request.query_string.decode()}"
+        if query_string:
+            url += f"?{query_string.decode()}"
+        return url
+    
+    def forward_request(self, service_name: str, service_path: str, conditional: bool = True) -> Response:
+        """转发请求到后端服务
         
-        # 准备请求数据
-        headers = dict(request.headers)
-        headers.pop('Host', None)  # 移除Host头
+        使用服务的连接池发送请求；小响应读入内存后返回，
+        大响应或长度未知的响应按块转发给客户端。
+        conditional 为False时不转发条件头部，保证取到完整响应。
+        后端实例由断路器与负载均衡选出，metrics.routes 中配置的路由按实例在该路由上的延迟自适应超时，其余使用服务配置的 timeout。
+        """
+        service_config = self.config["services"][service_name]
+        backend = self.backends.select(service_name, service_config)
+        if backend is None:
+            self.logger.warning(f"断路器开启，拒绝请求: {service_name}")
+            response = self.error_response("Service unavailable", 503)
+            response.headers["Retry-After"] = str(self.backends.retry_after(service_name, service_config))
+            return response
+        timing = g.get("timing")
+        max_timeout = service_config.get("timeout", 30)
+        route = self.metrics.timeout_route(service_config["prefix"], request.path)
+        timeout = backend.timeout(max_timeout, route)
+        url = self.build_upstream_url(backend.url, service_path, request.query_string)
         
-        data = None
-        if request.method in ['POST', 'PUT', 'PATCH']:
-            if request.is_json:
-                data = request.get_json()
-            else:
-                data = request.get_data()
+        # 请求体按原始字节转发，Content-Length 由上游请求重新计算
+        headers = filter_request_headers(request.headers)
+        if not conditional:
+            for name in CONDITIONAL_HEADERS:
+                headers.pop(name, None)
+        data = request.get_data() if request.method in ['POST', 'PUT', 'PATCH'] else None
         
+        started = time.perf_counter()
+        upstream_response = None
+        timed_out = False
         try:
-            # 发送请求
-            response = requests.request(
-                method=request.method,
-                url=url,
-                headers=headers,
-                json=data if request.is_json else None,
-                data=data if not request.is_json else None,
-                timeout=timeout
+            upstream_response = self.upstream.request(
+                service_name, request.method, url,
+                headers=headers, data=data, timeout=timeout
             )
-            
-            # 构建响应
-            excluded_headers = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
-            headers = [(name, value) for (name, value) in response.raw.headers.items()
-                      if name.lower() not in excluded_headers]
-            
-            return response.content, response.status_code, headers
-            
         except requests.exceptions.Timeout:
-            self.logger.error(f"请求超时: {service_name} {url}")
-            return jsonify({"error": "Service timeout"}), 504
+            timed_out = True
+            self.logger.error(f"请求超时: {service_name} {url}（{timeout:.1f}秒）")
+            return self.error_response("Service timeout", 504)
         except requests.exceptions.ConnectionError:
             self.logger.error(f"连接失败: {service_name} {url}")
-            return jsonify({"error": "Service unavailable"}), 503
+            return self.error_response("Service unavailable", 503)
         except Exception as e:
             self.logger.error(f"转发请求失败: {e}")
-            return jsonify({"error": "Service error"}), 502
-    
-    def check_services_health(self) -> Dict:
-        """检查服务健康状态"""
-        health_status = {}
+            return self.error_response("Service error", 502)
+        finally:
+            elapsed = time.perf_counter() - started
+            backend.record(upstream_response.status_code if upstream_response is not None else None,
+                           elapsed, route, timed_out, adaptive=timeout < max_timeout)
+            if timing is not None:
+                timing.upstream += elapsed
         
-        for service_name, service_config in self.config["services"].items():
+        headers = filter_response_headers(upstream_response.headers)
+        if not self.upstream.should_stream(upstream_response):
+            started = time.perf_counter()
             try:
-                url = f"{service_config['url']}/health"
-                response = requests.get(url, timeout=5)
-                health_status[service_name] = {
+                body = self.upstream.read_body(upstream_response)
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"读取响应失败: {service_name} {url}: {e}")
+                backend.breaker.record_failure()
+                return self.error_response("Service error", 502)
+            finally:
+                if timing is not None:
+                    timing.upstream += time.perf_counter() - started
+            return Response(body, status=upstream_response.status_code, headers=headers)
+        
+        # 大响应按块转发，上游耗时只计到响应头
+        response = Response(self.upstream.iter_body(upstream_response),
+                            status=upstream_response.status_code, headers=headers)
+        # 客户端提前断开时生成器可能从未启动，关闭响应时归还上游连接
+        response.call_on_close(upstream_response.close)
+        return response
+    
+    def check_service_health(self, service_name: str) -> Dict:
+        """检查单个服务健康状态（多实例时逐个检查，附实例状态）"""
+        urls = service_urls(self.config["services"][service_name])
+        instances = [self.check_instance_health(service_name, url) for url in urls]
+        return summarize_instance_health(urls, instances)
+    
+    def check_instance_health(self, service_name: str, base_url: str) -> Dict:
+        """检查单个后端实例"""
+        timeout = self.upstream.config["health_timeout"]
+        circuit = self.backends.backend(service_name, base_url).breaker.state
+        try:
+            url = f"{base_url}/health"
+            with self.upstream.session(service_name).get(url, timeout=timeout) as response:
+                return {
                     "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "response_time": response.elapsed.total_seconds()
-                }
-            except Exception as e:
-                health_status[service_name] = {
-                    "status": "unreachable",
-                    "error": str(e)
+                    "response_time": response.elapsed.total_seconds(),
+                    "circuit": circuit
                 }
-        
-        return health_status
+        except Exception as e:
+            return {
+                "status": "unreachable",
+                "error": str(e),
+                "circuit": circuit
+            }
+    
+    def check_services_health(self) -> Dict:
+        """并发检查所有服务健康状态（总耗时取决于最慢的服务）"""
+        service_names = list(self.config["services"])
+        results = self.health_executor.map(self.check_service_health, service_names)
+        return dict(zip(service_names, results))
     
     def run(self):
         """启动网关"""
@@ -422,7 +651,16 @@ class APIGateway:
         debug = gateway_config.get("debug", False)
         
         self.logger.info(f"启动API网关: {host}:{port}")
-        self.app.run(host=host, port=port, debug=debug)
+        try:
+            self.app.run(host=host, port=port, debug=debug, threaded=True)
+        finally:
+            self.close()
+    
+    def close(self):
+        """释放上游连接与后台线程"""
+        self.upstream.close()
+        self.health_executor.shutdown(wait=False)
+        self.revalidate_executor.shutdown(wait=False)
 
 
 def main():
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网关压测工具
+
+在本机启动桩后端、同步网关（Flask）与异步网关（ASGI），以相同负载分别压测并对比：
+- 吞吐量（请求/秒）、整体与快接口的 p50/p99 延迟、失败数
+- 负载中按比例混入慢接口请求，观察慢请求对其他请求的影响
+
+每个服务运行在独立进程中，压测端使用 aiohttp 异步客户端。
+
+用法：
+    python api_gateway/load_test.py --requests 2000 --concurrency 100 --slow-ratio 0.05 --slow-delay 1
+"""
+
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+# 导入项目模块
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"端口 {port} 未在 {timeout} 秒内就绪")
+
+
+def run_stub_backend(port: int, slow_delay: float):
+    """桩后端：/fast 立即返回，/slow 等待 slow_delay 秒，/health 健康检查"""
+    body = json.dumps({"items": list(range(50))}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/slow"):
+                time.sleep(slow_delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def run_sync_gateway(port: int, config_path: str):
+    """同步网关（Flask多线程服务器）"""
+    from werkzeug.serving import make_server
+    from api_gateway.gateway import APIGateway
+
+    gateway = APIGateway(config_path)
+    gateway.logger.setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", port, gateway.app, threaded=True)
+    server.serve_forever()
+
+
+def run_async_gateway(port: int, config_path: str):
+    """异步网关（uvicorn）"""
+    import uvicorn
+    from api_gateway.async_gateway import AsyncGateway
+
+    gateway = AsyncGateway(config_path)
+    gateway.logger.setLevel(logging.WARNING)
+    uvicorn.run(gateway, host="127.0.0.1", port=port, log_level="warning", backlog=1024)
+
+
+def build_config(backend_port: int) -> Dict:
+    """压测配置：关闭认证、限流与缓存，只比较转发性能"""
+    from api_gateway.gateway import APIGateway
+
+    config = APIGateway.get_default_config()
+    config["auth"]["enabled"] = False
+    config["rate_limiting"]["enabled"] = False
+    config["caching"]["enabled"] = False
+    config["services"] = {
+        "exam_management": {"url": f"http://127.0.0.1:{backend_port}", "prefix": "/api/exams",
+                            "timeout": 30, "pool_size": 200}
+    }
+    return config
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def drive_load(port: int, total: int, concurrency: int, slow_ratio: float) -> Dict:
+    """并发发送请求，统计延迟（毫秒）与吞吐"""
+    import aiohttp
+
+    slow_every = int(round(1 / slow_ratio)) if slow_ratio > 0 else 0
+    paths = ["/api/exams/slow" if slow_every and i % slow_every == 0 else "/api/exams/fast"
+             for i in range(total)]
+    results: List[Tuple[str, float, bool]] = []
+    next_index = iter(range(total))
+
+    base_url = f"http://127.0.0.1:{port}"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60),
+                                     headers={"Authorization": "Bearer load-test"}) as client:
+        async def worker():
+            for index in next_index:
+                path = paths[index]
+                start = time.perf_counter()
+                try:
+                    async with client.get(base_url + path) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                results.append((path, (time.perf_counter() - start) * 1000, ok))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for _, latency, ok in results if ok]
+    fast = [latency for path, latency, ok in results if ok and path.endswith("/fast")]
+    return {
+        "requests": total,
+        "failures": sum(1 for _, _, ok in results if not ok),
+        "elapsed": round(elapsed, 2),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "fast_p50_ms": round(percentile(fast, 50), 2),
+        "fast_p99_ms": round(percentile(fast, 99), 2),
+    }
+
+
+def run_load_test(total: int = 2000, concurrency: int = 100, slow_ratio: float = 0.05,
+                  slow_delay: float = 1.0, modes: Tuple[str, ...] = ("sync", "async")) -> Dict[str, Dict]:
+    """启动桩后端与各模式网关，依次压测"""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        backend_port = free_port()
+        config_path = Path(temp_dir) / "gateway.json"
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(build_config(backend_port), f, ensure_ascii=False, indent=2)
+
+        try:
+            backend = context.Process(target=run_stub_backend, args=(backend_port, slow_delay), daemon=True)
+            backend.start()
+            processes.append(backend)
+            wait_for_port(backend_port)
+
+            targets = {"sync": run_sync_gateway, "async": run_async_gateway}
+            for mode in modes:
+                port = free_port()
+                gateway = context.Process(target=targets[mode], args=(port, str(config_path)), daemon=True)
+                gateway.start()
+                processes.append(gateway)
+                wait_for_port(port)
+                # 预热连接池
+                asyncio.run(drive_load(port, min(concurrency, total), concurrency, 0))
+                results[mode] = asyncio.run(drive_load(port, total, concurrency, slow_ratio))
+                gateway.terminate()
+                gateway.join()
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+    return results
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="同步/异步网关压测对比")
+    parser.add_argument("--requests", type=int, default=2000, help="每种模式的请求总数")
+    parser.add_argument("--concurrency", type=int, default=100, help="并发连接数")
+    parser.add_argument("--slow-ratio", type=float, default=0.05, help="慢接口请求占比")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="慢接口耗时（秒）")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--output", help="结果保存为JSON文件")
+    args = parser.parse_args()
+
+    try:
+        import aiohttp  # noqa: F401
+        if args.mode != "sync":
+            import uvicorn  # noqa: F401
+    except ImportError as e:
+        print(f"❌ 缺少依赖: {e}（需要 aiohttp 与 uvicorn）")
+        return
+
+    modes = ("sync", "async") if args.mode == "both" else (args.mode,)
+    print(f"⏱️ 网关压测：{args.requests} 个请求，并发 {args.concurrency}，"
+          f"慢接口占比 {args.slow_ratio:.0%}（{args.slow_delay} 秒）")
+    results = run_load_test(args.requests, args.concurrency, args.slow_ratio, args.slow_delay, modes)
+
+    print(f"{'模式':<8}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'快接口p50':>12}{'快接口p99':>12}{'失败':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['rps']:>14}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['fast_p50_ms']:>12}{result['fast_p99_ms']:>12}{result['failures']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网关指标
+
+按服务与路由统计请求延迟，以 Prometheus 文本格式导出：
+- 延迟直方图采用 HDR 式对数线性分桶：每个2的幂区间再等分16个子桶，
+  相对误差不超过 1/16，覆盖 1 微秒到约 134 秒，桶数组预先分配
+- 每个线程写自己的分片（计数器、仪表、直方图），请求路径上不加锁；
+  导出时汇总所有分片，已退出线程的分片并入归档分片
+- 分别记录网关总耗时、上游耗时与网关自身开销，以及缓存命中、限流拒绝与处理中请求数
+"""
+
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "routes": [],  # 路由标签使用的路径前缀（最长前缀优先），未匹配时取服务前缀；只有这里配置的路由使用自适应超时
+}
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 27  # 2^27 微秒，约134秒，更大的值计入最后一个桶
+BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+# 导出时合并成的 Prometheus 桶边界（秒）
+EXPORT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def bucket_index(micros: int) -> int:
+    """微秒值所在的桶"""
+    shift = max(0, micros.bit_length() - SUB_BUCKET_BITS - 1)
+    return min(BUCKET_COUNT - 1, (shift << SUB_BUCKET_BITS) + (micros >> shift))
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """桶覆盖的微秒范围 [下界, 上界]"""
+    shift = max(0, (index >> SUB_BUCKET_BITS) - 1)
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+# 每个细分桶并入的导出桶（按桶下界判断）
+_EXPORT_INDEX = [
+    next((i for i, bound in enumerate(EXPORT_BUCKETS) if bucket_bounds(index)[0] <= bound * 1e6),
+         len(EXPORT_BUCKETS))
+    for index in range(BUCKET_COUNT)
+]
+
+
+class LatencyHistogram:
+    """汇总后的延迟直方图（只读）"""
+
+    def __init__(self, counts: List[int] = None, total: float = 0.0):
+        self.counts = counts if counts is not None else [0] * BUCKET_COUNT
+        self.total = total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def merge(self, counts: List[int], total: float):
+        for index, value in enumerate(counts):
+            if value:
+                self.counts[index] += value
+        self.total += total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位数（秒，取所在桶的上界），无样本时返回None"""
+        count = self.count
+        if not count:
+            return None
+        rank = max(1, int(q * count + 0.5))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                return (bucket_bounds(index)[1] + 1) / 1e6
+        return (bucket_bounds(BUCKET_COUNT - 1)[1] + 1) / 1e6
+
+    def export_buckets(self) -> List[int]:
+        """按 EXPORT_BUCKETS 合并的累计计数（最后一项为 +Inf）"""
+        merged = [0] * (len(EXPORT_BUCKETS) + 1)
+        for index, value in enumerate(self.counts):
+            if value:
+                merged[_EXPORT_INDEX[index]] += value
+        for i in range(1, len(merged)):
+            merged[i] += merged[i - 1]
+        return merged
+
+
+class _Shard:
+    """单个线程的指标分片（只由所属线程写入）"""
+    __slots__ = ("counters", "gauges", "histograms", "sums")
+
+    def __init__(self):
+        self.counters: Dict[Tuple, float] = {}
+        self.gauges: Dict[Tuple, float] = {}
+        self.histograms: Dict[Tuple, List[int]] = {}
+        self.sums: Dict[Tuple, float] = {}
+
+    def absorb(self, other: "_Shard"):
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, value in other.gauges.items():
+            self.gauges[key] = self.gauges.get(key, 0) + value
+        for key, counts in other.histograms.items():
+            target = self.histograms.setdefault(key, [0] * BUCKET_COUNT)
+            for index, value in enumerate(counts):
+                if value:
+                    target[index] += value
+        for key, value in other.sums.items():
+            self.sums[key] = self.sums.get(key, 0.0) + value
+
+
+class MetricsRegistry:
+    """按线程分片的指标注册表
+
+    指标以 (名称, 标签值元组) 为键；describe 声明类型、说明与标签名。
+    """
+
+    def __init__(self):
+        self._descriptions: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        self._retired = _Shard()
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, metric_type: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self._descriptions[name] = (metric_type, help_text, labelnames)
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                # 按连接创建线程的服务器会不断产生新线程，登记时顺便归档已退出的线程
+                if len(self._shards) >= 64:
+                    self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _retire_dead(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.absorb(shard)
+        self._shards = alive
+
+    def inc(self, name: str, labels: Tuple = (), value: float = 1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def gauge_add(self, name: str, labels: Tuple = (), delta: float = 1):
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + delta
+
+    def observe(self, name: str, labels: Tuple, seconds: float):
+        shard = self._shard()
+        key = (name, labels)
+        counts = shard.histograms.get(key)
+        if counts is None:
+            counts = shard.histograms[key] = [0] * BUCKET_COUNT
+            shard.sums[key] = 0.0
+        counts[bucket_index(int(seconds * 1e6))] += 1
+        shard.sums[key] += seconds
+
+    def snapshot(self) -> _Shard:
+        """汇总所有分片（其他线程可能同时写入，复制时不迭代原字典）"""
+        merged = _Shard()
+        with self._lock:
+            self._retire_dead()
+            shards = [self._retired] + [shard for _, shard in self._shards]
+            for shard in shards:
+                view = _Shard()
+                view.counters = shard.counters.copy()
+                view.gauges = shard.gauges.copy()
+                view.histograms = {key: list(counts) for key, counts in shard.histograms.copy().items()}
+                view.sums = shard.sums.copy()
+                merged.absorb(view)
+        return merged
+
+    def histogram(self, name: str, labels: Tuple) -> LatencyHistogram:
+        """汇总某个序列的直方图"""
+        histogram = LatencyHistogram()
+        with self._lock:
+            shards = [self._retired] + [shard for _, shard in self._shards]
+            for shard in shards:
+                counts = shard.histograms.get((name, labels))
+                if counts is not None:
+                    histogram.merge(list(counts), shard.sums.get((name, labels), 0.0))
+        return histogram
+
+    def render(self, extra: Iterable[Tuple[str, str, str, Dict[Tuple, float]]] = ()) -> str:
+        """Prometheus 文本格式
+
+        extra 为导出时计算的附加指标 [(名称, 类型, 说明, {((标签名, 标签值), ...): 值})]，
+        不带标签时键为 ()。
+        """
+        snapshot = self.snapshot()
+        series: Dict[str, Dict[Tuple, object]] = {name: {} for name in self._descriptions}
+        for (name, labels), value in snapshot.counters.items():
+            series[name][labels] = value
+        for (name, labels), value in snapshot.gauges.items():
+            series[name][labels] = value
+        for (name, labels), counts in snapshot.histograms.items():
+            series[name][labels] = LatencyHistogram(counts, snapshot.sums.get((name, labels), 0.0))
+
+        lines = []
+        for name, (metric_type, help_text, labelnames) in self._descriptions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(series[name].items()):
+                pairs = list(zip(labelnames, labels))
+                if isinstance(value, LatencyHistogram):
+                    cumulative = value.export_buckets()
+                    for bound, count in zip(EXPORT_BUCKETS + ("+Inf",), cumulative):
+                        lines.append(f"{name}_bucket{format_labels(pairs + [('le', str(bound))])} {count}")
+                    lines.append(f"{name}_sum{format_labels(pairs)} {value.total:.6f}")
+                    lines.append(f"{name}_count{format_labels(pairs)} {cumulative[-1]}")
+                else:
+                    lines.append(f"{name}{format_labels(pairs)} {format_value(value)}")
+
+        for name, metric_type, help_text, values in extra:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in values.items():
+                lines.append(f"{name}{format_labels(list(labels))} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+
+class RequestTiming:
+    """单个请求的计时（上游耗时由转发代码累加）"""
+    __slots__ = ("service", "route", "start", "upstream", "headers_at", "cache_result")
+
+    def __init__(self, service: str = "", route: str = ""):
+        self.service = service
+        self.route = route
+        self.start = time.perf_counter()
+        self.upstream = 0.0
+        self.headers_at = None  # 响应头发出的时间，流式响应据此只计到响应头
+        self.cache_result = None
+
+
+class GatewayMetrics(MetricsRegistry):
+    """网关请求指标"""
+
+    def __init__(self, config: Dict = None):
+        super().__init__()
+        config = dict(DEFAULT_METRICS_CONFIG, **(config or {}))
+        self.enabled = config["enabled"]
+        self.route_prefixes = sorted(("/" + prefix.strip("/") for prefix in config["routes"]),
+                                     key=len, reverse=True)
+
+        self.describe("gateway_requests_total", "counter", "网关处理的请求数",
+                      ("service", "method", "status"))
+        self.describe("gateway_request_duration_seconds", "histogram", "网关总耗时（至响应头）",
+                      ("service", "route"))
+        self.describe("gateway_upstream_duration_seconds", "histogram", "上游耗时",
+                      ("service", "route"))
+        self.describe("gateway_overhead_duration_seconds", "histogram", "网关自身耗时（总耗时减上游耗时）",
+                      ("service",))
+        self.describe("gateway_cache_requests_total", "counter", "可缓存请求的缓存结果",
+                      ("service", "result"))
+        self.describe("gateway_rate_limited_total", "counter", "被限流拒绝的请求数", ("service",))
+        self.describe("gateway_in_flight_requests", "gauge", "处理中的请求数", ("service",))
+
+    def route_label(self, service_prefix: str, path: str) -> str:
+        """路由标签：配置的最长匹配前缀，未配置时为服务前缀（避免路径参数导致标签过多）"""
+        for prefix in self.route_prefixes:
+            if path.startswith(prefix):
+                return prefix
+        return "/" + service_prefix.strip("/")
+
+    def timeout_route(self, service_prefix: str, path: str) -> Optional[str]:
+        """自适应超时的路由标签：只用 metrics.routes 中配置的路由，未配置时返回None
+
+        未配置路由时整个服务共用一个标签，快慢请求混在一起，
+        按快请求的延迟算出的超时会掐断慢请求，因此使用服务配置的 timeout。
+        """
+        route = self.route_label(service_prefix, path)
+        return route if route in self.route_prefixes else None
+
+    def start(self, service: str, route: str) -> RequestTiming:
+        if self.enabled:
+            self.gauge_add("gateway_in_flight_requests", (service,), 1)
+        return RequestTiming(service, route)
+
+    def finish(self, timing: RequestTiming, method: str, status: int, cache_result: str = None):
+        """请求结束（已开始计时的请求必须调用）"""
+        if not self.enabled:
+            return
+        duration = (timing.headers_at or time.perf_counter()) - timing.start
+        service = timing.service
+        self.gauge_add("gateway_in_flight_requests", (service,), -1)
+        self.inc("gateway_requests_total", (service, method, str(status)))
+        self.observe("gateway_request_duration_seconds", (service, timing.route), duration)
+        if timing.upstream:
+            self.observe("gateway_upstream_duration_seconds", (service, timing.route), timing.upstream)
+        self.observe("gateway_overhead_duration_seconds", (service,), max(0.0, duration - timing.upstream))
+        if cache_result:
+            self.inc("gateway_cache_requests_total", (service, cache_result.lower()))
+
+    def record_unrouted(self, method: str, status: int):
+        """未转发到服务的请求（认证失败、服务不存在、网关自身接口）"""
+        if self.enabled:
+            self.inc("gateway_requests_total", ("", method, str(status)))
+
+    def record_rate_limited(self, service: str):
+        if self.enabled:
+            self.inc("gateway_rate_limited_total", (service,))
+
+    def latency_quantiles(self, service: str, route: str,
+                          quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99)) -> Dict[str, Optional[float]]:
+        """某个路由的总耗时分位数（秒）"""
+        histogram = self.histogram("gateway_request_duration_seconds", (service, route))
+        return {f"p{int(q * 100)}": histogram.quantile(q) for q in quantiles}
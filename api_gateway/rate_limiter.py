@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网关请求限流
+
+令牌桶限流，替代按请求时间戳队列计数的滑动窗口：
+- 每个限流键只保存 [令牌数, 更新时间, 桶满时间] 三个数，内存与请求量无关
+- 容量为 limit，每 window 秒补满，允许不超过 limit 的突发
+- 桶满时间已过的键与新键等价，按 sweep_interval 定期清理，空闲客户端不再长期占用内存
+- 不同键分散到64把分段锁上，不同客户端之间互不等待。原需求希望放行路径完全无锁，
+  但 CPython 下令牌桶的读取-补充-扣减不是原子操作，这里改为按键哈希的分段锁，
+  同一段内才会竞争，临界区只有几次字典与浮点运算
+- 一个请求的服务、路由、用户多条规则一起检查：全部有令牌时才扣减，被任一规则拒绝的请求
+  不消耗其它规则的令牌
+- 键数量有硬上限 max_keys：每段按最近使用顺序保存，超出本段份额时淘汰最久未使用的键
+  （被淘汰的客户端下次请求时拿到新的满桶）
+- Redis 模式用 Lua 脚本在服务端原子完成补充与扣减，多个网关实例共享限额
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 原子令牌桶：以 Redis 服务器时间计算补充量，所有键都有令牌时才各扣一个，返回1表示放行
+# KEYS 为各条规则的限流键，ARGV 依次为每个键的 容量, 每秒补充量
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1])
+    local ts = tonumber(bucket[2])
+    if tokens == nil or ts == nil then
+        tokens = capacity
+        ts = now
+    end
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        allowed = 0
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i] - allowed
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil((capacity - tokens) / rate) + 1)
+end
+return allowed
+"""
+
+
+class RateLimiter:
+    """令牌桶限流器"""
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, redis_client=None, window_size: int = 60, sweep_interval: float = 30.0,
+                 max_keys: int = 100000):
+        self.redis_client = redis_client
+        self.window_size = window_size
+        self.sweep_interval = sweep_interval
+        self.max_keys = max_keys
+        self._stripe_max_keys = max(1, -(-max_keys // self.LOCK_STRIPES))
+
+        # 每段：限流键 -> [令牌数, 更新时间, 桶满时间]，按最近使用排序
+        self._buckets: List["OrderedDict[str, List[float]]"] = [OrderedDict() for _ in range(self.LOCK_STRIPES)]
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        # 每段锁各自计数，汇总时相加
+        self._allowed = [0] * self.LOCK_STRIPES
+        self._rejected = [0] * self.LOCK_STRIPES
+        self._overflow = [0] * self.LOCK_STRIPES
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.evicted = 0
+
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT) if redis_client else None
+
+    def is_allowed(self, key: str, limit: int, window: int = None) -> bool:
+        """检查是否允许请求（消耗一个令牌）"""
+        return self.allow_all([(key, limit, window)])
+
+    def allow_all(self, rules: List[Tuple[str, int, Optional[int]]]) -> bool:
+        """检查需要同时满足的多条限流规则 [(限流键, 限额, 窗口)]
+
+        先检查全部令牌桶，都有令牌时才各扣一个；任一规则拒绝时不消耗其它规则的令牌，
+        避免被路由或用户限额拒绝的请求耗尽同一出口IP的服务限额。
+        """
+        rules = [(key, limit, window or self.window_size) for key, limit, window in rules]
+        if any(limit <= 0 for _, limit, _ in rules):
+            return False
+
+        if self.redis_client:
+            return self._redis_rate_limit(rules)
+        return self._local_allow_all(rules, time.monotonic())
+
+    def _redis_rate_limit(self, rules: List[Tuple[str, int, int]]) -> bool:
+        """Redis实现的限流（Lua脚本原子执行）"""
+        args = []
+        for _, limit, window in rules:
+            args += [limit, limit / window]
+        try:
+            return bool(self._script(keys=[key for key, _, _ in rules], args=args))
+        except Exception:
+            return True  # Redis失败时允许请求
+
+    def _local_rate_limit(self, key: str, limit: int, window: int, now: float) -> bool:
+        """本地内存实现的限流"""
+        return self._local_allow_all([(key, limit, window)], now)
+
+    def _local_allow_all(self, rules: List[Tuple[str, int, int]], now: float) -> bool:
+        """本地内存实现的多规则限流：按段号顺序持有涉及的分段锁，检查与扣减一次完成"""
+        stripes = [hash(key) % self.LOCK_STRIPES for key, _, _ in rules]
+        locked = sorted(set(stripes))
+        for stripe in locked:
+            self._locks[stripe].acquire()
+        try:
+            levels = []
+            for (key, limit, window), stripe in zip(rules, stripes):
+                bucket = self._buckets[stripe].get(key)
+                if bucket is None:
+                    levels.append(float(limit))
+                else:
+                    levels.append(min(float(limit), bucket[0] + (now - bucket[1]) * limit / window))
+            allowed = all(tokens >= 1 for tokens in levels)
+
+            for (key, limit, window), stripe, tokens in zip(rules, stripes, levels):
+                if allowed:
+                    tokens -= 1
+                buckets = self._buckets[stripe]
+                buckets[key] = [tokens, now, now + (limit - tokens) * window / limit]
+                buckets.move_to_end(key)
+                if len(buckets) > self._stripe_max_keys:
+                    buckets.popitem(last=False)
+                    self._overflow[stripe] += 1
+
+            if allowed:
+                self._allowed[stripes[0]] += 1
+            else:
+                self._rejected[stripes[0]] += 1
+        finally:
+            for stripe in locked:
+                self._locks[stripe].release()
+
+        if now >= self._next_sweep:
+            self.sweep(now)
+        return allowed
+
+    def sweep(self, now: float = None) -> int:
+        """清理已补满的令牌桶（与不存在的键等价）"""
+        now = time.monotonic() if now is None else now
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0  # 其他线程正在清理
+        try:
+            self._next_sweep = now + self.sweep_interval
+            removed = 0
+            for lock, buckets in zip(self._locks, self._buckets):
+                with lock:
+                    idle = [key for key, bucket in buckets.items() if bucket[2] <= now]
+                    for key in idle:
+                        del buckets[key]
+                removed += len(idle)
+            self.evicted += removed
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    def stats(self) -> Dict:
+        """放行与拒绝次数、当前限流键数量、清理与超出上限淘汰的键数"""
+        return {
+            "backend": "redis" if self.redis_client else "local",
+            "allowed": sum(self._allowed),
+            "rejected": sum(self._rejected),
+            "keys": sum(len(buckets) for buckets in self._buckets),
+            "evicted": self.evicted,
+            "overflow_evicted": sum(self._overflow),
+        }
+
+
+def route_limit(routes: Dict, route: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    """按路由前缀查找限额（最长前缀优先），返回 (前缀, 限额, 窗口)"""
+    best = None
+    for prefix, rule in routes.items():
+        if route.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+            if isinstance(rule, dict):
+                best = (prefix, rule.get("limit", 0), rule.get("window"))
+            else:
+                best = (prefix, rule, None)
+    return best
+
+
+def rate_limit_rules(config: Dict, service_name: str, route: str, client_id: str,
+                     user_id: str = None) -> List[Tuple[str, int, Optional[int]]]:
+    """请求需要同时满足的限流规则 [(限流键, 限额, 窗口)]
+
+    - 服务 + 客户端IP：服务的 rate_limit，未配置时取 default_limit
+    - 路由 + 客户端IP：rate_limiting.routes 中最长匹配的路由前缀
+    - 用户：rate_limiting.users 中的用户限额，未单独配置时取 user_limit（0表示不限）
+    """
+    limits = config["rate_limiting"]
+    service_config = config["services"].get(service_name, {})
+    rules = [(f"rate_limit:{service_name}:{client_id}",
+              service_config.get("rate_limit", limits["default_limit"]), None)]
+
+    matched = route_limit(limits.get("routes", {}), route)
+    if matched is not None:
+        prefix, limit, window = matched
+        rules.append((f"rate_limit:route:{prefix}:{client_id}", limit, window))
+
+    if user_id:
+        limit = limits.get("users", {}).get(user_id, limits.get("user_limit", 0))
+        if limit:
+            rules.append((f"rate_limit:user:{user_id}", limit, None))
+    return rules
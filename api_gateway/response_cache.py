@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网关响应缓存
+
+替代按条数上限、逐个扫描淘汰的字典缓存：
+- OrderedDict 实现LRU，命中、写入、淘汰均为 O(1)
+- 按字节预算淘汰（响应体与头部大小之和），不再按条数计算
+- 缓存原始响应字节与响应头，命中时原样返回
+- 新鲜期优先取后端 Cache-Control（s-maxage/max-age），其次按路由前缀配置，最后取默认值；
+  no-store/no-cache/private 或带 Set-Cookie 的响应不缓存
+- 带 Authorization 的请求，其响应只有后端声明 public 或 s-maxage 时才缓存
+  （缓存键不含用户凭据，否则一个用户的响应会返回给其他用户）
+- 每条缓存带 ETag（后端未提供时按响应体生成），客户端条件请求命中时返回304
+- 过期后在 stale-while-revalidate 窗口内先返回旧响应，由调用方在后台重新验证
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from requests.structures import CaseInsensitiveDict
+
+# 每条缓存的固定开销估算（键、对象与字典槽位）
+ENTRY_OVERHEAD = 256
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": True,
+    "default_ttl": 300,
+    "max_bytes": 64 * 1024 * 1024,
+    "max_entry_bytes": 4 * 1024 * 1024,
+    "stale_while_revalidate": 30,
+    "route_ttls": {},
+}
+
+_CACHE_CONTROL_RE = re.compile(r'\s*([A-Za-z-]+)\s*(?:=\s*"?([^",]*)"?)?\s*(?:,|$)')
+
+
+def build_cache_key(service_name: str, path: str, params: Iterable[Tuple[str, str]],
+                    accept_encoding: str = "") -> str:
+    """缓存键：服务、路径、排序后的查询参数与 Accept-Encoding（缓存的是原始字节，压缩与否分开缓存）"""
+    return f"{service_name}:{path}?{urlencode(sorted(params))}|{accept_encoding}"
+
+
+def has_authorization(headers) -> bool:
+    """请求是否带 Authorization 头部（headers 为字典或请求头集合，名称大小写不限）"""
+    return any(name.lower() == "authorization" for name in headers.keys())
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """解析 Cache-Control 头部，指令名小写"""
+    if not value:
+        return {}
+    return {name.lower(): arg for name, arg in _CACHE_CONTROL_RE.findall(value) if name}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+@dataclass
+class CacheEntry:
+    """缓存的响应"""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    etag: str
+    stored_at: float
+    expires_at: float
+    stale_until: float
+    route: str = ""
+    size: int = field(default=0)
+
+    def age(self, now: float) -> int:
+        return max(0, int(now - self.stored_at))
+
+
+class ResponseCache:
+    """按字节预算淘汰的LRU/TTL响应缓存（线程安全）"""
+
+    def __init__(self, config: Dict = None):
+        self.config = dict(DEFAULT_CACHE_CONFIG, **(config or {}))
+        self.max_bytes = self.config["max_bytes"]
+        self.max_entry_bytes = min(self.config["max_entry_bytes"], self.max_bytes)
+        # 路由前缀按长度降序，取最长匹配
+        self.route_ttls = sorted(self.config["route_ttls"].items(), key=lambda item: -len(item[0]))
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0,
+                       "evictions": 0, "expirations": 0, "not_modified": 0,
+                       "revalidations": 0, "uncacheable": 0}
+
+    def route_ttl(self, route: str) -> int:
+        """按路由前缀配置的新鲜期"""
+        for prefix, ttl in self.route_ttls:
+            if route.startswith(prefix):
+                return ttl
+        return self.config["default_ttl"]
+
+    def freshness(self, route: str, headers, authorized: bool = False) -> Optional[Tuple[int, int]]:
+        """响应的新鲜期与过期后可用旧值的时长，不可缓存时返回None
+
+        authorized 表示请求带 Authorization，此时后端须明确允许共享缓存（public 或 s-maxage）。
+        """
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if {"no-store", "no-cache", "private"} & directives.keys():
+            return None
+        if authorized and not {"public", "s-maxage"} & directives.keys():
+            return None
+        if headers.get("Set-Cookie") is not None or headers.get("Vary", "").strip() == "*":
+            return None
+
+        ttl = None
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name) and directives[name].isdigit():
+                ttl = int(directives[name])
+                break
+        if ttl is None:
+            ttl = self.route_ttl(route)
+        swr = directives.get("stale-while-revalidate")
+        swr = int(swr) if swr and swr.isdigit() else self.config["stale_while_revalidate"]
+        if ttl <= 0 and swr <= 0:
+            return None
+        return ttl, swr
+
+    def get(self, key: str, now: float = None) -> Tuple[Optional[CacheEntry], bool]:
+        """查找缓存，返回 (缓存项, 是否需要后台重新验证)
+
+        新鲜缓存直接返回；过期但在旧值窗口内返回旧值，并且同一键只让一个调用方去重新验证；
+        超出窗口的缓存删除。
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, False
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry, False
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                if key in self._revalidating:
+                    return entry, False
+                self._revalidating.add(key)
+                self._stats["revalidations"] += 1
+                return entry, True
+            self._remove(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None, False
+
+    def store(self, key: str, route: str, status: int, headers: List[Tuple[str, str]],
+              body: bytes, response_headers=None, now: float = None,
+              authorized: bool = False) -> Optional[CacheEntry]:
+        """写入缓存，不可缓存或超过单条上限时返回None"""
+        now = time.time() if now is None else now
+        if response_headers is None:
+            response_headers = CaseInsensitiveDict(headers)
+        freshness = self.freshness(route, response_headers, authorized)
+        size = len(body) + sum(len(name) + len(value) for name, value in headers) + ENTRY_OVERHEAD
+        if freshness is None or size > self.max_entry_bytes:
+            with self._lock:
+                self._stats["uncacheable"] += 1
+                self._revalidating.discard(key)
+            return None
+
+        ttl, swr = freshness
+        etag = response_headers.get("ETag")
+        if not etag:
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            headers = headers + [("ETag", etag)]
+            size += len("ETag") + len(etag)
+        entry = CacheEntry(status, headers, body, etag, now, now + ttl, now + ttl + swr, route, size)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            self._stats["stores"] += 1
+            self._revalidating.discard(key)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+        return entry
+
+    def refresh(self, key: str, route: str, response_headers, now: float = None,
+                authorized: bool = False) -> bool:
+        """后端确认缓存未变化（304）时延长新鲜期"""
+        now = time.time() if now is None else now
+        freshness = self.freshness(route, response_headers, authorized)
+        with self._lock:
+            self._revalidating.discard(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if freshness is None:
+                self._remove(key)
+                return False
+            ttl, swr = freshness
+            entry.stored_at = now
+            entry.expires_at = now + ttl
+            entry.stale_until = now + ttl + swr
+            return True
+
+    def abandon_revalidation(self, key: str):
+        """重新验证失败，允许下一个请求再次尝试"""
+        with self._lock:
+            self._revalidating.discard(key)
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def invalidate(self, prefix: str = "") -> int:
+        """删除键以 prefix 开头的缓存"""
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """命中率、淘汰次数与容量"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["max_bytes"] = self.max_bytes
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
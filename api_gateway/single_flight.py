@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同请求合并（single-flight）
+
+缓存未命中时，同一键的并发请求只由第一个请求（领头请求）转发到后端，
+其余请求等待领头请求的结果：
+- 领头请求结束后公布可共享的结果；结果不可共享（未写入缓存的私有响应、流式响应、
+  转发失败）时公布None，等待的请求各自转发
+- 等待超时的请求也各自转发，不会因领头请求卡住而一直等待
+- 同步网关（多线程）与异步网关（事件循环）各有一个实现，统计口径相同
+"""
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_COALESCING_CONFIG = {
+    "enabled": True,
+    "timeout": 10,         # 等待领头请求的最长时间（秒）
+    "vary_headers": [],    # 参与合并键的请求头，如 ["Authorization"] 表示只合并同一用户的请求
+}
+
+
+@dataclass
+class SharedResponse:
+    """领头请求公布给等待方的响应"""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    entry: Any = None  # 已写入缓存时的缓存项，等待方据此按各自的条件请求返回304
+
+
+class _FlightStats:
+    def __init__(self):
+        self._stats = {"leaders": 0, "coalesced": 0, "timeouts": 0, "unshared": 0}
+
+    def stats(self) -> Dict:
+        """领头请求数、节省的后端调用数（coalesced）、等待超时与结果不可共享次数"""
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class _Call:
+    __slots__ = ("event", "result")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SingleFlight(_FlightStats):
+    """线程版请求合并"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> Tuple[_Call, bool]:
+        """加入键对应的请求，返回 (调用, 是否为领头请求)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                return call, True
+            return call, False
+
+    def wait(self, call: _Call, timeout: float) -> Optional[Any]:
+        """等待领头请求的结果，超时或结果不可共享时返回None"""
+        if not call.event.wait(timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return None
+        with self._lock:
+            self._stats["coalesced" if call.result is not None else "unshared"] += 1
+        return call.result
+
+    def complete(self, key: str, call: _Call, result: Any = None):
+        """领头请求公布结果（必须调用，转发失败时传None）"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.event.set()
+
+
+class AsyncSingleFlight(_FlightStats):
+    """事件循环版请求合并（只在一个事件循环内使用）"""
+
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def join(self, key: str) -> Tuple[asyncio.Future, bool]:
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.get_running_loop().create_future()
+            self._stats["leaders"] += 1
+            return future, True
+        return future, False
+
+    async def wait(self, future: asyncio.Future, timeout: float) -> Optional[Any]:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            return None
+        self._stats["coalesced" if result is not None else "unshared"] += 1
+        return result
+
+    def complete(self, key: str, future: asyncio.Future, result: Any = None):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.done():
+            future.set_result(result)
+
+
+def coalescing_key(cache_key: str, vary_headers, headers) -> str:
+    """合并键：缓存键加上配置的请求头取值"""
+    if not vary_headers:
+        return cache_key
+    values = "|".join(headers.get(name.lower(), "") for name in vary_headers)
+    return f"{cache_key}|{values}"
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游连接池
+
+网关转发请求时按服务复用 requests.Session，替代每次 requests.request 新建TCP连接：
+- 每个服务一个会话，连接池大小可按服务配置，连接保持长连接复用
+- 会话不保存Cookie、不跟随重定向，上游响应原样交给客户端
+- 响应以 stream=True 获取：小响应一次读入内存（便于缓存），
+  大响应或长度未知的响应按块转发，不在网关内存中整体缓冲
+- 响应体按原始字节转发，不解压，Content-Encoding 保持不变
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Iterator, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 逐跳头部只在单个连接上有效，不能转发（RFC 7230 6.1）
+HOP_BY_HOP_HEADERS = frozenset([
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade",
+])
+
+DEFAULT_UPSTREAM_CONFIG = {
+    "pool_size": 20,             # 每个服务的最大空闲连接数
+    "pool_block": False,         # 连接用尽时是否等待空闲连接（否则临时新建连接）
+    "stream_threshold": 262144,  # 超过该长度（字节）或长度未知的响应按块转发
+    "chunk_size": 65536,         # 转发块大小
+    "health_timeout": 5,
+}
+
+
+def service_urls(service_config: Dict) -> List[str]:
+    """服务的后端实例地址（url 可为单个地址或地址列表）"""
+    urls = service_config["url"]
+    return [urls] if isinstance(urls, str) else list(urls)
+
+
+def filter_request_headers(headers) -> Dict[str, str]:
+    """转发给上游的请求头（去掉逐跳头部、Host 与 Content-Length）"""
+    return {name: value for name, value in headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+            and name.lower() not in ("host", "content-length")}
+
+
+def filter_response_headers(headers) -> List[Tuple[str, str]]:
+    """返回给客户端的响应头（去掉逐跳头部）"""
+    return [(name, value) for name, value in headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS]
+
+
+class UpstreamPool:
+    """按服务划分的上游连接池"""
+
+    def __init__(self, services: Dict[str, Dict], config: Dict = None):
+        self.services = services
+        self.config = dict(DEFAULT_UPSTREAM_CONFIG, **(config or {}))
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self, service_name: str) -> requests.Session:
+        service_config = self.services.get(service_name, {})
+        pool_size = service_config.get("pool_size", self.config["pool_size"])
+
+        session = requests.Session()
+        # 响应按原始字节转发，不能替客户端添加 Accept-Encoding 等默认头部
+        session.headers.clear()
+        # 多个客户端共用会话，上游设置的Cookie不能留在会话里
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # 重试由客户端决定，网关不重放非幂等请求
+        # 每个后端实例一个主机连接池
+        host_pools = max(4, len(service_urls(service_config))) if service_config else 4
+        adapter = HTTPAdapter(pool_connections=host_pools, pool_maxsize=pool_size,
+                              pool_block=self.config["pool_block"], max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session(self, service_name: str) -> requests.Session:
+        """获取服务的会话（首次使用时创建）"""
+        session = self._sessions.get(service_name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(service_name)
+                if session is None:
+                    session = self._sessions[service_name] = self._create_session(service_name)
+        return session
+
+    def request(self, service_name: str, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求，响应体尚未读取，调用方负责读取或关闭"""
+        kwargs.setdefault("allow_redirects", False)
+        return self.session(service_name).request(method, url, stream=True, **kwargs)
+
+    def should_stream(self, response: requests.Response) -> bool:
+        """响应是否需要按块转发"""
+        length = response.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            return True
+        return int(length) > self.config["stream_threshold"]
+
+    @staticmethod
+    def read_body(response: requests.Response) -> bytes:
+        """读取完整原始响应体并归还连接"""
+        try:
+            body = response.raw.read(decode_content=False)
+        except Exception:
+            response.close()
+            raise
+        # 响应体已读完，连接放回连接池复用（response.close() 会直接关闭连接）
+        response.raw.release_conn()
+        return body
+
+    def iter_body(self, response: requests.Response) -> Iterator[bytes]:
+        """按块读取原始响应体，读完后归还连接，中断时关闭连接"""
+        completed = False
+        try:
+            for chunk in response.raw.stream(self.config["chunk_size"], decode_content=False):
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                response.raw.release_conn()
+            else:
+                response.close()
+
+    def close(self):
+        """关闭全部会话"""
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
@@ -2,6 +2,10 @@ import os
 import json
 import sys
 import logging
+import hashlib
+import sqlite3
+import threading
+from urllib.parse import quote
 from datetime import datetime
 
 # 获取logger
@@ -48,6 +52,207 @@ def get_application_path():
 def get_absolute_path(relative_path):
     return os.path.join(get_application_path(), relative_path)
 
+# 数据文件缓存：路径 -> (文件签名, 解析结果)
+# 考试开始时大量考生同时登录，考试与报名文件只在内容变化后重新解析
+_json_cache = {}
+_json_cache_lock = threading.RLock()
+
+def _file_signature(file_path):
+    """文件签名（修改时间、大小、inode），文件不存在时返回None"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def _db_signature(db_path):
+    """数据库签名（包括WAL文件，未检查点的写入也会使缓存失效）"""
+    return (_file_signature(db_path), _file_signature(db_path + '-wal'))
+
+def load_json_cached(relative_path, default=None):
+    """
+    读取JSON数据文件，文件签名不变时直接返回缓存的解析结果
+    返回的对象在多次调用间共享，调用方不得修改
+    """
+    file_path = get_absolute_path(relative_path)
+    signature = _file_signature(file_path)
+    if signature is None:
+        _json_cache.pop(file_path, None)
+        return default
+
+    cached = _json_cache.get(file_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _json_cache_lock:
+        # 等锁期间其它线程可能已完成解析
+        cached = _json_cache.get(file_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        _json_cache[file_path] = (signature, data)
+        return data
+
+
+class EnrollmentIndex:
+    """
+    考试报名索引
+    - 考试ID -> 考生ID集合
+    - 考生ID -> 考试ID列表（按报名文件中的顺序）
+    考生ID统一按字符串比较（JSON中可能是数字）
+    """
+
+    def __init__(self, enrollments_data=None):
+        self.students_by_exam = {}
+        self.exams_by_student = {}
+
+        if isinstance(enrollments_data, dict):
+            enrollments = enrollments_data.get("enrollments", [])
+        elif isinstance(enrollments_data, list):
+            enrollments = enrollments_data
+        else:
+            enrollments = []
+
+        for enrollment in enrollments:
+            exam_id = enrollment.get("exam_id")
+            # 新格式：每个考试一个记录，包含user_ids数组
+            if "user_ids" in enrollment:
+                user_ids = enrollment.get("user_ids") or []
+            # 旧格式：每个学生一个记录
+            elif enrollment.get("student_id") is not None and enrollment.get("status", "assigned") == "assigned":
+                user_ids = [enrollment.get("student_id")]
+            else:
+                continue
+            for user_id in user_ids:
+                self.add(exam_id, user_id)
+
+    def add(self, exam_id, student_id):
+        students = self.students_by_exam.setdefault(exam_id, set())
+        key = str(student_id)
+        if key in students:
+            return
+        students.add(key)
+        self.exams_by_student.setdefault(key, []).append(exam_id)
+
+    def exams_for(self, student_id):
+        """考生报名的考试ID列表"""
+        return self.exams_by_student.get(str(student_id), [])
+
+    def is_enrolled(self, exam_id, student_id):
+        return str(student_id) in self.students_by_exam.get(exam_id, ())
+
+
+_enrollment_index = (None, EnrollmentIndex())
+
+def get_enrollment_index():
+    """获取报名索引（报名文件变化后自动重建）"""
+    global _enrollment_index
+    relative_path = 'exam_management/enrollments.json'
+    signature = _file_signature(get_absolute_path(relative_path))
+    cached_signature, index = _enrollment_index
+    if cached_signature == signature:
+        return index
+
+    with _json_cache_lock:
+        cached_signature, index = _enrollment_index
+        if cached_signature != signature:
+            try:
+                index = EnrollmentIndex(load_json_cached(relative_path))
+            except Exception as e:
+                print(f"读取考试报名数据失败: {e}")
+                index = EnrollmentIndex()
+            _enrollment_index = (signature, index)
+    return index
+
+class LoginLookup:
+    """
+    登录查询服务（以 users.db 为唯一用户数据来源）
+    - username、id_card 的索引由 user_management 建表时创建，这里只使用只读连接
+    - 按标识类型（用户名、身份证号、用户ID）分别查找，不使用 OR 查询
+    - 标识 -> 用户ID列表 映射常驻内存，数据库文件变化后重建；不存在的标识无需访问数据库
+    - 只读连接按线程复用，数据库文件被替换后重新连接
+    """
+
+    IDENTIFIER_COLUMNS = ("username", "id_card", "id")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.signature = None
+        self.generation = 0
+        self.identifiers = {column: {} for column in self.IDENTIFIER_COLUMNS}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self):
+        """当前线程的只读连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.generation == self.generation:
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        self._local.conn = conn
+        self._local.generation = self.generation
+        return conn
+
+    def refresh(self):
+        """数据库文件变化时重建标识映射
+
+        记录的签名在查询之前获取：查询期间发生的写入会使签名再次变化，
+        下次调用时重建，不会被当作已包含在映射中。
+        """
+        if _db_signature(self.db_path) == self.signature:
+            return
+        with self._lock:
+            signature = _db_signature(self.db_path)
+            if signature == self.signature:
+                return
+            self.generation += 1
+            identifiers = {column: {} for column in self.IDENTIFIER_COLUMNS}
+            for row in self._connection().execute("SELECT id, username, id_card FROM users"):
+                for column in self.IDENTIFIER_COLUMNS:
+                    value = row[column]
+                    if value not in (None, ""):
+                        identifiers[column].setdefault(str(value), []).append(row["id"])
+            self.identifiers = identifiers
+            self.signature = signature
+
+    def find_candidates(self, identifier):
+        """标识可能对应的用户ID（按用户名、身份证号、用户ID的顺序，去重）"""
+        self.refresh()
+        identifier = str(identifier)
+        candidates = []
+        for column in self.IDENTIFIER_COLUMNS:
+            for user_id in self.identifiers[column].get(identifier, ()):
+                if user_id not in candidates:
+                    candidates.append(user_id)
+        return candidates
+
+    def authenticate(self, identifier, password):
+        """
+        按标识和密码查找用户
+        :return: 匹配的用户记录（sqlite3.Row），失败返回None
+        """
+        for user_id in self.find_candidates(identifier):
+            user = self._connection().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+            if user is not None and user['password'] == password:
+                return user
+        return None
+
+
+_login_lookups = {}
+_login_lookups_lock = threading.Lock()
+
+def get_login_lookup(db_path):
+    """获取数据库对应的登录查询服务（进程内共享）"""
+    lookup = _login_lookups.get(db_path)
+    if lookup is None:
+        with _login_lookups_lock:
+            lookup = _login_lookups.setdefault(db_path, LoginLookup(db_path))
+    return lookup
+
 def login(username, password):
     """
     登录API调用
@@ -57,24 +262,13 @@ def login(username, password):
     """
     print(f"尝试使用 {username} 登录...")
     
-    # 尝试从数据库获取用户信息
+    # 从用户数据库获取用户信息
     user_info = None
     db_path = get_absolute_path('user_management/users.db')
     
     if os.path.exists(db_path):
         try:
-            import sqlite3
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # 查找匹配的用户（通过用户名、身份证号或ID）
-            cursor.execute("""
-                SELECT * FROM users
-                WHERE (username = ? OR id_card = ? OR id = ?) AND password = ?
-            """, (username, username, username, password))
-            
-            user = cursor.fetchone()
+            user = get_login_lookup(db_path).authenticate(username, password)
             if user:
                 # 找到匹配的用户
                 user_info = {
@@ -86,37 +280,33 @@ def login(username, password):
                     "ID": user['id_card'] or "",
                     "token": "fake-jwt-token"
                 }
-            conn.close()
         except Exception as e:
             print(f"从数据库读取用户数据失败: {e}")
             
-    # 如果数据库查询失败，尝试从JSON文件获取用户信息（作为备选方案）
-    if user_info is None:
-        users_file_path = get_absolute_path('user_management/users.json')
-        if os.path.exists(users_file_path):
-            try:
-                with open(users_file_path, 'r', encoding='utf-8') as f:
-                    users_data = json.load(f)
-                    users = users_data.get("users", [])
-                    
-                    # 查找匹配的用户
-                    for user in users:
-                        # 检查用户名/身份证号和密码是否匹配
-                        if ((user.get("username") == username or user.get("ID") == username) and 
-                            (user.get("password") == password or user.get("password_hash") == password)):
-                            # 找到匹配的用户
-                            user_info = {
-                                "id": user.get("id"),
-                                "username": user.get("username"),
-                                "role": user.get("role"),
-                                "real_name": user.get("real_name", ""),
-                                "department": user.get("department", ""),
-                                "ID": user.get("ID", ""),
-                                "token": "fake-jwt-token"
-                            }
-                            break
-            except Exception as e:
-                print(f"读取JSON用户数据失败: {e}")
+    # 只有在没有用户数据库时才使用JSON文件（如未初始化用户管理模块的单机环境）
+    else:
+        try:
+            users_data = load_json_cached('user_management/users.json', {})
+            users = users_data.get("users", [])
+            
+            # 查找匹配的用户
+            for user in users:
+                # 检查用户名/身份证号和密码是否匹配
+                if ((user.get("username") == username or user.get("ID") == username) and 
+                    (user.get("password") == password or user.get("password_hash") == password)):
+                    # 找到匹配的用户
+                    user_info = {
+                        "id": user.get("id"),
+                        "username": user.get("username"),
+                        "role": user.get("role"),
+                        "real_name": user.get("real_name", ""),
+                        "department": user.get("department", ""),
+                        "ID": user.get("ID", ""),
+                        "token": "fake-jwt-token"
+                    }
+                    break
+        except Exception as e:
+            print(f"读取JSON用户数据失败: {e}")
     
     # 如果找不到用户信息，使用模拟数据（仅用于测试）
     if user_info is None and username == "student" and password == "123456":
@@ -148,41 +338,23 @@ def check_student_has_exam(student_id):
     print(f"检查学生ID {student_id} 是否有待进行的考试信息...")
     
     # 获取考试报名信息和考试状态
-    enrolled_exam_ids = []
-    enrollments_file_path = get_absolute_path('exam_management/enrollments.json')
-    if os.path.exists(enrollments_file_path):
-        try:
-            with open(enrollments_file_path, 'r', encoding='utf-8') as f:
-                enrollments_data = json.load(f)
-                enrollments = enrollments_data.get("enrollments", [])
-                
-                # 获取报名的所有考试ID
-                for enrollment in enrollments:
-                    user_ids = enrollment.get("user_ids", [])
-                    # 将student_id转换为字符串进行比较，因为JSON中可能是数字
-                    if str(student_id) in [str(uid) for uid in user_ids]:
-                        enrolled_exam_ids.append(enrollment.get("exam_id"))
-        except Exception as e:
-            print(f"读取考试报名数据失败: {e}")
+    enrolled_exam_ids = set(get_enrollment_index().exams_for(student_id))
     
     # 如果没有报名任何考试，直接返回False
     if not enrolled_exam_ids:
         return False
     
     # 检查报名的考试中是否有待进行的考试（已发布或进行中）
-    exams_file_path = get_absolute_path('exam_management/exams.json')
-    if os.path.exists(exams_file_path):
-        try:
-            with open(exams_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                server_exams = data.get("exams", [])
-                
-                # 检查是否有待进行的考试
-                for exam in server_exams:
-                    if exam.get("id") in enrolled_exam_ids and exam.get("status") in ["published", "ongoing"]:
-                        return True
-        except Exception as e:
-            print(f"读取考试数据失败: {e}")
+    try:
+        data = load_json_cached('exam_management/exams.json', {})
+        server_exams = data.get("exams", [])
+        
+        # 检查是否有待进行的考试
+        for exam in server_exams:
+            if exam.get("id") in enrolled_exam_ids and exam.get("status") in ["published", "ongoing"]:
+                return True
+    except Exception as e:
+        print(f"读取考试数据失败: {e}")
     
     # 如果没有找到待进行的考试，返回False
     return False
@@ -193,39 +365,16 @@ def get_published_exams_for_student(student_id):
     """
     try:
         # 1. 获取已发布的考试
-        published_exams_file = get_absolute_path('exam_management/published_exams.json')
-        if not os.path.exists(published_exams_file):
+        published_exams = load_json_cached('exam_management/published_exams.json')
+        if published_exams is None:
             return []
 
-        with open(published_exams_file, 'r', encoding='utf-8') as f:
-            published_exams = json.load(f)
-
         # 2. 获取学生的考试分配
-        enrollments_file = get_absolute_path('exam_management/enrollments.json')
-        if not os.path.exists(enrollments_file):
+        if not os.path.exists(get_absolute_path('exam_management/enrollments.json')):
             return []
 
-        with open(enrollments_file, 'r', encoding='utf-8') as f:
-            enrollments_data = json.load(f)
-
-        # 处理两种格式的enrollments数据
-        if isinstance(enrollments_data, dict) and "enrollments" in enrollments_data:
-            enrollments = enrollments_data["enrollments"]
-        elif isinstance(enrollments_data, list):
-            enrollments = enrollments_data
-        else:
-            enrollments = []
-
-        # 3. 找到分配给该学生的考试
-        student_exam_ids = []
-        for enrollment in enrollments:
-            # 新格式：每个考试一个记录，包含user_ids数组
-            if "user_ids" in enrollment:
-                if student_id in enrollment.get("user_ids", []):
-                    student_exam_ids.append(enrollment.get("exam_id"))
-            # 旧格式：每个学生一个记录
-            elif enrollment.get('student_id') == student_id and enrollment.get('status') == 'assigned':
-                student_exam_ids.append(enrollment.get('exam_id'))
+        # 3. 找到分配给该学生的考试（报名索引）
+        student_exam_ids = set(get_enrollment_index().exams_for(student_id))
 
         # 4. 获取学生可参加的已发布考试
         student_exams = []
@@ -327,18 +476,9 @@ def is_exam_assigned_to_student(exam_id, student_id):
         bool: 是否分配给该学生
     """
     try:
-        # 检查考试分配文件
-        enrollments_file = get_absolute_path('exam_management/enrollments.json')
-        if os.path.exists(enrollments_file):
-            with open(enrollments_file, 'r', encoding='utf-8') as f:
-                enrollments_data = json.load(f)
-
-            if isinstance(enrollments_data, dict) and "enrollments" in enrollments_data:
-                enrollments = enrollments_data["enrollments"]
-                for enrollment in enrollments:
-                    if (enrollment.get('exam_id') == exam_id and
-                        enrollment.get('student_id') == student_id):
-                        return True
+        # 检查考试分配（报名索引）
+        if get_enrollment_index().is_enrolled(exam_id, student_id):
+            return True
 
         # 如果没有分配文件，默认所有available状态的考试都可参加
         return True
@@ -486,29 +626,10 @@ def get_exams_for_student(student_id, user_info=None):
         if os.path.exists(client_exams_file):
             print(f"从客户端考试列表文件获取: {client_exams_file}")
             try:
-                with open(client_exams_file, 'r', encoding='utf-8') as f:
-                    available_exams = json.load(f)
+                available_exams = load_json_cached('client/available_exams.json', [])
 
                 # 获取学生分配信息
-                student_assigned_exam_ids = []
-                enrollments_file = get_absolute_path('exam_management/enrollments.json')
-                if os.path.exists(enrollments_file):
-                    with open(enrollments_file, 'r', encoding='utf-8') as f:
-                        enrollments_data = json.load(f)
-
-                    if isinstance(enrollments_data, dict) and "enrollments" in enrollments_data:
-                        enrollments = enrollments_data["enrollments"]
-                    elif isinstance(enrollments_data, list):
-                        enrollments = enrollments_data
-                    else:
-                        enrollments = []
-
-                    for enrollment in enrollments:
-                        if "user_ids" in enrollment:
-                            if student_id in enrollment.get("user_ids", []):
-                                student_assigned_exam_ids.append(enrollment.get("exam_id"))
-                        elif enrollment.get('student_id') == student_id:
-                            student_assigned_exam_ids.append(enrollment.get('exam_id'))
+                student_assigned_exam_ids = set(get_enrollment_index().exams_for(student_id))
 
                 exams_data = []
                 for exam in available_exams:
@@ -535,76 +656,62 @@ def get_exams_for_student(student_id, user_info=None):
         print("尝试从已发布考试系统获取...")
 
         # 检查注册信息
-        enrolled_exam_ids = []
-        enrollments_file_path = get_absolute_path('exam_management/enrollments.json')
-        if os.path.exists(enrollments_file_path):
-            with open(enrollments_file_path, 'r', encoding='utf-8') as f:
-                enrollments_data = json.load(f)
-                enrollments = enrollments_data.get("enrollments", [])
-                for enrollment in enrollments:
-                    user_ids = enrollment.get("user_ids", [])
-                    if str(student_id) in [str(uid) for uid in user_ids]:
-                        enrolled_exam_ids.append(enrollment.get("exam_id"))
+        enrolled_exam_ids = set(get_enrollment_index().exams_for(student_id))
 
         # 优先从已发布考试获取
         exams_data = []
-        published_exams_file = get_absolute_path('exam_management/published_exams.json')
-        if os.path.exists(published_exams_file):
-            with open(published_exams_file, 'r', encoding='utf-8') as f:
-                published_exams = json.load(f)
+        published_exams = load_json_cached('exam_management/published_exams.json')
+        if published_exams is not None:
+            for exam in published_exams:
+                # 只返回已发布且学生被分配的考试
+                if (exam.get("status") == "published" and
+                    exam.get("id") in enrolled_exam_ids):
+                    exams_data.append({
+                        "id": exam.get("id"),
+                        "name": exam.get("title"),
+                        "status": "available",
+                        "description": exam.get("description", ""),
+                        "time_limit": exam.get("duration", 60),
+                        "total_score": exam.get("total_score", 100),
+                        "exam_type": "published"
+                    })
 
-                for exam in published_exams:
-                    # 只返回已发布且学生被分配的考试
-                    if (exam.get("status") == "published" and
-                        exam.get("id") in enrolled_exam_ids):
-                        exams_data.append({
-                            "id": exam.get("id"),
-                            "name": exam.get("title"),
-                            "status": "available",
-                            "description": exam.get("description", ""),
-                            "time_limit": exam.get("duration", 60),
-                            "total_score": exam.get("total_score", 100),
-                            "exam_type": "published"
-                        })
-
-                if exams_data:
-                    print(f"从已发布考试系统获取到 {len(exams_data)} 个考试")
-                    return exams_data
+            if exams_data:
+                print(f"从已发布考试系统获取到 {len(exams_data)} 个考试")
+                return exams_data
 
         # 4. 最后的备用：从样例考试系统获取（仅当没有已发布考试时）
         print("没有已发布考试，尝试从样例考试系统获取...")
-        exams_file_path = get_absolute_path('exam_management/exams.json')
-        if os.path.exists(exams_file_path):
-            with open(exams_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                server_exams = data if isinstance(data, list) else data.get("exams", [])
-
-                for exam in server_exams:
-                    # 如果有注册限制，检查是否已注册
-                    if enrolled_exam_ids and exam.get("id") not in enrolled_exam_ids:
-                        continue
-
-                    if exam.get("status") == "archived":
-                        continue
-
-                    # 状态映射
-                    if exam.get("status") in ["published", "ongoing", "available"]:
-                        status = "available"
-                    elif exam.get("status") == "completed":
-                        status = "completed"
-                    elif exam.get("status") == "draft":
-                        status = "draft"
-                    else:
-                        status = exam.get("status", "available")
+        data = load_json_cached('exam_management/exams.json')
+        if data is not None:
+            server_exams = data if isinstance(data, list) else data.get("exams", [])
+
+            for exam in server_exams:
+                # 如果有注册限制，检查是否已注册
+                if enrolled_exam_ids and exam.get("id") not in enrolled_exam_ids:
+                    continue
+
+                if exam.get("status") == "archived":
+                    continue
+
+                # 状态映射
+                if exam.get("status") in ["published", "ongoing", "available"]:
+                    status = "available"
+                elif exam.get("status") == "completed":
+                    status = "completed"
+                elif exam.get("status") == "draft":
+                    status = "draft"
+                else:
+                    status = exam.get("status", "available")
 
-                    exams_data.append({
-                        "id": exam.get("id"),
-                        "name": exam.get("name") or exam.get("title"),
-                        "status": status,
-                        "description": exam.get("description", ""),
-                        "time_limit": exam.get("time_limit", 60),
-                        "total_score": exam.get("total_score", 100)
-                    })
+                exams_data.append({
+                    "id": exam.get("id"),
+                    "name": exam.get("name") or exam.get("title"),
+                    "status": status,
+                    "description": exam.get("description", ""),
+                    "time_limit": exam.get("time_limit", 60),
+                    "total_score": exam.get("total_score", 100)
+                })
 
         # 3. 如果还是没有考试，创建一个示例考试（用于测试）
         if not exams_data:
@@ -634,160 +741,219 @@ def get_exams_for_student(student_id, user_info=None):
         }]
 
 
-def get_paper_from_question_bank(paper_id_or_exam_id):
-    """
-    从题库数据库获取试卷详情和题目
-    支持UUID格式的paper_id和传统的数字ID
-    """
-    try:
-        # 尝试确定paper_id
-        paper_id = None
-
-        # 1. 如果是UUID格式，直接使用
-        if isinstance(paper_id_or_exam_id, str) and len(paper_id_or_exam_id) > 20 and '-' in paper_id_or_exam_id:
-            paper_id = paper_id_or_exam_id
-            print(f"使用UUID格式的paper_id: {paper_id}")
-
-        # 2. 如果是exam_数字格式，提取数字
-        elif isinstance(paper_id_or_exam_id, str) and paper_id_or_exam_id.startswith("exam_"):
-            parts = paper_id_or_exam_id.split("_")
-            if len(parts) >= 2:
-                try:
-                    paper_id = int(parts[1])
-                    print(f"从exam_id提取到数字paper_id: {paper_id}")
-                except ValueError:
-                    pass
-
-        # 3. 如果是纯数字，直接使用
-        elif isinstance(paper_id_or_exam_id, (int, str)) and str(paper_id_or_exam_id).isdigit():
-            paper_id = int(paper_id_or_exam_id)
-            print(f"使用数字paper_id: {paper_id}")
-
-        if paper_id is None:
-            print(f"无法识别paper_id格式: {paper_id_or_exam_id}")
-            return None
-
-        # 连接题库数据库 - 优先使用questions.db
-        db_paths = [
-            get_absolute_path('question_bank_web/questions.db'),
-            get_absolute_path('question_bank_web/local_dev.db')
-        ]
-
-        db_path = None
-        for path in db_paths:
-            if os.path.exists(path):
-                db_path = path
-                print(f"使用数据库: {db_path}")
-                break
+# 试卷数据块中不得出现的答案相关字段
+ANSWER_FIELDS = ("correct_answer", "answer", "answers", "analysis", "explanation")
 
-        if not db_path:
-            print(f"题库数据库不存在，检查路径: {db_paths}")
-            return None
+# 试卷数据块缓存：(数据库路径, 试卷ID) -> (数据库签名, 内容哈希, 数据块)
+_paper_payload_cache = {}
+_paper_payload_lock = threading.Lock()
 
-        import sqlite3
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # 获取试卷信息
-        cursor.execute("""
-            SELECT id, name, description, duration, total_score
-            FROM papers
-            WHERE id = ?
-        """, (paper_id,))
-
-        paper = cursor.fetchone()
-        if not paper:
-            print(f"未找到试卷 ID: {paper_id}")
-            conn.close()
-            return None
+def strip_answers(question):
+    """去除题目中的答案字段"""
+    return {key: value for key, value in question.items() if key not in ANSWER_FIELDS}
 
-        print(f"找到试卷: {paper[1]}")  # paper[1] 是 name 列
+def resolve_paper_id(paper_id_or_exam_id):
+    """
+    解析试卷ID
+    支持UUID格式的paper_id、exam_数字格式和纯数字
+    """
+    paper_id = None
 
-        # 获取试卷的题目
-        cursor.execute("""
-            SELECT q.id, q.stem, q.question_type_code, q.option_a, q.option_b,
-                   q.option_c, q.option_d, q.option_e, q.correct_answer,
-                   pq.score, pq.question_order
-            FROM questions q
-            JOIN paper_questions pq ON q.id = pq.question_id
-            WHERE pq.paper_id = ?
-            ORDER BY pq.question_order
-        """, (paper_id,))
+    # 1. 如果是UUID格式，直接使用
+    if isinstance(paper_id_or_exam_id, str) and len(paper_id_or_exam_id) > 20 and '-' in paper_id_or_exam_id:
+        paper_id = paper_id_or_exam_id
+        print(f"使用UUID格式的paper_id: {paper_id}")
 
-        questions_data = cursor.fetchall()
+    # 2. 如果是exam_数字格式，提取数字
+    elif isinstance(paper_id_or_exam_id, str) and paper_id_or_exam_id.startswith("exam_"):
+        parts = paper_id_or_exam_id.split("_")
+        if len(parts) >= 2:
+            try:
+                paper_id = int(parts[1])
+                print(f"从exam_id提取到数字paper_id: {paper_id}")
+            except ValueError:
+                pass
+
+    # 3. 如果是纯数字，直接使用
+    elif isinstance(paper_id_or_exam_id, (int, str)) and str(paper_id_or_exam_id).isdigit():
+        paper_id = int(paper_id_or_exam_id)
+        print(f"使用数字paper_id: {paper_id}")
+
+    return paper_id
+
+def find_question_bank_db():
+    """查找题库数据库 - 优先使用questions.db"""
+    db_paths = [
+        get_absolute_path('question_bank_web/questions.db'),
+        get_absolute_path('question_bank_web/local_dev.db')
+    ]
+    for path in db_paths:
+        if os.path.exists(path):
+            return path
+    print(f"题库数据库不存在，检查路径: {db_paths}")
+    return None
+
+def build_paper_payload(db_path, paper_id):
+    """从题库查询试卷和题目，构建不含答案的试卷数据"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    # 获取试卷信息
+    cursor.execute("""
+        SELECT id, name, description, duration, total_score
+        FROM papers
+        WHERE id = ?
+    """, (paper_id,))
+
+    paper = cursor.fetchone()
+    if not paper:
+        print(f"未找到试卷 ID: {paper_id}")
         conn.close()
+        return None
 
-        if not questions_data:
-            print(f"试卷 {paper_id} 没有题目")
-            return None
+    print(f"找到试卷: {paper[1]}")  # paper[1] 是 name 列
+
+    # 获取试卷的题目
+    cursor.execute("""
+        SELECT q.id, q.stem, q.question_type_code, q.option_a, q.option_b,
+               q.option_c, q.option_d, q.option_e,
+               pq.score, pq.question_order
+        FROM questions q
+        JOIN paper_questions pq ON q.id = pq.question_id
+        WHERE pq.paper_id = ?
+        ORDER BY pq.question_order
+    """, (paper_id,))
+
+    questions_data = cursor.fetchall()
+    conn.close()
+
+    if not questions_data:
+        # 仍返回试卷，由调用方决定如何处理空试卷
+        print(f"试卷 {paper_id} 没有题目")
+
+    # 转换题目格式
+    questions = []
+    for q in questions_data:
+        # 映射题目类型 - 修正映射关系
+        question_type_map = {
+            'B': 'single_choice',    # 单选题
+            'G': 'multiple_choice',  # 多选题
+            'C': 'true_false',       # 判断题
+            'T': 'fill_blank',       # 填空题
+            'D': 'short_answer',     # 简答题
+            'E': 'essay'             # 论述题
+        }
 
-        # 转换题目格式
-        questions = []
-        for q in questions_data:
-            # 映射题目类型 - 修正映射关系
-            question_type_map = {
-                'B': 'single_choice',    # 单选题
-                'G': 'multiple_choice',  # 多选题
-                'C': 'true_false',       # 判断题
-                'T': 'fill_blank',       # 填空题
-                'D': 'short_answer',     # 简答题
-                'E': 'essay'             # 论述题
-            }
+        # 使用索引访问而不是字典键
+        question_type = question_type_map.get(q[2], 'single_choice')  # q[2] 是 question_type_code
 
-            # 使用索引访问而不是字典键
-            question_type = question_type_map.get(q[2], 'single_choice')  # q[2] 是 question_type_code
+        question = {
+            "id": q[0],  # q[0] 是 id
+            "type": question_type,
+            "content": q[1] or "题目内容",  # q[1] 是 stem
+            "score": q[8] or 10,  # q[8] 是 score，默认10分
+            "order": q[9]  # q[9] 是 question_order
+        }
 
-            question = {
-                "id": q[0],  # q[0] 是 id
-                "type": question_type,
-                "content": q[1] or "题目内容",  # q[1] 是 stem
-                "score": q[9] or 10,  # q[9] 是 score，默认10分
-                "order": q[10]  # q[10] 是 question_order
-            }
+        # 处理选择题的选项
+        if question_type in ['single_choice', 'multiple_choice', 'true_false']:
+            options = []
+            # q[3] 到 q[7] 是 option_a 到 option_e
+            for i in range(3, 8):
+                option_value = q[i]
+                if option_value and option_value.strip():
+                    options.append(option_value.strip())
+
+            # 判断题特殊处理：如果没有选项或选项不标准，使用默认选项
+            if question_type == 'true_false':
+                if not options or len(options) < 2:
+                    # 检查是否有option_a和option_b
+                    if q[3] and q[4]:  # option_a和option_b
+                        options = [q[3].strip(), q[4].strip()]
+                    else:
+                        # 使用默认判断题选项
+                        options = ["正确", "错误"]
+                # 确保判断题只有两个选项
+                options = options[:2]
+
+            question["options"] = options
+
+        # 注意：不在客户端暴露正确答案
+        questions.append(strip_answers(question))
+
+    return {
+        "paper_id": paper_id,
+        "title": paper[1],  # paper[1] 是 name
+        "name": paper[1],   # paper[1] 是 name
+        "description": paper[2] or "请认真作答，注意考试时间。",  # paper[2] 是 description
+        "duration": paper[3] or 60,  # paper[3] 是 duration
+        "total_score": paper[4] or 100,  # paper[4] 是 total_score
+        "pass_score": 60,  # 默认及格分
+        "questions": questions,
+        "question_count": len(questions)
+    }
+
+def encode_paper_payload(paper):
+    """序列化为紧凑的数据块，返回 (内容哈希, 数据块)"""
+    blob = json.dumps(paper, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest(), blob
+
+def decode_paper_payload(blob):
+    """数据块还原为试卷数据（每次返回新对象）"""
+    return json.loads(blob.decode('utf-8') if isinstance(blob, bytes) else blob)
+
+def get_paper_payload(paper_id_or_exam_id, known_hash=None):
+    """
+    获取试卷数据块：不含答案的紧凑JSON及其内容哈希
+    每份试卷只在题库变化后重新查询和序列化，所有考生共用
+    :param known_hash: 客户端本地副本的哈希，与当前哈希一致时不返回数据块
+    :return: {"paper_id", "hash", "blob"}（blob为None表示本地副本可用），失败返回None
+    """
+    paper_id = resolve_paper_id(paper_id_or_exam_id)
+    if paper_id is None:
+        print(f"无法识别paper_id格式: {paper_id_or_exam_id}")
+        return None
 
-            # 处理选择题的选项
-            if question_type in ['single_choice', 'multiple_choice', 'true_false']:
-                options = []
-                # q[3] 到 q[7] 是 option_a 到 option_e
-                for i in range(3, 8):
-                    option_value = q[i]
-                    if option_value and option_value.strip():
-                        options.append(option_value.strip())
-
-                # 判断题特殊处理：如果没有选项或选项不标准，使用默认选项
-                if question_type == 'true_false':
-                    if not options or len(options) < 2:
-                        # 检查是否有option_a和option_b
-                        if q[3] and q[4]:  # option_a和option_b
-                            options = [q[3].strip(), q[4].strip()]
-                        else:
-                            # 使用默认判断题选项
-                            options = ["正确", "错误"]
-                    # 确保判断题只有两个选项
-                    options = options[:2]
-
-                question["options"] = options
-
-            # 注意：不在客户端暴露正确答案
-            questions.append(question)
-
-        # 构建考试详情
-        exam_details = {
-            "id": paper_id_or_exam_id,
-            "paper_id": paper_id,
-            "title": paper[1],  # paper[1] 是 name
-            "name": paper[1],   # paper[1] 是 name
-            "description": paper[2] or "请认真作答，注意考试时间。",  # paper[2] 是 description
-            "duration": paper[3] or 60,  # paper[3] 是 duration
-            "total_score": paper[4] or 100,  # paper[4] 是 total_score
-            "pass_score": 60,  # 默认及格分
-            "questions": questions,
-            "question_count": len(questions)
-        }
+    db_path = find_question_bank_db()
+    if not db_path:
+        return None
+
+    key = (db_path, paper_id)
+    signature = _db_signature(db_path)
+    cached = _paper_payload_cache.get(key)
+    if cached is None or cached[0] != signature:
+        with _paper_payload_lock:
+            cached = _paper_payload_cache.get(key)
+            if cached is None or cached[0] != signature:
+                print(f"使用数据库: {db_path}")
+                paper = build_paper_payload(db_path, paper_id)
+                if paper is None:
+                    return None
+                content_hash, blob = encode_paper_payload(paper)
+                cached = _paper_payload_cache[key] = (signature, content_hash, blob)
+                print(f"成功从题库获取试卷: {paper['name']}, 共 {paper['question_count']} 道题")
+
+    _, content_hash, blob = cached
+    return {
+        "paper_id": paper_id,
+        "hash": content_hash,
+        "blob": None if known_hash == content_hash else blob
+    }
 
-        print(f"成功从题库获取试卷: {paper[1]}, 共 {len(questions)} 道题")
-        return exam_details
+def get_paper_from_question_bank(paper_id_or_exam_id):
+    """
+    从题库数据库获取试卷详情和题目
+    支持UUID格式的paper_id和传统的数字ID
+    """
+    try:
+        payload = get_paper_payload(paper_id_or_exam_id)
+        if payload is None:
+            return None
+        paper = decode_paper_payload(payload["blob"])
+        if not paper["questions"]:
+            return None
+        return {"id": paper_id_or_exam_id, **paper}
 
     except Exception as e:
         print(f"从题库获取试卷失败: {e}")
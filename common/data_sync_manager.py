@@ -29,6 +29,9 @@ from common.sql_security import ParameterizedQuery
 class DataSyncManager:
     """数据同步管理器"""
     
+    # 成绩统计在阅卷结果变更日志上的消费者名称
+    FEED_CONSUMER = "score_statistics"
+    
     def __init__(self):
         self.logger = get_logger("data_sync_manager")
         self.config_manager = ConfigManager()
@@ -38,7 +41,8 @@ class DataSyncManager:
             "question_bank": "question_bank_web/local_dev.db",
             "user_management": "user_management/users.db", 
             "exam_management": "exam_management/exams.json",
-            "score_statistics": "score_statistics/scores.json",
+            "score_statistics": "score_statistics/scores.db",
+            "grading_graded": "grading_center/graded",
             "main": "database.sqlite"
         }
         
@@ -355,98 +359,101 @@ class DataSyncManager:
             except requests.RequestException as e:
                 self.logger.warning(f"无法连接阅卷中心API，结果已保存到本地: {e}")
             
-            # 如果API不可用，保存到阅卷中心的待处理目录
-            grading_queue_dir = "grading_center/queue"
-            os.makedirs(grading_queue_dir, exist_ok=True)
-            
-            queue_file = os.path.join(grading_queue_dir, f"pending_{int(time.time())}_{exam_result['user_id']}.json")
-            with open(queue_file, 'w', encoding='utf-8') as f:
-                json.dump(exam_result, f, ensure_ascii=False, indent=2)
-            
-            self.logger.info(f"考试结果已保存到阅卷队列: {queue_file}")
+            # 如果API不可用，写入阅卷中心的持久化队列（重复提交按任务键去重）
+            from grading_center.grading_queue import GradingQueue
+            queue = GradingQueue()
+            if queue.enqueue(exam_result):
+                self.logger.info(f"考试结果已加入阅卷队列: {GradingQueue.make_job_key(exam_result)}")
+            else:
+                self.logger.info(f"考试结果已在阅卷队列中: {GradingQueue.make_job_key(exam_result)}")
+            queue.close()
             return True
             
         except Exception as e:
             self.logger.error(f"提交考试结果失败: {e}")
             return False
     
-    def sync_grading_results_to_statistics(self) -> bool:
-        """同步阅卷结果到成绩统计模块"""
+    def sync_grading_results_to_statistics(self, feed=None, store=None, batch_size: int = 500) -> bool:
+        """同步阅卷结果到成绩统计模块
+        
+        从阅卷结果变更日志按偏移量增量拉取，每批成绩与新偏移量在同一事务中
+        写入成绩库；中途失败时从上次提交的偏移量重试，不会重复或丢失成绩。
+        """
+        from grading_center.result_feed import GradedResultFeed
+        from score_statistics.score_store import ScoreStore
+        
+        own_feed, own_store = feed is None, store is None
+        feed = feed or GradedResultFeed()
+        store = store or ScoreStore(self.databases["score_statistics"])
         try:
-            # 获取阅卷完成的结果
-            graded_results = self.get_graded_results()
-            
-            if not graded_results:
-                self.logger.info("没有新的阅卷结果需要同步")
-                return True
-            
-            # 读取成绩统计数据
-            scores_file = "score_statistics/scores.json"
-            if os.path.exists(scores_file):
-                with open(scores_file, 'r', encoding='utf-8') as f:
-                    scores_data = json.load(f)
+            # 旧版 graded/ 目录中的结果文件一次性补录到变更日志
+            feed.backfill_directory(Path(self.databases["grading_graded"]))
+            
+            meta_key = f"feed_offset:{self.FEED_CONSUMER}"
+            offset = store.feed_offset(self.FEED_CONSUMER)
+            synced = skipped = 0
+            while True:
+                batch = self.get_graded_results(feed, offset, batch_size)
+                if not batch:
+                    break
+                
+                records = []
+                for seq, result in batch:
+                    try:
+                        records.append(self.convert_graded_result(result))
+                    except (KeyError, TypeError, ValueError) as e:
+                        # 无法转换的记录（如缺少考试或考生ID的旧版结果）跳过，偏移量照常前进
+                        skipped += 1
+                        self.logger.error(f"跳过无法转换的阅卷结果（序列号 {seq}）: {e!r}")
+                offset = batch[-1][0]
+                store.upsert_many(records, meta={meta_key: offset})
+                synced += len(records)
+            
+            if skipped:
+                self.logger.warning(f"共跳过 {skipped} 条无法转换的阅卷结果")
+            if synced:
+                self.logger.info(f"成功同步 {synced} 条阅卷结果到成绩统计（偏移量 {offset}）")
             else:
-                scores_data = []
-            
-            # 添加新的成绩记录
-            for result in graded_results:
-                score_record = {
-                    'id': f"score_{result['exam_id']}_{result['user_id']}",
-                    'exam_id': result['exam_id'],
-                    'user_id': result['user_id'],
-                    'user_name': result.get('user_name', ''),
-                    'paper_title': result.get('paper_title', ''),
-                    'total_score': result.get('total_score', 0),
-                    'obtained_score': result.get('final_score', 0),
-                    'percentage': round((result.get('final_score', 0) / result.get('total_score', 1)) * 100, 2),
-                    'grade': self.calculate_grade(result.get('final_score', 0), result.get('total_score', 1)),
-                    'exam_time': result.get('submit_time', ''),
-                    'grading_time': result.get('grading_time', ''),
-                    'details': result.get('question_scores', [])
-                }
-                scores_data.append(score_record)
-            
-            # 保存更新后的成绩数据
-            os.makedirs(os.path.dirname(scores_file), exist_ok=True)
-            with open(scores_file, 'w', encoding='utf-8') as f:
-                json.dump(scores_data, f, ensure_ascii=False, indent=2)
-            
-            self.logger.info(f"成功同步 {len(graded_results)} 条阅卷结果到成绩统计")
+                self.logger.info("没有新的阅卷结果需要同步")
             return True
             
         except Exception as e:
             self.logger.error(f"同步阅卷结果失败: {e}")
             return False
+        finally:
+            if own_feed:
+                feed.close()
+            if own_store:
+                store.close()
     
-    def get_graded_results(self) -> List[Dict]:
-        """获取已完成阅卷的结果"""
-        try:
-            graded_results = []
-            
-            # 检查阅卷中心的完成目录
-            graded_dir = "grading_center/graded"
-            if os.path.exists(graded_dir):
-                for file_name in os.listdir(graded_dir):
-                    if file_name.endswith('.json'):
-                        file_path = os.path.join(graded_dir, file_name)
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                result = json.load(f)
-                                graded_results.append(result)
-                            
-                            # 移动到已处理目录
-                            processed_dir = "grading_center/processed"
-                            os.makedirs(processed_dir, exist_ok=True)
-                            os.rename(file_path, os.path.join(processed_dir, file_name))
-                            
-                        except Exception as e:
-                            self.logger.error(f"处理阅卷结果文件失败 {file_name}: {e}")
-            
-            return graded_results
-            
-        except Exception as e:
-            self.logger.error(f"获取阅卷结果失败: {e}")
-            return []
+    def get_graded_results(self, feed, after_seq: int = 0, limit: int = 500) -> List[tuple]:
+        """从变更日志读取偏移量之后的阅卷结果，返回 (序列号, 结果) 列表"""
+        return feed.read(after_seq, limit)
+    
+    def convert_graded_result(self, result: Dict) -> Dict:
+        """阅卷结果转换为成绩记录
+        
+        成绩ID由成绩库分配数字ID；source_key（考试_考生）标识来源，
+        同一考生同一考试重新阅卷时覆盖原成绩。
+        """
+        total_score = result.get('total_score') or 0
+        final_score = result.get('final_score', 0)
+        return {
+            'source_key': f"{result['exam_id']}_{result['user_id']}",
+            'exam_id': result['exam_id'],
+            'exam_name': result.get('paper_title', ''),
+            'student_id': result['user_id'],
+            'student_name': result.get('user_name', ''),
+            'department': result.get('department', ''),
+            'score': final_score,
+            'total_score': total_score,
+            'percentage': round(final_score / total_score * 100, 2) if total_score else 0,
+            'submit_time': result.get('submit_time') or '',
+            'status': 'completed',
+            'grade': self.calculate_grade(final_score, total_score),
+            'grading_time': result.get('grading_time', ''),
+            'details': result.get('question_scores', [])
+        }
     
     def calculate_grade(self, obtained_score: float, total_score: float) -> str:
         """计算等级"""
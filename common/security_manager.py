@@ -6,16 +6,23 @@
 
 更新日志：
 - 2024-06-25：初始版本，提供基本安全管理功能
+- 2026-10-19：密码验证移至有界线程池（先到先得准入），last_login 改为批量延迟写入
+- 2026-10-19：TokenManager 增加HMAC签名令牌模式与按过期时间分桶的撤销黑名单
 """
 
 import os
 import sys
 import json
 import time
+import hmac
+import atexit
 import base64
 import hashlib
 import secrets
+import weakref
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -107,8 +114,8 @@ class PasswordManager:
         # 哈希密码
         new_hash, _ = self.hash_password(password, salt)
         
-        # 比较哈希值
-        return new_hash == hash_password
+        # 比较哈希值（恒定时间）
+        return hmac.compare_digest(new_hash, hash_password)
     
     def encode_hash_salt(self, hash_password, salt):
         """
@@ -141,6 +148,173 @@ class PasswordManager:
         return hash_password, salt
 
 
+class LoginBusyError(Exception):
+    """密码验证排队超时"""
+    pass
+
+
+class PasswordVerifier:
+    """
+    密码验证线程池
+    
+    PBKDF2计算期间释放GIL，放入固定大小的线程池并行执行。
+    同时提交的验证数量不超过 max_pending，超出的请求按到达顺序排队准入，
+    等待超过 admission_timeout 时抛出 LoginBusyError。
+    """
+    def __init__(self, password_manager=None, workers=None, max_pending=None, admission_timeout=10.0):
+        """
+        初始化密码验证线程池
+        
+        Args:
+            password_manager (PasswordManager, optional): 密码管理器
+            workers (int, optional): 工作线程数，默认为CPU核数
+            max_pending (int, optional): 已提交（执行中与排队中）的验证数量上限，默认为工作线程数的4倍
+            admission_timeout (float, optional): 准入等待超时（秒）
+        """
+        self.password_manager = password_manager or PasswordManager()
+        self.workers = workers or os.cpu_count() or 2
+        self.max_pending = max_pending or self.workers * 4
+        self.admission_timeout = admission_timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pbkdf2")
+        
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.waiters = deque()
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "peak_pending": 0,
+            "peak_waiting": 0,
+            "admission_wait_total": 0.0,
+            "verify_time_total": 0.0,
+        }
+    
+    def _admit(self, timeout):
+        """申请执行名额，按到达顺序准入"""
+        with self.lock:
+            if self.pending < self.max_pending and not self.waiters:
+                self.pending += 1
+                return True
+            event = threading.Event()
+            self.waiters.append(event)
+            self.metrics["peak_waiting"] = max(self.metrics["peak_waiting"], len(self.waiters))
+        
+        if event.wait(timeout):
+            return True
+        
+        with self.lock:
+            # 超时与名额转交可能同时发生，以是否已转交为准
+            if event.is_set():
+                return True
+            self.waiters.remove(event)
+            self.metrics["rejected"] += 1
+            return False
+    
+    def _release(self, _future=None):
+        """释放执行名额，有排队请求时直接转交给最早到达的请求"""
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft().set()
+            else:
+                self.pending -= 1
+    
+    def _run(self, password, hash_password, salt):
+        with self.lock:
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            return self.password_manager.verify_password(password, hash_password, salt)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.running -= 1
+                self.metrics["completed"] += 1
+                self.metrics["verify_time_total"] += elapsed
+    
+    def verify(self, password, hash_password, salt, timeout=None):
+        """
+        验证密码（阻塞等待结果）
+        
+        Args:
+            password (str): 密码
+            hash_password (bytes): 哈希密码
+            salt (bytes): 盐
+            timeout (float, optional): 准入等待超时（秒），默认使用 admission_timeout
+            
+        Returns:
+            bool: 密码是否正确
+            
+        Raises:
+            LoginBusyError: 排队超时
+        """
+        start = time.perf_counter()
+        if not self._admit(self.admission_timeout if timeout is None else timeout):
+            raise LoginBusyError(f"密码验证排队超过 {self.admission_timeout} 秒")
+        
+        with self.lock:
+            self.metrics["submitted"] += 1
+            self.metrics["admission_wait_total"] += time.perf_counter() - start
+            self.metrics["peak_pending"] = max(self.metrics["peak_pending"], self.pending)
+        
+        try:
+            future = self.executor.submit(self._run, password, hash_password, salt)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future.result()
+    
+    def stats(self):
+        """
+        获取线程池指标
+        
+        Returns:
+            dict: 工作线程数、执行中/排队中/等待准入的数量及累计指标
+        """
+        with self.lock:
+            metrics = dict(self.metrics)
+            submitted = metrics["submitted"]
+            completed = metrics["completed"]
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "waiting": len(self.waiters),
+                "submitted": submitted,
+                "completed": completed,
+                "rejected": metrics["rejected"],
+                "peak_pending": metrics["peak_pending"],
+                "peak_waiting": metrics["peak_waiting"],
+                "avg_admission_wait_ms": metrics["admission_wait_total"] / submitted * 1000 if submitted else 0.0,
+                "avg_verify_ms": metrics["verify_time_total"] / completed * 1000 if completed else 0.0,
+            }
+    
+    def shutdown(self, wait=True):
+        """关闭线程池"""
+        self.executor.shutdown(wait=wait)
+
+
+_default_verifier = None
+_default_verifier_lock = threading.Lock()
+
+
+def get_password_verifier():
+    """
+    获取进程共享的密码验证线程池
+    
+    Returns:
+        PasswordVerifier: 密码验证线程池
+    """
+    global _default_verifier
+    with _default_verifier_lock:
+        if _default_verifier is None:
+            _default_verifier = PasswordVerifier()
+        return _default_verifier
+
+
 class EncryptionManager:
     """
     加密管理器，用于数据加密和解密
@@ -332,25 +506,232 @@ class EncryptionManager:
             return False
 
 
+class TokenDenylist:
+    """
+    已撤销令牌的黑名单，按令牌过期时间分桶
+    
+    只需记住尚未过期的已撤销令牌：每个桶覆盖 bucket_seconds 秒的过期时间，
+    整桶过期后直接丢弃，清理耗时与桶数量成正比，与令牌数量无关。
+    指定 db_path 时撤销记录写入SQLite，其它进程按 sync_interval 增量同步。
+    同步位置使用 AUTOINCREMENT 序号：清理过期记录后序号也不会重新从1开始，
+    已同步到较大序号的进程不会漏掉之后的撤销。
+    """
+    def __init__(self, bucket_seconds=300, db_path=None, sync_interval=1.0):
+        """
+        初始化黑名单
+        
+        Args:
+            bucket_seconds (int, optional): 分桶时长（秒）
+            db_path (str, optional): 跨进程共享的SQLite文件路径
+            sync_interval (float, optional): 从共享文件同步的最小间隔（秒）
+        """
+        self.bucket_seconds = bucket_seconds
+        self.buckets = {}
+        self.lock = threading.Lock()
+        
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+        self._last_seq = 0
+        self._next_sync = 0.0
+        if db_path:
+            import sqlite3
+            ensure_dir(os.path.dirname(os.path.abspath(db_path)))
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._init_table(conn)
+            self.sync(force=True)
+    
+    @staticmethod
+    def _init_table(conn):
+        """创建撤销记录表，旧版（按隐式rowid同步）的表迁移为带序号的表"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(revoked_tokens)")]
+        if columns and "seq" not in columns:
+            conn.execute("ALTER TABLE revoked_tokens RENAME TO revoked_tokens_legacy")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                jti TEXT NOT NULL UNIQUE,
+                expires_at INTEGER NOT NULL
+            )
+        """)
+        if columns and "seq" not in columns:
+            conn.execute("""
+                INSERT OR IGNORE INTO revoked_tokens (jti, expires_at)
+                SELECT jti, expires_at FROM revoked_tokens_legacy ORDER BY rowid
+            """)
+            conn.execute("DROP TABLE revoked_tokens_legacy")
+    
+    def _bucket(self, expires_at):
+        return int(expires_at) // self.bucket_seconds
+    
+    def _add_local(self, jti, expires_at):
+        self.buckets.setdefault(self._bucket(expires_at), set()).add(jti)
+    
+    def add(self, jti, expires_at):
+        """
+        撤销令牌
+        
+        Args:
+            jti (str): 令牌ID
+            expires_at (int): 令牌过期时间戳
+        """
+        if expires_at < time.time():
+            return
+        with self.lock:
+            self._add_local(jti, expires_at)
+        if self.db_path:
+            import sqlite3
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                             (jti, int(expires_at)))
+    
+    def contains(self, jti, expires_at):
+        """
+        检查令牌是否已撤销
+        
+        Args:
+            jti (str): 令牌ID
+            expires_at (int): 令牌过期时间戳
+            
+        Returns:
+            bool: 是否已撤销
+        """
+        if self.db_path and time.monotonic() >= self._next_sync:
+            self.sync()
+        bucket = self.buckets.get(self._bucket(expires_at))
+        return bucket is not None and jti in bucket
+    
+    def sync(self, force=False):
+        """从共享文件读取其它进程新增的撤销记录"""
+        if not self.db_path:
+            return
+        import sqlite3
+        with self.lock:
+            if not force and time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self.sync_interval
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    rows = conn.execute(
+                        "SELECT seq, jti, expires_at FROM revoked_tokens WHERE seq > ? ORDER BY seq",
+                        (self._last_seq,)).fetchall()
+            except Exception as e:
+                logger.error(f"同步令牌黑名单失败: {str(e)}")
+                return
+            now = time.time()
+            for seq, jti, expires_at in rows:
+                self._last_seq = seq
+                if expires_at >= now:
+                    self._add_local(jti, expires_at)
+    
+    def cleanup(self, now=None):
+        """
+        丢弃整桶过期的撤销记录
+        
+        Returns:
+            int: 丢弃的记录数量
+        """
+        now = time.time() if now is None else now
+        current = self._bucket(now)
+        count = 0
+        with self.lock:
+            for bucket in [b for b in self.buckets if b < current]:
+                count += len(self.buckets.pop(bucket))
+        if self.db_path:
+            import sqlite3
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?",
+                             (current * self.bucket_seconds,))
+        return count
+    
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
 class TokenManager:
     """
     令牌管理器，用于生成和验证访问令牌
+    
+    两种模式：
+    - 默认模式：随机令牌保存在进程内字典中，只能由签发进程验证
+    - 签名模式（signed=True）：令牌自带用户ID、角色和过期时间并以HMAC-SHA256签名，
+      持有相同密钥的任何进程都可以独立验证，无需共享状态；撤销通过 TokenDenylist 实现
     """
-    def __init__(self, secret_key=None, token_expiry=3600):
+    TOKEN_VERSION = "v1"
+    
+    def __init__(self, secret_key=None, token_expiry=3600, signed=False, denylist=None):
         """
         初始化令牌管理器
         
         Args:
-            secret_key (str, optional): 密钥，如果为None则生成新密钥
+            secret_key (str, optional): 密钥，如果为None则读取环境变量 PHRL_TOKEN_SECRET，
+                仍为空时生成新密钥（签名模式下此时只有本进程能验证）
             token_expiry (int, optional): 令牌过期时间（秒）
+            signed (bool, optional): 是否使用签名令牌
+            denylist (TokenDenylist, optional): 签名令牌的撤销黑名单
         """
         if secret_key is None:
-            secret_key = secrets.token_hex(32)
+            secret_key = os.environ.get("PHRL_TOKEN_SECRET") or secrets.token_hex(32)
         
         self.secret_key = secret_key
         self.token_expiry = token_expiry
+        self.signed = signed
         self.tokens = {}
         self.lock = threading.Lock()
+        
+        # 预先完成密钥填充，每次签名只复制HMAC状态
+        signing_key = secret_key.encode("utf-8") if isinstance(secret_key, str) else secret_key
+        self._hmac = hmac.new(signing_key, digestmod=hashlib.sha256)
+        self.denylist = denylist if denylist is not None else TokenDenylist()
+    
+    def _sign(self, payload):
+        mac = self._hmac.copy()
+        mac.update(payload.encode("ascii"))
+        return _b64encode(mac.digest())
+    
+    def _issue_signed_token(self, user_id, role):
+        """签发签名令牌：v1.用户ID.角色.过期时间.令牌ID.签名"""
+        expires_at = int(time.time()) + self.token_expiry
+        payload = ".".join((
+            self.TOKEN_VERSION,
+            _b64encode(str(user_id).encode("utf-8")),
+            _b64encode(str(role or "").encode("utf-8")),
+            str(expires_at),
+            secrets.token_hex(8),
+        ))
+        return f"{payload}.{self._sign(payload)}"
+    
+    def _verify_signed_token(self, token):
+        """验证签名令牌，返回令牌数据，无效时返回None"""
+        try:
+            payload, signature = token.rsplit(".", 1)
+            # 按字节比较：含非ASCII字符的签名段直接判为无效
+            if not hmac.compare_digest(signature.encode("utf-8"), self._sign(payload).encode("ascii")):
+                return None
+            version, user_id, role, expires_at, jti = payload.split(".")
+            expires_at = int(expires_at)
+        except (AttributeError, TypeError, ValueError, UnicodeEncodeError):
+            return None
+        
+        if version != self.TOKEN_VERSION or expires_at < time.time():
+            return None
+        if self.denylist.contains(jti, expires_at):
+            return None
+        
+        return {
+            "user_id": _b64decode(user_id).decode("utf-8"),
+            "expires_at": expires_at,
+            "jti": jti,
+            "data": {"role": _b64decode(role).decode("utf-8")}
+        }
     
     def generate_token(self, user_id, data=None):
         """
@@ -358,11 +739,14 @@ class TokenManager:
         
         Args:
             user_id (str): 用户ID
-            data (dict, optional): 令牌数据
+            data (dict, optional): 令牌数据（签名模式下只保留其中的角色）
             
         Returns:
             str: 访问令牌
         """
+        if self.signed:
+            return self._issue_signed_token(user_id, (data or {}).get("role"))
+        
         # 生成令牌
         token = secrets.token_hex(16)
         expires_at = datetime.now() + timedelta(seconds=self.token_expiry)
@@ -390,6 +774,9 @@ class TokenManager:
         Returns:
             dict: 令牌数据，如果令牌无效则返回None
         """
+        if self.signed:
+            return self._verify_signed_token(token)
+        
         with self.lock:
             # 检查令牌是否存在
             if token not in self.tokens:
@@ -414,8 +801,12 @@ class TokenManager:
             token (str): 访问令牌
             
         Returns:
-            bool: 是否成功刷新
+            bool: 是否成功刷新；签名令牌的过期时间不可修改，签名模式下返回False，
+                需要延长有效期时使用 reissue_token
         """
+        if self.signed:
+            return False
+        
         with self.lock:
             # 检查令牌是否存在
             if token not in self.tokens:
@@ -435,6 +826,26 @@ class TokenManager:
             
             return True
     
+    def reissue_token(self, token):
+        """
+        以新的签名令牌替换仍有效的签名令牌，原令牌通过黑名单撤销
+        
+        Args:
+            token (str): 访问令牌
+            
+        Returns:
+            str: 新签发的令牌，原令牌无效或非签名模式时返回None
+        """
+        if not self.signed:
+            return None
+        
+        token_data = self._verify_signed_token(token)
+        if token_data is None:
+            return None
+        new_token = self._issue_signed_token(token_data["user_id"], token_data["data"]["role"])
+        self.denylist.add(token_data["jti"], token_data["expires_at"])
+        return new_token
+    
     def revoke_token(self, token):
         """
         撤销访问令牌
@@ -445,6 +856,13 @@ class TokenManager:
         Returns:
             bool: 是否成功撤销
         """
+        if self.signed:
+            token_data = self._verify_signed_token(token)
+            if token_data is None:
+                return False
+            self.denylist.add(token_data["jti"], token_data["expires_at"])
+            return True
+        
         with self.lock:
             # 检查令牌是否存在
             if token not in self.tokens:
@@ -460,8 +878,11 @@ class TokenManager:
         清理过期令牌
         
         Returns:
-            int: 清理的令牌数量
+            int: 清理的令牌数量（签名模式下为清理的黑名单记录数量）
         """
+        if self.signed:
+            return self.denylist.cleanup()
+        
         count = 0
         current_time = datetime.now().timestamp()
         
@@ -478,18 +899,46 @@ class TokenManager:
                 count += 1
         
         return count
+    
+    def benchmark_verify(self, iterations=100000, user_id="benchmark_user"):
+        """
+        令牌验证基准测试
+        
+        Args:
+            iterations (int, optional): 验证次数
+            user_id (str, optional): 令牌用户ID
+            
+        Returns:
+            dict: 模式、验证次数、每秒验证次数、单次耗时（微秒）
+        """
+        token = self.generate_token(user_id, {"role": "student"})
+        start = time.perf_counter()
+        for _ in range(iterations):
+            self.verify_token(token)
+        elapsed = time.perf_counter() - start
+        if not self.signed:
+            self.revoke_token(token)
+        return {
+            "mode": "signed" if self.signed else "opaque",
+            "iterations": iterations,
+            "ops_per_sec": round(iterations / elapsed) if elapsed else 0,
+            "avg_us": round(elapsed / iterations * 1e6, 2) if iterations else 0.0,
+        }
 
 
 class UserManager:
     """
     用户管理器，用于用户管理和认证
     """
-    def __init__(self, users_file=None):
+    def __init__(self, users_file=None, verifier=None, last_login_flush_interval=5.0, token_manager=None):
         """
         初始化用户管理器
         
         Args:
             users_file (str, optional): 用户文件路径
+            verifier (PasswordVerifier, optional): 密码验证线程池，默认使用进程共享的线程池
+            last_login_flush_interval (float, optional): 最后登录时间的批量写入间隔（秒）
+            token_manager (TokenManager, optional): 令牌管理器，跨进程验证时传入签名模式的实例
         """
         if users_file is None:
             project_root = Path(__file__).parent.parent
@@ -498,9 +947,16 @@ class UserManager:
         self.users_file = users_file
         self.users = {}
         self.password_manager = PasswordManager()
-        self.token_manager = TokenManager()
+        self.verifier = verifier or get_password_verifier()
+        self.token_manager = token_manager or TokenManager()
         self.lock = threading.Lock()
         
+        # 最后登录时间先更新内存，按间隔批量写入文件
+        self.last_login_flush_interval = last_login_flush_interval
+        self._last_login_dirty = False
+        self._flush_timer = None
+        _user_managers.add(self)
+        
         # 加载用户数据
         self.load_users()
     
@@ -545,8 +1001,11 @@ class UserManager:
             # 确保用户文件目录存在
             ensure_dir(os.path.dirname(self.users_file))
             
-            # 保存用户数据
-            return write_json_file(self.users_file, self.users)
+            # 保存用户数据（包含尚未写入的最后登录时间）
+            success = write_json_file(self.users_file, self.users)
+            if success:
+                self._last_login_dirty = False
+            return success
         except Exception as e:
             logger.error(f"保存用户数据失败: {str(e)}")
             return False
@@ -698,16 +1157,60 @@ class UserManager:
         # 解码密码
         hash_password, salt = self.password_manager.decode_hash_salt(user["password"])
         
-        # 验证密码
-        if not self.password_manager.verify_password(password, hash_password, salt):
+        # 验证密码（在线程池中执行，排队超时视为认证失败）
+        try:
+            if not self.verifier.verify(password, hash_password, salt):
+                return False
+        except LoginBusyError as e:
+            logger.warning(f"登录繁忙，认证被拒绝: {username} ({e})")
             return False
         
         # 更新最后登录时间
+        self.record_login(username)
+        
+        return True
+    
+    def record_login(self, username):
+        """
+        记录最后登录时间（先更新内存，延迟批量写入文件）
+        
+        Args:
+            username (str): 用户名
+        """
         with self.lock:
+            user = self.users.get(username)
+            if user is None:
+                return
             user["last_login"] = datetime.now().timestamp()
-            self.save_users()
+            self._last_login_dirty = True
+            
+            if self.last_login_flush_interval <= 0:
+                self.save_users()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.last_login_flush_interval, self.flush_last_login)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush_last_login(self):
+        """
+        写入尚未保存的最后登录时间
         
-        return True
+        Returns:
+            bool: 是否执行了写入
+        """
+        with self.lock:
+            self._flush_timer = None
+            if not self._last_login_dirty:
+                return False
+            return self.save_users()
+    
+    def close(self):
+        """取消定时写入并立即写入尚未保存的数据"""
+        with self.lock:
+            timer, self._flush_timer = self._flush_timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush_last_login()
     
     def login(self, username, password):
         """
@@ -763,6 +1266,18 @@ class UserManager:
         """
         return self.token_manager.refresh_token(token)
     
+    def reissue_token(self, token):
+        """
+        以新的签名令牌替换当前令牌（签名模式），原令牌随即失效
+        
+        Args:
+            token (str): 访问令牌
+            
+        Returns:
+            str: 新令牌，失败返回None
+        """
+        return self.token_manager.reissue_token(token)
+    
     def logout(self, token):
         """
         用户登出
@@ -776,6 +1291,19 @@ class UserManager:
         return self.token_manager.revoke_token(token)
 
 
+# 进程退出时写入所有用户管理器尚未保存的最后登录时间
+_user_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_user_managers():
+    for manager in list(_user_managers):
+        try:
+            manager.flush_last_login()
+        except Exception as e:
+            logger.error(f"写入最后登录时间失败: {str(e)}")
+
+
 class PermissionManager:
     """
     权限管理器，用于权限管理和访问控制
@@ -1186,6 +1714,14 @@ if __name__ == "__main__":
     token_data = token_manager.verify_token(token)
     print(f"令牌数据: {token_data}")
     
+    # 测试签名令牌
+    signed_manager = TokenManager(signed=True)
+    signed_token = signed_manager.generate_token("test_user", {"role": "admin"})
+    print(f"签名令牌: {signed_token}")
+    print(f"签名令牌数据: {signed_manager.verify_token(signed_token)}")
+    print(f"验证基准（内存令牌）: {token_manager.benchmark_verify(20000)}")
+    print(f"验证基准（签名令牌）: {signed_manager.benchmark_verify(20000)}")
+    
     # 测试用户管理器
     user_manager = UserManager()
     username = "test_user"
@@ -6,13 +6,16 @@
 
 更新日志：
 - 2025-01-07：创建自动阅卷系统
+- 2026-10-19：改为从持久化阅卷队列领取任务，支持监听模式和多工作线程
 """
 
 import os
+import re
 import sys
 import json
 import sqlite3
-import time
+import argparse
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Any
@@ -22,12 +25,14 @@ sys.path.append(str(Path(__file__).parent.parent))
 from common.logger import get_logger
 from common.error_handler import handle_error, retry
 from common.sql_security import ParameterizedQuery
+from grading_center.grading_queue import GradingQueue, GradingJob
+from grading_center.result_feed import GradedResultFeed
 
 
 class AutoGrader:
     """自动阅卷器"""
     
-    def __init__(self):
+    def __init__(self, queue: GradingQueue = None, feed: GradedResultFeed = None):
         self.logger = get_logger("auto_grader")
         self.queue_dir = Path(__file__).parent / "queue"
         self.graded_dir = Path(__file__).parent / "graded"
@@ -37,35 +42,34 @@ class AutoGrader:
         self.queue_dir.mkdir(exist_ok=True)
         self.graded_dir.mkdir(exist_ok=True)
         self.processed_dir.mkdir(exist_ok=True)
+        
+        self.queue = queue or GradingQueue()
+        # 阅卷结果变更日志，成绩统计按序列号增量拉取
+        self.feed = feed or GradedResultFeed()
     
-    def process_pending_exams(self) -> int:
-        """处理待阅卷的考试"""
+    def process_pending_exams(self, worker_id: str = None, batch_size: int = 10) -> int:
+        """处理待阅卷的考试，直到队列中没有可领取的任务"""
         processed_count = 0
         
         try:
-            # 获取队列中的所有待处理文件
-            pending_files = list(self.queue_dir.glob("*.json"))
+            # 兼容旧版：把 queue/*.json 文件导入持久化队列
+            self.queue.import_directory(self.queue_dir, self.processed_dir)
             
-            if not pending_files:
+            backlog = self.queue.backlog()
+            if not backlog["backlog"]:
                 self.logger.info("没有待处理的考试结果")
                 return 0
             
-            self.logger.info(f"发现 {len(pending_files)} 个待处理的考试结果")
+            self.logger.info(f"待处理考试结果 {backlog['pending']} 个，"
+                             f"最早等待 {backlog['oldest_pending_age']:.0f} 秒")
             
-            for file_path in pending_files:
-                try:
-                    success = self.grade_single_exam(file_path)
-                    if success:
+            while True:
+                jobs = self.queue.claim(worker_id, limit=batch_size)
+                if not jobs:
+                    break
+                for job in jobs:
+                    if self.process_job(job):
                         processed_count += 1
-                        # 移动到已处理目录
-                        processed_file = self.processed_dir / file_path.name
-                        file_path.rename(processed_file)
-                        self.logger.info(f"考试结果处理完成: {file_path.name}")
-                    else:
-                        self.logger.error(f"考试结果处理失败: {file_path.name}")
-                        
-                except Exception as e:
-                    self.logger.error(f"处理考试文件失败 {file_path.name}: {e}")
             
             return processed_count
             
@@ -73,13 +77,73 @@ class AutoGrader:
             self.logger.error(f"处理待阅卷考试失败: {e}")
             return processed_count
     
+    def process_job(self, job: GradingJob) -> bool:
+        """处理一个已领取的阅卷任务"""
+        try:
+            result_key = self.grade_exam_result(job.payload, job.job_key)
+            if result_key:
+                if not self.queue.ack(job, result_key):
+                    self.logger.warning(f"租约已被接管，结果由新的工作者确认: {job.job_key}")
+                    return False
+                self.logger.info(f"考试结果处理完成: {job.job_key}")
+                return True
+            
+            status = self.queue.nack(job, "阅卷失败")
+            self.logger.error(f"考试结果处理失败: {job.job_key} (第{job.attempts}次, 状态: {status})")
+            return False
+            
+        except Exception as e:
+            self.queue.nack(job, str(e))
+            self.logger.error(f"处理阅卷任务失败 {job.job_key}: {e}")
+            return False
+    
+    def run_workers(self, num_workers: int = 1, poll_interval: float = 2.0,
+                    stop_event: threading.Event = None):
+        """监听模式：多个工作线程持续从队列领取任务，直到 stop_event 被设置"""
+        stop_event = stop_event or threading.Event()
+        
+        def worker_loop():
+            worker_id = GradingQueue.default_worker_id()
+            while not stop_event.is_set():
+                jobs = self.queue.claim(worker_id, limit=1)
+                if not jobs:
+                    stop_event.wait(poll_interval)
+                    continue
+                self.process_job(jobs[0])
+            self.queue.close()
+        
+        threads = [threading.Thread(target=worker_loop, name=f"grader-{i}", daemon=True)
+                   for i in range(num_workers)]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while not stop_event.is_set():
+                self.queue.import_directory(self.queue_dir, self.processed_dir)
+                stop_event.wait(poll_interval)
+        except KeyboardInterrupt:
+            stop_event.set()
+        
+        for thread in threads:
+            thread.join()
+    
     def grade_single_exam(self, file_path: Path) -> bool:
-        """阅卷单个考试"""
+        """阅卷单个考试文件"""
         try:
-            # 读取考试结果
             with open(file_path, 'r', encoding='utf-8') as f:
                 exam_result = json.load(f)
-            
+            return self.grade_exam_result(exam_result) is not None
+        except Exception as e:
+            self.logger.error(f"阅卷失败: {e}")
+            return False
+    
+    def grade_exam_result(self, exam_result: Dict, job_key: str = None) -> Optional[str]:
+        """阅卷一份答卷，返回阅卷结果键（失败返回None）
+        
+        结果文件以任务键命名，重复处理同一任务会覆盖同一个文件，保证幂等。
+        """
+        try:
+            job_key = job_key or GradingQueue.make_job_key(exam_result)
             exam_id = exam_result.get('exam_id')
             user_id = exam_result.get('user_id')
             answers = exam_result.get('answers', {})
@@ -90,7 +154,7 @@ class AutoGrader:
             correct_answers = self.get_correct_answers(exam_id)
             if not correct_answers:
                 self.logger.warning(f"无法获取考试 {exam_id} 的正确答案，使用默认评分")
-                return self.create_default_grading_result(exam_result, file_path)
+                return self.create_default_grading_result(exam_result, job_key)
             
             # 进行自动阅卷
             grading_result = self.auto_grade_answers(answers, correct_answers)
@@ -112,20 +176,35 @@ class AutoGrader:
                 "question_scores": grading_result['question_scores'],
                 "grading_details": grading_result['grading_details'],
                 "auto_graded": True,
-                "grader": "auto_grader_v1.0"
+                "grader": "auto_grader_v1.0",
+                "result_key": job_key
             }
             
             # 保存阅卷结果
-            graded_file = self.graded_dir / f"graded_{exam_id}_{user_id}_{int(time.time())}.json"
-            with open(graded_file, 'w', encoding='utf-8') as f:
-                json.dump(final_result, f, ensure_ascii=False, indent=2)
+            graded_file = self.save_graded_result(final_result, f"graded_{job_key}")
             
             self.logger.info(f"阅卷完成: {graded_file.name}, 得分: {final_result['final_score']}/{final_result['total_score']}")
-            return True
+            return job_key
             
         except Exception as e:
             self.logger.error(f"阅卷失败: {e}")
-            return False
+            return None
+    
+    def save_graded_result(self, final_result: Dict, name: str) -> Path:
+        """原子写入阅卷结果文件（先写临时文件再替换），并追加到变更日志
+        
+        任务在两步都完成后才确认，中途崩溃会重新投递；变更日志按结果键去重。
+        """
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        graded_file = self.graded_dir / f"{safe_name}.json"
+        temp_file = graded_file.with_suffix('.json.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(final_result, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, graded_file)
+        self.feed.append(final_result, final_result.get("result_key") or name)
+        return graded_file
     
     def get_correct_answers(self, exam_id) -> Optional[Dict]:
         """获取考试的正确答案"""
@@ -315,7 +394,7 @@ class AutoGrader:
             self.logger.error(f"评分题目失败: {e}")
             return 0
     
-    def create_default_grading_result(self, exam_result: Dict, file_path: Path) -> bool:
+    def create_default_grading_result(self, exam_result: Dict, job_key: str) -> Optional[str]:
         """创建默认阅卷结果（当无法获取正确答案时）"""
         try:
             answers = exam_result.get('answers', {})
@@ -355,26 +434,41 @@ class AutoGrader:
                 "grading_details": [],
                 "auto_graded": True,
                 "grader": "default_grader",
-                "note": "使用默认评分规则：答题得5分，未答题得0分"
+                "note": "使用默认评分规则：答题得5分，未答题得0分",
+                "result_key": job_key
             }
             
             # 保存结果
-            graded_file = self.graded_dir / f"default_graded_{exam_result.get('exam_id')}_{exam_result.get('user_id')}_{int(time.time())}.json"
-            with open(graded_file, 'w', encoding='utf-8') as f:
-                json.dump(final_result, f, ensure_ascii=False, indent=2)
+            graded_file = self.save_graded_result(final_result, f"default_graded_{job_key}")
             
             self.logger.info(f"默认阅卷完成: {graded_file.name}")
-            return True
+            return job_key
             
         except Exception as e:
             self.logger.error(f"创建默认阅卷结果失败: {e}")
-            return False
+            return None
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="自动阅卷系统")
+    parser.add_argument("--watch", action="store_true", help="持续监听阅卷队列")
+    parser.add_argument("--workers", type=int, default=1, help="监听模式下的工作线程数")
+    parser.add_argument("--interval", type=float, default=2.0, help="队列轮询间隔（秒）")
+    parser.add_argument("--stats", action="store_true", help="仅显示队列积压情况")
+    args = parser.parse_args()
+    
     grader = AutoGrader()
     
+    if args.stats:
+        print(json.dumps(grader.queue.backlog(), ensure_ascii=False, indent=2))
+        return
+    
+    if args.watch:
+        print(f"🎯 自动阅卷监听中（{args.workers} 个工作线程），按 Ctrl+C 退出...")
+        grader.run_workers(args.workers, args.interval)
+        return
+    
     print("🎯 启动自动阅卷系统...")
     processed_count = grader.process_pending_exams()
     
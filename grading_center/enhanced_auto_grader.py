@@ -10,6 +10,8 @@
 - 模糊匹配
 - 评分规则配置
 - 质量检查
+- 参考答案预处理缓存（关键词、标准化文本、n-gram）
+- 多进程批量阅卷（工作进程预热jieba）
 """
 
 import os
@@ -18,13 +20,29 @@ import json
 import re
 import time
 import logging
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet, Iterable, Iterator
+from dataclasses import dataclass, field
 from difflib import SequenceMatcher
 import jieba
 import jieba.analyse
 
+try:
+    from rapidfuzz import fuzz as rapidfuzz_fuzz
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    rapidfuzz_fuzz = None
+    RAPIDFUZZ_AVAILABLE = False
+
+from grading_center.text_similarity import (
+    normalize_text, char_ngrams, ngram_counts, jaccard_similarity, cosine_similarity
+)
+
+# 支持的相似度算法
+SIMILARITY_METHODS = ("sequence", "ngram", "cosine", "rapidfuzz")
+
 
 @dataclass
 class GradingRule:
@@ -37,10 +55,35 @@ class GradingRule:
     case_sensitive: bool = False
     ignore_punctuation: bool = True
     keywords: List[str] = None
+    similarity_method: str = "sequence"  # sequence / ngram / cosine / rapidfuzz
+    ngram_size: int = 2
     
     def __post_init__(self):
         if self.keywords is None:
             self.keywords = []
+        if self.similarity_method not in SIMILARITY_METHODS:
+            raise ValueError(f"不支持的相似度算法: {self.similarity_method}")
+
+
+@dataclass
+class ReferenceArtifacts:
+    """参考答案预处理结果（每道题只计算一次）"""
+    normalized_text: str
+    keywords: List[str]
+    ngram_set: FrozenSet[str]
+    ngram_counts: Dict[str, int] = field(default_factory=dict)
+    ngram_norm: float = 0.0
+
+
+@dataclass
+class GradingWorkItem:
+    """批量阅卷工作项：一道题及其全部考生答案"""
+    question_id: str
+    question_type: str
+    correct_answer: Any
+    max_score: float
+    answers: List[Any]
+    rule: Optional[GradingRule] = None
 
 
 @dataclass
@@ -73,6 +116,12 @@ class EnhancedAutoGrader:
         self.load_config(config_path)
         self.setup_jieba()
         
+        # 参考答案预处理缓存: (参考答案, 标准化参数, n) -> ReferenceArtifacts
+        self.reference_cache_size = int(self.config.get("reference_cache_size", 4096))
+        self._reference_cache: Dict[Tuple, ReferenceArtifacts] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
         # 默认评分规则
         self.default_rules = {
             "single_choice": GradingRule("single_choice", exact_match_score=1.0),
@@ -105,6 +154,7 @@ class EnhancedAutoGrader:
     
     def load_config(self, config_path: str = None):
         """加载配置"""
+        self.config_path = config_path
         if config_path and Path(config_path).exists():
             try:
                 with open(config_path, 'r', encoding='utf-8') as f:
@@ -135,21 +185,51 @@ class EnhancedAutoGrader:
         """文本标准化"""
         if not text:
             return ""
+        return normalize_text(text, rule.case_sensitive, rule.ignore_punctuation)
+    
+    def get_reference_artifacts(self, correct_answer: str, rule: GradingRule) -> ReferenceArtifacts:
+        """获取参考答案的预处理结果（带缓存）"""
+        key = (correct_answer, rule.case_sensitive, rule.ignore_punctuation, rule.ngram_size)
+        artifacts = self._reference_cache.get(key)
+        if artifacts is not None:
+            self.cache_hits += 1
+            return artifacts
         
-        text = str(text).strip()
-        
-        # 移除标点符号
-        if rule.ignore_punctuation:
-            text = re.sub(r'[^\w\s]', '', text)
-        
-        # 大小写处理
-        if not rule.case_sensitive:
-            text = text.lower()
-        
-        # 移除多余空格
-        text = re.sub(r'\s+', ' ', text)
+        self.cache_misses += 1
+        normalized = self.normalize_text(correct_answer, rule)
+        counts, norm = ngram_counts(normalized, rule.ngram_size)
+        artifacts = ReferenceArtifacts(
+            normalized_text=normalized,
+            keywords=self.extract_keywords(normalized),
+            ngram_set=frozenset(counts),
+            ngram_counts=dict(counts),
+            ngram_norm=norm
+        )
         
-        return text
+        if len(self._reference_cache) >= self.reference_cache_size:
+            self._reference_cache.clear()
+        self._reference_cache[key] = artifacts
+        return artifacts
+    
+    def precompute_references(self, correct_answers: Dict,
+                              custom_rules: Dict[str, GradingRule] = None) -> int:
+        """预先计算整份试卷主观题的参考答案缓存，返回处理的题目数"""
+        count = 0
+        for question_id, correct_data in correct_answers.get("questions", {}).items():
+            question_type = correct_data.get("question_type", "essay")
+            if question_type not in ("fill_blank", "short_answer", "essay"):
+                continue
+            rule = (custom_rules or {}).get(question_id) or self.default_rules.get(
+                question_type, self.default_rules["essay"])
+            self.get_reference_artifacts(str(correct_data.get("correct_answer", "")), rule)
+            count += 1
+        return count
+    
+    def clear_reference_cache(self):
+        """清空参考答案缓存（题库答案更新后调用）"""
+        self._reference_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def extract_keywords(self, text: str, top_k: int = 10) -> List[str]:
         """提取关键词"""
@@ -163,12 +243,42 @@ class EnhancedAutoGrader:
             self.logger.warning(f"提取关键词失败: {e}")
             return []
     
-    def calculate_similarity(self, text1: str, text2: str) -> float:
-        """计算文本相似度"""
+    def calculate_similarity(self, text1: str, text2: str, method: str = "sequence",
+                             reference: ReferenceArtifacts = None, n: int = 2) -> float:
+        """计算文本相似度
+        
+        text2 为参考答案；传入 reference 时复用其预先计算的 n-gram。
+        """
         try:
-            # 使用SequenceMatcher计算相似度
-            similarity = SequenceMatcher(None, text1, text2).ratio()
-            return similarity
+            if method == "rapidfuzz":
+                if RAPIDFUZZ_AVAILABLE:
+                    return rapidfuzz_fuzz.ratio(text1, text2) / 100.0
+                # 未安装rapidfuzz时退化为同样基于编辑匹配的SequenceMatcher，阈值含义不变
+                method = "sequence"
+            
+            if method == "sequence":
+                # 使用SequenceMatcher计算相似度（长文本为平方复杂度）
+                return SequenceMatcher(None, text1, text2).ratio()
+            
+            if text1 == text2:
+                return 1.0
+            
+            student_ngrams = Counter(char_ngrams(text1, n))
+            if reference is None:
+                ref_counts, ref_norm = ngram_counts(text2, n)
+                ref_set = frozenset(ref_counts)
+            else:
+                ref_counts = reference.ngram_counts
+                ref_set = reference.ngram_set
+                ref_norm = reference.ngram_norm
+            
+            if not student_ngrams or not ref_set:
+                return 0.0
+            
+            if method == "ngram":
+                return jaccard_similarity(student_ngrams, ref_set)
+            return cosine_similarity(student_ngrams, ref_counts, ref_norm)
+            
         except Exception as e:
             self.logger.warning(f"计算相似度失败: {e}")
             return 0.0
@@ -182,12 +292,9 @@ class EnhancedAutoGrader:
         if not keywords:
             return 0.0, []
         
-        student_keywords = self.extract_keywords(student_text)
-        matched_keywords = []
-        
-        for keyword in keywords:
-            if keyword in student_keywords or keyword in student_text:
-                matched_keywords.append(keyword)
+        # jieba提取的关键词都是原文的子串，直接做子串判断即可，
+        # 无需再对学生答案做一次TF-IDF提取
+        matched_keywords = [kw for kw in keywords if kw in student_text]
         
         match_ratio = len(matched_keywords) / len(keywords) if keywords else 0
         return match_ratio, matched_keywords
@@ -264,8 +371,9 @@ class EnhancedAutoGrader:
     def grade_fill_blank(self, student_answer: str, correct_answer: str,
                         max_score: float, rule: GradingRule) -> GradingResult:
         """评分填空题"""
+        reference = self.get_reference_artifacts(correct_answer, rule)
         student_norm = self.normalize_text(student_answer, rule)
-        correct_norm = self.normalize_text(correct_answer, rule)
+        correct_norm = reference.normalized_text
         
         # 精确匹配
         if student_norm == correct_norm:
@@ -275,7 +383,10 @@ class EnhancedAutoGrader:
             method = "exact_match"
         else:
             # 相似度匹配
-            similarity = self.calculate_similarity(student_norm, correct_norm)
+            similarity = self.calculate_similarity(
+                student_norm, correct_norm, rule.similarity_method,
+                reference=reference, n=rule.ngram_size
+            )
             
             if similarity >= rule.similarity_threshold:
                 score = max_score * rule.partial_match_score
@@ -285,7 +396,7 @@ class EnhancedAutoGrader:
             else:
                 # 关键词匹配
                 keyword_score, matched_keywords = self.calculate_keyword_match_score(
-                    student_norm, correct_norm
+                    student_norm, correct_norm, reference.keywords
                 )
                 
                 if keyword_score > 0:
@@ -358,6 +469,67 @@ class EnhancedAutoGrader:
                 feedback=f"评分出错: {str(e)}", score_ratio=0
             )
     
+    def grade_work_item(self, item: GradingWorkItem) -> List[GradingResult]:
+        """评分一个工作项中的全部答案（参考答案只预处理一次）"""
+        return [
+            self.grade_question(item.question_id, answer, item.correct_answer,
+                                item.question_type, item.max_score, item.rule)
+            for answer in item.answers
+        ]
+    
+    def grade_batch(self, work_items: Iterable[GradingWorkItem], workers: int = None,
+                    chunk_size: int = None) -> Iterator[List[GradingResult]]:
+        """批量阅卷，按提交顺序逐个产出每个工作项的评分结果
+        
+        workers 为 1 时在当前进程内评分；否则使用进程池，工作进程在初始化时
+        加载一次jieba与阅卷配置。答案较多的题目会被切分成 chunk_size 大小的
+        分块分发，结果再按顺序拼接。
+        """
+        workers = workers or self.config.get("grading_workers") or os.cpu_count() or 1
+        chunk_size = chunk_size or int(self.config.get("grading_chunk_size", 256))
+        
+        if workers <= 1:
+            for item in work_items:
+                yield self.grade_work_item(item)
+            return
+        
+        # 限制在途分块数量，避免一次性把所有答案序列化进队列
+        max_pending = workers * 4
+        pending = deque()  # (future, 是否为该工作项的最后一块)
+        partial: List[GradingResult] = []
+        
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_grading_worker,
+                                 initargs=(self.config_path,)) as executor:
+            for item in work_items:
+                answers = list(item.answers)
+                chunks = [answers[i:i + chunk_size] for i in range(0, len(answers), chunk_size)] or [[]]
+                for index, chunk in enumerate(chunks):
+                    chunk_item = GradingWorkItem(item.question_id, item.question_type,
+                                                 item.correct_answer, item.max_score,
+                                                 chunk, item.rule)
+                    pending.append((executor.submit(_grade_work_chunk, chunk_item),
+                                    index == len(chunks) - 1))
+                    
+                    while len(pending) >= max_pending:
+                        done = self._collect_chunk(pending, partial)
+                        if done is not None:
+                            partial = []
+                            yield done
+            
+            while pending:
+                done = self._collect_chunk(pending, partial)
+                if done is not None:
+                    partial = []
+                    yield done
+    
+    @staticmethod
+    def _collect_chunk(pending: deque, partial: List[GradingResult]) -> Optional[List[GradingResult]]:
+        """取出最早提交的分块结果；工作项的全部分块完成时返回完整结果"""
+        future, is_last = pending.popleft()
+        partial.extend(future.result())
+        return partial if is_last else None
+    
     def grade_exam(self, student_answers: Dict, correct_answers: Dict, 
                    custom_rules: Dict[str, GradingRule] = None) -> Dict:
         """评分整个考试"""
@@ -420,6 +592,27 @@ class EnhancedAutoGrader:
             }
 
 
+# 多进程阅卷工作进程内的阅卷器实例（由初始化函数创建，进程内复用）
+_worker_grader: Optional[EnhancedAutoGrader] = None
+
+
+def _init_grading_worker(config_path: str = None):
+    """工作进程初始化：加载配置、自定义词典并预热jieba"""
+    global _worker_grader
+    _worker_grader = EnhancedAutoGrader(config_path)
+    try:
+        jieba.initialize()
+    except Exception as e:
+        _worker_grader.logger.warning(f"预热jieba失败: {e}")
+
+
+def _grade_work_chunk(item: GradingWorkItem) -> List[GradingResult]:
+    """工作进程内评分一个分块"""
+    if _worker_grader is None:
+        _init_grading_worker()
+    return _worker_grader.grade_work_item(item)
+
+
 def main():
     """主函数 - 测试增强阅卷系统"""
     grader = EnhancedAutoGrader()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+阅卷任务队列
+
+基于SQLite的持久化阅卷队列，替代原来的 queue/*.json 目录扫描：
+- 领取/租约语义：工作进程领取任务后持有租约，崩溃后租约过期自动重新投递
+- 至少一次处理：任务只有在确认（ack）后才标记为完成
+- 幂等键：同一份答卷重复入队只保留一条任务，阅卷结果按任务键写入
+- 支持多个工作进程并发领取
+- 积压指标：各状态任务数量与最早待处理任务的等待时间
+
+更新日志：
+- 2026-10-19：创建阅卷任务队列
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import socket
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Any
+
+# 导入项目模块
+sys.path.append(str(Path(__file__).parent.parent))
+from common.logger import get_logger
+
+
+DEFAULT_QUEUE_DB = Path(__file__).parent / "queue" / "grading_queue.db"
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class GradingJob:
+    """已领取的阅卷任务"""
+
+    def __init__(self, job_id: int, job_key: str, payload: Dict, attempts: int,
+                 lease_owner: str, lease_expires: float):
+        self.job_id = job_id
+        self.job_key = job_key
+        self.payload = payload
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+        self.lease_expires = lease_expires
+
+    def __repr__(self):
+        return f"GradingJob(id={self.job_id}, key={self.job_key}, attempts={self.attempts})"
+
+
+class GradingQueue:
+    """SQLite持久化阅卷队列"""
+
+    def __init__(self, db_path: str = None, lease_seconds: float = 300.0, max_attempts: int = 5):
+        self.logger = get_logger("grading_queue")
+        self.db_path = Path(db_path) if db_path else DEFAULT_QUEUE_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._init_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        """初始化队列表"""
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS grading_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                enqueued_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                result_key TEXT,
+                last_error TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_grading_jobs_status
+            ON grading_jobs (status, lease_expires, id)
+        """)
+
+    @staticmethod
+    def make_job_key(exam_result: Dict) -> str:
+        """根据答卷内容生成幂等任务键"""
+        return "{}_{}_{}".format(
+            exam_result.get("exam_id", ""),
+            exam_result.get("user_id", ""),
+            exam_result.get("submit_time", "")
+        )
+
+    @staticmethod
+    def default_worker_id() -> str:
+        """默认工作者标识：主机名-进程号-线程号"""
+        return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+    def enqueue(self, payload: Dict, job_key: str = None) -> bool:
+        """任务入队，任务键已存在时忽略（返回False）"""
+        job_key = job_key or self.make_job_key(payload)
+        now = time.time()
+        cursor = self._get_connection().execute("""
+            INSERT OR IGNORE INTO grading_jobs (job_key, payload, status, enqueued_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (job_key, json.dumps(payload, ensure_ascii=False), STATUS_PENDING, now, now))
+        return cursor.rowcount > 0
+
+    def claim(self, worker_id: str = None, limit: int = 1,
+              lease_seconds: float = None) -> List[GradingJob]:
+        """领取待处理任务（包括租约已过期的任务）
+
+        租约过期且已达到最大尝试次数的任务（工作者反复崩溃）直接标记为失败，不再投递。
+        """
+        worker_id = worker_id or self.default_worker_id()
+        lease_seconds = lease_seconds or self.lease_seconds
+        now = time.time()
+        expires = now + lease_seconds
+        conn = self._get_connection()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                UPDATE grading_jobs
+                SET status = ?, lease_owner = NULL, lease_expires = NULL,
+                    last_error = ?, updated_at = ?
+                WHERE status = ? AND lease_expires < ? AND attempts >= ?
+            """, (STATUS_FAILED, "租约过期次数达到最大尝试次数", now,
+                  STATUS_LEASED, now, self.max_attempts))
+
+            rows = conn.execute("""
+                SELECT id, job_key, payload, attempts FROM grading_jobs
+                WHERE status = ? OR (status = ? AND lease_expires < ?)
+                ORDER BY id
+                LIMIT ?
+            """, (STATUS_PENDING, STATUS_LEASED, now, limit)).fetchall()
+
+            conn.executemany("""
+                UPDATE grading_jobs
+                SET status = ?, lease_owner = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            """, [(STATUS_LEASED, worker_id, expires, now, row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [
+            GradingJob(row["id"], row["job_key"], json.loads(row["payload"]),
+                       row["attempts"] + 1, worker_id, expires)
+            for row in rows
+        ]
+
+    def extend_lease(self, job: GradingJob, lease_seconds: float = None) -> bool:
+        """延长租约，租约已被其他工作者接管时返回False"""
+        expires = time.time() + (lease_seconds or self.lease_seconds)
+        cursor = self._get_connection().execute("""
+            UPDATE grading_jobs SET lease_expires = ?, updated_at = ?
+            WHERE id = ? AND status = ? AND lease_owner = ?
+        """, (expires, time.time(), job.job_id, STATUS_LEASED, job.lease_owner))
+        if cursor.rowcount:
+            job.lease_expires = expires
+        return cursor.rowcount > 0
+
+    def ack(self, job: GradingJob, result_key: str = None) -> bool:
+        """确认任务完成，租约已被其他工作者接管时返回False"""
+        cursor = self._get_connection().execute("""
+            UPDATE grading_jobs
+            SET status = ?, result_key = ?, lease_owner = NULL, lease_expires = NULL,
+                last_error = NULL, updated_at = ?
+            WHERE id = ? AND status = ? AND lease_owner = ?
+        """, (STATUS_DONE, result_key, time.time(), job.job_id, STATUS_LEASED, job.lease_owner))
+        return cursor.rowcount > 0
+
+    def nack(self, job: GradingJob, error: str = "") -> str:
+        """任务处理失败：未超过最大尝试次数则重新排队，否则标记为失败"""
+        status = STATUS_FAILED if job.attempts >= self.max_attempts else STATUS_PENDING
+        self._get_connection().execute("""
+            UPDATE grading_jobs
+            SET status = ?, lease_owner = NULL, lease_expires = NULL,
+                last_error = ?, updated_at = ?
+            WHERE id = ? AND lease_owner = ?
+        """, (status, error[:1000], time.time(), job.job_id, job.lease_owner))
+        return status
+
+    def requeue_failed(self) -> int:
+        """将失败任务重新放回队列"""
+        cursor = self._get_connection().execute("""
+            UPDATE grading_jobs SET status = ?, attempts = 0, updated_at = ?
+            WHERE status = ?
+        """, (STATUS_PENDING, time.time(), STATUS_FAILED))
+        return cursor.rowcount
+
+    def backlog(self) -> Dict[str, Any]:
+        """队列积压指标"""
+        now = time.time()
+        conn = self._get_connection()
+        counts = {STATUS_PENDING: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        for row in conn.execute("SELECT status, COUNT(*) AS n FROM grading_jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+
+        expired = conn.execute("""
+            SELECT COUNT(*) FROM grading_jobs WHERE status = ? AND lease_expires < ?
+        """, (STATUS_LEASED, now)).fetchone()[0]
+        oldest = conn.execute("""
+            SELECT MIN(enqueued_at) FROM grading_jobs WHERE status IN (?, ?)
+        """, (STATUS_PENDING, STATUS_LEASED)).fetchone()[0]
+
+        return {
+            **counts,
+            "expired_leases": expired,
+            "backlog": counts[STATUS_PENDING] + counts[STATUS_LEASED],
+            "oldest_pending_age": round(now - oldest, 3) if oldest else 0.0
+        }
+
+    def import_directory(self, queue_dir: Path, processed_dir: Path = None) -> int:
+        """导入旧版 queue/*.json 文件，导入成功后移到 processed 目录"""
+        imported = 0
+        for file_path in sorted(Path(queue_dir).glob("*.json")):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                if self.enqueue(payload):
+                    imported += 1
+                if processed_dir:
+                    os.replace(file_path, Path(processed_dir) / file_path.name)
+                else:
+                    file_path.unlink()
+            except Exception as e:
+                self.logger.error(f"导入队列文件失败 {file_path.name}: {e}")
+
+        if imported:
+            self.logger.info(f"从目录导入 {imported} 个待阅卷任务")
+        return imported
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
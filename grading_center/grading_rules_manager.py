@@ -9,15 +9,46 @@
 - 规则验证和测试
 - 规则导入导出
 - 动态规则调整
+- 规则编译为评分函数，并对测试用例做回归基准测试
 """
 
+import re
+import math
 import json
+import time
 import logging
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
+from grading_center.text_similarity import (
+    normalize_text, ngram_counts, cosine_similarity
+)
+
+
+TOKEN_SPLIT_PATTERN = re.compile(r'[\s,，。.;；:：、!！?？()（）"“”\'‘’]+')
+
+# 关键词条件对应的最低命中比例
+KEYWORD_CONDITIONS = {
+    "all_keywords": 1.0,
+    "rich_keywords": 0.8,
+    "most_keywords": 0.6,
+    "main_keywords": 0.5,
+    "some_keywords": 0.3,
+    "basic_keywords": 0.2,
+    "few_keywords": 1e-9,
+    "keyword_match": 1e-9,
+}
+
+# 以评分标准 min_similarity 为阈值的相似度条件
+SIMILARITY_CONDITIONS = {"high_similarity", "medium_similarity",
+                         "low_similarity", "very_low_similarity"}
+
+# 总是成立的兜底条件
+FALLBACK_CONDITIONS = {"no_match", "low_confidence"}
+
 
 @dataclass
 class ScoringCriteria:
@@ -28,6 +59,7 @@ class ScoringCriteria:
     conditions: List[str]    # 满足条件
     keywords: List[str] = None
     min_similarity: float = 0.0
+    match_mode: str = "any"  # any: 任一条件成立; all: 全部条件成立
     
     def __post_init__(self):
         if self.keywords is None:
@@ -57,6 +89,163 @@ class QuestionTypeRule:
             self.updated_at = self.created_at
 
 
+class ReferenceFeatures:
+    """标准答案的预处理结果"""
+    __slots__ = ("normalized", "option_set", "ngrams", "ngram_norm", "keywords")
+    
+    def __init__(self, normalized: str, option_set: frozenset, ngrams: Counter,
+                 ngram_norm: float, keywords: Tuple[str, ...]):
+        self.normalized = normalized
+        self.option_set = option_set
+        self.ngrams = ngrams
+        self.ngram_norm = ngram_norm
+        self.keywords = keywords
+
+
+class CompiledRule:
+    """编译后的评分规则
+    
+    编译时确定每条评分标准需要的特征（精确匹配、选项集合、相似度、关键词），
+    评分时只计算用到的特征；标准答案的预处理结果按答案文本缓存。
+    """
+    
+    def __init__(self, rule: QuestionTypeRule, reference_cache_size: int = 4096):
+        self.rule = rule
+        self.question_type = rule.question_type
+        self.case_sensitive = rule.case_sensitive
+        self.ignore_punctuation = rule.ignore_punctuation
+        self.partial_credit = rule.partial_credit
+        self.default_percentage = rule.default_score
+        self.reference_cache_size = reference_cache_size
+        self._references: Dict[str, ReferenceFeatures] = {}
+        
+        self.needed_features = set()
+        self.criteria: List[Tuple[str, float, str, List[Callable[[Dict], bool]], Tuple[str, ...]]] = []
+        for criteria in rule.scoring_criteria:
+            predicates = [self._compile_condition(condition, criteria, rule)
+                          for condition in criteria.conditions]
+            percentage = criteria.score_percentage
+            if not self.partial_credit:
+                percentage = 1.0 if percentage >= 1.0 else 0.0
+            self.criteria.append((criteria.name, percentage, criteria.match_mode,
+                                  predicates, tuple(self.normalize(kw) for kw in criteria.keywords if kw)))
+    
+    def _compile_condition(self, condition: str, criteria: ScoringCriteria,
+                           rule: QuestionTypeRule) -> Callable[[Dict], bool]:
+        """把条件名编译为特征判断函数"""
+        if condition == "exact_match":
+            self.needed_features.add("exact")
+            return lambda f: f["exact"]
+        if condition == "exact_set_match":
+            self.needed_features.add("set")
+            return lambda f: f["set_exact"]
+        if condition == "partial_set_match":
+            self.needed_features.add("set")
+            return lambda f: f["set_overlap"] > 0
+        if condition in SIMILARITY_CONDITIONS:
+            self.needed_features.add("similarity")
+            threshold = criteria.min_similarity
+            return lambda f: f["similarity"] >= threshold
+        if condition == "partial_match":
+            self.needed_features.add("similarity")
+            threshold = rule.similarity_threshold
+            return lambda f: f["similarity"] >= threshold
+        if condition in KEYWORD_CONDITIONS:
+            self.needed_features.add("keywords")
+            ratio = KEYWORD_CONDITIONS[condition]
+            return lambda f: f["keyword_ratio"] >= ratio
+        if condition in FALLBACK_CONDITIONS:
+            return lambda f: True
+        raise ValueError(f"未知的评分条件: {condition}")
+    
+    def normalize(self, text: Any) -> str:
+        """文本标准化"""
+        if text is None:
+            return ""
+        if isinstance(text, (list, tuple, set)):
+            text = "".join(str(x) for x in text)
+        return normalize_text(text, self.case_sensitive, self.ignore_punctuation)
+    
+    @staticmethod
+    def option_set(answer: Any) -> frozenset:
+        """选择题答案转为选项集合"""
+        if isinstance(answer, (list, tuple, set)):
+            return frozenset(str(x).strip().upper() for x in answer if str(x).strip())
+        return frozenset(ch for ch in str(answer or "").upper() if ch.isalnum())
+    
+    def reference(self, correct_answer: Any) -> ReferenceFeatures:
+        """标准答案预处理（带缓存）"""
+        key = correct_answer if isinstance(correct_answer, str) else json.dumps(correct_answer, ensure_ascii=False)
+        features = self._references.get(key)
+        if features is None:
+            normalized = self.normalize(correct_answer)
+            grams, norm = ngram_counts(normalized)
+            keywords = tuple(t for t in TOKEN_SPLIT_PATTERN.split(self.normalize_keep_punctuation(correct_answer)) if len(t) >= 2)
+            features = ReferenceFeatures(
+                normalized, self.option_set(correct_answer), grams, norm, keywords
+            )
+            if len(self._references) >= self.reference_cache_size:
+                self._references.clear()
+            self._references[key] = features
+        return features
+    
+    def normalize_keep_punctuation(self, text: Any) -> str:
+        """保留标点的标准化（用于切分关键词）"""
+        text = "" if text is None else str(text).strip()
+        return text if self.case_sensitive else text.lower()
+    
+    def compute_features(self, student_answer: Any, reference: ReferenceFeatures,
+                         keywords: Tuple[str, ...]) -> Dict[str, Any]:
+        """计算评分需要的特征"""
+        features: Dict[str, Any] = {}
+        needed = self.needed_features
+        normalized = None
+        
+        if "exact" in needed or "similarity" in needed or "keywords" in needed:
+            normalized = self.normalize(student_answer)
+        if "exact" in needed:
+            features["exact"] = normalized == reference.normalized
+        if "set" in needed:
+            student_set = self.option_set(student_answer)
+            features["set_exact"] = student_set == reference.option_set
+            features["set_overlap"] = len(student_set & reference.option_set)
+        if "similarity" in needed:
+            if normalized == reference.normalized:
+                similarity = 1.0
+            else:
+                grams, _ = ngram_counts(normalized)
+                similarity = cosine_similarity(grams, reference.ngrams, reference.ngram_norm)
+            features["similarity"] = similarity
+        if "keywords" in needed:
+            keywords = keywords or reference.keywords
+            if keywords:
+                matched = sum(1 for kw in keywords if kw in normalized)
+                features["keyword_ratio"] = matched / len(keywords)
+            else:
+                features["keyword_ratio"] = 0.0
+        return features
+    
+    def __call__(self, student_answer: Any, correct_answer: Any,
+                 max_score: float = 1.0) -> Tuple[float, str]:
+        """评分，返回(得分, 命中的评分标准名称)"""
+        reference = self.reference(correct_answer)
+        features_by_keywords: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        
+        for name, percentage, match_mode, predicates, keywords in self.criteria:
+            features = features_by_keywords.get(keywords)
+            if features is None:
+                features = features_by_keywords[keywords] = self.compute_features(
+                    student_answer, reference, keywords)
+            if match_mode == "all":
+                matched = all(predicate(features) for predicate in predicates)
+            else:
+                matched = any(predicate(features) for predicate in predicates)
+            if matched:
+                return max_score * percentage, name
+        
+        return max_score * self.default_percentage, ""
+
+
 class GradingRulesManager:
     """评分规则管理器"""
     
@@ -66,6 +255,7 @@ class GradingRulesManager:
         
         self.setup_logging()
         self.rules: Dict[str, QuestionTypeRule] = {}
+        self._compiled: Dict[str, CompiledRule] = {}
         self.load_default_rules()
         self.load_custom_rules()
     
@@ -177,28 +367,32 @@ class GradingRulesManager:
                     description="答案完整准确，包含所有要点",
                     score_percentage=1.0,
                     conditions=["high_similarity", "all_keywords"],
-                    min_similarity=0.8
+                    min_similarity=0.8,
+                    match_mode="all"
                 ),
                 ScoringCriteria(
                     name="良好",
                     description="答案基本正确，包含主要要点",
                     score_percentage=0.8,
                     conditions=["medium_similarity", "most_keywords"],
-                    min_similarity=0.6
+                    min_similarity=0.6,
+                    match_mode="all"
                 ),
                 ScoringCriteria(
                     name="及格",
                     description="答案部分正确，包含部分要点",
                     score_percentage=0.6,
                     conditions=["low_similarity", "some_keywords"],
-                    min_similarity=0.4
+                    min_similarity=0.4,
+                    match_mode="all"
                 ),
                 ScoringCriteria(
                     name="不及格",
                     description="答案基本错误或空白",
                     score_percentage=0.2,
                     conditions=["very_low_similarity", "few_keywords"],
-                    min_similarity=0.2
+                    min_similarity=0.2,
+                    match_mode="all"
                 )
             ],
             similarity_threshold=0.6,
@@ -217,14 +411,16 @@ class GradingRulesManager:
                     description="包含丰富关键词和高相似度",
                     score_percentage=0.9,
                     conditions=["high_similarity", "rich_keywords"],
-                    min_similarity=0.7
+                    min_similarity=0.7,
+                    match_mode="all"
                 ),
                 ScoringCriteria(
                     name="自动初评-良好",
                     description="包含主要关键词",
                     score_percentage=0.7,
                     conditions=["medium_similarity", "main_keywords"],
-                    min_similarity=0.5
+                    min_similarity=0.5,
+                    match_mode="all"
                 ),
                 ScoringCriteria(
                     name="自动初评-及格",
@@ -270,6 +466,7 @@ class GradingRulesManager:
                 rule = QuestionTypeRule(**rule_data)
                 
                 self.rules[rule.question_type] = rule
+                self._compiled.pop(rule.question_type, None)
                 self.logger.info(f"加载自定义规则: {rule.name}")
                 
         except Exception as e:
@@ -288,6 +485,7 @@ class GradingRulesManager:
                 json.dump(rule_dict, f, indent=2, ensure_ascii=False)
             
             self.rules[rule.question_type] = rule
+            self._compiled.pop(rule.question_type, None)
             self.logger.info(f"保存规则: {rule.name}")
             
         except Exception as e:
@@ -339,6 +537,7 @@ class GradingRulesManager:
                 rule_file.unlink()
             
             del self.rules[question_type]
+            self._compiled.pop(question_type, None)
             self.logger.info(f"删除规则: {question_type}")
     
     def export_rules(self, export_path: str):
@@ -412,33 +611,150 @@ class GradingRulesManager:
         
         return errors
     
-    def test_rule(self, question_type: str, test_cases: List[Dict]) -> Dict:
-        """测试规则"""
+    def compile_rule(self, question_type: str) -> Optional[CompiledRule]:
+        """获取编译后的规则（规则修改后自动重新编译）"""
+        compiled = self._compiled.get(question_type)
+        if compiled is None:
+            rule = self.get_rule(question_type)
+            if not rule:
+                return None
+            compiled = self._compiled[question_type] = CompiledRule(rule)
+        return compiled
+    
+    def evaluate(self, question_type: str, student_answer: Any, correct_answer: Any,
+                 max_score: float = 1.0) -> Tuple[float, str]:
+        """使用编译后的规则评分，返回(得分, 命中的评分标准名称)"""
+        compiled = self.compile_rule(question_type)
+        if compiled is None:
+            raise ValueError(f"规则不存在: {question_type}")
+        return compiled(student_answer, correct_answer, max_score)
+    
+    def test_rule(self, question_type: str, test_cases: List[Dict],
+                  iterations: int = 1, tolerance: float = 0.01,
+                  baseline: Dict = None) -> Dict:
+        """测试规则
+        
+        用编译后的评分函数批量运行测试用例，统计通过率、吞吐量和单次评分
+        延迟分位数。传入上一次的测试结果作为 baseline 时给出回归对比。
+        """
         rule = self.get_rule(question_type)
         if not rule:
             return {"error": f"规则不存在: {question_type}"}
         
+        compile_start = time.perf_counter()
+        try:
+            self._compiled.pop(question_type, None)
+            compiled = self.compile_rule(question_type)
+        except ValueError as e:
+            return {"error": f"规则编译失败: {e}"}
+        compile_time = time.perf_counter() - compile_start
+        
         results = []
-        for test_case in test_cases:
-            student_answer = test_case.get("student_answer", "")
-            correct_answer = test_case.get("correct_answer", "")
-            expected_score = test_case.get("expected_score", 0)
-            
-            # 这里需要调用实际的评分逻辑
-            # 简化示例
-            result = {
-                "student_answer": student_answer,
-                "correct_answer": correct_answer,
-                "expected_score": expected_score,
-                "actual_score": 0,  # 需要实际计算
-                "passed": False
-            }
-            results.append(result)
+        latencies = []
+        batch_start = time.perf_counter()
+        for iteration in range(max(1, iterations)):
+            for test_case in test_cases:
+                student_answer = test_case.get("student_answer", "")
+                correct_answer = test_case.get("correct_answer", "")
+                max_score = float(test_case.get("max_score", 1.0))
+                
+                start = time.perf_counter()
+                actual_score, criteria_name = compiled(student_answer, correct_answer, max_score)
+                latencies.append(time.perf_counter() - start)
+                
+                if iteration == 0:
+                    expected_score = test_case.get("expected_score", 0)
+                    results.append({
+                        "student_answer": student_answer,
+                        "correct_answer": correct_answer,
+                        "expected_score": expected_score,
+                        "actual_score": round(actual_score, 4),
+                        "matched_criteria": criteria_name,
+                        "passed": abs(actual_score - expected_score) <= tolerance
+                    })
+        elapsed = time.perf_counter() - batch_start
         
-        return {
+        benchmark = self.summarize_latencies(latencies, elapsed)
+        benchmark["compile_time_ms"] = round(compile_time * 1000, 3)
+        
+        report = {
             "rule_name": rule.name,
+            "question_type": question_type,
             "test_results": results,
-            "pass_rate": sum(1 for r in results if r["passed"]) / len(results) if results else 0
+            "pass_rate": sum(1 for r in results if r["passed"]) / len(results) if results else 0,
+            "benchmark": benchmark
+        }
+        if baseline:
+            report["regression"] = self.compare_benchmarks(report, baseline)
+        return report
+    
+    def save_benchmark(self, report: Dict) -> Path:
+        """保存测试结果作为后续回归对比的基准"""
+        benchmark_dir = self.rules_dir / "benchmarks"
+        benchmark_dir.mkdir(parents=True, exist_ok=True)
+        benchmark_file = benchmark_dir / f"{report['question_type']}.json"
+        with open(benchmark_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return benchmark_file
+    
+    def load_benchmark(self, question_type: str) -> Optional[Dict]:
+        """加载已保存的基准测试结果"""
+        benchmark_file = self.rules_dir / "benchmarks" / f"{question_type}.json"
+        if not benchmark_file.exists():
+            return None
+        with open(benchmark_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def summarize_latencies(latencies: List[float], elapsed: float) -> Dict:
+        """计算吞吐量与延迟分位数（微秒）"""
+        if not latencies:
+            return {"evaluations": 0, "throughput_per_sec": 0,
+                    "p50_us": 0, "p95_us": 0, "p99_us": 0, "max_us": 0}
+        
+        ordered = sorted(latencies)
+        
+        def percentile(q: float) -> float:
+            index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+            return round(ordered[index] * 1e6, 2)
+        
+        return {
+            "evaluations": len(ordered),
+            "throughput_per_sec": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0,
+            "p50_us": percentile(0.50),
+            "p95_us": percentile(0.95),
+            "p99_us": percentile(0.99),
+            "max_us": round(ordered[-1] * 1e6, 2)
+        }
+    
+    @staticmethod
+    def compare_benchmarks(current: Dict, baseline: Dict, max_slowdown: float = 0.2) -> Dict:
+        """与基准测试结果对比，判断是否出现评分或性能回归"""
+        current_bench = current.get("benchmark", {})
+        baseline_bench = baseline.get("benchmark", {})
+        
+        baseline_p99 = baseline_bench.get("p99_us") or 0
+        current_p99 = current_bench.get("p99_us") or 0
+        slowdown = (current_p99 - baseline_p99) / baseline_p99 if baseline_p99 else 0.0
+        
+        baseline_scores = {(json.dumps(r["student_answer"], ensure_ascii=False),
+                            json.dumps(r["correct_answer"], ensure_ascii=False)): r["actual_score"]
+                           for r in baseline.get("test_results", [])}
+        changed = [
+            r for r in current.get("test_results", [])
+            if baseline_scores.get((json.dumps(r["student_answer"], ensure_ascii=False),
+                                    json.dumps(r["correct_answer"], ensure_ascii=False)),
+                                   r["actual_score"]) != r["actual_score"]
+        ]
+        
+        pass_rate_drop = baseline.get("pass_rate", 0) - current.get("pass_rate", 0)
+        return {
+            "p99_slowdown": round(slowdown, 4),
+            "performance_regression": slowdown > max_slowdown,
+            "pass_rate_drop": round(pass_rate_drop, 4),
+            "changed_scores": len(changed),
+            "score_regression": pass_rate_drop > 0,
+            "passed": slowdown <= max_slowdown and pass_rate_drop <= 0
         }
 
 
@@ -489,6 +805,16 @@ def main():
         else:
             print("✅ 规则验证通过")
         
+        # 规则回归测试
+        report = manager.test_rule("fill_blank", [
+            {"student_answer": "Python", "correct_answer": "python", "expected_score": 1.0},
+            {"student_answer": "Pythom", "correct_answer": "python", "expected_score": 0.5},
+            {"student_answer": "Java", "correct_answer": "python", "expected_score": 0.0},
+        ], iterations=1000)
+        bench = report["benchmark"]
+        print(f"✅ 填空题规则测试通过率: {report['pass_rate']:.0%}, "
+              f"吞吐量: {bench['throughput_per_sec']}/秒, p99: {bench['p99_us']}微秒")
+        
     except Exception as e:
         print(f"❌ 创建自定义规则失败: {e}")
 
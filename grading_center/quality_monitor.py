@@ -9,17 +9,31 @@
 - 评分员表现分析
 - 质量报告生成
 - 实时监控预警
+
+评分记录以追加方式写入 grading_records.jsonl，按题目、评分员、考试维护
+Welford均值/方差和分位数草图，每条记录O(1)更新；质量报告直接由统计量
+生成，无需重新加载全部记录。按时间窗口、按考试的评分员分析使用
+列式记录存储（record_store）做向量化分组统计。
 """
 
+import os
+import sys
 import json
 import logging
 import statistics
+from collections import OrderedDict, deque
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import numpy as np
 
+sys.path.append(str(Path(__file__).parent.parent))
+from grading_center.streaming_stats import RunningStats, ScopeStats
+from grading_center.record_store import GradingRecordStore
+
+KEY_SEPARATOR = "\x1f"
+
 
 @dataclass
 class GradingRecord:
@@ -79,9 +93,35 @@ class QualityMonitor:
         self.data_dir.mkdir(exist_ok=True)
         
         self.setup_logging()
-        self.grading_records: List[GradingRecord] = []
         self.quality_thresholds = self.load_quality_thresholds()
         
+        self.records_file = self.data_dir / "grading_records.jsonl"
+        self.stats_file = self.data_dir / "quality_stats.json"
+        self.snapshot_interval = int(self.quality_thresholds.get("snapshot_interval", 1000))
+        self.min_anomaly_samples = int(self.quality_thresholds.get("min_anomaly_samples", 10))
+        
+        # 流式统计量
+        self.exam_stats: Dict[str, ScopeStats] = {}
+        self.question_stats: Dict[Tuple[str, str], ScopeStats] = {}
+        self.grader_stats: Dict[str, ScopeStats] = {}
+        self.exam_grader_stats: Dict[Tuple[str, str], ScopeStats] = {}
+        # 同一答卷多评的统计只在考试阅卷期间需要：按考试分组，
+        # 只保留最近活跃的若干场考试，阅卷结束（finish_exam）或被挤出后释放
+        self.answer_stats: "OrderedDict[str, Dict[Tuple[str, str], RunningStats]]" = OrderedDict()
+        self.answer_stats_max_exams = int(self.quality_thresholds.get("answer_stats_max_exams", 20))
+        self.grader_consistency: Dict[str, RunningStats] = {}
+        self.total_records = 0
+        
+        # 最近的记录和异常（仅用于展示）
+        self.recent_records: deque = deque(maxlen=int(self.quality_thresholds.get("recent_records", 1000)))
+        self.recent_anomalies: deque = deque(maxlen=100)
+        
+        # 列式记录存储（按考试分区）
+        self.record_store = GradingRecordStore(str(self.data_dir / "records"))
+        
+        self._records_handle = None
+        self._unsaved_records = 0
+        
         # 加载历史数据
         self.load_grading_records()
     
@@ -112,6 +152,7 @@ class QualityMonitor:
             "anomaly_threshold": 0.05,         # 异常比例阈值
             "min_grading_time": 30,            # 最小评分时间(秒)
             "max_grading_time": 1800,          # 最大评分时间(秒)
+            "answer_stats_max_exams": 20,      # 保留答卷级一致性统计的考试数
         }
         
         threshold_file = self.data_dir / "quality_thresholds.json"
@@ -126,42 +167,213 @@ class QualityMonitor:
         return default_thresholds
     
     def load_grading_records(self):
-        """加载评分记录"""
+        """加载统计快照，并重放快照之后追加的评分记录"""
         try:
-            records_file = self.data_dir / "grading_records.json"
-            if records_file.exists():
-                with open(records_file, 'r', encoding='utf-8') as f:
-                    records_data = json.load(f)
-                
-                self.grading_records = [
-                    GradingRecord(**record) for record in records_data
-                ]
-                
-                self.logger.info(f"加载评分记录: {len(self.grading_records)} 条")
+            log_offset = 0
+            if self.stats_file.exists():
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self.restore_snapshot(snapshot)
+                log_offset = snapshot.get("log_offset", 0)
+            
+            # 兼容旧版：整体JSON格式的评分记录迁移到追加日志
+            legacy_file = self.data_dir / "grading_records.json"
+            if legacy_file.exists() and not self.records_file.exists():
+                self.migrate_legacy_records(legacy_file)
+                return
+            
+            # 统计快照与列式存储各自记录了已处理的日志位置，分别补齐
+            store_offset = self.record_store.log_offset
+            position = min(log_offset, store_offset)
+            replayed = 0
+            if self.records_file.exists():
+                with open(self.records_file, 'rb') as f:
+                    f.seek(position)
+                    for line in f:
+                        line_start = position
+                        position += len(line)
+                        if not line.strip():
+                            continue
+                        record = GradingRecord(**json.loads(line))
+                        if line_start >= log_offset:
+                            self.ingest_record(record)
+                            replayed += 1
+                        if line_start >= store_offset:
+                            self.record_store.append(record)
+            
+            self._unsaved_records = replayed
+            self.logger.info(f"加载评分统计: {self.total_records} 条记录（重放 {replayed} 条）")
         except Exception as e:
             self.logger.error(f"加载评分记录失败: {e}")
     
+    def migrate_legacy_records(self, legacy_file: Path):
+        """把旧版 grading_records.json 转为追加日志"""
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            records_data = json.load(f)
+        
+        for record_data in records_data:
+            record = GradingRecord(**record_data)
+            self.append_record(record)
+            self.ingest_record(record)
+            self.record_store.append(record)
+        
+        self.save_grading_records()
+        os.replace(legacy_file, legacy_file.with_suffix('.json.migrated'))
+        self.logger.info(f"迁移旧版评分记录: {len(records_data)} 条")
+    
+    def append_record(self, record: GradingRecord):
+        """追加写入一条评分记录"""
+        if self._records_handle is None:
+            self._records_handle = open(self.records_file, 'a', encoding='utf-8')
+        self._records_handle.write(json.dumps(record.__dict__, ensure_ascii=False) + "\n")
+        self._records_handle.flush()
+    
     def save_grading_records(self):
-        """保存评分记录"""
+        """保存统计快照（评分记录本身已追加写入日志）"""
         try:
-            records_file = self.data_dir / "grading_records.json"
-            records_data = [asdict(record) for record in self.grading_records]
+            if self._records_handle is not None:
+                self._records_handle.flush()
+                os.fsync(self._records_handle.fileno())
+            
+            log_offset = self.records_file.stat().st_size if self.records_file.exists() else 0
+            self.record_store.save(log_offset)
             
-            with open(records_file, 'w', encoding='utf-8') as f:
-                json.dump(records_data, f, indent=2, ensure_ascii=False)
+            snapshot = self.build_snapshot()
+            snapshot["log_offset"] = log_offset
+            
+            temp_file = self.stats_file.with_suffix('.json.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False))
+            os.replace(temp_file, self.stats_file)
+            self._unsaved_records = 0
                 
         except Exception as e:
             self.logger.error(f"保存评分记录失败: {e}")
     
+    def close(self):
+        """保存快照并关闭记录日志"""
+        self.save_grading_records()
+        if self._records_handle is not None:
+            self._records_handle.close()
+            self._records_handle = None
+    
+    @staticmethod
+    def _join_key(key) -> str:
+        return KEY_SEPARATOR.join(key) if isinstance(key, tuple) else key
+    
+    @staticmethod
+    def _split_key(key: str):
+        parts = key.split(KEY_SEPARATOR)
+        return tuple(parts) if len(parts) > 1 else key
+    
+    def build_snapshot(self) -> Dict:
+        """序列化全部流式统计量"""
+        def dump(mapping):
+            return {self._join_key(k): v.to_dict() for k, v in mapping.items()}
+        
+        return {
+            "version": 2,
+            "total_records": self.total_records,
+            "exam_stats": dump(self.exam_stats),
+            "question_stats": dump(self.question_stats),
+            "grader_stats": dump(self.grader_stats),
+            "exam_grader_stats": dump(self.exam_grader_stats),
+            "answer_stats": {exam_id: dump(answers) for exam_id, answers in self.answer_stats.items()},
+            "grader_consistency": dump(self.grader_consistency),
+            "recent_anomalies": [asdict(r) for r in self.recent_anomalies]
+        }
+    
+    def restore_snapshot(self, snapshot: Dict):
+        """从快照恢复流式统计量"""
+        def load(name, cls):
+            return {self._split_key(k): cls.from_dict(v) for k, v in snapshot.get(name, {}).items()}
+        
+        self.total_records = snapshot.get("total_records", 0)
+        self.exam_stats = load("exam_stats", ScopeStats)
+        self.question_stats = load("question_stats", ScopeStats)
+        self.grader_stats = load("grader_stats", ScopeStats)
+        self.exam_grader_stats = load("exam_grader_stats", ScopeStats)
+        # 版本1的答卷统计不含考试ID，无法按考试释放，直接丢弃
+        self.answer_stats = OrderedDict()
+        if snapshot.get("version", 1) >= 2:
+            for exam_id, answers in snapshot.get("answer_stats", {}).items():
+                self.answer_stats[exam_id] = {self._split_key(k): RunningStats.from_dict(v)
+                                              for k, v in answers.items()}
+        self.grader_consistency = load("grader_consistency", RunningStats)
+        self.recent_anomalies.extend(GradingRecord(**r) for r in snapshot.get("recent_anomalies", []))
+    
+    @staticmethod
+    def _get_scope(mapping: Dict, key) -> ScopeStats:
+        scope = mapping.get(key)
+        if scope is None:
+            scope = mapping[key] = ScopeStats()
+        return scope
+    
+    def ingest_record(self, record: GradingRecord) -> bool:
+        """把一条评分记录计入流式统计量，返回是否为异常评分"""
+        ratio = record.score_ratio
+        exam_scope = self._get_scope(self.exam_stats, record.exam_id)
+        
+        # 以考试当前分布的IQR界限判定异常（样本足够时）；
+        # 界限每新增约1%的样本刷新一次
+        is_anomaly = False
+        count = exam_scope.scores.count
+        if count >= self.min_anomaly_samples:
+            lower_bound, upper_bound = exam_scope.sketch.iqr_bounds(refresh_every=max(1, count // 100))
+            is_anomaly = ratio < lower_bound or ratio > upper_bound
+        
+        scopes = (
+            exam_scope,
+            self._get_scope(self.question_stats, (record.exam_id, record.question_id)),
+            self._get_scope(self.grader_stats, record.grader_id),
+            self._get_scope(self.exam_grader_stats, (record.exam_id, record.grader_id)),
+        )
+        for scope in scopes:
+            scope.update(ratio, record.grading_time)
+            if is_anomaly:
+                scope.anomalies += 1
+        
+        # 同一答卷多评的一致性，计入本次评分员
+        exam_answers = self.answer_stats.get(record.exam_id)
+        if exam_answers is None:
+            exam_answers = self.answer_stats[record.exam_id] = {}
+            while len(self.answer_stats) > self.answer_stats_max_exams:
+                self.answer_stats.popitem(last=False)
+        else:
+            self.answer_stats.move_to_end(record.exam_id)
+        answer_key = (record.question_id, record.student_id)
+        answer = exam_answers.get(answer_key)
+        if answer is None:
+            answer = exam_answers[answer_key] = RunningStats()
+        answer.update(ratio)
+        if answer.count > 1:
+            consistency = self.grader_consistency.get(record.grader_id)
+            if consistency is None:
+                consistency = self.grader_consistency[record.grader_id] = RunningStats()
+            consistency.update(self.consistency_from_variance(answer.variance))
+        
+        self.total_records += 1
+        self.recent_records.append(record)
+        if is_anomaly:
+            self.recent_anomalies.append(record)
+        return is_anomaly
+    
+    def finish_exam(self, exam_id: str):
+        """考试阅卷结束，释放该考试的答卷级统计（考试、评分员等汇总统计保留）"""
+        self.answer_stats.pop(exam_id, None)
+    
     def add_grading_record(self, record: GradingRecord):
         """添加评分记录"""
-        self.grading_records.append(record)
+        self.append_record(record)
+        self.ingest_record(record)
+        self.record_store.append(record)
         
         # 实时质量检查
         self.check_real_time_quality(record)
         
-        # 定期保存
-        if len(self.grading_records) % 100 == 0:
+        # 定期保存统计快照
+        self._unsaved_records += 1
+        if self._unsaved_records >= self.snapshot_interval:
             self.save_grading_records()
     
     def check_real_time_quality(self, record: GradingRecord):
@@ -209,7 +421,10 @@ class QualityMonitor:
         score_ratios = [record.score_ratio for record in question_records]
         variance = statistics.variance(score_ratios) if len(score_ratios) > 1 else 0
         
-        # 转换为一致性分数 (方差越小，一致性越高)
+        return self.consistency_from_variance(variance)
+    
+    def consistency_from_variance(self, variance: float) -> float:
+        """方差转换为一致性分数 (方差越小，一致性越高)"""
         consistency = max(0, 1 - variance / self.quality_thresholds["score_variance_threshold"])
         return min(1.0, consistency)
     
@@ -236,17 +451,18 @@ class QualityMonitor:
         return anomalies
     
     def analyze_grader_performance(self, grader_id: str, 
-                                 time_period: int = 30) -> GraderPerformance:
-        """分析评分员表现"""
-        # 获取指定时间段内的评分记录
-        cutoff_date = datetime.now() - timedelta(days=time_period)
+                                 time_period: Optional[int] = None) -> GraderPerformance:
+        """分析评分员表现
         
-        grader_records = [
-            record for record in self.grading_records
-            if record.grader_id == grader_id
-        ]
+        不指定 time_period 时使用全量流式统计量；指定天数时从列式存储中
+        按时间窗口筛选后计算。
+        """
+        if time_period is not None:
+            return self.analyze_grader_performance_window(grader_id, time_period)
         
-        if not grader_records:
+        grader_scope = self.grader_stats.get(grader_id)
+        
+        if not grader_scope or grader_scope.scores.count == 0:
             return GraderPerformance(
                 grader_id=grader_id,
                 grader_name=f"评分员_{grader_id}",
@@ -260,23 +476,13 @@ class QualityMonitor:
                 last_active=""
             )
         
-        # 计算基本统计
-        scores = [record.score_ratio for record in grader_records]
-        average_score = statistics.mean(scores)
-        score_variance = statistics.variance(scores) if len(scores) > 1 else 0
-        
-        # 计算一致性
-        consistency_scores = []
-        for record in grader_records:
-            same_question_records = [
-                r for r in self.grading_records
-                if r.question_id == record.question_id and r.student_id == record.student_id
-            ]
-            if len(same_question_records) > 1:
-                consistency = self.calculate_consistency_score(same_question_records)
-                consistency_scores.append(consistency)
+        # 基本统计
+        average_score = grader_scope.scores.mean
+        score_variance = grader_scope.scores.variance
         
-        consistency_with_others = statistics.mean(consistency_scores) if consistency_scores else 1.0
+        # 一致性
+        consistency_stats = self.grader_consistency.get(grader_id)
+        consistency_with_others = consistency_stats.mean if consistency_stats and consistency_stats.count else 1.0
         
         # 计算质量指标
         quality_metrics = QualityMetrics(
@@ -285,7 +491,8 @@ class QualityMonitor:
             efficiency_score=0.8,  # 简化计算
             accuracy_score=0.9,    # 需要与标准答案比较
             overall_score=0.0,
-            total_records=len(grader_records),
+            anomaly_count=grader_scope.anomalies,
+            total_records=grader_scope.scores.count,
             score_variance=score_variance
         )
         
@@ -299,56 +506,116 @@ class QualityMonitor:
         return GraderPerformance(
             grader_id=grader_id,
             grader_name=f"评分员_{grader_id}",
-            total_graded=len(grader_records),
+            total_graded=grader_scope.scores.count,
             average_score=average_score,
             score_variance=score_variance,
             average_time=0,  # 需要计算实际时间
             consistency_with_others=consistency_with_others,
             accuracy_rate=0.9,  # 简化
             quality_metrics=quality_metrics,
-            last_active=grader_records[-1].grading_time if grader_records else ""
+            last_active=grader_scope.last_active
+        )
+    
+    def analyze_grader_performance_window(self, grader_id: str, time_period: int) -> GraderPerformance:
+        """分析评分员最近 time_period 天的表现（列式存储向量化计算）"""
+        since = (datetime.now() - timedelta(days=time_period)).timestamp()
+        summary = self.record_store.grader_summary(since=since).get(grader_id)
+        
+        if not summary:
+            return GraderPerformance(
+                grader_id=grader_id,
+                grader_name=f"评分员_{grader_id}",
+                total_graded=0,
+                average_score=0,
+                score_variance=0,
+                average_time=0,
+                consistency_with_others=0,
+                accuracy_rate=0,
+                quality_metrics=QualityMetrics(0, 0, 0, 0, 0),
+                last_active=""
+            )
+        
+        consistency_stats = self.grader_consistency.get(grader_id)
+        consistency_with_others = consistency_stats.mean if consistency_stats and consistency_stats.count else 1.0
+        score_variance = summary["score_variance"]
+        
+        quality_metrics = QualityMetrics(
+            consistency_score=consistency_with_others,
+            reliability_score=min(1.0, 1 - score_variance),
+            efficiency_score=0.8,  # 简化计算
+            accuracy_score=0.9,    # 需要与标准答案比较
+            overall_score=0.0,
+            anomaly_count=summary["anomaly_count"],
+            total_records=summary["total_graded"],
+            score_variance=score_variance
+        )
+        quality_metrics.overall_score = (
+            quality_metrics.consistency_score * 0.3 +
+            quality_metrics.reliability_score * 0.3 +
+            quality_metrics.efficiency_score * 0.2 +
+            quality_metrics.accuracy_score * 0.2
+        )
+        
+        return GraderPerformance(
+            grader_id=grader_id,
+            grader_name=f"评分员_{grader_id}",
+            total_graded=summary["total_graded"],
+            average_score=summary["average_score"],
+            score_variance=score_variance,
+            average_time=0,  # 需要计算实际时间
+            consistency_with_others=consistency_with_others,
+            accuracy_rate=0.9,  # 简化
+            quality_metrics=quality_metrics,
+            last_active=summary["last_active"]
         )
     
     def generate_quality_report(self, exam_id: str = None) -> Dict:
-        """生成质量报告"""
-        # 筛选记录
+        """生成质量报告（基于流式统计量，不重新加载评分记录）"""
+        # 筛选统计维度
         if exam_id:
-            records = [r for r in self.grading_records if r.exam_id == exam_id]
+            exam_scope = self.exam_stats.get(exam_id)
+            overall = exam_scope.scores if exam_scope else RunningStats()
+            anomaly_count = exam_scope.anomalies if exam_scope else 0
+            graders = {g for (e, g) in self.exam_grader_stats if e == exam_id}
+            question_scopes = {q: scope.scores for (e, q), scope in self.question_stats.items() if e == exam_id}
         else:
-            records = self.grading_records
-        
-        if not records:
+            overall = RunningStats()
+            anomaly_count = 0
+            for scope in self.exam_stats.values():
+                overall.merge(scope.scores)
+                anomaly_count += scope.anomalies
+            graders = set(self.grader_stats)
+            question_scopes = {}
+            for (_, question_id), scope in self.question_stats.items():
+                question_scopes.setdefault(question_id, RunningStats()).merge(scope.scores)
+        
+        if overall.count == 0:
             return {"error": "没有找到评分记录"}
         
         # 总体统计
-        total_records = len(records)
-        unique_graders = len(set(record.grader_id for record in records))
-        unique_questions = len(set(record.question_id for record in records))
-        
-        # 检测异常
-        anomalies = self.detect_anomalies(records)
-        anomaly_rate = len(anomalies) / total_records if total_records > 0 else 0
-        
-        # 计算总体质量指标
-        all_scores = [record.score_ratio for record in records]
-        overall_variance = statistics.variance(all_scores) if len(all_scores) > 1 else 0
+        total_records = overall.count
+        unique_graders = len(graders)
+        unique_questions = len(question_scopes)
+        anomaly_rate = anomaly_count / total_records if total_records > 0 else 0
+        overall_variance = overall.variance
         
         # 按题目分析一致性
-        question_consistency = {}
-        for question_id in set(record.question_id for record in records):
-            question_records = [r for r in records if r.question_id == question_id]
-            if len(question_records) > 1:
-                consistency = self.calculate_consistency_score(question_records)
-                question_consistency[question_id] = consistency
+        question_consistency = {
+            question_id: self.consistency_from_variance(stats.variance)
+            for question_id, stats in question_scopes.items()
+            if stats.count > 1
+        }
         
         average_consistency = statistics.mean(question_consistency.values()) if question_consistency else 1.0
         
         # 评分员表现分析
         grader_performances = {}
-        for grader_id in set(record.grader_id for record in records):
+        for grader_id in graders:
             performance = self.analyze_grader_performance(grader_id)
             grader_performances[grader_id] = asdict(performance)
         
+        anomalies = [r for r in self.recent_anomalies if not exam_id or r.exam_id == exam_id]
+        
         # 生成报告
         report = {
             "report_id": f"quality_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
@@ -358,7 +625,7 @@ class QualityMonitor:
                 "total_records": total_records,
                 "unique_graders": unique_graders,
                 "unique_questions": unique_questions,
-                "anomaly_count": len(anomalies),
+                "anomaly_count": anomaly_count,
                 "anomaly_rate": anomaly_rate,
                 "overall_variance": overall_variance,
                 "average_consistency": average_consistency
@@ -371,7 +638,8 @@ class QualityMonitor:
             },
             "question_analysis": question_consistency,
             "grader_performances": grader_performances,
-            "anomalies": [asdict(anomaly) for anomaly in anomalies[:10]],  # 只显示前10个异常
+            "grader_exam_summary": self.record_store.grader_summary(exam_id),
+            "anomalies": [asdict(anomaly) for anomaly in anomalies[-10:]],  # 只显示最近10个异常
             "recommendations": self.generate_recommendations(
                 average_consistency, overall_variance, anomaly_rate
             )
@@ -419,6 +687,7 @@ def main():
     
     for record in test_records:
         monitor.add_grading_record(record)
+    monitor.save_grading_records()
     
     print("📊 阅卷质量监控系统测试")
     
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式评分记录存储
+
+评分记录按考试分区，以NumPy结构化数组保存（records/<exam_id>/part-*.npy）：
+- 评分员、题目、考生ID做字典编码，列中只存整数编码
+- 新记录先进入内存缓冲区，flush时写出新的分片文件（只追加）
+- 按评分员、题目的统计用 np.bincount 向量化分组计算
+
+清单文件（manifest.json）是提交点：清单列出每个分区已提交的分片文件和对应的
+日志位置，未列入清单的分片（写出后、清单更新前崩溃留下的）在加载时忽略并删除，
+重放日志时不会重复计入。合并分片时先写出新文件，清单提交后才删除旧分片。
+"""
+
+import os
+import re
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+
+RECORD_DTYPE = np.dtype([
+    ("grader", np.int32),
+    ("question", np.int32),
+    ("student", np.int32),
+    ("score", np.float64),
+    ("max_score", np.float64),
+    ("ratio", np.float64),
+    ("confidence", np.float32),
+    ("timestamp", np.float64),   # Unix时间戳，无法解析时为NaN
+])
+
+
+def parse_timestamp(value: str) -> float:
+    """ISO时间字符串转Unix时间戳"""
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class StringDictionary:
+    """字符串字典编码"""
+
+    def __init__(self, values: List[str] = None):
+        self.values: List[str] = list(values or [])
+        self.codes: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self.codes.get(value)
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ExamPartition:
+    """单个考试的记录分区"""
+
+    def __init__(self, exam_id: str, path: Path):
+        self.exam_id = exam_id
+        self.path = path
+        self.parts: List[np.ndarray] = []
+        self.part_files: List[str] = []
+        self.obsolete_files: List[str] = []
+        self.next_part = 0
+        self.buffer: List[tuple] = []
+        self._merged: Optional[np.ndarray] = None
+
+    def load(self, part_files: List[str] = None, next_part: int = None):
+        """加载清单中已提交的分片，删除未提交的残留文件
+
+        part_files 为None时（旧版清单）加载目录下全部分片。
+        """
+        existing = sorted(p.name for p in self.path.glob("part-*.npy"))
+        if part_files is None:
+            part_files = existing
+        else:
+            committed = set(part_files)
+            for name in existing:
+                if name not in committed:
+                    (self.path / name).unlink()
+        for name in part_files:
+            self.parts.append(np.load(self.path / name))
+        self.part_files = list(part_files)
+        if next_part is None:
+            next_part = max((int(name[5:11]) + 1 for name in part_files), default=0)
+        self.next_part = next_part
+        self._merged = None
+
+    def append(self, row: tuple):
+        self.buffer.append(row)
+        self._merged = None
+
+    def _write_part(self, array: np.ndarray) -> str:
+        """写出一个新分片文件（文件名不复用），返回文件名"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f"part-{self.next_part:06d}.npy"
+        self.next_part += 1
+        temp_file = self.path / f".{name}.tmp"
+        with open(temp_file, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path / name)
+        return name
+
+    def flush(self) -> int:
+        """把缓冲区写出为新的分片文件（清单提交前不生效）"""
+        if not self.buffer:
+            return 0
+        array = np.array(self.buffer, dtype=RECORD_DTYPE)
+        self.part_files.append(self._write_part(array))
+        self.parts.append(array)
+        self.buffer = []
+        return len(array)
+
+    def compact(self):
+        """合并所有分片为一个新文件，旧分片在清单提交后由 remove_obsolete 删除"""
+        self.flush()
+        if len(self.parts) <= 1:
+            return
+        merged = np.concatenate(self.parts)
+        name = self._write_part(merged)
+        self.obsolete_files.extend(self.part_files)
+        self.part_files = [name]
+        self.parts = [merged]
+        self._merged = merged
+
+    def remove_obsolete(self):
+        """删除已被合并、不再列入清单的分片"""
+        for name in self.obsolete_files:
+            try:
+                (self.path / name).unlink()
+            except FileNotFoundError:
+                pass
+        self.obsolete_files = []
+
+    def manifest_entry(self) -> Dict[str, Any]:
+        return {"dir": self.path.name, "parts": self.part_files, "next_part": self.next_part}
+
+    def array(self) -> np.ndarray:
+        """分区全部记录（含缓冲区）"""
+        if self._merged is None:
+            arrays = list(self.parts)
+            if self.buffer:
+                arrays.append(np.array(self.buffer, dtype=RECORD_DTYPE))
+            self._merged = np.concatenate(arrays) if arrays else np.empty(0, dtype=RECORD_DTYPE)
+        return self._merged
+
+
+class GradingRecordStore:
+    """按考试分区的列式评分记录存储"""
+
+    def __init__(self, data_dir: str, max_parts: int = 32):
+        self.data_dir = Path(data_dir)
+        self.max_parts = max_parts
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_file = self.data_dir / "manifest.json"
+
+        self.graders = StringDictionary()
+        self.questions = StringDictionary()
+        self.students = StringDictionary()
+        self.partitions: Dict[str, ExamPartition] = {}
+        self.log_offset = 0
+
+        self.load()
+
+    @staticmethod
+    def _partition_dir_name(exam_id: str) -> str:
+        return re.sub(r'[^\w.-]', '_', str(exam_id))
+
+    def load(self):
+        """加载字典与分区"""
+        if not self.manifest_file.exists():
+            return
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.graders = StringDictionary(manifest.get("graders"))
+        self.questions = StringDictionary(manifest.get("questions"))
+        self.students = StringDictionary(manifest.get("students"))
+        self.log_offset = manifest.get("log_offset", 0)
+        for exam_id, entry in manifest.get("partitions", {}).items():
+            if isinstance(entry, str):
+                # 版本1清单只记录分区目录
+                partition = ExamPartition(exam_id, self.data_dir / entry)
+                partition.load()
+            else:
+                partition = ExamPartition(exam_id, self.data_dir / entry["dir"])
+                partition.load(entry["parts"], entry.get("next_part"))
+            self.partitions[exam_id] = partition
+
+    def save(self, log_offset: int = None):
+        """落盘缓冲区并提交清单（分片过多的分区自动合并）
+
+        log_offset 是已计入存储的评分日志位置，与分片列表在同一次清单替换中提交。
+        """
+        for partition in self.partitions.values():
+            partition.flush()
+            if len(partition.parts) > self.max_parts:
+                partition.compact()
+        if log_offset is not None:
+            self.log_offset = log_offset
+
+        manifest = {
+            "version": 2,
+            "graders": self.graders.values,
+            "questions": self.questions.values,
+            "students": self.students.values,
+            "partitions": {exam_id: p.manifest_entry() for exam_id, p in self.partitions.items()},
+            "log_offset": self.log_offset,
+            "saved_at": time.time()
+        }
+        temp_file = self.manifest_file.with_suffix(".json.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps(manifest, ensure_ascii=False))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.manifest_file)
+
+        for partition in self.partitions.values():
+            partition.remove_obsolete()
+
+    def compact(self):
+        """合并各分区的分片文件"""
+        for partition in self.partitions.values():
+            partition.compact()
+        self.save()
+
+    def append(self, record) -> None:
+        """追加一条评分记录（GradingRecord）"""
+        partition = self.partitions.get(record.exam_id)
+        if partition is None:
+            partition = ExamPartition(record.exam_id,
+                                      self.data_dir / self._partition_dir_name(record.exam_id))
+            self.partitions[record.exam_id] = partition
+
+        partition.append((
+            self.graders.encode(record.grader_id),
+            self.questions.encode(record.question_id),
+            self.students.encode(record.student_id),
+            record.score,
+            record.max_score,
+            record.score_ratio,
+            record.confidence,
+            parse_timestamp(record.grading_time),
+        ))
+
+    def __len__(self):
+        return sum(sum(len(part) for part in p.parts) + len(p.buffer)
+                   for p in self.partitions.values())
+
+    def select(self, exam_id: str = None, since: float = None,
+               grader_id: str = None) -> np.ndarray:
+        """按考试、起始时间、评分员筛选记录"""
+        if exam_id is not None:
+            partition = self.partitions.get(exam_id)
+            data = partition.array() if partition else np.empty(0, dtype=RECORD_DTYPE)
+        else:
+            arrays = [p.array() for p in self.partitions.values()]
+            data = np.concatenate(arrays) if arrays else np.empty(0, dtype=RECORD_DTYPE)
+
+        mask = None
+        if since is not None:
+            mask = data["timestamp"] >= since
+        if grader_id is not None:
+            code = self.graders.lookup(grader_id)
+            if code is None:
+                return np.empty(0, dtype=RECORD_DTYPE)
+            grader_mask = data["grader"] == code
+            mask = grader_mask if mask is None else mask & grader_mask
+        return data if mask is None else data[mask]
+
+    @staticmethod
+    def _group_stats(codes: np.ndarray, values: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+        """向量化分组：计数、均值、样本方差"""
+        count = np.bincount(codes, minlength=size)
+        total = np.bincount(codes, weights=values, minlength=size)
+        total_sq = np.bincount(codes, weights=values * values, minlength=size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(count > 0, total / count, 0.0)
+            variance = np.where(count > 1, (total_sq - count * mean * mean) / (count - 1), 0.0)
+        return {"count": count, "mean": mean, "variance": np.maximum(variance, 0.0)}
+
+    def grader_summary(self, exam_id: str = None, since: float = None) -> Dict[str, Dict[str, Any]]:
+        """按评分员分组统计"""
+        data = self.select(exam_id, since)
+        if len(data) == 0:
+            return {}
+
+        stats = self._group_stats(data["grader"], data["ratio"], len(self.graders))
+        last_active = np.full(len(self.graders), -np.inf)
+        timestamps = np.nan_to_num(data["timestamp"], nan=-np.inf)
+        np.maximum.at(last_active, data["grader"], timestamps)
+        anomalies = self._iqr_anomaly_mask(data["ratio"])
+        anomaly_count = np.bincount(data["grader"], weights=anomalies, minlength=len(self.graders))
+
+        summary = {}
+        for code in np.nonzero(stats["count"])[0]:
+            summary[self.graders.decode(code)] = {
+                "total_graded": int(stats["count"][code]),
+                "average_score": float(stats["mean"][code]),
+                "score_variance": float(stats["variance"][code]),
+                "anomaly_count": int(anomaly_count[code]),
+                "last_active": (datetime.fromtimestamp(last_active[code]).isoformat()
+                                if np.isfinite(last_active[code]) else "")
+            }
+        return summary
+
+    def question_summary(self, exam_id: str = None, since: float = None) -> Dict[str, Dict[str, Any]]:
+        """按题目分组统计"""
+        data = self.select(exam_id, since)
+        if len(data) == 0:
+            return {}
+
+        stats = self._group_stats(data["question"], data["ratio"], len(self.questions))
+        return {
+            self.questions.decode(code): {
+                "count": int(stats["count"][code]),
+                "average_score": float(stats["mean"][code]),
+                "score_variance": float(stats["variance"][code])
+            }
+            for code in np.nonzero(stats["count"])[0]
+        }
+
+    @staticmethod
+    def _iqr_anomaly_mask(ratios: np.ndarray) -> np.ndarray:
+        if len(ratios) < 3:
+            return np.zeros(len(ratios), dtype=bool)
+        q1, q3 = np.percentile(ratios, [25, 75])
+        iqr = q3 - q1
+        return (ratios < q1 - 1.5 * iqr) | (ratios > q3 + 1.5 * iqr)
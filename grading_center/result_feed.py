@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+阅卷结果变更日志
+
+阅卷中心把每份阅卷结果追加到持久化日志，每条记录带单调递增的序列号：
+- 生产者：追加时以结果键去重，同一结果内容重复追加不会产生新记录；
+  结果内容变化（重新阅卷）时分配新的序列号，消费者会再次收到
+- 消费者：自行保存已处理的序列号（偏移量），按批次拉取偏移量之后的记录，
+  同步耗时只与新结果数量有关，进程重启后从偏移量继续
+
+更新日志：
+- 2026-10-19：替代 graded/ 目录扫描与文件移动的成绩同步方式
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# 导入项目模块
+sys.path.append(str(Path(__file__).parent.parent))
+from common.logger import get_logger
+
+
+DEFAULT_FEED_DB = Path(__file__).parent / "feed" / "result_feed.db"
+
+
+class GradedResultFeed:
+    """阅卷结果变更日志（SQLite，序列号单调递增且不复用）"""
+
+    def __init__(self, db_path: str = None):
+        self.logger = get_logger("result_feed")
+        self.db_path = Path(db_path) if db_path else DEFAULT_FEED_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._init_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        """初始化日志表（AUTOINCREMENT 保证序列号不回退、不复用）"""
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS result_feed (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                appended_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS feed_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+    def append(self, result: Dict, result_key: str = None) -> int:
+        """追加阅卷结果，返回序列号
+
+        同一结果键、内容相同时直接返回已有序列号；内容变化时删除旧记录
+        并以新序列号追加。
+        """
+        result_key = result_key or result.get("result_key")
+        if not result_key:
+            raise ValueError("阅卷结果缺少结果键")
+        payload = json.dumps(result, ensure_ascii=False, sort_keys=True)
+
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT seq, payload FROM result_feed WHERE result_key = ?",
+                               (result_key,)).fetchone()
+            if row is not None and row["payload"] == payload:
+                conn.execute("COMMIT")
+                return row["seq"]
+            if row is not None:
+                conn.execute("DELETE FROM result_feed WHERE seq = ?", (row["seq"],))
+            cursor = conn.execute("""
+                INSERT INTO result_feed (result_key, payload, appended_at) VALUES (?, ?, ?)
+            """, (result_key, payload, time.time()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.lastrowid
+
+    def read(self, after_seq: int = 0, limit: int = 500) -> List[Tuple[int, Dict]]:
+        """读取序列号大于 after_seq 的记录（按序列号升序）"""
+        rows = self._get_connection().execute("""
+            SELECT seq, payload FROM result_feed WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (after_seq, limit)).fetchall()
+        return [(row["seq"], json.loads(row["payload"])) for row in rows]
+
+    def latest_seq(self) -> int:
+        """当前最大序列号"""
+        row = self._get_connection().execute("SELECT MAX(seq) FROM result_feed").fetchone()
+        return row[0] or 0
+
+    def lag(self, offset: int) -> int:
+        """消费者偏移量之后尚未处理的记录数"""
+        return self._get_connection().execute(
+            "SELECT COUNT(*) FROM result_feed WHERE seq > ?", (offset,)).fetchone()[0]
+
+    def truncate(self, before_seq: int) -> int:
+        """删除所有消费者都已处理过的旧记录"""
+        cursor = self._get_connection().execute(
+            "DELETE FROM result_feed WHERE seq < ?", (before_seq,))
+        return cursor.rowcount
+
+    def backfill_directory(self, graded_dir: Path) -> int:
+        """一次性导入旧版 graded/*.json 结果文件（文件保留原处）"""
+        conn = self._get_connection()
+        if conn.execute("SELECT value FROM feed_meta WHERE key = 'legacy_backfilled'").fetchone():
+            return 0
+
+        imported = 0
+        graded_dir = Path(graded_dir)
+        if graded_dir.exists():
+            for file_path in sorted(graded_dir.glob("*.json"), key=os.path.getmtime):
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        result = json.load(f)
+                    self.append(result, result.get("result_key") or file_path.stem)
+                    imported += 1
+                except Exception as e:
+                    self.logger.error(f"导入阅卷结果文件失败 {file_path.name}: {e}")
+
+        conn.execute("INSERT OR REPLACE INTO feed_meta (key, value) VALUES ('legacy_backfilled', ?)",
+                     (str(time.time()),))
+        if imported:
+            self.logger.info(f"从目录导入 {imported} 份阅卷结果到变更日志")
+        return imported
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -8,7 +8,10 @@
 import os
 import sys
 import json
+import time
 import sqlite3
+import threading
+from itertools import groupby
 from datetime import datetime
 from pathlib import Path
 
@@ -30,6 +33,31 @@ CORS(app)
 app.config['SECRET_KEY'] = 'grading-center-secret-key'
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'grading_center.db')
 
+# 自动阅卷配置
+AUTO_GRADE_DEFAULT_LIMIT = 2000      # 单次调用默认最多处理的答卷数
+AUTO_GRADE_PROGRESS_INTERVAL = 500   # 每处理多少份答卷更新一次进度
+
+# 自动阅卷进度（供 /api/auto-grade/progress 查询）
+auto_grade_progress = {
+    'running': False,
+    'total': 0,
+    'processed': 0,
+    'current_exam': None,
+    'started_at': None,
+    'finished_at': None
+}
+auto_grade_lock = threading.Lock()
+_auto_grader = None
+
+
+def get_auto_grader():
+    """获取阅卷引擎（首次调用时创建）"""
+    global _auto_grader
+    if _auto_grader is None:
+        from grading_center.auto_grader import AutoGrader
+        _auto_grader = AutoGrader()
+    return _auto_grader
+
 def init_database():
     """初始化数据库"""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -241,7 +269,14 @@ MAIN_TEMPLATE = '''
             fetch('/api/auto-grade', { method: 'POST' })
                 .then(response => response.json())
                 .then(data => {
-                    alert(`自动阅卷完成！处理了 ${data.processed} 个任务`);
+                    if (!data.success) {
+                        alert(data.message);
+                        return;
+                    }
+                    let message = `自动阅卷完成！处理了 ${data.processed} 个任务`;
+                    if (data.skipped) message += `，${data.skipped} 个缺少标准答案需人工阅卷`;
+                    if (data.remaining) message += `，剩余 ${data.remaining} 个待阅卷`;
+                    alert(message);
                     refreshTasks();
                 })
                 .catch(error => {
@@ -358,32 +393,148 @@ def grade_task(task_id):
     
     return jsonify({'success': True, 'message': '阅卷完成'})
 
-@app.route('/api/auto-grade', methods=['POST'])
-def auto_grade():
-    """自动阅卷"""
+def parse_answers(raw_answers):
+    """解析exam_results.answers字段"""
+    if not raw_answers:
+        return {}
+    answers = json.loads(raw_answers) if isinstance(raw_answers, str) else raw_answers
+    if isinstance(answers, dict) and isinstance(answers.get('answers'), dict):
+        answers = answers['answers']
+    if not isinstance(answers, dict):
+        raise ValueError('答案格式无效')
+    return answers
+
+
+def grade_pending_results(limit=None, retry_skipped=False):
+    """按考试分组批量阅卷未评分的答卷
+    
+    每个考试的标准答案只获取一次，分数最后通过一次executemany写回。
+    缺少标准答案或答案无法解析的答卷标记为需人工阅卷，之后的调用不再
+    重复领取（retry_skipped=True 时重新尝试）。返回处理统计。
+    """
+    grader = get_auto_grader()
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
-    # 获取未阅卷的任务
-    cursor.execute('SELECT id FROM exam_results WHERE score IS NULL')
-    tasks = cursor.fetchall()
-    
-    # 简单的自动阅卷逻辑（随机分数）
-    import random
-    processed = 0
-    for task in tasks:
-        score = random.randint(60, 95)  # 随机分数
-        cursor.execute('''
+    try:
+        condition = 'score IS NULL'
+        if not retry_skipped:
+            condition += " AND (graded_by IS NULL OR graded_by != 'manual_required')"
+        
+        cursor.execute(f'SELECT COUNT(*) FROM exam_results WHERE {condition}')
+        pending_total = cursor.fetchone()[0]
+        
+        query = f'SELECT id, exam_id, answers FROM exam_results WHERE {condition} ORDER BY exam_id, id'
+        params = ()
+        if limit:
+            query += ' LIMIT ?'
+            params = (int(limit),)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        auto_grade_progress.update({
+            'running': True, 'total': len(rows), 'processed': 0,
+            'current_exam': None, 'started_at': time.time(), 'finished_at': None
+        })
+        
+        updates = []
+        manual_required = []
+        skipped = 0
+        failed = 0
+        missing_keys = []
+        processed = 0
+        next_report = AUTO_GRADE_PROGRESS_INTERVAL
+        
+        for exam_id, exam_rows in groupby(rows, key=lambda row: row[1]):
+            exam_rows = list(exam_rows)
+            auto_grade_progress['current_exam'] = exam_id
+            
+            # 每个考试只解析一次标准答案
+            correct_answers = grader.get_correct_answers(exam_id)
+            if not correct_answers:
+                missing_keys.append(exam_id)
+                skipped += len(exam_rows)
+                manual_required.extend((row[0],) for row in exam_rows)
+            else:
+                total_score = correct_answers.get('total_score') or 100
+                for result_id, _, raw_answers in exam_rows:
+                    try:
+                        answers = parse_answers(raw_answers)
+                        grading = grader.auto_grade_answers(answers, correct_answers)
+                        score = round(grading['total_obtained_score'] / total_score * 100, 2)
+                        updates.append((score, result_id))
+                    except Exception as e:
+                        print(f"⚠️ 答卷 {result_id} 阅卷失败: {e}")
+                        failed += 1
+                        manual_required.append((result_id,))
+            
+            processed += len(exam_rows)
+            auto_grade_progress['processed'] = processed
+            if processed >= next_report:
+                print(f"🤖 自动阅卷进度: {processed}/{len(rows)}")
+                next_report = processed + AUTO_GRADE_PROGRESS_INTERVAL
+        
+        cursor.executemany('''
             UPDATE exam_results 
             SET score = ?, graded_by = 'auto', graded_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        ''', (score, task[0]))
-        processed += 1
+        ''', updates)
+        cursor.executemany('''
+            UPDATE exam_results SET graded_by = 'manual_required' WHERE id = ?
+        ''', manual_required)
+        conn.commit()
+        
+        return {
+            'processed': len(updates),
+            'skipped': skipped,
+            'failed': failed,
+            'missing_answer_keys': missing_keys,
+            'remaining': pending_total - len(updates) - len(manual_required)
+        }
+    finally:
+        conn.close()
+        auto_grade_progress.update({'running': False, 'current_exam': None,
+                                    'finished_at': time.time()})
+
+
+@app.route('/api/auto-grade', methods=['POST'])
+def auto_grade():
+    """自动阅卷"""
+    data = request.get_json(silent=True) or {}
+    limit = data.get('limit', request.args.get('limit', AUTO_GRADE_DEFAULT_LIMIT))
+    retry_skipped = data.get('retry_skipped', request.args.get('retry_skipped', False))
     
-    conn.commit()
-    conn.close()
+    # limit 为0或空表示不限制
+    try:
+        limit = int(limit) if limit not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'limit必须是整数'}), 400
+    if limit is not None and limit < 0:
+        return jsonify({'success': False, 'message': 'limit不能为负数'}), 400
+    
+    # 只接受布尔值或 "true"/"false"，避免 "false"、"0" 之类的字符串被当作真值
+    if isinstance(retry_skipped, str) and retry_skipped.lower() in ('true', 'false'):
+        retry_skipped = retry_skipped.lower() == 'true'
+    if not isinstance(retry_skipped, bool):
+        return jsonify({'success': False, 'message': 'retry_skipped必须是true或false'}), 400
     
-    return jsonify({'success': True, 'processed': processed})
+    # 同一时间只允许一个批量阅卷任务
+    if not auto_grade_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'message': '自动阅卷正在进行中',
+                        'progress': auto_grade_progress}), 409
+    try:
+        result = grade_pending_results(limit or None, retry_skipped)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'自动阅卷失败: {e}'}), 500
+    finally:
+        auto_grade_lock.release()
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/auto-grade/progress')
+def auto_grade_status():
+    """自动阅卷进度"""
+    return jsonify(auto_grade_progress)
 
 @app.route('/api/export')
 def export_results():
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式统计工具
+
+为阅卷质量监控提供O(1)更新的在线统计量：
+- RunningStats: Welford算法维护的计数、均值、方差、最值
+- QuantileSketch: 固定分桶的分位数草图，可合并、可序列化
+"""
+
+import math
+from typing import Dict, List, Optional
+
+
+class RunningStats:
+    """Welford在线均值/方差"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 min: Optional[float] = None, max: Optional[float] = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def update(self, value: float):
+        """加入一个样本"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """合并另一组统计量（Chan并行算法）"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """样本方差（与statistics.variance一致）"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunningStats":
+        return cls(**data)
+
+
+class QuantileSketch:
+    """固定分桶分位数草图
+
+    在 [low, high] 区间内等宽分桶，超出范围的值落入首尾桶；
+    分位数误差不超过一个桶宽，更新和内存均为O(1)。
+    """
+
+    __slots__ = ("low", "high", "bins", "counts", "total", "_bounds", "_bounds_total")
+
+    def __init__(self, low: float = 0.0, high: float = 1.0, bins: int = 200,
+                 counts: List[int] = None, total: int = 0):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.counts = counts if counts is not None else [0] * bins
+        self.total = total
+        self._bounds = None
+        self._bounds_total = 0
+
+    def _index(self, value: float) -> int:
+        index = int((value - self.low) / (self.high - self.low) * self.bins)
+        return min(self.bins - 1, max(0, index))
+
+    def update(self, value: float):
+        """加入一个样本"""
+        self.counts[self._index(value)] += 1
+        self.total += 1
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """合并同参数的草图"""
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        return self
+
+    def quantile(self, q: float) -> float:
+        """估计分位数（桶内线性插值）"""
+        if self.total == 0:
+            return 0.0
+
+        width = (self.high - self.low) / self.bins
+        # 与numpy.percentile的线性插值位置保持一致
+        target = q * (self.total - 1)
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count > target:
+                fraction = (target - cumulative + 0.5) / count
+                return self.low + (i + fraction) * width
+            cumulative += count
+        return self.high
+
+    def iqr_bounds(self, k: float = 1.5, refresh_every: int = 1):
+        """IQR异常值上下界
+        
+        refresh_every > 1 时复用上次计算的界限，直到新增样本数达到该值，
+        避免每条记录都遍历全部分桶。
+        """
+        if self._bounds is None or self.total - self._bounds_total >= refresh_every:
+            q1 = self.quantile(0.25)
+            q3 = self.quantile(0.75)
+            iqr = q3 - q1
+            self._bounds = (q1 - k * iqr, q3 + k * iqr)
+            self._bounds_total = self.total
+        return self._bounds
+
+    def to_dict(self) -> Dict:
+        # 稀疏存储非零桶
+        return {"low": self.low, "high": self.high, "bins": self.bins,
+                "counts": {str(i): c for i, c in enumerate(self.counts) if c},
+                "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        counts = [0] * data["bins"]
+        for index, count in data.get("counts", {}).items():
+            counts[int(index)] = count
+        return cls(data["low"], data["high"], data["bins"], counts, data.get("total", 0))
+
+
+class ScopeStats:
+    """某个统计维度（题目、评分员、考试等）的流式统计量"""
+
+    __slots__ = ("scores", "sketch", "anomalies", "last_active")
+
+    def __init__(self, scores: RunningStats = None, sketch: QuantileSketch = None,
+                 anomalies: int = 0, last_active: str = ""):
+        self.scores = scores or RunningStats()
+        self.sketch = sketch or QuantileSketch()
+        self.anomalies = anomalies
+        self.last_active = last_active
+
+    def update(self, value: float, timestamp: str = ""):
+        self.scores.update(value)
+        self.sketch.update(value)
+        if timestamp:
+            self.last_active = timestamp
+
+    def to_dict(self) -> Dict:
+        return {"scores": self.scores.to_dict(), "sketch": self.sketch.to_dict(),
+                "anomalies": self.anomalies, "last_active": self.last_active}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScopeStats":
+        return cls(RunningStats.from_dict(data["scores"]),
+                   QuantileSketch.from_dict(data["sketch"]),
+                   data.get("anomalies", 0), data.get("last_active", ""))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本相似度工具
+
+增强阅卷器和评分规则编译共用的文本处理函数，保证两套评分结果一致：
+- normalize_text: 去标点、大小写、空白的标准化
+- char_ngrams / ngram_counts: 字符n-gram及其计数、向量模长
+- jaccard_similarity / cosine_similarity: 基于n-gram的相似度
+"""
+
+import re
+import math
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+
+# 预编译的文本标准化正则
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_text(text: str, case_sensitive: bool = False,
+                   ignore_punctuation: bool = True) -> str:
+    """文本标准化"""
+    text = str(text).strip()
+    if ignore_punctuation:
+        text = PUNCTUATION_PATTERN.sub('', text)
+    if not case_sensitive:
+        text = text.lower()
+    return WHITESPACE_PATTERN.sub(' ', text)
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """生成字符n-gram（文本短于n时退化为整体）"""
+    text = text.replace(' ', '')
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def vector_norm(counts: Counter) -> float:
+    """n-gram计数向量的模长"""
+    return math.sqrt(sum(c * c for c in counts.values()))
+
+
+def ngram_counts(text: str, n: int = 2) -> Tuple[Counter, float]:
+    """字符n-gram计数及其模长"""
+    counts = Counter(char_ngrams(text, n))
+    return counts, vector_norm(counts)
+
+
+def jaccard_similarity(grams: Iterable[str], reference_set: frozenset) -> float:
+    """字符n-gram Jaccard相似度"""
+    grams = set(grams)
+    intersection = sum(1 for g in grams if g in reference_set)
+    union = len(grams) + len(reference_set) - intersection
+    return intersection / union if union else 0.0
+
+
+def cosine_similarity(counts: Counter, reference_counts: dict, reference_norm: float) -> float:
+    """字符n-gram余弦相似度"""
+    norm = vector_norm(counts)
+    if not norm or not reference_norm:
+        return 0.0
+    dot = sum(c * reference_counts.get(g, 0) for g, c in counts.items())
+    return dot / (norm * reference_norm)
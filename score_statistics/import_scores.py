@@ -1,15 +1,23 @@
 import os
+import sys
 import json
 import shutil
 import time
 from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from score_statistics.score_store import ScoreStore
 
 class ScoreImporter:
-    def __init__(self):
+    def __init__(self, store=None, base_dir=None):
         # 定义导入目录和备份目录
-        self.import_dir = os.path.join(os.path.dirname(__file__), 'imports')
-        self.backup_dir = os.path.join(os.path.dirname(__file__), 'imports_backup')
-        self.scores_file = os.path.join(os.path.dirname(__file__), 'scores.json')
+        base_dir = base_dir or os.path.dirname(__file__)
+        self.import_dir = os.path.join(base_dir, 'imports')
+        self.backup_dir = os.path.join(base_dir, 'imports_backup')
+        
+        # 成绩库（按成绩ID索引，导入只写入新数据）
+        self.store = store or ScoreStore()
         
         # 确保目录存在
         os.makedirs(self.import_dir, exist_ok=True)
@@ -18,24 +26,20 @@ class ScoreImporter:
     def load_current_scores(self):
         """加载当前成绩数据"""
         try:
-            if os.path.exists(self.scores_file):
-                with open(self.scores_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {"scores": []}
+            return {"scores": self.store.load_all()}
         except Exception as e:
             print(f"加载当前成绩数据失败: {e}")
             return {"scores": []}
     
     def save_scores(self, scores):
-        """保存成绩数据"""
+        """批量写入成绩数据（按ID新增或更新）"""
         try:
-            with open(self.scores_file, 'w', encoding='utf-8') as f:
-                json.dump(scores, f, ensure_ascii=False, indent=2)
-            print(f"成绩数据已保存到 {self.scores_file}")
-            return True
+            result = self.store.upsert_many(scores.get("scores", []))
+            print(f"成绩数据已保存到 {self.store.db_path}")
+            return result
         except Exception as e:
             print(f"保存成绩数据失败: {e}")
-            return False
+            return None
     
     def backup_import_file(self, file_path):
         """备份导入文件"""
@@ -61,36 +65,15 @@ class ScoreImporter:
             with open(file_path, 'r', encoding='utf-8') as f:
                 import_data = json.load(f)
             
-            # 加载当前成绩数据
-            current_scores = self.load_current_scores()
-            
             # 获取导入的成绩列表
-            import_scores = import_data.get("scores", [])
+            import_scores = import_data.get("scores", []) if isinstance(import_data, dict) else import_data
             if not import_scores:
                 print("导入文件中没有成绩数据")
                 return False
             
-            # 合并成绩数据（根据ID去重）
-            existing_ids = {score.get("id") for score in current_scores.get("scores", [])}
-            new_scores = []
-            updated_scores = []
-            
-            for score in import_scores:
-                score_id = score.get("id")
-                if score_id in existing_ids:
-                    # 更新现有成绩
-                    for i, existing_score in enumerate(current_scores["scores"]):
-                        if existing_score.get("id") == score_id:
-                            current_scores["scores"][i] = score
-                            updated_scores.append(score_id)
-                            break
-                else:
-                    # 添加新成绩
-                    current_scores["scores"].append(score)
-                    new_scores.append(score_id)
-            
-            # 保存更新后的成绩数据
-            if self.save_scores(current_scores):
+            # 单个事务内按ID新增或更新
+            result = self.save_scores({"scores": import_scores})
+            if result is not None:
                 # 备份导入文件
                 self.backup_import_file(file_path)
                 
@@ -98,7 +81,7 @@ class ScoreImporter:
                 os.remove(file_path)
                 
                 print(f"成功导入 {len(import_scores)} 条成绩数据")
-                print(f"新增: {len(new_scores)} 条, 更新: {len(updated_scores)} 条")
+                print(f"新增: {result['inserted']} 条, 更新: {result['updated']} 条")
                 return True
             else:
                 print("保存成绩数据失败")
@@ -112,7 +95,7 @@ class ScoreImporter:
         """导入所有待处理文件"""
         try:
             # 获取导入目录中的所有JSON文件
-            import_files = [f for f in os.listdir(self.import_dir) if f.endswith('.json')]
+            import_files = sorted(f for f in os.listdir(self.import_dir) if f.endswith('.json'))
             
             if not import_files:
                 print("没有待导入的文件")
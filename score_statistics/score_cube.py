@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成绩聚合立方体
+
+按 考试 × 部门 × 日期 维护预聚合单元（人数、总分、平方和、合格人数、分数频次），
+成绩增删改时增量更新。统计面板与考试合格率表从聚合单元汇总，
+耗时与分组数量成正比，与成绩条数无关。
+"""
+
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+# 默认合格分数（与原合格率表一致）
+DEFAULT_PASS_SCORE = 60
+
+# 分数段：(名称, 下限, 上限)
+SCORE_BANDS = (
+    ("excellent", 90, math.inf),
+    ("good", 80, 90),
+    ("fair", 70, 80),
+    ("pass", 60, 70),
+    ("fail", -math.inf, 60),
+)
+
+CUBE_DIMENSIONS = ("exam", "department", "date")
+
+
+class CubeCell:
+    """单个聚合单元"""
+
+    __slots__ = ("count", "total", "total_sq", "pass_count", "values", "total_score")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pass_count = 0
+        self.values: Dict[float, int] = {}   # 分数 -> 人数，用于最值、分数段和直方图
+        self.total_score = 0
+
+    def add(self, value: float, passed: bool, total_score, sign: int = 1):
+        self.count += sign
+        self.total += sign * value
+        self.total_sq += sign * value * value
+        self.pass_count += sign if passed else 0
+        remaining = self.values.get(value, 0) + sign
+        if remaining > 0:
+            self.values[value] = remaining
+        else:
+            self.values.pop(value, None)
+        if sign > 0 and total_score:
+            self.total_score = max(self.total_score, total_score)
+
+    def copy(self) -> "CubeCell":
+        return CubeCell().merge(self)
+
+    def merge(self, other: "CubeCell") -> "CubeCell":
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.pass_count += other.pass_count
+        for value, count in other.values.items():
+            self.values[value] = self.values.get(value, 0) + count
+        self.total_score = max(self.total_score, other.total_score)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """总体标准差（与numpy.std一致）"""
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+    @property
+    def min(self) -> float:
+        return min(self.values) if self.values else 0
+
+    @property
+    def max(self) -> float:
+        return max(self.values) if self.values else 0
+
+    @property
+    def pass_rate(self) -> float:
+        return self.pass_count / self.count * 100 if self.count else 0.0
+
+    def bands(self) -> Dict[str, int]:
+        """各分数段人数"""
+        result = {name: 0 for name, _, _ in SCORE_BANDS}
+        for value, count in self.values.items():
+            for name, low, high in SCORE_BANDS:
+                if low <= value < high:
+                    result[name] += count
+                    break
+        return result
+
+    def histogram(self, bins: int = 10) -> Tuple[list, list]:
+        """等宽直方图（区间与numpy.histogram一致）"""
+        if not self.values:
+            return [], []
+        low, high = self.min, self.max
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        width = (high - low) / bins
+        counts = [0] * bins
+        for value, count in self.values.items():
+            counts[min(bins - 1, int((value - low) / width))] += count
+        edges = [low + i * width for i in range(bins + 1)]
+        return counts, edges
+
+
+class ScoreCube:
+    """考试 × 部门 × 日期 成绩聚合立方体"""
+
+    def __init__(self, pass_score: float = DEFAULT_PASS_SCORE):
+        self.pass_score = pass_score
+        self.cells: Dict[Tuple[str, str, str], CubeCell] = {}
+
+    @classmethod
+    def from_scores(cls, scores: Iterable[Dict], pass_score: float = DEFAULT_PASS_SCORE) -> "ScoreCube":
+        cube = cls(pass_score)
+        for score in scores:
+            cube.add(score)
+        return cube
+
+    def copy(self) -> "ScoreCube":
+        """独立副本（供后台线程计算，耗时与聚合单元数成正比）"""
+        cube = ScoreCube(self.pass_score)
+        cube.cells = {key: cell.copy() for key, cell in self.cells.items()}
+        return cube
+
+    @staticmethod
+    def cell_key(score: Dict) -> Tuple[str, str, str]:
+        submit_time = score.get("submit_time") or ""
+        return (
+            score.get("exam_name", "未知考试"),
+            score.get("department", "未知部门"),
+            submit_time.split()[0] if submit_time else "",
+        )
+
+    @staticmethod
+    def score_value(score: Dict) -> float:
+        try:
+            return float(score.get("score", 0) or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _apply(self, score: Dict, sign: int):
+        key = self.cell_key(score)
+        cell = self.cells.get(key)
+        if cell is None:
+            if sign < 0:
+                return
+            cell = self.cells[key] = CubeCell()
+        value = self.score_value(score)
+        cell.add(value, value >= self.pass_score, score.get("total_score", 100), sign)
+        if cell.count <= 0:
+            del self.cells[key]
+
+    def add(self, score: Dict):
+        """加入一条成绩"""
+        self._apply(score, 1)
+
+    def remove(self, score: Dict):
+        """移除一条成绩"""
+        self._apply(score, -1)
+
+    def replace(self, old_score: Optional[Dict], new_score: Dict):
+        """成绩修改"""
+        if old_score is not None:
+            self.remove(old_score)
+        self.add(new_score)
+
+    def rollup(self, dimension: str, exam: str = None, department: str = None,
+               date_granularity: str = "day") -> Dict[str, CubeCell]:
+        """按维度汇总（可先按考试、部门切片）
+
+        date_granularity 为 "month" 时日期按月汇总。
+        """
+        index = CUBE_DIMENSIONS.index(dimension)
+        result: Dict[str, CubeCell] = {}
+        for key, cell in self.cells.items():
+            if exam is not None and key[0] != exam:
+                continue
+            if department is not None and key[1] != department:
+                continue
+            group = key[index]
+            if dimension == "date":
+                if not group:
+                    continue
+                if date_granularity == "month":
+                    group = group[:7]
+            target = result.get(group)
+            if target is None:
+                target = result[group] = CubeCell()
+            target.merge(cell)
+        return result
+
+    def summary(self, exam: str = None, department: str = None) -> CubeCell:
+        """切片总计"""
+        total = CubeCell()
+        for key, cell in self.cells.items():
+            if exam is not None and key[0] != exam:
+                continue
+            if department is not None and key[1] != department:
+                continue
+            total.merge(cell)
+        return total
+
+    def exam_pass_rates(self, exam: str = None, department: str = None) -> Dict[str, Dict]:
+        """各考试合格率"""
+        return {
+            exam_name: {
+                "total": cell.count,
+                "pass": cell.pass_count,
+                "total_score": cell.total_score or 100,
+                "pass_score": self.pass_score,
+                "pass_rate": cell.pass_rate,
+            }
+            for exam_name, cell in self.rollup("exam", exam, department).items()
+        }
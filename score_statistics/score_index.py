@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成绩搜索索引
+
+替代逐条 str(value).lower() 子串扫描的成绩搜索：
+- 检索字段（考生姓名、考试名称、部门、成绩ID）的不同取值构成词表，
+  每个取值按单字/双字切分建立倒排表，搜索时求倒排表交集后再校验子串
+- 考试、部门筛选列做字典编码，每个取值对应一个成绩集合
+- 成绩新增、修改、删除时增量更新，修改后的成绩保持原有顺序
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_SEARCH_FIELDS = ("student_name", "exam_name", "department", "id")
+DEFAULT_FILTER_FIELDS = ("exam_name", "department")
+
+
+def text_grams(text: str) -> Set[str]:
+    """单字与双字切分"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(term: str) -> Set[str]:
+    """查询词切分：单字查询用单字，否则用全部双字"""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+class ScoreSearchIndex:
+    """成绩倒排索引"""
+
+    def __init__(self, scores: Iterable[Dict] = (), fields: Tuple[str, ...] = DEFAULT_SEARCH_FIELDS,
+                 filter_fields: Tuple[str, ...] = DEFAULT_FILTER_FIELDS):
+        self.fields = fields
+        self.filter_fields = filter_fields
+
+        # 槽位按插入顺序递增，搜索结果按槽位排序即保持原列表顺序
+        self.docs: Dict[int, Dict] = {}
+        self.slot_by_id: Dict[str, int] = {}
+        self.next_slot = 0
+
+        # 检索词表：取值 -> 编号、编号 -> 取值、编号 -> 成绩槽位
+        self.value_ids: Dict[str, int] = {}
+        self.values: Dict[int, str] = {}
+        self.value_slots: Dict[int, Set[int]] = {}
+        self.next_value_id = 0
+        # 倒排表：单字/双字 -> 取值编号
+        self.postings: Dict[str, Set[int]] = {}
+
+        # 筛选列字典编码：字段 -> 取值 -> 成绩槽位
+        self.columns: Dict[str, Dict[str, Set[int]]] = {field: {} for field in filter_fields}
+
+        for score in scores:
+            self.add(score)
+
+    def __len__(self):
+        return len(self.docs)
+
+    @staticmethod
+    def _key(score_id) -> str:
+        return str(score_id)
+
+    def _searchable_values(self, score: Dict) -> Set[str]:
+        return {str(score.get(field, "")).lower() for field in self.fields
+                if score.get(field) is not None}
+
+    def _index(self, slot: int, score: Dict):
+        for value in self._searchable_values(score):
+            value_id = self.value_ids.get(value)
+            if value_id is None:
+                value_id = self.value_ids[value] = self.next_value_id
+                self.next_value_id += 1
+                self.values[value_id] = value
+                self.value_slots[value_id] = set()
+                for gram in text_grams(value):
+                    self.postings.setdefault(gram, set()).add(value_id)
+            self.value_slots[value_id].add(slot)
+
+        for field in self.filter_fields:
+            self.columns[field].setdefault(score.get(field, ""), set()).add(slot)
+
+    def _unindex(self, slot: int, score: Dict):
+        for value in self._searchable_values(score):
+            value_id = self.value_ids.get(value)
+            if value_id is None:
+                continue
+            slots = self.value_slots[value_id]
+            slots.discard(slot)
+            if not slots:
+                # 取值不再出现，清理词表与倒排表
+                del self.value_slots[value_id], self.values[value_id], self.value_ids[value]
+                for gram in text_grams(value):
+                    posting = self.postings.get(gram)
+                    if posting is not None:
+                        posting.discard(value_id)
+                        if not posting:
+                            del self.postings[gram]
+
+        for field in self.filter_fields:
+            value = score.get(field, "")
+            slots = self.columns[field].get(value)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self.columns[field][value]
+
+    def add(self, score: Dict):
+        """新增成绩（ID已存在时按修改处理）"""
+        key = self._key(score.get("id"))
+        if key in self.slot_by_id:
+            self.update(score)
+            return
+        slot = self.next_slot
+        self.next_slot += 1
+        self.slot_by_id[key] = slot
+        self.docs[slot] = score
+        self._index(slot, score)
+
+    def update(self, score: Dict, old_id=None):
+        """修改成绩，保持原有位置"""
+        key = self._key(score.get("id") if old_id is None else old_id)
+        slot = self.slot_by_id.get(key)
+        if slot is None:
+            self.add(score)
+            return
+        self._unindex(slot, self.docs[slot])
+        new_key = self._key(score.get("id"))
+        if new_key != key:
+            del self.slot_by_id[key]
+            self.slot_by_id[new_key] = slot
+        self.docs[slot] = score
+        self._index(slot, score)
+
+    def remove(self, score_id) -> Optional[Dict]:
+        """删除成绩"""
+        slot = self.slot_by_id.pop(self._key(score_id), None)
+        if slot is None:
+            return None
+        score = self.docs.pop(slot)
+        self._unindex(slot, score)
+        return score
+
+    def get(self, score_id) -> Optional[Dict]:
+        slot = self.slot_by_id.get(self._key(score_id))
+        return self.docs.get(slot) if slot is not None else None
+
+    def filter_values(self, field: str) -> List[str]:
+        """筛选列当前的全部取值"""
+        return list(self.columns[field])
+
+    def match_term(self, term: str) -> Set[int]:
+        """包含查询词的成绩槽位（任一检索字段包含即匹配）"""
+        term = term.lower()
+        posting_lists = sorted((self.postings.get(gram, set()) for gram in query_grams(term)), key=len)
+        if not posting_lists or not posting_lists[0]:
+            return set()
+        candidates = set(posting_lists[0])
+        for posting in posting_lists[1:]:
+            candidates &= posting
+            if not candidates:
+                return set()
+
+        slots: Set[int] = set()
+        for value_id in candidates:
+            # 双字交集可能误命中（如"abc"与"ab…bc"），校验子串
+            if term in self.values[value_id]:
+                slots |= self.value_slots[value_id]
+        return slots
+
+    def search(self, text: str = "", **filters) -> List[Dict]:
+        """搜索成绩
+
+        text 为空时只按筛选列过滤；filters 的键为筛选字段名，值为None表示不筛选。
+        结果按成绩插入顺序返回。
+        """
+        slot_sets = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            slot_sets.append(self.columns[field].get(value, set()))
+        if text:
+            slot_sets.append(self.match_term(text))
+
+        if not slot_sets:
+            return list(self.docs.values())
+
+        slot_sets.sort(key=len)
+        result = set(slot_sets[0])
+        for slots in slot_sets[1:]:
+            result &= slots
+            if not result:
+                return []
+        return [self.docs[slot] for slot in sorted(result)]
@@ -1,13 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
-import os
+import sys
 import csv
 from datetime import datetime
+from pathlib import Path
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
+sys.path.append(str(Path(__file__).parent.parent))
+from score_statistics.score_store import ScoreStore
+from score_statistics.score_index import ScoreSearchIndex, DEFAULT_SEARCH_FIELDS
+
 class ScoreManager:
     """成绩统计管理主类"""
     def __init__(self):
@@ -16,7 +20,11 @@ class ScoreManager:
         self.root.geometry("1200x800")
         
         # 成绩数据存储
+        self.store = ScoreStore()
         self.scores = self.load_scores()
+        # 搜索倒排索引（保留原有的按成绩搜索）
+        self.search_index = ScoreSearchIndex(self.scores.get("scores", []),
+                                             fields=DEFAULT_SEARCH_FIELDS + ("score",))
         self.current_page = 1
         self.page_size = 20
         
@@ -35,9 +43,8 @@ class ScoreManager:
     def load_scores(self):
         """加载成绩数据"""
         try:
-            if os.path.exists('score_statistics/scores.json'):
-                with open('score_statistics/scores.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            if self.store.count():
+                return {"scores": self.store.load_all()}
         except Exception as e:
             print(f"加载成绩数据失败: {e}")
         
@@ -86,12 +93,13 @@ class ScoreManager:
             ]
         }
     
-    def save_scores(self):
-        """保存成绩数据"""
+    def save_scores(self, changed=(), removed_ids=()):
+        """保存界面新增、修改或删除的成绩（只写入变化的记录）"""
         try:
-            os.makedirs('score_statistics', exist_ok=True)
-            with open('score_statistics/scores.json', 'w', encoding='utf-8') as f:
-                json.dump(self.scores, f, ensure_ascii=False, indent=2)
+            if changed:
+                self.store.upsert_many(changed)
+            if removed_ids:
+                self.store.delete(removed_ids)
         except Exception as e:
             messagebox.showerror("错误", f"保存成绩数据失败: {e}")
     
@@ -237,26 +245,7 @@ class ScoreManager:
     
     def get_filtered_scores(self):
         """获取筛选后的成绩列表"""
-        scores = self.scores.get("scores", [])
-        filtered = []
-        
-        search_text = self.search_var.get().lower()
-        
-        for score in scores:
-            # 搜索筛选
-            if search_text:
-                searchable_fields = [
-                    str(score.get("exam_name", "")),
-                    str(score.get("student_name", "")),
-                    str(score.get("department", "")),
-                    str(score.get("score", ""))
-                ]
-                if not any(search_text in field.lower() for field in searchable_fields):
-                    continue
-            
-            filtered.append(score)
-        
-        return filtered
+        return self.search_index.search(self.search_var.get().strip())
     
     def on_search(self, event=None):
         """搜索事件处理"""
@@ -457,10 +446,7 @@ class ScoreManager:
     
     def get_score_by_id(self, score_id):
         """根据ID获取成绩"""
-        for score in self.scores.get("scores", []):
-            if score.get("id") == score_id:
-                return score
-        return None
+        return self.search_index.get(score_id)
     
     def export_scores(self):
         """导出成绩"""
@@ -612,14 +598,16 @@ class ScoreDialog:
                 for i, score_item in enumerate(self.score_manager.scores["scores"]):
                     if score_item["id"] == self.score_data["id"]:
                         self.score_manager.scores["scores"][i] = score_data
+                        self.score_manager.search_index.update(score_data)
                         break
             else:
                 # 新增模式
                 score_data["id"] = self.get_next_score_id()
                 self.score_manager.scores["scores"].append(score_data)
+                self.score_manager.search_index.add(score_data)
             
             # 保存数据
-            self.score_manager.save_scores()
+            self.score_manager.save_scores(changed=[score_data])
             self.score_manager.refresh_score_list()
             self.score_manager.update_statistics()
             
@@ -632,11 +620,8 @@ class ScoreDialog:
             messagebox.showerror("错误", f"保存失败: {e}")
     
     def get_next_score_id(self):
-        """获取下一个成绩ID"""
-        max_id = 0
-        for score in self.score_manager.scores.get("scores", []):
-            max_id = max(max_id, score.get("id", 0))
-        return max_id + 1
+        """获取下一个成绩ID（同步写入的成绩也在成绩库中，由成绩库分配）"""
+        return self.score_manager.store.next_id()
 
 
 if __name__ == "__main__":
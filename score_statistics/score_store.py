@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成绩存储
+
+基于SQLite的成绩库，按成绩ID建立主键索引，替代整体读写 scores.json：
+- 批量导入为单事务内的 upsert，耗时与新数据量成正比，与历史数据量无关
+- 常用筛选字段（考试、考生、部门、提交时间）单独成列并建立索引
+- 完整成绩记录以JSON保存在 data 列，保持原有字段不变
+- 首次创建时自动迁移旧版 scores.json
+- 外部同步的成绩以 source_key（考试_考生）标识，分配数字ID，重新同步时覆盖原成绩
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable
+
+
+DEFAULT_SCORE_DB = Path(__file__).parent / "scores.db"
+LEGACY_SCORES_FILE = Path(__file__).parent / "scores.json"
+
+# SQLite单条语句的参数个数上限较低，IN查询分块进行
+QUERY_CHUNK_SIZE = 500
+
+
+class ScoreStore:
+    """SQLite成绩库"""
+
+    def __init__(self, db_path: str = None, legacy_file: str = None):
+        self.db_path = Path(db_path) if db_path else DEFAULT_SCORE_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._init_database()
+
+        legacy_file = Path(legacy_file) if legacy_file else (LEGACY_SCORES_FILE if db_path is None else None)
+        if legacy_file is not None:
+            self.migrate_json(legacy_file)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        """初始化成绩表"""
+        conn = self._get_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                score_key TEXT PRIMARY KEY,
+                exam_id TEXT,
+                exam_name TEXT,
+                student_id TEXT,
+                student_name TEXT,
+                department TEXT,
+                submit_time TEXT,
+                percentage REAL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                source_key TEXT
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(scores)")}
+        if "source_key" not in columns:
+            conn.execute("ALTER TABLE scores ADD COLUMN source_key TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_exam ON scores (exam_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_student ON scores (student_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_department ON scores (department)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_submit_time ON scores (submit_time)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_source_key ON scores (source_key)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+    @staticmethod
+    def score_key(score_id: Any) -> str:
+        """成绩ID统一转为字符串主键"""
+        return str(score_id)
+
+    @staticmethod
+    def _score_id(score_key: str) -> Any:
+        """主键还原为成绩ID（数字ID还原为整数）"""
+        return int(score_key) if score_key.isdigit() else score_key
+
+    @staticmethod
+    def _text(value: Any) -> Optional[str]:
+        return None if value is None else str(value)
+
+    def _row(self, score: Dict, now: float) -> tuple:
+        percentage = score.get("percentage")
+        try:
+            percentage = float(percentage) if percentage is not None else None
+        except (TypeError, ValueError):
+            percentage = None
+        return (
+            self.score_key(score["id"]),
+            self._text(score.get("exam_id")),
+            score.get("exam_name"),
+            self._text(score.get("student_id")),
+            score.get("student_name"),
+            score.get("department"),
+            score.get("submit_time"),
+            percentage,
+            json.dumps(score, ensure_ascii=False),
+            now,
+            self._text(score.get("source_key")),
+        )
+
+    def _existing_keys(self, conn: sqlite3.Connection, keys: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT score_key FROM scores WHERE score_key IN ({placeholders})", chunk))
+        return existing
+
+    def _ids_for_source_keys(self, conn: sqlite3.Connection, source_keys: List[str]) -> Dict[str, Any]:
+        """已入库的 source_key 对应的成绩ID
+
+        兼容早期同步以 "score_<考试>_<考生>" 作为成绩ID写入的记录。
+        """
+        ids = {}
+        for start in range(0, len(source_keys), QUERY_CHUNK_SIZE):
+            chunk = source_keys[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                    f"SELECT source_key, score_key FROM scores WHERE source_key IN ({placeholders})", chunk):
+                ids[row[0]] = self._score_id(row[1])
+            legacy = {f"score_{key}": key for key in chunk if key not in ids}
+            if legacy:
+                for score_key in self._existing_keys(conn, list(legacy)):
+                    ids[legacy[score_key]] = score_key
+        return ids
+
+    def next_id(self) -> int:
+        """下一个可用的数字成绩ID"""
+        row = self._get_connection().execute(
+            "SELECT MAX(CAST(score_key AS INTEGER)) FROM scores WHERE score_key GLOB '[0-9]*'"
+        ).fetchone()
+        return (row[0] or 0) + 1
+
+    def upsert_many(self, scores: Iterable[Dict], meta: Dict[str, str] = None) -> Dict[str, int]:
+        """批量新增或更新成绩（单个事务）
+
+        返回新增和更新的条数；没有ID的成绩按 source_key 沿用已有ID，否则自动分配数字ID。
+        meta 在同一事务中写入（如变更日志消费偏移量），与成绩同时生效。
+        """
+        scores = list(scores)
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            next_id = None
+            source_ids = self._ids_for_source_keys(conn, list({
+                str(score["source_key"]) for score in scores
+                if score.get("id") is None and score.get("source_key") is not None}))
+            rows = {}
+            for score in scores:
+                if score.get("id") is None:
+                    source_key = score.get("source_key")
+                    source_key = None if source_key is None else str(source_key)
+                    if source_key in source_ids:
+                        score = dict(score, id=source_ids[source_key])
+                    else:
+                        if next_id is None:
+                            next_id = self.next_id()
+                        score = dict(score, id=next_id)
+                        next_id += 1
+                        if source_key is not None:
+                            source_ids[source_key] = score["id"]
+                # 同一批次内重复的ID以最后一条为准
+                rows[self.score_key(score["id"])] = self._row(score, now)
+
+            existing = self._existing_keys(conn, list(rows))
+            conn.executemany("""
+                INSERT INTO scores (score_key, exam_id, exam_name, student_id, student_name,
+                                    department, submit_time, percentage, data, updated_at, source_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(score_key) DO UPDATE SET
+                    exam_id = excluded.exam_id,
+                    exam_name = excluded.exam_name,
+                    student_id = excluded.student_id,
+                    student_name = excluded.student_name,
+                    department = excluded.department,
+                    submit_time = excluded.submit_time,
+                    percentage = excluded.percentage,
+                    data = excluded.data,
+                    updated_at = excluded.updated_at,
+                    source_key = excluded.source_key
+            """, list(rows.values()))
+            if meta:
+                conn.executemany("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)",
+                                 [(key, str(value)) for key, value in meta.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return {"inserted": len(rows) - len(existing), "updated": len(existing)}
+
+    def delete(self, score_ids: Iterable[Any]) -> int:
+        """按ID删除成绩"""
+        keys = [(self.score_key(score_id),) for score_id in score_ids]
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany("DELETE FROM scores WHERE score_key = ?", keys)
+            deleted = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def replace_all(self, scores: List[Dict]) -> Dict[str, int]:
+        """用给定列表覆盖成绩库（界面整体保存时使用）"""
+        result = self.upsert_many(scores)
+        keep = {self.score_key(score["id"]) for score in scores if score.get("id") is not None}
+        stale = [row[0] for row in self._get_connection().execute("SELECT score_key FROM scores")
+                 if row[0] not in keep]
+        result["deleted"] = self.delete(stale) if stale else 0
+        return result
+
+    def get_by_source_key(self, source_key: str) -> Optional[Dict]:
+        """按 source_key 读取同步的成绩"""
+        score_id = self._ids_for_source_keys(self._get_connection(), [str(source_key)]).get(str(source_key))
+        return None if score_id is None else self.get(score_id)
+
+    def get(self, score_id: Any) -> Optional[Dict]:
+        """按ID读取成绩"""
+        row = self._get_connection().execute(
+            "SELECT data FROM scores WHERE score_key = ?", (self.score_key(score_id),)
+        ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def query(self, exam_id: Any = None, department: str = None,
+              student_id: Any = None) -> List[Dict]:
+        """按索引字段筛选成绩"""
+        conditions, params = [], []
+        for column, value in (("exam_id", exam_id), ("department", department),
+                              ("student_id", student_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(self._text(value))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._get_connection().execute(
+            f"SELECT data FROM scores {where} ORDER BY rowid", params)
+        return [json.loads(row["data"]) for row in rows]
+
+    def load_all(self) -> List[Dict]:
+        """读取全部成绩（按导入顺序）"""
+        return self.query()
+
+    def count(self) -> int:
+        return self._get_connection().execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._get_connection().execute(
+            "SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._get_connection().execute(
+            "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def feed_offset(self, consumer: str) -> int:
+        """变更日志消费偏移量（已处理的最大序列号）"""
+        return int(self.get_meta(f"feed_offset:{consumer}") or 0)
+
+    def migrate_json(self, json_file: Path) -> int:
+        """一次性迁移旧版 scores.json"""
+        json_file = Path(json_file)
+        if self.get_meta("legacy_json_migrated") or not json_file.exists():
+            return 0
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"迁移旧版成绩数据失败: {e}")
+            return 0
+
+        scores = data.get("scores", []) if isinstance(data, dict) else data
+        result = self.upsert_many(scores) if scores else {"inserted": 0}
+        self.set_meta("legacy_json_migrated", str(json_file))
+        return result["inserted"]
+
+    def export_json(self, json_file: str) -> int:
+        """导出为 scores.json 格式"""
+        scores = self.load_all()
+        temp_file = f"{json_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"scores": scores}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, json_file)
+        return len(scores)
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,26 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import os
-import json
+import sys
 import csv
 import requests
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
 # 导入自定义模块
+sys.path.append(str(Path(__file__).parent.parent))
 from import_scores import ScoreImporter
+from score_statistics.score_store import ScoreStore
+from score_statistics.score_cube import ScoreCube
+from score_statistics.score_index import ScoreSearchIndex
 
-# 尝试导入matplotlib和numpy
+# 统计图表重绘防抖间隔（毫秒）
+STATS_DEBOUNCE_MS = 250
+
+# 尝试导入matplotlib
 try:
-    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
     from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    import numpy as np
+    from score_statistics.score_analytics import ScoreArrays
     HAS_MATPLOTLIB = True
 except ImportError:
     HAS_MATPLOTLIB = False
-    print("警告：未安装matplotlib和numpy，图表功能将不可用")
-    print("请运行：pip install matplotlib numpy")
+    print("警告：未安装matplotlib，图表功能将不可用")
+    print("请运行：pip install matplotlib")
 
 class SimpleScoreManager:
     """简化版成绩统计主类"""
@@ -45,10 +53,29 @@ class SimpleScoreManager:
         }
         
         # 成绩数据存储
+        self.store = ScoreStore()
         self.scores = self.load_scores()
+        # 考试×部门×日期预聚合，统计面板直接从聚合单元汇总
+        self.cube = ScoreCube.from_scores(self.scores.get("scores", []))
+        # 成绩NumPy数组缓存（数据版本, 数组），用于分位数与排名
+        self.score_arrays = None
+        # 搜索倒排索引与考试、部门筛选列
+        self.search_index = ScoreSearchIndex(self.scores.get("scores", []))
         self.current_page = 1
         self.page_size = 20
         
+        # 成绩数据版本（增删改后递增），用于筛选结果与统计缓存失效
+        self.data_version = 0
+        self.filtered_cache = (None, [])
+        # 固定数量的列表行，翻页时只更新行内容
+        self.page_rows = []
+        
+        # 统计计算在后台线程进行，结果按代次丢弃过期的
+        self.stats_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="score-stats")
+        self.stats_generation = 0
+        self.stats_after_id = None
+        self.stats_key = None
+        
         # 统计维度定义
         self.dimensions = {
             'exam': '按考试统计',
@@ -63,9 +90,8 @@ class SimpleScoreManager:
     def load_scores(self):
         """加载成绩数据"""
         try:
-            if os.path.exists('score_statistics/scores.json'):
-                with open('score_statistics/scores.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            if self.store.count():
+                return {"scores": self.store.load_all()}
         except Exception as e:
             print(f"加载成绩数据失败: {e}")
         
@@ -88,12 +114,13 @@ class SimpleScoreManager:
             ]
         }
     
-    def save_scores(self):
-        """保存成绩数据"""
+    def save_scores(self, changed=(), removed_ids=()):
+        """保存界面新增、修改或删除的成绩（只写入变化的记录）"""
         try:
-            os.makedirs('score_statistics', exist_ok=True)
-            with open('score_statistics/scores.json', 'w', encoding='utf-8') as f:
-                json.dump(self.scores, f, ensure_ascii=False, indent=2)
+            if changed:
+                self.store.upsert_many(changed)
+            if removed_ids:
+                self.store.delete(removed_ids)
         except Exception as e:
             messagebox.showerror("错误", f"保存成绩数据失败: {e}")
     
@@ -141,12 +168,9 @@ class SimpleScoreManager:
         title_label.pack(side=tk.LEFT)
         
         # 成绩统计信息
-        total_scores = len(self.scores.get("scores", []))
-        avg_score = 0
-        if total_scores > 0:
-            scores_list = self.scores.get("scores", [])
-            total_points = sum(score.get("score", 0) for score in scores_list)
-            avg_score = round(total_points / total_scores, 1)
+        summary = self.cube.summary()
+        total_scores = summary.count
+        avg_score = round(summary.mean, 1)
         
         stats_label = ttk.Label(
             title_frame,
@@ -436,6 +460,22 @@ class SimpleScoreManager:
         # 统计信息区域
         self.stats_info_frame = ttk.Frame(stats_frame)
         self.stats_info_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        self.create_chart_widgets()
+    
+    def create_chart_widgets(self):
+        """创建可复用的图表、统计信息和合格率表格控件"""
+        if HAS_MATPLOTLIB:
+            self.figure = Figure(figsize=(10, 4))
+            self.ax1, self.ax2 = self.figure.subplots(1, 2)
+            self.chart_canvas = FigureCanvasTkAgg(self.figure, self.chart_frame)
+            self.chart_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        else:
+            ttk.Label(self.chart_frame, text="图表功能需要安装matplotlib和numpy\n请运行：pip install matplotlib numpy").pack(expand=True)
+        
+        self.stats_info_label = ttk.Label(self.stats_info_frame, text="", justify=tk.LEFT)
+        self.stats_info_label.pack(anchor=tk.W)
+        self.pass_rate_table = None
     
     def create_pagination_frame(self, parent):
         """创建分页控件"""
@@ -500,78 +540,95 @@ class SimpleScoreManager:
         """更新筛选选项"""
         try:
             # 更新考试选项
-            exams = ["all"] + list(set(score.get("exam_name", "") for score in self.scores.get("scores", [])))
+            exams = ["all"] + list(set(key[0] for key in self.cube.cells))
             if hasattr(self, 'exam_combo') and self.exam_combo:
                 self.exam_combo['values'] = exams
             
             # 更新部门选项
-            depts = ["all"] + list(set(score.get("department", "") for score in self.scores.get("scores", [])))
+            depts = ["all"] + list(set(key[1] for key in self.cube.cells))
             if hasattr(self, 'dept_combo') and self.dept_combo:
                 self.dept_combo['values'] = depts
         except Exception as e:
             print(f"更新筛选选项出错: {e}")
     
     def refresh_score_list(self):
-        """刷新成绩列表"""
-        # 清空现有数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """刷新成绩列表
         
-        # 获取筛选后的成绩列表
-        filtered_scores = self.get_filtered_scores()
+        筛选结果按筛选条件缓存，翻页只切片并更新固定数量的列表行；
+        筛选结果变化时才（防抖后）重新计算统计图表。
+        """
+        filtered_scores = self.get_current_scores()
         
         # 计算分页
         total_scores = len(filtered_scores)
+        total_pages = (total_scores + self.page_size - 1) // self.page_size
+        self.current_page = max(1, min(self.current_page, total_pages or 1))
         start_idx = (self.current_page - 1) * self.page_size
-        end_idx = start_idx + self.page_size
-        page_scores = filtered_scores[start_idx:end_idx]
-        
-        # 插入数据
-        for score in page_scores:
-            self.tree.insert("", tk.END, values=(
-                score.get("id"),
-                score.get("exam_name", ""),
-                score.get("student_name", ""),
-                score.get("department", ""),
-                score.get("score", 0),
-                score.get("total_score", 100),
-                f"{score.get('percentage', 0):.1f}%",  # 这里仍然显示百分比，因为它表示的是成绩/总分的比例
-                score.get("submit_time", "")
-            ))
+        self.render_page(filtered_scores[start_idx:start_idx + self.page_size])
         
         # 更新分页信息
-        total_pages = (total_scores + self.page_size - 1) // self.page_size
         self.page_info_label.config(text=f"第 {self.current_page} 页，共 {total_pages} 页，总计 {total_scores} 条记录")
         
         # 更新统计图表
-        self.update_statistics()
+        if self.stats_key != self.filtered_cache[0]:
+            self.update_statistics()
+    
+    def render_page(self, page_scores):
+        """把当前页数据写入固定的列表行，多余的行隐藏"""
+        while len(self.page_rows) < len(page_scores):
+            self.page_rows.append(self.tree.insert("", tk.END))
+        
+        for index, row_id in enumerate(self.page_rows):
+            if index < len(page_scores):
+                score = page_scores[index]
+                self.tree.item(row_id, values=(
+                    score.get("id"),
+                    score.get("exam_name", ""),
+                    score.get("student_name", ""),
+                    score.get("department", ""),
+                    score.get("score", 0),
+                    score.get("total_score", 100),
+                    f"{score.get('percentage', 0):.1f}%",  # 这里仍然显示百分比，因为它表示的是成绩/总分的比例
+                    score.get("submit_time", "")
+                ))
+                self.tree.move(row_id, "", index)
+            else:
+                self.tree.detach(row_id)
+        self.tree.selection_remove(self.tree.selection())
+    
+    def get_filter_state(self):
+        """当前筛选条件"""
+        exam_filter = self.exam_filter_var.get()
+        dept_filter = self.dept_filter_var.get()
+        return (
+            self.search_var.get().strip(),
+            None if exam_filter == "all" else exam_filter,
+            None if dept_filter == "all" else dept_filter,
+            self.data_version
+        )
+    
+    def get_current_scores(self):
+        """当前筛选条件下的成绩列表（缓存）"""
+        key = self.get_filter_state()
+        if self.filtered_cache[0] != key:
+            self.filtered_cache = (key, self.get_filtered_scores())
+        return self.filtered_cache[1]
+    
+    def mark_scores_changed(self):
+        """成绩增删改后使筛选结果与统计数组缓存失效"""
+        self.data_version += 1
+        self.score_arrays = None
     
     def get_filtered_scores(self):
-        """获取筛选后的成绩列表"""
-        scores = self.scores.get("scores", [])
-        filtered = []
-        
-        search_term = self.search_var.get().lower()
+        """获取筛选后的成绩列表（考生姓名、考试名称、部门、ID搜索）"""
         exam_filter = self.exam_filter_var.get()
         dept_filter = self.dept_filter_var.get()
         
-        for score in scores:
-            # 搜索筛选
-            if search_term:
-                if not any(search_term in str(value).lower() for value in score.values()):
-                    continue
-            
-            # 考试筛选
-            if exam_filter != "all" and score.get("exam_name") != exam_filter:
-                continue
-            
-            # 部门筛选
-            if dept_filter != "all" and score.get("department") != dept_filter:
-                continue
-            
-            filtered.append(score)
-        
-        return filtered
+        return self.search_index.search(
+            self.search_var.get().strip(),
+            exam_name=None if exam_filter == "all" else exam_filter,
+            department=None if dept_filter == "all" else dept_filter
+        )
     
     def search_scores(self):
         """搜索成绩"""
@@ -594,7 +651,7 @@ class SimpleScoreManager:
     
     def next_page(self):
         """下一页"""
-        total_scores = len(self.get_filtered_scores())
+        total_scores = len(self.get_current_scores())
         total_pages = (total_scores + self.page_size - 1) // self.page_size
         if self.current_page < total_pages:
             self.current_page += 1
@@ -630,283 +687,298 @@ class SimpleScoreManager:
             return
         
         if messagebox.askyesno("确认", "确定要删除选中的成绩记录吗？"):
+            removed_ids = []
             for item in selected:
                 score_id = self.tree.item(item)['values'][0]
+                removed_ids.append(score_id)
+                removed = [s for s in self.scores["scores"] if s.get("id") == score_id]
                 self.scores["scores"] = [s for s in self.scores["scores"] if s.get("id") != score_id]
+                for score in removed:
+                    self.cube.remove(score)
+                self.search_index.remove(score_id)
+            self.mark_scores_changed()
             
-            self.save_scores()
+            self.save_scores(removed_ids=removed_ids)
             self.refresh_score_list()
             messagebox.showinfo("成功", "成绩记录已删除")
     
     def get_score_by_id(self, score_id):
         """根据ID获取成绩数据"""
-        for score in self.scores.get("scores", []):
-            if score.get("id") == score_id:
-                return score
-        return None
+        return self.search_index.get(score_id)
     
-    def update_statistics(self, event=None):
-        """更新统计图表"""
-        # 清空图表区域
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
-        
-        # 清空统计信息区域
-        for widget in self.stats_info_frame.winfo_children():
-            widget.destroy()
+    @staticmethod
+    def get_statistics_cube(cube, search, exam, department, filtered_scores):
+        """获取筛选条件对应的聚合立方体及切片条件
         
+        只按考试、部门筛选时直接切片预聚合立方体；有搜索关键词时
+        只对搜索结果临时聚合。
+        """
+        if search:
+            return ScoreCube.from_scores(filtered_scores, cube.pass_score), None, None
+        return cube, exam, department
+    
+    def get_score_arrays(self, search, exam, department, filtered_scores, scores, version):
+        """获取筛选条件下的成绩数组"""
+        if search:
+            return ScoreArrays.from_scores(filtered_scores)
+        cached = self.score_arrays
+        if cached is None or cached[0] != version:
+            cached = (version, ScoreArrays.from_scores(scores))
+            # 计算期间成绩又有修改时不写入缓存
+            if version == self.data_version:
+                self.score_arrays = cached
+        arrays = cached[1]
+        
+        if exam is None and department is None:
+            return arrays
+        return arrays.subset(arrays.mask(exam=exam, department=department))
+    
+    def update_statistics(self, event=None):
+        """更新统计图表（防抖，连续触发只计算最后一次）"""
+        if self.stats_after_id is not None:
+            self.root.after_cancel(self.stats_after_id)
+        self.stats_after_id = self.root.after(STATS_DEBOUNCE_MS, self.start_statistics_job)
+    
+    def start_statistics_job(self):
+        """在后台线程计算统计数据"""
+        self.stats_after_id = None
+        self.stats_generation += 1
+        generation = self.stats_generation
+        
+        filtered_scores = self.get_current_scores()
+        self.stats_key = self.filtered_cache[0]
+        search, exam, department, version = self.stats_key
+        
+        # 在主线程生成快照，后台计算期间界面增删改成绩不影响计算：
+        # 立方体复制聚合单元，成绩列表浅复制（修改成绩时替换字典而不是原地修改）
+        params = (self.dimension_var.get(), search, exam, department,
+                  list(filtered_scores), list(self.scores.get("scores", [])), version,
+                  self.cube.copy())
+        
+        def job():
+            result = self.compute_statistics(*params)
+            self.root.after(0, lambda: self.apply_statistics(generation, result))
+        
+        self.stats_executor.submit(job)
+    
+    def compute_statistics(self, dimension, search, exam, department,
+                           filtered_scores, scores, version, cube):
+        """计算图表与统计信息数据（后台线程，只使用传入的快照，不访问Tk控件）"""
+        cube, exam, department = self.get_statistics_cube(cube, search, exam, department, filtered_scores)
+        summary = cube.summary(exam, department)
+        if not summary.count:
+            return {"empty": True}
+        
+        result = {"empty": False, "summary": summary,
+                  "pass_rates": cube.exam_pass_rates(exam, department)}
         if not HAS_MATPLOTLIB:
-            ttk.Label(self.chart_frame, text="图表功能需要安装matplotlib和numpy\n请运行：pip install matplotlib numpy").pack(expand=True)
-            return
-        
-        dimension = self.dimension_var.get()
-        filtered_scores = self.get_filtered_scores()
-        
-        if not filtered_scores:
-            ttk.Label(self.chart_frame, text="暂无数据").pack(expand=True)
-            return
-        
-        # 创建图表
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+            return result
         
+        arrays = self.get_score_arrays(search, exam, department, filtered_scores, scores, version)
+        result["distribution"] = arrays.describe()
         if dimension == 'exam':
-            self.analyze_by_exam(filtered_scores, ax1, ax2)
+            result["charts"] = self.analyze_by_exam(cube.rollup('exam', exam, department))
         elif dimension == 'student':
-            self.analyze_by_student(filtered_scores, ax1, ax2)
+            result["charts"] = self.analyze_by_student(arrays, summary)
         elif dimension == 'department':
-            self.analyze_by_department(filtered_scores, ax1, ax2)
+            result["charts"] = self.analyze_by_department(cube.rollup('department', exam, department))
         elif dimension == 'date':
-            self.analyze_by_date(filtered_scores, ax1, ax2)
+            result["charts"] = self.analyze_by_date(cube.rollup('date', exam, department))
+        return result
+    
+    def apply_statistics(self, generation, result):
+        """主线程：用计算结果更新复用的图表与表格"""
+        if generation != self.stats_generation:
+            return
         
-        # 嵌入图表
-        canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        if HAS_MATPLOTLIB:
+            self.ax1.clear()
+            self.ax2.clear()
+            if result["empty"]:
+                self.ax1.text(0.5, 0.5, "暂无数据", ha='center', va='center', transform=self.ax1.transAxes)
+                self.ax2.set_axis_off()
+            else:
+                self.ax2.set_axis_on()
+                for ax, chart in zip((self.ax1, self.ax2), result.get("charts", ())):
+                    self.draw_chart(ax, chart)
+            self.figure.tight_layout()
+            self.chart_canvas.draw_idle()
+        
+        if result["empty"]:
+            self.stats_info_label.config(text="")
+            self.create_exam_pass_rate_table({})
+            return
         
         # 显示统计信息
-        self.show_statistics_info(filtered_scores)
+        self.show_statistics_info(result["summary"], result.get("distribution"))
+        
+        # 考试合格率统计表格
+        self.create_exam_pass_rate_table(result["pass_rates"])
     
-    def analyze_by_exam(self, scores, ax1, ax2):
+    @staticmethod
+    def draw_chart(ax, chart):
+        """按图表描述绘制到坐标轴"""
+        kind = chart["kind"]
+        if kind == "text":
+            ax.text(0.5, 0.5, chart["text"], ha='center', va='center', transform=ax.transAxes)
+            return
+        if kind == "bar":
+            ax.bar(chart["x"], chart["y"])
+        elif kind == "line":
+            ax.plot(chart["x"], chart["y"], marker='o')
+        elif kind == "pie":
+            ax.pie(chart["y"], labels=chart["x"], autopct='%1.1f%%')
+        elif kind == "hist":
+            ax.hist(chart["x"], bins=chart["bins"], weights=chart["y"], alpha=0.7)
+        
+        ax.set_title(chart.get("title", ""))
+        if chart.get("xlabel"):
+            ax.set_xlabel(chart["xlabel"])
+        if chart.get("ylabel"):
+            ax.set_ylabel(chart["ylabel"])
+        if chart.get("rotate"):
+            ax.tick_params(axis='x', rotation=45)
+    
+    def analyze_by_exam(self, exam_cells):
         """按考试分析"""
-        exam_stats = {}
-        for score in scores:
-            exam_name = score.get("exam_name", "未知考试")
-            if exam_name not in exam_stats:
-                exam_stats[exam_name] = []
-            exam_stats[exam_name].append(score.get("score", 0))
-        
-        # 计算平均分
-        exam_avgs = {exam: np.mean(scores) for exam, scores in exam_stats.items()}
-        
-        # 柱状图
-        exams = list(exam_avgs.keys())
-        avgs = list(exam_avgs.values())
-        ax1.bar(exams, avgs)
-        ax1.set_title("各考试平均分")
-        ax1.set_ylabel("平均分")
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # 饼图
-        total_scores = len(scores)
-        exam_counts = {exam: len(scores) for exam, scores in exam_stats.items()}
-        ax2.pie(exam_counts.values(), labels=exam_counts.keys(), autopct='%1.1f%%')
-        ax2.set_title("考试分布")
+        exams = list(exam_cells.keys())
+        return (
+            # 柱状图
+            {"kind": "bar", "x": exams, "y": [cell.mean for cell in exam_cells.values()],
+             "title": "各考试平均分", "ylabel": "平均分", "rotate": True},
+            # 饼图
+            {"kind": "pie", "x": exams, "y": [cell.count for cell in exam_cells.values()],
+             "title": "考试分布"},
+        )
     
-    def analyze_by_student(self, scores, ax1, ax2):
+    def analyze_by_student(self, arrays, summary):
         """按考生分析"""
-        student_stats = {}
-        for score in scores:
-            student_name = score.get("student_name", "未知考生")
-            if student_name not in student_stats:
-                student_stats[student_name] = []
-            student_stats[student_name].append(score.get("score", 0))
-        
-        # 计算平均分
-        student_avgs = {student: np.mean(scores) for student, scores in student_stats.items()}
-        
-        # 取前10名
-        top_students = sorted(student_avgs.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        # 柱状图
-        students = [s[0] for s in top_students]
-        avgs = [s[1] for s in top_students]
-        ax1.bar(students, avgs)
-        ax1.set_title("考生平均分排名（前10名）")
-        ax1.set_ylabel("平均分")
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # 成绩分布
-        all_scores = [score.get("score", 0) for score in scores]
-        ax2.hist(all_scores, bins=10, alpha=0.7)
-        ax2.set_title("成绩分布")
-        ax2.set_xlabel("分数")
-        ax2.set_ylabel("人数")
+        # 取前10名（按考生平均分）
+        top_students = arrays.top_k(10, "student")
+        
+        # 成绩分布（由聚合单元的分数频次得到）
+        counts, edges = summary.histogram(bins=10)
+        return (
+            {"kind": "bar", "x": [s["name"] for s in top_students], "y": [s["mean"] for s in top_students],
+             "title": "考生平均分排名（前10名）", "ylabel": "平均分", "rotate": True},
+            {"kind": "hist", "x": edges[:-1], "bins": edges, "y": counts,
+             "title": "成绩分布", "xlabel": "分数", "ylabel": "人数"},
+        )
     
-    def analyze_by_department(self, scores, ax1, ax2):
+    def analyze_by_department(self, dept_cells):
         """按部门分析"""
-        dept_stats = {}
-        for score in scores:
-            dept = score.get("department", "未知部门")
-            if dept not in dept_stats:
-                dept_stats[dept] = []
-            dept_stats[dept].append(score.get("score", 0))
-        
-        # 计算平均分
-        dept_avgs = {dept: np.mean(scores) for dept, scores in dept_stats.items()}
-        
-        # 柱状图
-        depts = list(dept_avgs.keys())
-        avgs = list(dept_avgs.values())
-        ax1.bar(depts, avgs)
-        ax1.set_title("各部门平均分")
-        ax1.set_ylabel("平均分")
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # 饼图
-        dept_counts = {dept: len(scores) for dept, scores in dept_stats.items()}
-        ax2.pie(dept_counts.values(), labels=dept_counts.keys(), autopct='%1.1f%%')
-        ax2.set_title("部门分布")
+        depts = list(dept_cells.keys())
+        return (
+            # 柱状图
+            {"kind": "bar", "x": depts, "y": [cell.mean for cell in dept_cells.values()],
+             "title": "各部门平均分", "ylabel": "平均分", "rotate": True},
+            # 饼图
+            {"kind": "pie", "x": depts, "y": [cell.count for cell in dept_cells.values()],
+             "title": "部门分布"},
+        )
     
-    def analyze_by_date(self, scores, ax1, ax2):
+    def analyze_by_date(self, date_cells):
         """按日期分析"""
-        date_stats = {}
-        for score in scores:
-            submit_time = score.get("submit_time", "")
-            if submit_time:
-                date = submit_time.split()[0]  # 取日期部分
-                if date not in date_stats:
-                    date_stats[date] = []
-                date_stats[date].append(score.get("score", 0))
-        
-        if not date_stats:
-            ax1.text(0.5, 0.5, "无日期数据", ha='center', va='center', transform=ax1.transAxes)
-            ax2.text(0.5, 0.5, "无日期数据", ha='center', va='center', transform=ax2.transAxes)
-            return
-        
-        # 计算平均分
-        date_avgs = {date: np.mean(scores) for date, scores in date_stats.items()}
+        if not date_cells:
+            no_data = {"kind": "text", "text": "无日期数据"}
+            return no_data, no_data
         
         # 按日期排序
-        sorted_dates = sorted(date_avgs.items())
-        dates = [d[0] for d in sorted_dates]
-        avgs = [d[1] for d in sorted_dates]
-        
-        # 折线图
-        ax1.plot(dates, avgs, marker='o')
-        ax1.set_title("成绩趋势")
-        ax1.set_ylabel("平均分")
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # 柱状图
-        ax2.bar(dates, avgs)
-        ax2.set_title("各日期平均分")
-        ax2.set_ylabel("平均分")
-        ax2.tick_params(axis='x', rotation=45)
+        dates = sorted(date_cells)
+        avgs = [date_cells[date].mean for date in dates]
+        return (
+            # 折线图
+            {"kind": "line", "x": dates, "y": avgs, "title": "成绩趋势", "ylabel": "平均分", "rotate": True},
+            # 柱状图
+            {"kind": "bar", "x": dates, "y": avgs, "title": "各日期平均分", "ylabel": "平均分", "rotate": True},
+        )
     
-    def show_statistics_info(self, scores):
-        """显示统计信息"""
-        if not scores:
+    def show_statistics_info(self, summary, distribution=None):
+        """显示统计信息（distribution 为 ScoreArrays.describe 的结果）"""
+        total = summary.count
+        if not total:
             return
         
-        # 基本统计
-        all_scores = [score.get("score", 0) for score in scores]
-        if HAS_MATPLOTLIB:
-            avg_score = np.mean(all_scores)
-            max_score = np.max(all_scores)
-            min_score = np.min(all_scores)
-            std_score = np.std(all_scores)
-        else:
-            avg_score = sum(all_scores) / len(all_scores)
-            max_score = max(all_scores)
-            min_score = min(all_scores)
-            std_score = 0  # 简化计算
-        
         # 分数段统计
-        excellent = len([s for s in all_scores if s >= 90])
-        good = len([s for s in all_scores if 80 <= s < 90])
-        fair = len([s for s in all_scores if 70 <= s < 80])
-        pass_score = len([s for s in all_scores if 60 <= s < 70])
-        fail = len([s for s in all_scores if s < 60])
+        bands = summary.bands()
+        excellent = bands["excellent"]
+        good = bands["good"]
+        fair = bands["fair"]
+        pass_score = bands["pass"]
+        fail = bands["fail"]
         
         # 显示统计信息
         info_text = f"""
 基本统计：
-- 总记录数：{len(scores)}
-- 平均分：{avg_score:.2f}
-- 最高分：{max_score}
-- 最低分：{min_score}
-- 标准差：{std_score:.2f}
-
+- 总记录数：{total}
+- 平均分：{summary.mean:.2f}
+- 最高分：{summary.max:g}
+- 最低分：{summary.min:g}
+- 标准差：{summary.std:.2f}
+{self.format_quantiles(distribution)}
 分数段分布：
-- 优秀（90分以上）：{excellent}人 ({excellent/len(scores)*100:.1f}%)
-- 良好（80-89分）：{good}人 ({good/len(scores)*100:.1f}%)
-- 中等（70-79分）：{fair}人 ({fair/len(scores)*100:.1f}%)
-- 及格（60-69分）：{pass_score}人 ({pass_score/len(scores)*100:.1f}%)
-- 不及格（60分以下）：{fail}人 ({fail/len(scores)*100:.1f}%)
+- 优秀（90分以上）：{excellent}人 ({excellent/total*100:.1f}%)
+- 良好（80-89分）：{good}人 ({good/total*100:.1f}%)
+- 中等（70-79分）：{fair}人 ({fair/total*100:.1f}%)
+- 及格（60-69分）：{pass_score}人 ({pass_score/total*100:.1f}%)
+- 不及格（60分以下）：{fail}人 ({fail/total*100:.1f}%)
         """
         
-        ttk.Label(self.stats_info_frame, text=info_text, justify=tk.LEFT).pack(anchor=tk.W)
-        
-        # 添加考试合格率统计表格
-        self.create_exam_pass_rate_table(scores)
+        self.stats_info_label.config(text=info_text)
     
-    def create_exam_pass_rate_table(self, scores):
-        """创建考试合格率统计表格"""
-        # 创建表格框架
-        table_frame = ttk.LabelFrame(self.stats_info_frame, text="考试合格率统计表", padding="10")
-        table_frame.pack(fill=tk.X, pady=(10, 0))
-        
-        # 创建表格
-        columns = ("考试名称", "考试人数", "总分", "合格分数", "合格人数", "通过率")
-        table = ttk.Treeview(table_frame, columns=columns, show="headings", height=5)
-        
-        # 设置列标题和宽度
-        column_widths = {
-            "考试名称": 200,
-            "考试人数": 80,
-            "总分": 80,
-            "合格分数": 80,
-            "合格人数": 80,
-            "通过率": 100
-        }
-        
-        for col in columns:
-            table.heading(col, text=col)
-            table.column(col, width=column_widths.get(col, 100), anchor="center")
-        
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
-        table.configure(yscrollcommand=scrollbar.set)
-        
-        table.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # 按考试分组统计数据
-        exam_stats = {}
-        for score in scores:
-            exam_name = score.get("exam_name", "未知考试")
-            if exam_name not in exam_stats:
-                exam_stats[exam_name] = {
-                    "total": 0,
-                    "pass": 0,
-                    "total_score": score.get("total_score", 100),
-                    "pass_score": 60  # 默认60分为合格分数
-                }
+    @staticmethod
+    def format_quantiles(distribution):
+        """分位数统计文本"""
+        if not distribution or not distribution.get("count"):
+            return ""
+        return (f"- 分位数：P25 {distribution['p25']:.1f} / 中位数 {distribution['p50']:.1f} / "
+                f"P75 {distribution['p75']:.1f} / P90 {distribution['p90']:.1f}\n")
+    
+    def create_exam_pass_rate_table(self, exam_stats):
+        """更新考试合格率统计表格（exam_stats 来自 ScoreCube.exam_pass_rates，表格首次调用时创建）"""
+        if self.pass_rate_table is None:
+            # 创建表格框架
+            table_frame = ttk.LabelFrame(self.stats_info_frame, text="考试合格率统计表", padding="10")
+            table_frame.pack(fill=tk.X, pady=(10, 0))
+            
+            # 创建表格
+            columns = ("考试名称", "考试人数", "总分", "合格分数", "合格人数", "通过率")
+            table = ttk.Treeview(table_frame, columns=columns, show="headings", height=5)
+            
+            # 设置列标题和宽度
+            column_widths = {
+                "考试名称": 200,
+                "考试人数": 80,
+                "总分": 80,
+                "合格分数": 80,
+                "合格人数": 80,
+                "通过率": 100
+            }
             
-            exam_stats[exam_name]["total"] += 1
-            if score.get("score", 0) >= exam_stats[exam_name]["pass_score"]:  # 使用设置的合格分数
-                exam_stats[exam_name]["pass"] += 1
+            for col in columns:
+                table.heading(col, text=col)
+                table.column(col, width=column_widths.get(col, 100), anchor="center")
+            
+            # 添加滚动条
+            scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+            table.configure(yscrollcommand=scrollbar.set)
+            
+            table.pack(side=tk.LEFT, fill=tk.X, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            self.pass_rate_table = table
+        
+        table = self.pass_rate_table
+        table.delete(*table.get_children())
         
         # 填充表格数据
         for exam_name, stats in exam_stats.items():
-            pass_rate = (stats["pass"] / stats["total"]) * 100 if stats["total"] > 0 else 0
             table.insert("", tk.END, values=(
                 exam_name,
                 stats["total"],
                 stats["total_score"],
                 stats["pass_score"],
                 stats["pass"],
-                f"{pass_rate:.1f}% ({stats['pass']}/{stats['total']})"
+                f"{stats['pass_rate']:.1f}% ({stats['pass']}/{stats['total']})"
             ))
     
     def export_data(self):
@@ -1212,7 +1284,10 @@ class SimpleScoreManager:
     
     def run(self):
         """运行应用"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.stats_executor.shutdown(wait=False, cancel_futures=True)
 
 class ScoreDialog:
     """成绩编辑对话框"""
@@ -1301,6 +1376,8 @@ class ScoreDialog:
                 for i, score in enumerate(self.score_manager.scores["scores"]):
                     if score['id'] == score_data['id']:
                         self.score_manager.scores["scores"][i] = score_data
+                        self.score_manager.cube.replace(score, score_data)
+                        self.score_manager.search_index.update(score_data)
                         break
             else:
                 # 新增模式
@@ -1309,8 +1386,11 @@ class ScoreDialog:
                 score_data['updated_at'] = score_data['created_at']
                 
                 self.score_manager.scores["scores"].append(score_data)
+                self.score_manager.cube.add(score_data)
+                self.score_manager.search_index.add(score_data)
             
-            self.score_manager.save_scores()
+            self.score_manager.mark_scores_changed()
+            self.score_manager.save_scores(changed=[score_data])
             self.dialog.destroy()
             messagebox.showinfo("成功", "成绩数据已保存")
             
@@ -1318,11 +1398,8 @@ class ScoreDialog:
             messagebox.showerror("错误", f"保存失败: {e}")
     
     def get_next_score_id(self):
-        """获取下一个成绩ID"""
-        scores = self.score_manager.scores.get("scores", [])
-        if not scores:
-            return 1
-        return max(score.get("id", 0) for score in scores) + 1
+        """获取下一个成绩ID（同步写入的成绩也在成绩库中，由成绩库分配）"""
+        return self.score_manager.store.next_id()
 
 if __name__ == "__main__":
     app = SimpleScoreManager()
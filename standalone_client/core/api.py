@@ -12,6 +12,7 @@ import time
 from typing import Dict, Any, Optional, List
 from .config import client_config
 from utils.logger import get_logger
+from utils.storage import local_storage
 
 logger = get_logger(__name__)
 
@@ -285,17 +286,23 @@ class APIClient:
 
             from client.exam_management_api import exam_api
 
-            # 获取考试详情
-            exam_details = exam_api.get_exam_details(exam_id)
-            if exam_details:
+            # 获取考试信息
+            exam_info = next((exam for exam in exam_api.load_published_exams()
+                              if exam.get('id') == exam_id), None)
+            if not exam_info or not exam_info.get('paper_id'):
+                return None
+
+            # 获取试卷（不含答案），本机已有相同版本时直接复用
+            paper = self.get_paper(exam_info['paper_id'])
+            if paper:
                 # 转换为客户端格式
                 return {
-                    "id": exam_details.get("id"),
-                    "name": exam_details.get("name"),
-                    "description": exam_details.get("description", ""),
-                    "duration": exam_details.get("duration", 60),
-                    "total_score": exam_details.get("total_score", 100),
-                    "questions": self._format_questions(exam_details.get("questions", []))
+                    "id": exam_id,
+                    "name": exam_info.get("title", paper.get("name")),
+                    "description": exam_info.get("description", ""),
+                    "duration": exam_info.get("duration", 60),
+                    "total_score": exam_info.get("total_score", 100),
+                    "questions": self._format_questions(paper.get("questions", []))
                 }
 
             return None
@@ -304,6 +311,34 @@ class APIClient:
             logger.warning(f"从考试管理模块获取考试详情失败: {e}")
             return None
 
+    def get_paper(self, paper_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        获取试卷数据（不含答案），试卷没有题目时 questions 为空列表
+        
+        以本地副本的内容哈希向题库请求，哈希一致时题库不返回数据块，
+        直接使用本地副本；同一台考试机上只有第一位考生需要下载和解析试卷。
+        """
+        try:
+            from client import api as paper_api
+
+            cached = local_storage.get_paper_payload(paper_id)
+            payload = paper_api.get_paper_payload(paper_id, known_hash=cached[0] if cached else None)
+            if payload is None:
+                return None
+
+            if payload["blob"] is None:
+                logger.debug(f"使用本地试卷副本: {paper_id}")
+                blob = cached[1]
+            else:
+                blob = payload["blob"]
+                local_storage.save_paper_payload(paper_id, payload["hash"], blob)
+
+            return paper_api.decode_paper_payload(blob)
+
+        except Exception as e:
+            logger.warning(f"获取试卷失败: {e}")
+            return None
+
     def _format_questions(self, questions: List[Dict]) -> List[Dict]:
         """格式化题目数据为客户端格式"""
         formatted_questions = []
@@ -330,7 +365,6 @@ class APIClient:
                     "type": q.get('type', 'single_choice'),
                     "content": q.get('content', ''),
                     "options": options,
-                    "correct_answer": q.get('correct_answer', ''),
                     "score": q.get('score', 10)
                 }
 
@@ -65,6 +65,16 @@ class LocalStorage:
                     )
                 ''')
                 
+                # 创建试卷数据块表（不含答案，按内容哈希校验）
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS paper_payloads (
+                        paper_id TEXT PRIMARY KEY,
+                        content_hash TEXT NOT NULL,
+                        payload BLOB NOT NULL,
+                        saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
                 # 创建用户设置表
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS user_settings (
@@ -281,6 +291,49 @@ class LocalStorage:
             logger.error(f"清除考试数据失败: {e}")
             return False
     
+    def save_paper_payload(self, paper_id: Any, content_hash: str, payload: bytes) -> bool:
+        """保存试卷数据块"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO paper_payloads 
+                    (paper_id, content_hash, payload, saved_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (str(paper_id), content_hash, sqlite3.Binary(payload)))
+                conn.commit()
+            
+            logger.debug(f"试卷数据块已保存: {paper_id} ({content_hash[:12]})")
+            return True
+            
+        except Exception as e:
+            logger.error(f"保存试卷数据块失败: {e}")
+            return False
+    
+    def get_paper_payload(self, paper_id: Any) -> Optional[tuple]:
+        """获取本地试卷数据块，返回 (内容哈希, 数据块)；内容与哈希不符时视为无副本"""
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT content_hash, payload FROM paper_payloads 
+                    WHERE paper_id = ?
+                ''', (str(paper_id),))
+                
+                result = cursor.fetchone()
+                if not result:
+                    return None
+            
+            content_hash, payload = result[0], bytes(result[1])
+            if hashlib.sha256(payload).hexdigest() != content_hash:
+                logger.warning(f"试卷数据块校验失败，丢弃本地副本: {paper_id}")
+                return None
+            return content_hash, payload
+            
+        except Exception as e:
+            logger.error(f"获取试卷数据块失败: {e}")
+            return None
+    
     def save_json(self, filename: str, data: Any) -> bool:
         """保存JSON文件"""
         try:
@@ -428,7 +428,7 @@ class SystemLauncher:
             # 目前简单检查数据文件是否存在
             data_files = [
                 'user_management/users.json',
-                'score_statistics/scores.json'
+                'score_statistics/scores.db'  # 成绩存储（ScoreStore）的SQLite数据库
             ]
             
             missing_files = []
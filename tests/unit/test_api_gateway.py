@@ -0,0 +1,607 @@
+"""
+API网关单元测试
+
+测试api_gateway/gateway.py的上游连接复用、响应流式转发、并发健康检查、响应缓存、请求合并、限流、指标与后端断路器。
+后端为本机临时启动的桩服务。
+"""
+
+import json
+import time
+import socket
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+try:
+    from api_gateway.gateway import APIGateway, create_token_manager
+    from api_gateway.response_cache import ResponseCache
+    from api_gateway.rate_limiter import RateLimiter, rate_limit_rules
+    from api_gateway.metrics import MetricsRegistry, LatencyHistogram, bucket_index, bucket_bounds
+    from api_gateway.backends import Backend, BackendPool, CircuitBreaker, merge_resilience_config
+    from common.security_manager import TokenManager, TokenDenylist
+except ImportError as e:
+    pytest.skip(f"无法导入API网关模块: {e}", allow_module_level=True)
+
+
+class StubBackend:
+    """本机桩后端（HTTP/1.1长连接），记录客户端连接端口"""
+
+    def __init__(self, health_delay=0.0):
+        self.ports = set()
+        self.hits = defaultdict(int)
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status, body, content_type="application/json", headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                backend.ports.add(self.client_address[1])
+                backend.hits[self.path] += 1
+                if self.path == "/health":
+                    time.sleep(health_delay)
+                    self.send_body(200, b'{"status": "ok"}')
+                elif self.path == "/items":
+                    self.send_body(200, json.dumps({"items": [1, 2, 3]}).encode())
+                elif self.path.startswith("/papers"):
+                    body = json.dumps({"version": backend.hits[self.path]}).encode()
+                    self.send_body(200, body, headers=[("Cache-Control", "max-age=60")])
+                elif self.path.startswith("/reports"):
+                    # 慢接口，用于并发请求合并
+                    time.sleep(0.3)
+                    self.send_body(200, b'{"report": 1}', headers=[("Cache-Control", "max-age=60")])
+                elif self.path.startswith("/catalog"):
+                    body = json.dumps({"version": backend.hits[self.path]}).encode()
+                    self.send_body(200, body, headers=[("Cache-Control", "public, max-age=60")])
+                elif self.path == "/private":
+                    self.send_body(200, b"{}", headers=[("Cache-Control", "private")])
+                elif self.path == "/export":
+                    # 分块传输，长度未知
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/csv")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for _ in range(512):
+                        self.wfile.write(b"400\r\n" + b"x" * 1024 + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self.send_body(404, b"{}")
+
+            def do_POST(self):
+                backend.ports.add(self.client_address[1])
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_body(201, json.dumps({"received": json.loads(body)}).encode())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def closed_port_url():
+    """没有服务监听的本机地址"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture
+def backends():
+    started = [StubBackend(health_delay=0.3) for _ in range(3)]
+    yield started
+    for backend in started:
+        backend.stop()
+
+
+@pytest.fixture
+def gateway(temp_dir, backends, monkeypatch):
+    monkeypatch.setenv("PHRL_TOKEN_SECRET", "gateway-test-secret")
+    config = APIGateway.get_default_config()
+    config["auth"]["revocation_db"] = str(temp_dir / "revoked.db")
+    with open(temp_dir / "gateway.json", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    gw = APIGateway(str(temp_dir / "gateway.json"))
+    gw.config["auth"]["enabled"] = False
+    gw.config["caching"]["enabled"] = False
+    gw.config["services"] = {
+        f"svc{i}": {"url": backend.url, "prefix": f"/api/svc{i}", "timeout": 5}
+        for i, backend in enumerate(backends)
+    }
+    gw.upstream.services = gw.config["services"]
+    yield gw
+    gw.close()
+
+
+@pytest.mark.unit
+class TestUpstreamForwarding:
+    """上游转发测试"""
+
+    def test_requests_reuse_pooled_connection(self, gateway, backends):
+        """测试连续请求复用同一条上游连接"""
+        client = gateway.app.test_client()
+        for _ in range(5):
+            response = client.get("/api/svc0/items")
+            assert response.status_code == 200
+            assert response.get_json() == {"items": [1, 2, 3]}
+
+        response = client.post("/api/svc0/items", json={"name": "试卷"})
+        assert response.status_code == 201
+        assert response.get_json() == {"received": {"name": "试卷"}}
+        assert len(backends[0].ports) == 1
+
+    def test_large_response_is_streamed(self, gateway):
+        """测试长度未知的大响应按块转发"""
+        response = gateway.app.test_client().get("/api/svc0/export")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert len(response.get_data()) == 512 * 1024
+
+    def test_unreachable_service_returns_503(self, gateway):
+        """测试后端不可达时返回503"""
+        gateway.config["services"]["svc0"]["url"] = "http://127.0.0.1:9"
+        response = gateway.app.test_client().get("/api/svc0/items")
+        assert response.status_code == 503
+
+    def test_health_checks_run_concurrently(self, gateway):
+        """测试健康检查并发进行"""
+        start = time.time()
+        health = gateway.check_services_health()
+        elapsed = time.time() - start
+
+        assert set(health) == {"svc0", "svc1", "svc2"}
+        assert all(status["status"] == "healthy" for status in health.values())
+        assert elapsed < 0.8
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """响应缓存测试"""
+
+    def test_gateway_serves_hits_and_304(self, gateway, backends):
+        """测试重复请求命中缓存，条件请求返回304，私有响应不缓存"""
+        gateway.config["caching"]["enabled"] = True
+        client = gateway.app.test_client()
+
+        first = client.get("/api/svc0/papers?b=2&a=1")
+        assert first.headers["X-Cache"] == "MISS"
+        etag = first.headers["ETag"]
+        second = client.get("/api/svc0/papers?a=1&b=2")
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.get_json() == first.get_json() == {"version": 1}
+
+        not_modified = client.get("/api/svc0/papers?a=1&b=2", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+        assert backends[0].hits["/papers?b=2&a=1"] == 1
+
+        client.get("/api/svc0/private")
+        client.get("/api/svc0/private")
+        assert backends[0].hits["/private"] == 2
+
+        stats = client.get("/stats").get_json()["cache"]
+        assert stats["hits"] == 2 and stats["not_modified"] == 1
+        assert stats["entries"] == 1
+
+    def test_authorized_responses_need_public(self, gateway, backends):
+        """测试带 Authorization 的请求只缓存后端声明 public 的响应，其他用户不会拿到别人的响应"""
+        gateway.config["caching"]["enabled"] = True
+        client = gateway.app.test_client()
+        alice, bob = {"Authorization": "Bearer alice"}, {"Authorization": "Bearer bob"}
+
+        assert client.get("/api/svc0/papers", headers=alice).headers.get("X-Cache") is None
+        assert client.get("/api/svc0/papers", headers=bob).get_json() == {"version": 2}
+        assert client.get("/api/svc0/catalog", headers=alice).headers["X-Cache"] == "MISS"
+        assert client.get("/api/svc0/catalog", headers=bob).headers["X-Cache"] == "HIT"
+        assert backends[0].hits["/papers"] == 2 and backends[0].hits["/catalog"] == 1
+
+        cache = ResponseCache()
+        assert cache.freshness("/api", {"Cache-Control": "max-age=60"}, authorized=True) is None
+        assert cache.freshness("/api", {"Cache-Control": "s-maxage=60"}, authorized=True) == (60, 30)
+
+    def test_authorized_misses_not_coalesced(self, gateway, backends):
+        """测试不同用户的并发请求不共享不可缓存的响应"""
+        gateway.config["caching"]["enabled"] = True
+        results = []
+
+        def fetch(token):
+            response = gateway.app.test_client().get("/api/svc0/reports",
+                                                      headers={"Authorization": f"Bearer {token}"})
+            results.append(response.headers.get("X-Cache"))
+
+        threads = [threading.Thread(target=fetch, args=(f"user{i}",)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert "COALESCED" not in results
+        assert backends[0].hits["/reports"] == 3
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        """测试超过字节预算时淘汰最久未使用的缓存"""
+        cache = ResponseCache({"max_bytes": 3200, "max_entry_bytes": 3200})
+        body = b"x" * 700
+        for key in ("a", "b", "c"):
+            assert cache.store(key, "/api", 200, [], body) is not None
+        cache.get("a")
+        cache.store("d", "/api", 200, [], body)
+
+        assert cache.get("b")[0] is None
+        assert cache.get("a")[0] is not None
+        stats = cache.stats()
+        assert stats["evictions"] == 1 and stats["bytes"] <= 3200
+        assert cache.store("big", "/api", 200, [], b"x" * 4000) is None
+
+    def test_stale_while_revalidate_and_route_ttl(self):
+        """测试按路由配置的新鲜期，过期后旧值窗口内只触发一次重新验证"""
+        cache = ResponseCache({"route_ttls": {"/api/exams": 10}, "stale_while_revalidate": 5})
+        cache.store("k", "/api/exams/list", 200, [("Content-Type", "application/json")], b"{}", now=100)
+
+        entry, revalidate = cache.get("k", now=105)
+        assert entry is not None and not revalidate
+        entry, revalidate = cache.get("k", now=112)
+        assert entry is not None and revalidate
+        assert cache.get("k", now=113)[1] is False
+
+        assert cache.refresh("k", "/api/exams/list", {}, now=113)
+        assert cache.get("k", now=120)[1] is False
+        assert cache.get("k", now=200)[0] is None
+
+
+@pytest.mark.unit
+class TestRequestCoalescing:
+    """相同请求合并测试"""
+
+    def test_concurrent_misses_share_one_upstream_call(self, gateway, backends):
+        """测试并发的相同GET请求只转发一次"""
+        gateway.config["caching"]["enabled"] = True
+        results = []
+
+        def fetch():
+            response = gateway.app.test_client().get("/api/svc0/reports")
+            results.append((response.status_code, response.get_json(), response.headers["X-Cache"]))
+
+        threads = [threading.Thread(target=fetch) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(status == 200 and body == {"report": 1} for status, body, _ in results)
+        assert sorted(x_cache for _, _, x_cache in results) == ["COALESCED"] * 9 + ["MISS"]
+        assert backends[0].hits["/reports"] == 1
+        stats = gateway.single_flight.stats()
+        assert stats["leaders"] == 1 and stats["coalesced"] == 9 and stats["in_flight"] == 0
+
+    def test_wait_timeout_falls_back_to_own_request(self, gateway, backends):
+        """测试等待超时的请求自行转发"""
+        gateway.config["caching"]["enabled"] = True
+        gateway.coalescing_config["timeout"] = 0.05
+        threads = [threading.Thread(target=gateway.app.test_client().get, args=("/api/svc0/reports",))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+
+        assert backends[0].hits["/reports"] == 2
+        assert gateway.single_flight.stats()["timeouts"] == 1
+
+
+@pytest.mark.unit
+class TestRateLimiter:
+    """令牌桶限流测试"""
+
+    def test_burst_refill_and_idle_eviction(self):
+        """测试突发上限、按速率补充，补满的键被清理"""
+        limiter = RateLimiter(window_size=10)
+        results = [limiter._local_rate_limit("ip", 5, 10, now=100.0) for _ in range(6)]
+        assert results == [True] * 5 + [False]
+        # 每2秒补充1个令牌
+        assert limiter._local_rate_limit("ip", 5, 10, now=102.1)
+        assert not limiter._local_rate_limit("ip", 5, 10, now=102.2)
+
+        for i in range(1000):
+            limiter._local_rate_limit(f"client{i}", 5, 10, now=103.0)
+        assert limiter.sweep(now=104.5) == 0
+        assert limiter.sweep(now=200.0) == 1001
+        stats = limiter.stats()
+        assert stats["keys"] == 0 and stats["rejected"] == 2
+
+    def test_max_keys_is_hard_cap(self):
+        """测试键数量不超过上限，淘汰最久未使用的键，且超限时不触发全量清理"""
+        limiter = RateLimiter(window_size=10, max_keys=RateLimiter.LOCK_STRIPES * 2)
+        limiter._next_sweep = float("inf")
+        for i in range(1000):
+            limiter._local_rate_limit(f"client{i}", 5, 10, now=100.0)
+        stats = limiter.stats()
+        assert stats["keys"] <= limiter.max_keys
+        assert stats["overflow_evicted"] == 1000 - stats["keys"]
+        assert stats["evicted"] == 0
+
+        # 同一段内最近使用的键保留，最久未使用的键被淘汰
+        stripe = hash("a") % RateLimiter.LOCK_STRIPES
+        first, second, third = [f"k{i}" for i in range(10000)
+                                if hash(f"k{i}") % RateLimiter.LOCK_STRIPES == stripe][:3]
+        for key in (first, second, first, first, third):
+            limiter._local_rate_limit(key, 5, 10, now=101.0)
+        assert list(limiter._buckets[stripe]) == [first, third]
+        assert limiter._buckets[stripe][first][0] == 2.0
+
+    def test_route_and_user_rules(self):
+        """测试服务、路由与用户限额规则"""
+        config = {
+            "services": {"exam_management": {"rate_limit": 100}},
+            "rate_limiting": {"default_limit": 50,
+                              "routes": {"/api/exams": 30, "/api/exams/paper": {"limit": 5, "window": 1}},
+                              "user_limit": 20, "users": {"admin": 1000}}
+        }
+        rules = rate_limit_rules(config, "exam_management", "/api/exams/paper/1", "10.0.0.1", "张三")
+        assert rules == [("rate_limit:exam_management:10.0.0.1", 100, None),
+                         ("rate_limit:route:/api/exams/paper:10.0.0.1", 5, 1),
+                         ("rate_limit:user:张三", 20, None)]
+        assert rate_limit_rules(config, "exam_management", "/api/exams", "ip", "admin")[-1][1] == 1000
+        assert len(rate_limit_rules(config, "other", "/api/other", "ip")) == 1
+
+    def test_rejected_rule_consumes_no_tokens(self):
+        """测试被用户限额拒绝的请求不消耗同一IP的服务限额"""
+        limiter = RateLimiter(window_size=10)
+        service, user = ("rate_limit:svc:nat", 3, 10), ("rate_limit:user:u1", 1, 10)
+        assert limiter.allow_all([service, user])
+        assert not any(limiter.allow_all([service, user]) for _ in range(5))
+
+        stripe = hash(service[0]) % RateLimiter.LOCK_STRIPES
+        assert limiter._buckets[stripe][service[0]][0] == pytest.approx(2.0, abs=0.01)
+        assert limiter.allow_all([service, ("rate_limit:user:u2", 1, 10)])
+        stats = limiter.stats()
+        assert (stats["allowed"], stats["rejected"]) == (2, 5)
+
+    def test_gateway_limits_per_user(self, gateway):
+        """测试网关按签名令牌中的用户限流"""
+        gateway.config["auth"]["enabled"] = True
+        gateway.config["rate_limiting"]["user_limit"] = 2
+        # 网关未配置 jwt_secret，与签发进程一样使用 PHRL_TOKEN_SECRET
+        tokens = TokenManager(signed=True,
+                              denylist=TokenDenylist(db_path=gateway.config["auth"]["revocation_db"]))
+        alice = {"Authorization": f"Bearer {tokens.generate_token('alice')}"}
+        bob_token = tokens.generate_token('bob')
+        bob = {"Authorization": f"Bearer {bob_token}"}
+
+        client = gateway.app.test_client()
+        statuses = [client.get("/api/svc0/items", headers=alice).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        assert client.get("/api/svc0/items", headers=bob).status_code == 200
+        assert client.get("/stats").get_json()["rate_limiting"]["rejected"] == 1
+
+        assert TokenManager("your-secret-key", signed=True).verify_token(bob_token) is None
+        assert tokens.revoke_token(bob_token)
+        gateway.token_manager.denylist.sync(force=True)
+        assert gateway.token_manager.verify_token(bob_token) is None
+
+    def test_token_manager_ignores_placeholder_secret(self, temp_dir, monkeypatch):
+        """测试占位密钥改用环境变量中的密钥，未启用认证时不创建撤销库"""
+        monkeypatch.setenv("PHRL_TOKEN_SECRET", "gateway-test-secret")
+        db_path = temp_dir / "revoked.db"
+        tokens = create_token_manager({"enabled": False, "jwt_secret": "your-secret-key",
+                                       "revocation_db": str(db_path)})
+        assert tokens.secret_key == "gateway-test-secret"
+        assert tokens.denylist.db_path is None and not db_path.exists()
+
+        tokens = create_token_manager({"enabled": True, "jwt_secret": "configured-secret",
+                                       "revocation_db": str(db_path)})
+        assert tokens.secret_key == "configured-secret" and db_path.exists()
+
+    def test_redis_script_is_atomic_bucket(self):
+        """测试Redis令牌桶脚本"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        limiter = RateLimiter(fakeredis.FakeRedis())
+        assert [limiter.is_allowed("k", 3, 60) for _ in range(4)] == [True, True, True, False]
+        # 任一键没有令牌时其它键也不扣减
+        assert not limiter.allow_all([("shared", 2, 60), ("k", 3, 60)])
+        assert limiter.allow_all([("shared", 2, 60), ("u2", 1, 60)])
+        assert limiter.allow_all([("shared", 2, 60), ("u3", 1, 60)])
+        assert not limiter.is_allowed("shared", 2, 60)
+
+
+@pytest.mark.unit
+class TestGatewayMetrics:
+    """网关指标测试"""
+
+    def test_histogram_buckets_and_quantiles(self):
+        """测试分桶相对误差与分位数"""
+        for micros in (0, 15, 31, 32, 999, 123456, 10 ** 7):
+            low, high = bucket_bounds(bucket_index(micros))
+            assert low <= micros <= high
+            assert high - low <= max(1, micros / 16)
+
+        registry = MetricsRegistry()
+        for ms in range(1, 101):
+            registry.observe("latency", (), ms / 1000)
+        histogram = registry.histogram("latency", ())
+        assert histogram.count == 100
+        assert histogram.quantile(0.5) == pytest.approx(0.050, rel=0.07)
+        assert histogram.quantile(0.99) == pytest.approx(0.099, rel=0.07)
+        assert LatencyHistogram().quantile(0.5) is None
+
+    def test_thread_shards_are_merged(self):
+        """测试各线程分片（含已退出线程）汇总后计数完整"""
+        registry = MetricsRegistry()
+        registry.describe("hits", "counter", "hits")
+
+        def record():
+            for _ in range(1000):
+                registry.inc("hits")
+
+        for _ in range(3):
+            threads = [threading.Thread(target=record) for _ in range(40)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert "hits 120000" in registry.render()
+
+    def test_metrics_endpoint(self, gateway, backends):
+        """测试 /metrics 输出请求、缓存、限流与处理中请求指标"""
+        gateway.config["caching"]["enabled"] = True
+        gateway.config["rate_limiting"]["default_limit"] = 3
+        client = gateway.app.test_client()
+        statuses = [client.get("/api/svc0/papers/1").status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+        response = client.get("/metrics")
+        assert response.mimetype == "text/plain"
+        text = response.get_data(as_text=True)
+        assert 'gateway_requests_total{service="svc0",method="GET",status="200"} 3' in text
+        assert 'gateway_cache_requests_total{service="svc0",result="miss"} 1' in text
+        assert 'gateway_cache_requests_total{service="svc0",result="hit"} 2' in text
+        assert 'gateway_rate_limited_total{service="svc0"} 1' in text
+        assert 'gateway_in_flight_requests{service="svc0"} 0' in text
+        assert 'gateway_request_duration_seconds_count{service="svc0",route="/api/svc0"} 4' in text
+        assert 'gateway_upstream_duration_seconds_count{service="svc0",route="/api/svc0"} 1' in text
+        assert 'gateway_cache_entries 1' in text
+
+
+@pytest.mark.unit
+class TestBackendResilience:
+    """断路器、自适应超时与多实例负载均衡测试"""
+
+    def test_circuit_breaker_half_open_probe(self):
+        """测试连续失败开启、半开只放行一个探测、探测结果决定关闭或重新开启"""
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10)
+        breaker.record_failure(now=0)
+        assert breaker.allow(now=1)
+        breaker.record_failure(now=1)
+        assert breaker.state == "open" and not breaker.allow(now=5)
+
+        assert breaker.allow(now=11) and breaker.state == "half_open"
+        assert not breaker.allow(now=11)
+        breaker.record_failure(now=12)
+        assert breaker.state == "open" and not breaker.allow(now=20)
+
+        assert breaker.allow(now=22)
+        breaker.record_success()
+        assert breaker.state == "closed" and breaker.allow(now=22)
+
+    def test_adaptive_timeout_follows_latency(self):
+        """测试超时按延迟分位数自适应，并限制在上下限之间"""
+        config = merge_resilience_config({"adaptive_timeout": {"min_samples": 20, "min_timeout": 0.05}})
+        backend = Backend("http://backend", config)
+        assert backend.timeout(30) == 30  # 样本不足
+
+        for _ in range(40):
+            backend.record(200, 0.1)
+        assert backend.timeout(30) == pytest.approx(0.3, rel=0.07)
+        assert backend.timeout(0.2) == 0.2
+
+    def test_adaptive_timeout_grows_when_latency_shifts(self):
+        """测试延迟整体变慢时，超时的请求计为样本，超时随之增长；自适应超时不计为断路器失败"""
+        backend = Backend("http://backend", merge_resilience_config())
+        for _ in range(2000):
+            backend.record(200, 0.05, "/api/svc")
+        assert backend.timeout(30, "/api/svc") == 2.0
+
+        # 后端变为3秒响应：并发的请求全部按2秒的自适应超时结束，断路器保持关闭
+        for _ in range(5):
+            backend.record(None, 2.0, "/api/svc", timed_out=True, adaptive=True)
+        assert backend.breaker.state == "closed"
+        grown_timeout = backend.timeout(30, "/api/svc")
+        assert grown_timeout > 3.0
+        backend.record(200, 3.0, "/api/svc")
+        assert backend.timeout(30, "/api/svc") > grown_timeout
+
+        # 按配置的 timeout 超时计为失败；半开探测使用配置的 timeout
+        for _ in range(5):
+            backend.record(None, 30.0, "/api/svc", timed_out=True)
+        assert backend.breaker.state == "open"
+        assert backend.breaker.allow(now=backend.breaker.opened_at + 30)
+        assert backend.timeout(30, "/api/svc") == 30
+
+    def test_adaptive_timeout_per_route(self):
+        """测试超时按路由分别计算，连接失败不计入延迟样本"""
+        config = merge_resilience_config({"adaptive_timeout": {"min_samples": 20}})
+        backend = Backend("http://backend", config)
+        backend.record(None, 0.001, "/api/svc/items")
+        assert backend.routes == {}
+
+        for _ in range(100):
+            backend.record(200, 0.05, "/api/svc/items")
+            backend.record(200, 4.0, "/api/svc/export")
+        assert backend.timeout(30, "/api/svc/items") == 2.0
+        assert backend.timeout(30, "/api/svc/export") == pytest.approx(12.0, rel=0.07)
+        assert backend.timeout(30, "/api/svc/other") == 30
+        assert set(backend.stats(30)["timeouts"]) == {"/api/svc/items", "/api/svc/export"}
+
+    def test_unconfigured_routes_use_service_timeout(self, gateway, backends):
+        """测试未配置 metrics.routes 时快慢请求共用服务标签，慢请求不会被快请求的延迟分布掐断"""
+        gateway.backends = BackendPool({"adaptive_timeout": {"min_samples": 20, "min_timeout": 0.05}})
+        client = gateway.app.test_client()
+        for _ in range(40):
+            assert client.get("/api/svc0/items").status_code == 200
+        assert client.get("/api/svc0/reports/1").status_code == 200
+
+        backend = gateway.backends.backend("svc0", backends[0].url)
+        assert backend.routes == {} and backend.breaker.state == "closed"
+        assert client.get("/stats").get_json()["backends"]["services"]["svc0"][0]["timeouts"] == {}
+
+    def test_configured_route_adapts(self, gateway, backends):
+        """测试 metrics.routes 中配置的路由按各自延迟自适应超时"""
+        gateway.metrics.route_prefixes = ["/api/svc0/items"]
+        gateway.backends = BackendPool({"adaptive_timeout": {"min_samples": 20, "min_timeout": 0.05}})
+        client = gateway.app.test_client()
+        for _ in range(40):
+            assert client.get("/api/svc0/items").status_code == 200
+        assert client.get("/api/svc0/reports/1").status_code == 200
+
+        backend = gateway.backends.backend("svc0", backends[0].url)
+        assert set(backend.routes) == {"/api/svc0/items"}
+        assert backend.timeout(5, "/api/svc0/items") < 1
+
+    def test_dead_instance_is_skipped(self, gateway, backends):
+        """测试故障实例开启断路器后请求只发往健康实例"""
+        gateway.backends = BackendPool({"circuit_breaker": {"failure_threshold": 1}})
+        dead_url = closed_port_url()
+        gateway.config["services"]["svc0"]["url"] = [backends[0].url, dead_url]
+        client = gateway.app.test_client()
+
+        for _ in range(50):
+            client.get("/api/svc0/items")
+            if gateway.backends.backend("svc0", dead_url).breaker.state == "open":
+                break
+        assert all(client.get("/api/svc0/items").status_code == 200 for _ in range(5))
+
+        stats = client.get("/stats").get_json()["backends"]["services"]["svc0"]
+        assert [instance["state"] for instance in stats] == ["closed", "open"]
+        health = client.get("/health").get_json()["services"]["svc0"]
+        assert health["status"] == "degraded"
+        assert health["instances"][dead_url]["circuit"] == "open"
+
+    def test_open_circuit_fails_fast(self, gateway, backends):
+        """测试所有实例断路器开启时直接返回503，不再等待后端"""
+        gateway.backends = BackendPool({"circuit_breaker": {"failure_threshold": 2, "recovery_timeout": 30}})
+        gateway.config["services"]["svc0"]["url"] = closed_port_url()
+        client = gateway.app.test_client()
+        assert [client.get("/api/svc0/items").status_code for _ in range(2)] == [503, 503]
+
+        response = client.get("/api/svc0/items")
+        assert response.status_code == 503
+        assert 0 < int(response.headers["Retry-After"]) <= 30
+        assert gateway.backends.rejected == 1
+        assert "gateway_circuit_rejected_total 1" in client.get("/metrics").get_data(as_text=True)
@@ -0,0 +1,183 @@
+"""
+异步API网关单元测试
+
+测试api_gateway/async_gateway.py的转发、缓存、流式转发、请求合并、指标、断路器与并发健康检查。
+"""
+
+import json
+import time
+import asyncio
+import pytest
+
+try:
+    from api_gateway.async_gateway import AsyncGateway, HAS_AIOHTTP
+    from api_gateway.gateway import APIGateway
+    from api_gateway.backends import BackendPool
+    from tests.unit.test_api_gateway import StubBackend, closed_port_url
+except ImportError as e:
+    pytest.skip(f"无法导入异步网关模块: {e}", allow_module_level=True)
+
+if not HAS_AIOHTTP:
+    pytest.skip("aiohttp模块未安装", allow_module_level=True)
+
+
+@pytest.fixture
+def backend():
+    b = StubBackend(health_delay=0.3)
+    yield b
+    b.stop()
+
+
+def make_gateway(backend, caching=False):
+    config = APIGateway.get_default_config()
+    config["auth"]["enabled"] = False
+    config["caching"]["enabled"] = caching
+    config["services"] = {"svc": {"url": backend.url, "prefix": "/api/svc", "timeout": 5}}
+    return AsyncGateway(config=config)
+
+
+async def asgi_request(app, method, path, headers=None, body=b""):
+    """直接调用ASGI应用，返回 (状态码, 响应头, 响应体)"""
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "client": ("127.0.0.1", 50000),
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    response_headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], response_headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def run(gateway, *requests):
+    """按顺序发送 (方法, 路径, 请求头, 请求体) 请求，结束后关闭连接池"""
+    async def scenario():
+        try:
+            return [await asgi_request(gateway, *request) for request in requests]
+        finally:
+            await gateway.aclose()
+    return asyncio.run(scenario())
+
+
+@pytest.mark.unit
+class TestAsyncGateway:
+    """异步网关测试"""
+
+    def test_forwarding_reuses_connection(self, backend):
+        """测试转发结果正确且复用上游连接"""
+        gateway = make_gateway(backend)
+        body = json.dumps({"name": "试卷"}).encode()
+        *items, created, missing = run(
+            gateway,
+            ("GET", "/api/svc/items"), ("GET", "/api/svc/items"), ("GET", "/api/svc/items"),
+            ("POST", "/api/svc/items", {"Content-Type": "application/json"}, body),
+            ("GET", "/api/unknown"))
+
+        assert all(json.loads(content) == {"items": [1, 2, 3]} for _, _, content in items)
+        assert created[0] == 201 and json.loads(created[2]) == {"received": {"name": "试卷"}}
+        assert missing[0] == 404
+        assert len(backend.ports) == 1
+
+    def test_cache_and_streaming(self, backend):
+        """测试缓存命中、304与长度未知响应的转发"""
+        gateway = make_gateway(backend, caching=True)
+        first, second, export = run(gateway, ("GET", "/api/svc/papers"), ("GET", "/api/svc/papers"),
+                                    ("GET", "/api/svc/export"))
+        assert first[1]["x-cache"] == "MISS" and second[1]["x-cache"] == "HIT"
+        assert json.loads(first[2]) == json.loads(second[2]) == {"version": 1}
+        assert len(export[2]) == 512 * 1024
+
+        (not_modified,) = run(gateway, ("GET", "/api/svc/papers", {"If-None-Match": first[1]["etag"]}))
+        assert not_modified[0] == 304
+        assert gateway.cache.stats()["not_modified"] == 1
+        assert backend.hits["/papers"] == 1
+
+    def test_authorized_responses_need_public(self, backend):
+        """测试带 Authorization 的请求只缓存后端声明 public 的响应"""
+        gateway = make_gateway(backend, caching=True)
+        alice, bob = {"Authorization": "Bearer alice"}, {"Authorization": "Bearer bob"}
+        _, second, _, shared = run(gateway, ("GET", "/api/svc/papers", alice), ("GET", "/api/svc/papers", bob),
+                                   ("GET", "/api/svc/catalog", alice), ("GET", "/api/svc/catalog", bob))
+        assert json.loads(second[2]) == {"version": 2} and "x-cache" not in second[1]
+        assert shared[1]["x-cache"] == "HIT"
+        assert backend.hits["/papers"] == 2 and backend.hits["/catalog"] == 1
+
+    def test_concurrent_misses_share_one_upstream_call(self, backend):
+        """测试并发的相同GET请求只转发一次"""
+        gateway = make_gateway(backend, caching=True)
+
+        async def scenario():
+            try:
+                return await asyncio.gather(
+                    *(asgi_request(gateway, "GET", "/api/svc/reports") for _ in range(10)))
+            finally:
+                await gateway.aclose()
+
+        results = asyncio.run(scenario())
+        assert all(status == 200 and json.loads(body) == {"report": 1} for status, _, body in results)
+        assert sorted(headers["x-cache"] for _, headers, _ in results) == ["COALESCED"] * 9 + ["MISS"]
+        assert backend.hits["/reports"] == 1
+        assert gateway.single_flight.stats()["coalesced"] == 9
+
+    def test_metrics_endpoint(self, backend):
+        """测试 /metrics 输出请求延迟与缓存结果"""
+        gateway = make_gateway(backend, caching=True)
+        *_, (status, headers, body) = run(gateway, ("GET", "/api/svc/papers"), ("GET", "/api/svc/papers"),
+                                          ("GET", "/api/unknown"), ("GET", "/metrics"))
+        text = body.decode("utf-8")
+        assert status == 200 and headers["content-type"].startswith("text/plain")
+        assert 'gateway_requests_total{service="svc",method="GET",status="200"} 2' in text
+        assert 'gateway_requests_total{service="",method="GET",status="404"} 1' in text
+        assert 'gateway_cache_requests_total{service="svc",result="hit"} 1' in text
+        assert 'gateway_upstream_duration_seconds_count{service="svc",route="/api/svc"} 1' in text
+
+    def test_circuit_breaker_routes_around_dead_instance(self, backend):
+        """测试故障实例开启断路器后请求只发往健康实例，全部开启时直接返回503"""
+        gateway = make_gateway(backend)
+        gateway.backends = BackendPool({"circuit_breaker": {"failure_threshold": 1}})
+        dead_url = closed_port_url()
+        gateway.config["services"]["svc"]["url"] = [backend.url, dead_url]
+        dead = gateway.backends.backend("svc", dead_url)
+
+        async def scenario():
+            try:
+                for _ in range(50):
+                    await asgi_request(gateway, "GET", "/api/svc/items")
+                    if dead.breaker.state == "open":
+                        break
+                healthy = [await asgi_request(gateway, "GET", "/api/svc/items") for _ in range(5)]
+                gateway.config["services"]["svc"]["url"] = [dead_url]
+                rejected = await asgi_request(gateway, "GET", "/api/svc/items")
+                return healthy, rejected
+            finally:
+                await gateway.aclose()
+
+        healthy, rejected = asyncio.run(scenario())
+        assert all(status == 200 for status, _, _ in healthy)
+        assert rejected[0] == 503 and "retry-after" in rejected[1]
+        assert gateway.backends.rejected == 1
+
+    def test_health_checks_run_concurrently(self, backend):
+        """测试健康检查在事件循环中并发进行"""
+        gateway = make_gateway(backend)
+        gateway.config["services"] = {
+            name: {"url": backend.url, "prefix": f"/api/{name}"} for name in ("a", "b", "c")}
+
+        async def scenario():
+            try:
+                return await gateway.check_services_health()
+            finally:
+                await gateway.aclose()
+
+        start = time.time()
+        health = asyncio.run(scenario())
+        assert all(status["status"] == "healthy" for status in health.values())
+        assert time.time() - start < 0.8
@@ -0,0 +1,176 @@
+"""
+客户端API单元测试
+
+测试client/api.py的试卷数据块缓存与登录查询。
+"""
+
+import json
+import os
+import sqlite3
+import pytest
+
+try:
+    from client import api
+except ImportError as e:
+    pytest.skip(f"无法导入客户端API模块: {e}", allow_module_level=True)
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def question_bank(temp_dir, monkeypatch):
+    """临时题库数据库"""
+    monkeypatch.setattr(api, "get_application_path", lambda: str(temp_dir))
+    monkeypatch.setattr(api, "_paper_payload_cache", {})
+    db_dir = temp_dir / "question_bank_web"
+    db_dir.mkdir()
+    db_path = db_dir / "questions.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE papers (id INTEGER PRIMARY KEY, name TEXT, description TEXT,
+                             duration INTEGER, total_score INTEGER);
+        CREATE TABLE questions (id TEXT PRIMARY KEY, stem TEXT, question_type_code TEXT,
+                                option_a TEXT, option_b TEXT, option_c TEXT, option_d TEXT,
+                                option_e TEXT, correct_answer TEXT);
+        CREATE TABLE paper_questions (paper_id INTEGER, question_id TEXT, score REAL,
+                                      question_order INTEGER);
+        INSERT INTO papers VALUES (7, '安全规程', NULL, 90, 100);
+        INSERT INTO questions VALUES ('q1', '题目一', 'B', 'A', 'B', 'C', 'D', NULL, 'B');
+        INSERT INTO questions VALUES ('q2', '题目二', 'C', NULL, NULL, NULL, NULL, NULL, '正确');
+        INSERT INTO paper_questions VALUES (7, 'q1', 5, 1), (7, 'q2', 5, 2);
+    """)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+@pytest.mark.unit
+class TestPaperPayload:
+    """试卷数据块测试"""
+
+    def test_payload_is_answer_free_and_hash_addressed(self, question_bank):
+        """测试数据块不含答案，本地哈希一致时不返回数据块"""
+        payload = api.get_paper_payload("exam_7")
+        assert payload["paper_id"] == 7
+        assert b"correct_answer" not in payload["blob"]
+
+        paper = api.decode_paper_payload(payload["blob"])
+        assert [q["id"] for q in paper["questions"]] == ["q1", "q2"]
+        assert [(q["score"], q["order"]) for q in paper["questions"]] == [(5, 1), (5, 2)]
+        assert paper["questions"][1]["options"] == ["正确", "错误"]
+
+        again = api.get_paper_payload(7, known_hash=payload["hash"])
+        assert again["hash"] == payload["hash"] and again["blob"] is None
+
+        details = api.get_paper_from_question_bank("exam_7")
+        assert details["id"] == "exam_7" and details["question_count"] == 2
+
+    def test_paper_without_questions(self, question_bank):
+        """测试没有题目的试卷仍返回数据块（questions为空），题库详情接口保持返回None"""
+        conn = sqlite3.connect(question_bank)
+        conn.execute("INSERT INTO papers VALUES (8, '空试卷', NULL, 30, 100)")
+        conn.commit()
+        conn.close()
+
+        payload = api.get_paper_payload(8)
+        paper = api.decode_paper_payload(payload["blob"])
+        assert paper["name"] == "空试卷"
+        assert paper["questions"] == [] and paper["question_count"] == 0
+        assert api.get_paper_payload(9) is None
+        assert api.get_paper_from_question_bank(8) is None
+
+    def test_payload_rebuilt_when_question_bank_changes(self, question_bank):
+        """测试题库变化后重新生成数据块"""
+        first = api.get_paper_payload(7)
+        conn = sqlite3.connect(question_bank)
+        conn.execute("UPDATE questions SET stem = '题目一（修订）' WHERE id = 'q1'")
+        conn.commit()
+        conn.close()
+        stat = os.stat(question_bank)
+        os.utime(question_bank, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        second = api.get_paper_payload(7, known_hash=first["hash"])
+        assert second["hash"] != first["hash"]
+        assert "题目一（修订）" in api.decode_paper_payload(second["blob"])["questions"][0]["content"]
+
+
+@pytest.fixture
+def users_db(temp_dir, monkeypatch):
+    """临时用户数据库"""
+    monkeypatch.setattr(api, "get_application_path", lambda: str(temp_dir))
+    db_dir = temp_dir / "user_management"
+    db_dir.mkdir()
+    db_path = db_dir / "users.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE users (id TEXT PRIMARY KEY, id_card TEXT, username TEXT NOT NULL UNIQUE,
+                            password TEXT NOT NULL, role TEXT NOT NULL, status TEXT NOT NULL,
+                            real_name TEXT, email TEXT, phone TEXT, department TEXT,
+                            created_at TEXT NOT NULL);
+        INSERT INTO users VALUES ('u-1', '110101199001011234', 'zhangsan', 'pw1', 'student',
+                                  'active', '张三', NULL, NULL, '一车间', '2025-01-01');
+    """)
+    conn.commit()
+    conn.close()
+    write_json(db_dir / "users.json", {"users": [
+        {"id": 9, "username": "json_only", "password": "pw", "role": "student"}]})
+    return db_path
+
+
+@pytest.mark.unit
+class TestLoginLookup:
+    """登录查询测试"""
+
+    def test_login_by_each_identifier(self, users_db):
+        """测试用户名、身份证号、用户ID登录，数据库存在时不再查找JSON"""
+        mtime_before = os.stat(users_db).st_mtime_ns
+        for identifier in ("zhangsan", "110101199001011234", "u-1"):
+            user_info = api.login(identifier, "pw1")
+            assert user_info["id"] == "u-1" and user_info["real_name"] == "张三"
+        assert api.login("zhangsan", "wrong") is None
+        assert api.login("json_only", "pw") is None
+        assert os.stat(users_db).st_mtime_ns == mtime_before
+
+    def test_identifier_map_refreshed_on_change(self, users_db):
+        """测试数据库变化后标识映射重建"""
+        assert api.login("lisi", "pw2") is None
+        conn = sqlite3.connect(users_db)
+        conn.execute("""INSERT INTO users VALUES ('u-2', NULL, 'lisi', 'pw2', 'student',
+                                                  'active', '李四', NULL, NULL, NULL, '2025-01-02')""")
+        conn.commit()
+        conn.close()
+        stat = os.stat(users_db)
+        os.utime(users_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert api.login("lisi", "pw2")["id"] == "u-2"
+
+    def test_write_during_rebuild_not_missed(self, users_db):
+        """测试重建映射的查询之后、记录签名之前发生的写入，下次查询时仍会重建"""
+        lookup = api.LoginLookup(str(users_db))
+        lookup.refresh()
+        real_connection = lookup._connection
+
+        class WriteAfterSelect:
+            def execute(self, sql, params=()):
+                rows = real_connection().execute(sql, params).fetchall()
+                conn = sqlite3.connect(users_db)
+                conn.execute("""INSERT INTO users VALUES ('u-3', NULL, 'wangwu', 'pw3', 'student',
+                                                          'active', '王五', NULL, NULL, NULL, '2025-01-03')""")
+                conn.commit()
+                conn.close()
+                stat = os.stat(users_db)
+                os.utime(users_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+                return rows
+
+        stat = os.stat(users_db)
+        os.utime(users_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        lookup._connection = WriteAfterSelect
+        lookup.refresh()
+        assert "wangwu" not in lookup.identifiers["username"]
+
+        lookup._connection = real_connection
+        assert lookup.find_candidates("wangwu") == ["u-3"]
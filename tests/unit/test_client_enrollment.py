@@ -0,0 +1,67 @@
+"""
+客户端考试列表单元测试
+
+测试client/api.py的报名索引与数据文件缓存。
+"""
+
+import json
+import os
+import pytest
+
+try:
+    from client import api
+except ImportError as e:
+    pytest.skip(f"无法导入客户端API模块: {e}", allow_module_level=True)
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def app_dir(temp_dir, monkeypatch):
+    """临时应用目录"""
+    monkeypatch.setattr(api, "get_application_path", lambda: str(temp_dir))
+    write_json(temp_dir / "exam_management" / "published_exams.json", [
+        {"id": "exam_a", "title": "考试A", "status": "published"},
+        {"id": "exam_b", "title": "考试B", "status": "published"},
+    ])
+    write_json(temp_dir / "exam_management" / "enrollments.json", {"enrollments": [
+        {"exam_id": "exam_a", "user_ids": [1, "2"]},
+        {"exam_id": "exam_b", "student_id": 3, "status": "assigned"},
+    ]})
+    return temp_dir
+
+
+@pytest.mark.unit
+class TestEnrollmentIndex:
+    """报名索引测试"""
+
+    def test_index_handles_both_formats(self, app_dir):
+        """测试新旧两种报名格式，考生ID按字符串匹配"""
+        index = api.get_enrollment_index()
+        assert index.exams_for("1") == ["exam_a"]
+        assert index.exams_for(2) == ["exam_a"]
+        assert index.is_enrolled("exam_b", "3")
+        assert not index.is_enrolled("exam_b", 1)
+        assert api.get_enrollment_index() is index
+
+        exams = api.get_published_exams_for_student(1)
+        assert [exam["id"] for exam in exams] == ["exam_a"]
+
+    def test_index_rebuilt_when_file_changes(self, app_dir):
+        """测试报名文件变化后重建索引"""
+        index = api.get_enrollment_index()
+        enrollments_file = app_dir / "exam_management" / "enrollments.json"
+        write_json(enrollments_file, {"enrollments": [
+            {"exam_id": "exam_b", "user_ids": [1, 5]},
+        ]})
+        stat = os.stat(enrollments_file)
+        os.utime(enrollments_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        rebuilt = api.get_enrollment_index()
+        assert rebuilt is not index
+        assert rebuilt.exams_for(1) == ["exam_b"]
+        assert [exam["id"] for exam in api.get_published_exams_for_student(5)] == ["exam_b"]
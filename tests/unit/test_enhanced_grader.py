@@ -0,0 +1,126 @@
+"""
+增强自动阅卷单元测试
+
+测试grading_center/enhanced_auto_grader.py的相似度算法、参考答案预处理缓存与批量阅卷。
+"""
+
+import pytest
+
+try:
+    from grading_center import enhanced_auto_grader
+    from grading_center.enhanced_auto_grader import EnhancedAutoGrader, GradingRule, GradingWorkItem
+except ImportError as e:
+    pytest.skip(f"无法导入增强阅卷模块: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def grader():
+    return EnhancedAutoGrader()
+
+
+@pytest.mark.unit
+class TestSimilarityBackends:
+    """相似度算法测试"""
+
+    def test_default_rules_keep_sequence_matching(self, grader):
+        """测试主观题默认仍使用SequenceMatcher，得分不随可选依赖变化"""
+        assert grader.default_rules["short_answer"].similarity_method == "sequence"
+        assert grader.default_rules["essay"].similarity_method == "sequence"
+        with pytest.raises(ValueError):
+            GradingRule("essay", similarity_method="unknown")
+
+    def test_ngram_and_cosine(self, grader):
+        """测试n-gram Jaccard与余弦相似度，复用参考答案n-gram时结果一致"""
+        rule = GradingRule("short_answer", similarity_method="cosine")
+        reference = grader.get_reference_artifacts("封装继承多态", rule)
+
+        assert grader.calculate_similarity("封装继承", "封装继承多态", "ngram") == pytest.approx(3 / 5)
+        cosine = grader.calculate_similarity("封装继承", "封装继承多态", "cosine")
+        assert cosine == pytest.approx(3 / (3 ** 0.5 * 5 ** 0.5))
+        assert grader.calculate_similarity("封装继承", "封装继承多态", "cosine", reference=reference) == cosine
+        assert grader.calculate_similarity("", "封装继承多态", "ngram") == 0.0
+
+    def test_rapidfuzz_falls_back_to_sequence(self, grader, monkeypatch):
+        """测试未安装rapidfuzz时退化为SequenceMatcher"""
+        monkeypatch.setattr(enhanced_auto_grader, "RAPIDFUZZ_AVAILABLE", False)
+        expected = grader.calculate_similarity("面向对象的特点", "面向对象编程的特点", "sequence")
+        assert grader.calculate_similarity("面向对象的特点", "面向对象编程的特点", "rapidfuzz") == expected
+
+    @pytest.mark.skipif(not enhanced_auto_grader.RAPIDFUZZ_AVAILABLE, reason="rapidfuzz未安装")
+    def test_rapidfuzz_ratio(self, grader):
+        """测试rapidfuzz相似度与SequenceMatcher同为0~1的编辑相似度"""
+        assert grader.calculate_similarity("abcd", "abcd", "rapidfuzz") == 1.0
+        assert grader.calculate_similarity("abcd", "abce", "rapidfuzz") == pytest.approx(0.75)
+
+
+@pytest.mark.unit
+class TestReferenceCache:
+    """参考答案预处理缓存测试"""
+
+    def test_artifacts_are_reused(self, grader):
+        """测试同一参考答案只预处理一次，标准化参数不同时分别缓存"""
+        rule = grader.default_rules["short_answer"]
+        first = grader.get_reference_artifacts("Python, 是解释型语言!", rule)
+        assert grader.get_reference_artifacts("Python, 是解释型语言!", rule) is first
+        assert first.normalized_text == "python 是解释型语言"
+        assert (grader.cache_hits, grader.cache_misses) == (1, 1)
+
+        strict = GradingRule("short_answer", case_sensitive=True)
+        assert grader.get_reference_artifacts("Python, 是解释型语言!", strict) is not first
+        assert grader.cache_misses == 2
+
+    def test_cached_grading_matches_uncached(self, grader):
+        """测试缓存命中前后评分结果一致，清空缓存后重新计算"""
+        args = ("q1", "面向对象的特点是封装和继承", "面向对象编程的特点是封装、继承、多态",
+                "short_answer", 20)
+        first = grader.grade_question(*args)
+        second = grader.grade_question(*args)
+        assert grader.cache_hits >= 1
+        assert second.obtained_score == first.obtained_score
+
+        grader.clear_reference_cache()
+        assert grader.grade_question(*args).obtained_score == first.obtained_score
+        assert grader.cache_misses == 1
+
+    def test_precompute_references(self, grader):
+        """测试整卷预计算只处理主观题"""
+        answers = {"questions": {
+            "q1": {"correct_answer": "B", "question_type": "single_choice"},
+            "q2": {"correct_answer": "解释型语言", "question_type": "fill_blank"},
+            "q3": {"correct_answer": "封装、继承、多态", "question_type": "essay"},
+        }}
+        assert grader.precompute_references(answers) == 2
+        grader.grade_question("q3", "封装", "封装、继承、多态", "essay", 10)
+        assert grader.cache_hits == 1
+
+
+def batch_work_items():
+    """三道题：客观题、主观题（答案数超过分块大小）与空答案列表"""
+    essay_answers = ["面向对象的特点是封装和继承", "封装、继承、多态", "", "多态",
+                     "面向对象编程的特点是封装、继承、多态", "不知道", "继承"]
+    return [
+        GradingWorkItem("q1", "multiple_choice", ["A", "C"], 10, ["AC", "A", "B", ["A", "C"]]),
+        GradingWorkItem("q2", "essay", "面向对象编程的特点是封装、继承、多态", 20, essay_answers),
+        GradingWorkItem("q3", "fill_blank", "解释型", 5, []),
+    ]
+
+
+def sequential_results(grader, items):
+    return [[grader.grade_question(item.question_id, answer, item.correct_answer,
+                                   item.question_type, item.max_score, item.rule).__dict__
+             for answer in item.answers]
+            for item in items]
+
+
+@pytest.mark.unit
+class TestBatchGrading:
+    """批量阅卷测试"""
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_batch_matches_sequential_grading(self, grader, workers):
+        """测试单进程与进程池批量阅卷结果都与逐题评分一致，并保持提交顺序"""
+        items = batch_work_items()
+        expected = sequential_results(grader, items)
+        batches = list(grader.grade_batch(iter(items), workers=workers, chunk_size=3))
+        assert [[result.__dict__ for result in batch] for batch in batches] == expected
+        assert [len(batch) for batch in batches] == [4, 7, 0]
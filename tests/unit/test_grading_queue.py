@@ -0,0 +1,101 @@
+"""
+阅卷任务队列单元测试
+
+测试grading_center/grading_queue.py的领取、租约、确认和积压统计。
+"""
+
+import time
+import pytest
+
+try:
+    from grading_center.grading_queue import GradingQueue
+except ImportError as e:
+    pytest.skip(f"无法导入阅卷队列模块: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def queue(temp_dir):
+    """临时阅卷队列"""
+    q = GradingQueue(str(temp_dir / "queue.db"), lease_seconds=60, max_attempts=2)
+    yield q
+    q.close()
+
+
+def make_result(user_id):
+    return {"exam_id": "exam_1", "user_id": user_id, "submit_time": "2025-01-07T10:00:00", "answers": {}}
+
+
+@pytest.mark.unit
+class TestGradingQueue:
+    """阅卷队列测试"""
+
+    def test_enqueue_is_idempotent(self, queue):
+        """测试同一答卷重复入队只保留一条任务"""
+        assert queue.enqueue(make_result(1)) is True
+        assert queue.enqueue(make_result(1)) is False
+        assert queue.backlog()["pending"] == 1
+
+    def test_claim_and_ack(self, queue):
+        """测试领取后确认完成"""
+        queue.enqueue(make_result(1))
+        queue.enqueue(make_result(2))
+
+        jobs = queue.claim("worker-a", limit=1)
+        assert len(jobs) == 1
+        assert jobs[0].payload["user_id"] == 1
+
+        # 已领取的任务不会被其他工作者重复领取
+        other = queue.claim("worker-b", limit=5)
+        assert [job.payload["user_id"] for job in other] == [2]
+
+        assert queue.ack(jobs[0], "result-1") is True
+        backlog = queue.backlog()
+        assert backlog["done"] == 1
+        assert backlog["leased"] == 1
+
+    def test_expired_lease_is_redelivered(self, queue):
+        """测试工作者崩溃后租约过期任务重新投递"""
+        queue.enqueue(make_result(1))
+        first = queue.claim("crashed", lease_seconds=0.01)
+        time.sleep(0.05)
+
+        assert queue.backlog()["expired_leases"] == 1
+        second = queue.claim("worker-b")
+        assert second[0].job_id == first[0].job_id
+        assert second[0].attempts == 2
+
+    def test_nack_fails_after_max_attempts(self, queue):
+        """测试超过最大尝试次数后任务标记为失败"""
+        queue.enqueue(make_result(1))
+        job = queue.claim("worker-a")[0]
+        assert queue.nack(job, "error") == "pending"
+
+        job = queue.claim("worker-a")[0]
+        assert queue.nack(job, "error") == "failed"
+        assert queue.claim("worker-a") == []
+
+        assert queue.requeue_failed() == 1
+        assert queue.backlog()["pending"] == 1
+
+    def test_stale_worker_cannot_ack(self, queue):
+        """测试租约过期被接管后，原工作者不能确认任务"""
+        queue.enqueue(make_result(1))
+        stale = queue.claim("crashed", lease_seconds=0.01)[0]
+        time.sleep(0.05)
+        current = queue.claim("worker-b")[0]
+
+        assert queue.ack(stale, "stale-result") is False
+        assert queue.ack(current, "result-1") is True
+        assert queue.ack(current, "result-1") is False
+        assert queue.backlog()["done"] == 1
+
+    def test_crashing_job_fails_after_max_attempts(self, queue):
+        """测试反复导致工作者崩溃（租约过期）的任务达到最大尝试次数后标记为失败"""
+        queue.enqueue(make_result(1))
+        for _ in range(2):
+            assert len(queue.claim("crashed", lease_seconds=0.01)) == 1
+            time.sleep(0.05)
+
+        assert queue.claim("worker-b") == []
+        backlog = queue.backlog()
+        assert backlog["failed"] == 1 and backlog["leased"] == 0
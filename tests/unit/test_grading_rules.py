@@ -0,0 +1,69 @@
+"""
+评分规则管理单元测试
+
+测试grading_center/grading_rules_manager.py的规则编译评分与回归基准。
+"""
+
+import pytest
+
+try:
+    from grading_center.grading_rules_manager import GradingRulesManager
+except ImportError as e:
+    pytest.skip(f"无法导入评分规则模块: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """临时规则管理器"""
+    return GradingRulesManager(str(temp_dir / "rules"))
+
+
+@pytest.mark.unit
+class TestCompiledRules:
+    """编译规则测试"""
+
+    def test_choice_rules(self, manager):
+        """测试选择题精确匹配与多选部分得分"""
+        assert manager.evaluate("single_choice", "b", "B", 2) == (2, "完全正确")
+        assert manager.evaluate("multiple_choice", ["A", "C"], "AC", 10)[0] == 10
+        assert manager.evaluate("multiple_choice", "AB", "ABC", 10)[0] == pytest.approx(6)
+        assert manager.evaluate("multiple_choice", "D", "ABC", 10)[0] == 0
+
+    def test_recompile_after_rule_update(self, manager):
+        """测试规则修改后编译结果失效"""
+        assert manager.evaluate("fill_blank", "Java", "python", 5)[0] == 0
+        manager.update_rule("fill_blank", default_score=0.2)
+        assert manager.evaluate("fill_blank", "Java", "python", 5)[0] == pytest.approx(1.0)
+
+    def test_similarity_matches_enhanced_grader(self, manager):
+        """测试编译规则与增强阅卷器使用同一套n-gram余弦相似度"""
+        enhanced_auto_grader = pytest.importorskip("grading_center.enhanced_auto_grader")
+        grader = enhanced_auto_grader.EnhancedAutoGrader()
+        rule = enhanced_auto_grader.GradingRule("short_answer", similarity_method="cosine")
+        compiled = manager.compile_rule("short_answer")
+        student, correct = "面向对象的三大特征：封装、继承", "面向对象三大特征是封装、继承、多态。"
+
+        features = compiled.compute_features(student, compiled.reference(correct), ())
+        expected = grader.calculate_similarity(grader.normalize_text(student, rule),
+                                               grader.normalize_text(correct, rule), "cosine")
+        assert 0 < features["similarity"] < 1
+        assert features["similarity"] == pytest.approx(expected)
+
+    def test_rule_benchmark_and_regression(self, manager):
+        """测试规则测试报告实际得分、延迟分位数和回归对比"""
+        cases = [
+            {"student_answer": "Python", "correct_answer": "python", "expected_score": 1.0},
+            {"student_answer": "Java", "correct_answer": "python", "expected_score": 0.0},
+        ]
+        report = manager.test_rule("fill_blank", cases, iterations=50)
+        assert report["pass_rate"] == 1.0
+        assert report["test_results"][0]["actual_score"] == 1.0
+        assert report["benchmark"]["evaluations"] == 100
+        assert report["benchmark"]["p50_us"] <= report["benchmark"]["p99_us"]
+
+        manager.save_benchmark(report)
+        baseline = manager.load_benchmark("fill_blank")
+        cases[1]["expected_score"] = 0.5
+        regression = manager.test_rule("fill_blank", cases, baseline=baseline)["regression"]
+        assert regression["score_regression"] is True
+        assert regression["changed_scores"] == 0
@@ -0,0 +1,155 @@
+"""
+阅卷中心服务器单元测试
+
+测试grading_center/simple_grading_server.py的批量自动阅卷与相关接口，
+考试结果库使用临时目录中的SQLite数据库。
+"""
+
+import json
+import sqlite3
+import pytest
+
+# simple_grading_server在缺少Flask时会在导入阶段直接sys.exit(1)，需先跳过
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+try:
+    from grading_center import simple_grading_server as server
+    from grading_center.auto_grader import AutoGrader
+    from grading_center.grading_queue import GradingQueue
+    from grading_center.result_feed import GradedResultFeed
+except ImportError as e:
+    pytest.skip(f"无法导入阅卷中心服务器: {e}", allow_module_level=True)
+
+
+ANSWER_KEYS = {
+    "exam_1": {
+        "total_score": 20,
+        "questions": {
+            "q1": {"correct_answer": "A", "question_type": "single_choice", "score": 10},
+            "q2": {"correct_answer": "B", "question_type": "single_choice", "score": 10},
+        },
+    },
+}
+
+
+@pytest.fixture
+def results_db(temp_dir, monkeypatch):
+    """临时考试结果库，阅卷引擎的标准答案来自 ANSWER_KEYS"""
+    monkeypatch.setattr(server, "DATABASE_PATH", str(temp_dir / "grading_center.db"))
+    server.init_database()
+
+    grader = AutoGrader(GradingQueue(str(temp_dir / "queue.db")),
+                        GradedResultFeed(str(temp_dir / "feed.db")))
+    monkeypatch.setattr(grader, "get_correct_answers", ANSWER_KEYS.get)
+    monkeypatch.setattr(server, "_auto_grader", grader)
+    return server.DATABASE_PATH
+
+
+def insert_results(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO exam_results (student_id, exam_id, answers) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def fetch_results(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT student_id, score, graded_by FROM exam_results ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.mark.unit
+class TestParseAnswers:
+    """答案字段解析测试"""
+
+    def test_parse_answers(self):
+        """测试JSON字符串、嵌套answers字段与空值"""
+        assert server.parse_answers('{"q1": "A"}') == {"q1": "A"}
+        assert server.parse_answers(json.dumps({"answers": {"q1": "B"}, "time": 30})) == {"q1": "B"}
+        assert server.parse_answers({"q1": "C"}) == {"q1": "C"}
+        assert server.parse_answers(None) == {}
+        with pytest.raises(ValueError):
+            server.parse_answers('["A", "B"]')
+
+
+@pytest.mark.unit
+class TestGradePendingResults:
+    """批量自动阅卷测试"""
+
+    def test_grades_and_marks_manual_required(self, results_db):
+        """测试按考试批量评分，缺少标准答案或答案无法解析的答卷转人工且不再重复领取"""
+        insert_results(results_db, [
+            ("s1", "exam_1", json.dumps({"q1": "A", "q2": "B"})),
+            ("s2", "exam_1", json.dumps({"answers": {"q1": "A", "q2": "C"}})),
+            ("s3", "exam_1", "not json"),
+            ("s4", "exam_9", json.dumps({"q1": "A"})),
+        ])
+
+        result = server.grade_pending_results()
+        assert result == {"processed": 2, "skipped": 1, "failed": 1,
+                          "missing_answer_keys": ["exam_9"], "remaining": 0}
+        assert fetch_results(results_db) == [
+            ("s1", 100.0, "auto"), ("s2", 50.0, "auto"),
+            ("s3", None, "manual_required"), ("s4", None, "manual_required"),
+        ]
+        assert server.grade_pending_results()["processed"] == 0
+        assert server.grade_pending_results(retry_skipped=True)["skipped"] == 1
+
+    def test_limit(self, results_db):
+        """测试单次处理数量限制与剩余数量"""
+        insert_results(results_db, [(f"s{i}", "exam_1", '{"q1": "A"}') for i in range(5)])
+        assert server.grade_pending_results(limit=2)["remaining"] == 3
+        assert server.grade_pending_results()["processed"] == 3
+
+
+@pytest.mark.unit
+class TestAutoGradeEndpoints:
+    """自动阅卷接口测试"""
+
+    def test_auto_grade_and_progress(self, results_db):
+        """测试自动阅卷接口与进度接口"""
+        insert_results(results_db, [("s1", "exam_1", '{"q1": "A", "q2": "B"}')])
+        client = server.app.test_client()
+
+        response = client.post("/api/auto-grade", json={"limit": "10"})
+        assert response.status_code == 200
+        assert response.get_json()["processed"] == 1
+
+        progress = client.get("/api/auto-grade/progress").get_json()
+        assert progress["running"] is False
+        assert (progress["total"], progress["processed"]) == (1, 1)
+        assert progress["finished_at"] >= progress["started_at"]
+
+    @pytest.mark.parametrize("limit", ["abc", -1, [1]])
+    def test_invalid_limit_rejected(self, results_db, limit):
+        """测试limit不是非负整数时返回400，且不开始阅卷"""
+        insert_results(results_db, [("s1", "exam_1", '{"q1": "A"}')])
+        response = server.app.test_client().post("/api/auto-grade", json={"limit": limit})
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
+        assert fetch_results(results_db)[0][1] is None
+
+    def test_invalid_limit_in_query_string(self, results_db):
+        """测试查询参数中的limit同样校验"""
+        response = server.app.test_client().post("/api/auto-grade?limit=ten")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("value, expected", [(False, 0), ("false", 0), ("True", 1), (True, 1)])
+    def test_retry_skipped_flag(self, results_db, value, expected):
+        """测试retry_skipped按布尔值或"true"/"false"解析"""
+        insert_results(results_db, [("s1", "exam_9", json.dumps({"q1": "A"}))])
+        client = server.app.test_client()
+        client.post("/api/auto-grade", json={})
+
+        response = client.post("/api/auto-grade", json={"retry_skipped": value})
+        assert response.status_code == 200
+        assert response.get_json()["skipped"] == expected
+
+    @pytest.mark.parametrize("value", ["0", "yes", 1, None])
+    def test_invalid_retry_skipped_rejected(self, results_db, value):
+        """测试retry_skipped不是布尔值时返回400"""
+        response = server.app.test_client().post("/api/auto-grade", json={"retry_skipped": value})
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
@@ -0,0 +1,146 @@
+"""
+阅卷质量监控单元测试
+
+测试grading_center/streaming_stats.py的流式统计量，以及
+grading_center/quality_monitor.py的统计快照与答卷级统计的释放。
+"""
+
+import statistics
+import pytest
+
+try:
+    import numpy as np
+    from grading_center.streaming_stats import RunningStats, QuantileSketch, ScopeStats
+    from grading_center.quality_monitor import QualityMonitor, GradingRecord
+except ImportError as e:
+    pytest.skip(f"无法导入质量监控模块: {e}", allow_module_level=True)
+
+
+SAMPLES = [0.9, 0.35, 0.6, 0.75, 0.8, 0.1, 0.55, 0.95, 0.6, 0.7]
+
+
+def make_record(index, exam_id="exam-1", question_id="q1", student_id=None, grader_id="g1", score=8):
+    return GradingRecord(
+        record_id=f"r{index}", exam_id=exam_id, question_id=question_id,
+        student_id=student_id or f"s{index}", grader_id=grader_id,
+        score=score, max_score=10, grading_time=f"2026-01-01T10:00:{index % 60:02d}")
+
+
+@pytest.fixture
+def monitor(temp_dir):
+    m = QualityMonitor(str(temp_dir / "quality"))
+    yield m
+    m.close()
+
+
+@pytest.mark.unit
+class TestStreamingStats:
+    """流式统计量测试"""
+
+    def test_running_stats_matches_statistics(self):
+        """测试Welford均值/方差与statistics模块一致，合并结果与整体计算一致"""
+        stats = RunningStats()
+        for value in SAMPLES:
+            stats.update(value)
+        assert stats.mean == pytest.approx(statistics.mean(SAMPLES))
+        assert stats.variance == pytest.approx(statistics.variance(SAMPLES))
+        assert (stats.min, stats.max) == (0.1, 0.95)
+
+        left, right = RunningStats(), RunningStats()
+        for value in SAMPLES[:3]:
+            left.update(value)
+        for value in SAMPLES[3:]:
+            right.update(value)
+        merged = left.merge(right)
+        assert merged.count == len(SAMPLES)
+        assert merged.variance == pytest.approx(stats.variance)
+        assert RunningStats.from_dict(stats.to_dict()).m2 == stats.m2
+
+    def test_quantile_sketch_within_bucket_width(self):
+        """测试样本密集时分位数误差不超过一个桶宽，序列化后结果不变"""
+        values = np.random.default_rng(7).beta(5, 2, size=2000)
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.update(float(value))
+        width = (sketch.high - sketch.low) / sketch.bins
+        for q in (0.25, 0.5, 0.75):
+            assert abs(sketch.quantile(q) - np.percentile(values, q * 100)) <= width
+
+        restored = QuantileSketch.from_dict(sketch.to_dict())
+        assert restored.quantile(0.5) == sketch.quantile(0.5)
+        assert restored.iqr_bounds() == sketch.iqr_bounds()
+
+    def test_scope_stats_round_trip(self):
+        """测试统计维度序列化往返"""
+        scope = ScopeStats()
+        for value in SAMPLES:
+            scope.update(value, "2026-01-01")
+        scope.anomalies = 2
+        restored = ScopeStats.from_dict(scope.to_dict())
+        assert restored.scores.to_dict() == scope.scores.to_dict()
+        assert restored.sketch.counts == scope.sketch.counts
+        assert (restored.anomalies, restored.last_active) == (2, "2026-01-01")
+
+
+@pytest.mark.unit
+class TestQualityMonitorSnapshot:
+    """统计快照测试"""
+
+    def test_snapshot_round_trip(self, monitor, temp_dir):
+        """测试关闭后重新加载，统计量与答卷级统计保持一致"""
+        for i in range(12):
+            monitor.add_grading_record(make_record(i, score=i % 10))
+        monitor.add_grading_record(make_record(99, student_id="s1", grader_id="g2", score=2))
+        monitor.close()
+        expected = monitor.build_snapshot()
+
+        reloaded = QualityMonitor(str(temp_dir / "quality"))
+        try:
+            assert reloaded.build_snapshot() == expected
+            assert reloaded.total_records == 13
+            assert reloaded.answer_stats["exam-1"][("q1", "s1")].count == 2
+            assert reloaded.grader_consistency["g2"].count == 1
+        finally:
+            reloaded.close()
+
+    def test_unsaved_records_replayed(self, monitor, temp_dir):
+        """测试快照之后追加的记录在重新加载时重放"""
+        monitor.add_grading_record(make_record(1))
+        monitor.save_grading_records()
+        monitor.add_grading_record(make_record(2))
+        monitor._records_handle.close()
+        monitor._records_handle = None
+
+        reloaded = QualityMonitor(str(temp_dir / "quality"))
+        try:
+            assert reloaded.total_records == 2
+            assert reloaded.exam_stats["exam-1"].scores.count == 2
+        finally:
+            reloaded.close()
+
+
+@pytest.mark.unit
+class TestAnswerStats:
+    """答卷级一致性统计测试"""
+
+    def test_same_answer_in_different_exams_is_separate(self, monitor):
+        """测试不同考试的同题同学生不会被当作同一答卷多评"""
+        monitor.add_grading_record(make_record(1, exam_id="exam-1", student_id="s1"))
+        monitor.add_grading_record(make_record(2, exam_id="exam-2", student_id="s1", grader_id="g2"))
+        assert "g2" not in monitor.grader_consistency
+
+        monitor.add_grading_record(make_record(3, exam_id="exam-2", student_id="s1", grader_id="g3", score=7))
+        assert monitor.grader_consistency["g3"].count == 1
+
+    def test_answer_stats_bounded_by_exams(self, monitor):
+        """测试只保留最近活跃考试的答卷级统计，汇总统计不受影响"""
+        monitor.answer_stats_max_exams = 2
+        for i, exam_id in enumerate(["exam-1", "exam-2", "exam-1", "exam-3"]):
+            monitor.add_grading_record(make_record(i, exam_id=exam_id))
+
+        assert list(monitor.answer_stats) == ["exam-1", "exam-3"]
+        assert monitor.exam_stats["exam-2"].scores.count == 1
+
+        monitor.finish_exam("exam-1")
+        assert list(monitor.answer_stats) == ["exam-3"]
+        assert monitor.exam_stats["exam-1"].scores.count == 2
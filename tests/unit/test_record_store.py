@@ -0,0 +1,120 @@
+"""
+列式评分记录存储单元测试
+
+测试grading_center/record_store.py的落盘往返、分片合并与崩溃后的日志重放。
+"""
+
+import json
+import pytest
+
+try:
+    from grading_center.record_store import GradingRecordStore
+    from grading_center.quality_monitor import QualityMonitor, GradingRecord
+except ImportError as e:
+    pytest.skip(f"无法导入记录存储模块: {e}", allow_module_level=True)
+
+
+def make_record(index, exam_id="exam-1", grader_id=None, score=None):
+    return GradingRecord(
+        record_id=f"r{index}", exam_id=exam_id, question_id=f"q{index % 3}",
+        student_id=f"s{index}", grader_id=grader_id or f"g{index % 2}",
+        score=score if score is not None else index % 10, max_score=10,
+        grading_time=f"2026-01-01T10:{index % 60:02d}:00")
+
+
+def part_files(store, exam_id="exam-1"):
+    return sorted(p.name for p in store.partitions[exam_id].path.glob("part-*.npy"))
+
+
+@pytest.mark.unit
+class TestRecordStore:
+    """记录存储测试"""
+
+    def test_round_trip(self, temp_dir):
+        """测试保存后重新加载，记录与分组统计一致"""
+        store = GradingRecordStore(str(temp_dir / "records"))
+        for i in range(10):
+            store.append(make_record(i, exam_id="exam-1" if i < 6 else "exam/2"))
+        store.save(log_offset=123)
+        store.append(make_record(10))
+        store.save(log_offset=456)
+
+        reloaded = GradingRecordStore(str(temp_dir / "records"))
+        assert len(reloaded) == 11
+        assert reloaded.log_offset == 456
+        assert (reloaded.select("exam-1") == store.select("exam-1")).all()
+        assert reloaded.grader_summary() == store.grader_summary()
+        assert reloaded.question_summary("exam/2") == store.question_summary("exam/2")
+        assert len(reloaded.select(grader_id="g1")) == 5
+
+    def test_compaction_keeps_records(self, temp_dir):
+        """测试分片过多时合并为新文件，旧分片在清单提交后删除"""
+        store = GradingRecordStore(str(temp_dir / "records"), max_parts=2)
+        for i in range(3):
+            store.append(make_record(i))
+            store.save()
+        assert part_files(store) == ["part-000003.npy"]
+
+        store.append(make_record(3))
+        store.save()
+        manifest = json.loads(store.manifest_file.read_text(encoding="utf-8"))
+        assert manifest["partitions"]["exam-1"]["parts"] == ["part-000003.npy", "part-000004.npy"]
+
+        reloaded = GradingRecordStore(str(temp_dir / "records"))
+        assert len(reloaded) == 4
+        assert sorted(reloaded.select("exam-1")["student"].tolist()) == [0, 1, 2, 3]
+
+
+@pytest.mark.unit
+class TestCrashRecovery:
+    """崩溃恢复测试"""
+
+    def test_uncommitted_parts_ignored(self, temp_dir):
+        """测试清单提交前写出的分片在加载时忽略并删除"""
+        store = GradingRecordStore(str(temp_dir / "records"))
+        store.append(make_record(0))
+        store.save(log_offset=100)
+
+        # 写出分片后、更新清单前崩溃
+        store.append(make_record(1))
+        store.partitions["exam-1"].flush()
+        assert len(part_files(store)) == 2
+
+        reloaded = GradingRecordStore(str(temp_dir / "records"))
+        assert len(reloaded) == 1
+        assert reloaded.log_offset == 100
+        assert part_files(reloaded) == ["part-000000.npy"]
+
+        reloaded.append(make_record(1))
+        reloaded.save(log_offset=200)
+        assert len(GradingRecordStore(str(temp_dir / "records"))) == 2
+
+    def test_interrupted_compaction(self, temp_dir):
+        """测试合并后、清单提交前崩溃，旧分片仍然有效且不重复"""
+        store = GradingRecordStore(str(temp_dir / "records"))
+        for i in range(3):
+            store.append(make_record(i))
+            store.save()
+        store.partitions["exam-1"].compact()
+
+        reloaded = GradingRecordStore(str(temp_dir / "records"))
+        assert len(reloaded) == 3
+        assert part_files(reloaded) == ["part-000000.npy", "part-000001.npy", "part-000002.npy"]
+
+    def test_monitor_replay_does_not_duplicate(self, temp_dir):
+        """测试质量监控重放评分日志时，未提交的分片不会导致记录重复"""
+        monitor = QualityMonitor(str(temp_dir / "quality"))
+        monitor.add_grading_record(make_record(0))
+        monitor.save_grading_records()
+        monitor.add_grading_record(make_record(1))
+        monitor.record_store.partitions["exam-1"].flush()
+        monitor._records_handle.close()
+        monitor._records_handle = None
+
+        reloaded = QualityMonitor(str(temp_dir / "quality"))
+        try:
+            assert reloaded.total_records == 2
+            assert len(reloaded.record_store) == 2
+            assert reloaded.record_store.grader_summary()["g1"]["total_graded"] == 1
+        finally:
+            reloaded.close()
@@ -0,0 +1,121 @@
+"""
+阅卷结果变更日志单元测试
+
+测试grading_center/result_feed.py的去重追加，以及成绩统计按偏移量增量同步。
+"""
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+
+try:
+    from grading_center.result_feed import GradedResultFeed
+    from score_statistics.score_store import ScoreStore
+    from common.data_sync_manager import DataSyncManager
+except ImportError as e:
+    pytest.skip(f"无法导入变更日志模块: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def feed(temp_dir):
+    """临时变更日志"""
+    f = GradedResultFeed(str(temp_dir / "result_feed.db"))
+    yield f
+    f.close()
+
+
+@pytest.fixture
+def store(temp_dir):
+    """临时成绩库"""
+    s = ScoreStore(str(temp_dir / "scores.db"))
+    yield s
+    s.close()
+
+
+def make_result(exam_id, user_id, final_score=80):
+    return {"exam_id": exam_id, "user_id": user_id, "user_name": f"考生{user_id}",
+            "department": "计算机系", "paper_title": "Python基础", "total_score": 100,
+            "final_score": final_score, "submit_time": "2025-01-07 10:00:00",
+            "result_key": f"{exam_id}_{user_id}"}
+
+
+@pytest.mark.unit
+class TestGradedResultFeed:
+    """变更日志测试"""
+
+    def test_append_is_idempotent_per_result_key(self, feed):
+        """测试相同结果重复追加不产生新记录，内容变化时分配新序列号"""
+        first = feed.append(make_result(1, 1))
+        assert feed.append(make_result(1, 1)) == first
+        second = feed.append(make_result(1, 2))
+
+        regraded = feed.append(make_result(1, 1, final_score=95))
+        assert regraded > second
+        assert [seq for seq, _ in feed.read(0)] == [second, regraded]
+        assert feed.read(second)[0][1]["final_score"] == 95
+        assert feed.lag(second) == 1
+
+    def test_sync_advances_offset_and_skips_processed(self, feed, store, temp_dir):
+        """测试同步按偏移量增量进行，重复同步不会重复导入"""
+        graded_dir = temp_dir / "graded"
+        graded_dir.mkdir()
+        with open(graded_dir / "graded_legacy.json", "w", encoding="utf-8") as f:
+            json.dump(make_result(2, 9), f, ensure_ascii=False)
+
+        sync = DataSyncManager()
+        sync.databases["grading_graded"] = str(graded_dir)
+        for user_id in range(1, 6):
+            feed.append(make_result(1, user_id, 60 + user_id))
+
+        assert sync.sync_grading_results_to_statistics(feed, store, batch_size=2)
+        assert store.count() == 6
+        assert store.feed_offset(DataSyncManager.FEED_CONSUMER) == feed.latest_seq()
+        # 旧版结果文件保留在原目录
+        assert (graded_dir / "graded_legacy.json").exists()
+
+        feed.append(make_result(1, 3, 99))
+        assert sync.sync_grading_results_to_statistics(feed, store)
+        assert store.count() == 6
+        record = store.get_by_source_key("1_3")
+        assert record["score"] == 99 and record["student_name"] == "考生3"
+        assert record["grade"] == "优秀"
+        assert store.feed_offset(DataSyncManager.FEED_CONSUMER) == feed.latest_seq()
+
+    def test_malformed_record_skipped(self, feed, store, temp_dir):
+        """测试无法转换的记录被跳过，偏移量越过它，后续同步不再卡住"""
+        sync = DataSyncManager()
+        sync.databases["grading_graded"] = str(temp_dir / "graded")
+        feed.append(make_result(1, 1))
+        feed.append({"user_name": "旧版结果", "final_score": 70, "result_key": "legacy_1"})
+        feed.append(make_result(1, 2))
+
+        assert sync.sync_grading_results_to_statistics(feed, store, batch_size=2)
+        assert store.count() == 2
+        assert store.feed_offset(DataSyncManager.FEED_CONSUMER) == feed.latest_seq()
+
+        feed.append(make_result(1, 3))
+        assert sync.sync_grading_results_to_statistics(feed, store)
+        assert store.count() == 3
+
+    def test_manual_score_after_sync(self, feed, store, temp_dir, monkeypatch):
+        """测试同步写入的成绩使用数字ID，之后在界面中手动添加成绩可正常分配ID"""
+        sync = DataSyncManager()
+        sync.databases["grading_graded"] = str(temp_dir / "graded")
+        for user_id in (1, 2):
+            feed.append(make_result(1, user_id))
+        assert sync.sync_grading_results_to_statistics(feed, store)
+        assert store.upsert_many([{"id": 7, "exam_id": 2, "student_id": 5, "score": 60}])["inserted"] == 1
+        assert sorted(score["id"] for score in store.load_all()) == [1, 2, 7]
+
+        # 重新阅卷沿用原成绩ID
+        feed.append(make_result(1, 2, final_score=90))
+        assert sync.sync_grading_results_to_statistics(feed, store)
+        assert store.get_by_source_key("1_2") == store.get(2)
+        assert store.get(2)["score"] == 90
+
+        monkeypatch.syspath_prepend(str(Path(__file__).parents[2] / "score_statistics"))
+        simple_score_manager = pytest.importorskip("score_statistics.simple_score_manager")
+        dialog = simple_score_manager.ScoreDialog.__new__(simple_score_manager.ScoreDialog)
+        dialog.score_manager = SimpleNamespace(store=store, scores={"scores": store.load_all()})
+        assert dialog.get_next_score_id() == 8
@@ -0,0 +1,57 @@
+"""
+成绩统计数组单元测试
+
+测试score_statistics/score_analytics.py的向量化统计与逐条计算结果一致。
+"""
+
+import pytest
+
+try:
+    import numpy as np
+    from score_statistics.score_analytics import ScoreArrays, synthetic_scores
+except ImportError as e:
+    pytest.skip(f"无法导入成绩统计模块: {e}", allow_module_level=True)
+
+
+SCORES = [
+    {"exam_name": "计算机基础", "department": "计算机系", "student_name": "张三", "score": 85},
+    {"exam_name": "计算机基础", "department": "数学系", "student_name": "李四", "score": 92},
+    {"exam_name": "英语四级", "department": "计算机系", "student_name": "张三", "score": 78},
+    {"exam_name": "英语四级", "department": "数学系", "student_name": "李四", "score": 88},
+    {"exam_name": "英语四级", "department": "数学系", "student_name": "王五", "score": 60},
+]
+
+
+@pytest.mark.unit
+class TestScoreArrays:
+    """成绩数组测试"""
+
+    def test_describe_and_ranks(self):
+        """测试描述统计、百分位排名和Z分数"""
+        arrays = ScoreArrays.from_scores(SCORES)
+        values = np.array([s["score"] for s in SCORES], dtype=float)
+        summary = arrays.describe()
+        assert summary["p50"] == pytest.approx(np.median(values))
+        assert summary["std"] == pytest.approx(values.std())
+        assert arrays.percentile_ranks().tolist() == [60.0, 100.0, 40.0, 80.0, 20.0]
+        assert arrays.z_scores().mean() == pytest.approx(0.0)
+
+    def test_group_quantiles_match_numpy(self):
+        """测试分组分位数与逐组np.quantile一致"""
+        arrays = synthetic_scores(20000, exams=7, students=50, seed=1)
+        result = arrays.group_quantiles("exam")
+        for code, label in enumerate(arrays.labels["exam"]):
+            expected = np.quantile(arrays.scores[arrays.codes["exam"] == code], [0.25, 0.5, 0.75, 0.9])
+            actual = [result[label][key] for key in ("p25", "p50", "p75", "p90")]
+            assert np.allclose(actual, expected)
+
+    def test_top_k_and_mask(self):
+        """测试按考生平均分排名和筛选"""
+        arrays = ScoreArrays.from_scores(SCORES)
+        top = arrays.top_k(2, "student")
+        assert [s["name"] for s in top] == ["李四", "张三"]
+        assert top[0]["mean"] == pytest.approx(90.0)
+
+        english = arrays.subset(arrays.mask(exam="英语四级"))
+        assert len(english) == 3
+        assert len(arrays.subset(arrays.mask(exam="不存在"))) == 0
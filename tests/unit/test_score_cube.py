@@ -0,0 +1,69 @@
+"""
+成绩聚合立方体单元测试
+
+测试score_statistics/score_cube.py的增量维护与汇总结果。
+"""
+
+import pytest
+
+try:
+    from score_statistics.score_cube import ScoreCube
+except ImportError as e:
+    pytest.skip(f"无法导入成绩聚合模块: {e}", allow_module_level=True)
+
+
+SCORES = [
+    {"id": 1, "exam_name": "计算机基础", "department": "计算机系", "score": 85, "submit_time": "2024-01-15 14:30:00"},
+    {"id": 2, "exam_name": "计算机基础", "department": "数学系", "score": 55, "submit_time": "2024-01-15 15:20:00"},
+    {"id": 3, "exam_name": "英语四级", "department": "计算机系", "score": 92, "submit_time": "2024-02-16 10:15:00"},
+    {"id": 4, "exam_name": "英语四级", "department": "数学系", "score": 60, "submit_time": "2024-02-16 11:30:00"},
+]
+
+
+@pytest.mark.unit
+class TestScoreCube:
+    """聚合立方体测试"""
+
+    def test_summary_matches_raw_scores(self):
+        """测试总计与逐条计算一致"""
+        summary = ScoreCube.from_scores(SCORES).summary()
+        values = [s["score"] for s in SCORES]
+        mean = sum(values) / len(values)
+        assert summary.count == 4
+        assert summary.mean == pytest.approx(mean)
+        assert summary.std == pytest.approx((sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5)
+        assert (summary.min, summary.max) == (55, 92)
+        assert summary.bands() == {"excellent": 1, "good": 1, "fair": 0, "pass": 1, "fail": 1}
+
+    def test_rollup_and_pass_rates(self):
+        """测试按维度汇总与切片"""
+        cube = ScoreCube.from_scores(SCORES)
+        assert set(cube.rollup("date", date_granularity="month")) == {"2024-01", "2024-02"}
+        assert cube.rollup("department", exam="英语四级")["数学系"].mean == 60
+
+        rates = cube.exam_pass_rates()
+        assert rates["计算机基础"]["pass"] == 1
+        assert rates["英语四级"]["pass_rate"] == pytest.approx(100.0)
+
+    def test_incremental_update(self):
+        """测试成绩修改、删除后的增量维护"""
+        cube = ScoreCube.from_scores(SCORES)
+        cube.replace(SCORES[1], dict(SCORES[1], score=75))
+        assert cube.exam_pass_rates()["计算机基础"]["pass"] == 2
+
+        cube.remove(SCORES[0])
+        cube.remove(dict(SCORES[1], score=75))
+        assert "计算机基础" not in cube.rollup("exam")
+        assert cube.summary().count == 2
+
+    def test_copy_is_independent(self):
+        """测试副本与原立方体互不影响（后台统计使用副本）"""
+        cube = ScoreCube.from_scores(SCORES)
+        snapshot = cube.copy()
+        cube.remove(SCORES[0])
+        cube.add(dict(SCORES[1], id=5, score=99))
+
+        assert snapshot.summary().count == 4
+        assert (snapshot.summary().min, snapshot.summary().max) == (55, 92)
+        assert snapshot.exam_pass_rates() == ScoreCube.from_scores(SCORES).exam_pass_rates()
+        assert cube.summary().max == 99
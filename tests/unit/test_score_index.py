@@ -0,0 +1,62 @@
+"""
+成绩搜索索引单元测试
+
+测试score_statistics/score_index.py的搜索结果与逐条子串扫描一致，以及增量更新。
+"""
+
+import random
+import pytest
+
+try:
+    from score_statistics.score_index import ScoreSearchIndex, DEFAULT_SEARCH_FIELDS
+except ImportError as e:
+    pytest.skip(f"无法导入成绩索引模块: {e}", allow_module_level=True)
+
+
+def make_scores(n, seed=0):
+    rng = random.Random(seed)
+    names = ["张三", "李四", "王五", "赵六", "Alice", "Bob"]
+    exams = ["计算机基础", "英语四级", "高等数学"]
+    departments = ["计算机系", "数学系", "外语系"]
+    return [{"id": i, "student_name": rng.choice(names) + str(i % 7), "exam_name": rng.choice(exams),
+             "department": rng.choice(departments), "score": rng.randint(0, 100)}
+            for i in range(1, n + 1)]
+
+
+def scan(scores, term, exam=None, department=None):
+    term = term.lower()
+    return [s for s in scores
+            if (not term or any(term in str(s[f]).lower() for f in DEFAULT_SEARCH_FIELDS))
+            and (exam is None or s["exam_name"] == exam)
+            and (department is None or s["department"] == department)]
+
+
+@pytest.mark.unit
+class TestScoreSearchIndex:
+    """成绩搜索索引测试"""
+
+    @pytest.mark.parametrize("term", ["张", "李四3", "alice", "12", "计算机", "系", "不存在"])
+    def test_search_matches_scan(self, term):
+        """测试搜索结果与逐条扫描一致（含顺序）"""
+        scores = make_scores(500)
+        index = ScoreSearchIndex(scores)
+        assert index.search(term) == scan(scores, term)
+        assert index.search(term, exam_name="英语四级", department="数学系") == \
+            scan(scores, term, "英语四级", "数学系")
+
+    def test_incremental_update(self):
+        """测试新增、修改、删除后索引同步"""
+        scores = make_scores(50)
+        index = ScoreSearchIndex(scores)
+
+        index.add({"id": 99, "student_name": "钱七", "exam_name": "物理", "department": "物理系"})
+        assert [s["id"] for s in index.search("钱七")] == [99]
+
+        edited = dict(scores[0], student_name="孙八")
+        index.update(edited)
+        assert index.search("孙八") == [edited]
+        assert index.search()[0] is edited
+
+        index.remove(99)
+        assert index.search("钱七") == []
+        assert "物理" not in index.filter_values("exam_name")
@@ -0,0 +1,73 @@
+"""
+成绩库单元测试
+
+测试score_statistics/score_store.py的批量upsert与增量导入。
+"""
+
+import json
+import pytest
+
+try:
+    from score_statistics.score_store import ScoreStore
+    from score_statistics.import_scores import ScoreImporter
+except ImportError as e:
+    pytest.skip(f"无法导入成绩库模块: {e}", allow_module_level=True)
+
+
+@pytest.fixture
+def store(temp_dir):
+    """临时成绩库"""
+    s = ScoreStore(str(temp_dir / "scores.db"))
+    yield s
+    s.close()
+
+
+def make_score(score_id, score=80, exam_id=101):
+    return {"id": score_id, "exam_id": exam_id, "student_id": 1000 + score_id,
+            "department": "计算机系", "score": score, "percentage": float(score)}
+
+
+@pytest.mark.unit
+class TestScoreStore:
+    """成绩库测试"""
+
+    def test_upsert_counts_inserted_and_updated(self, store):
+        """测试按ID新增或更新"""
+        assert store.upsert_many([make_score(1), make_score(2)]) == {"inserted": 2, "updated": 0}
+        assert store.upsert_many([make_score(2, 95), make_score(3)]) == {"inserted": 1, "updated": 1}
+        assert store.count() == 3
+        assert store.get(2)["score"] == 95
+        assert [s["id"] for s in store.load_all()] == [1, 2, 3]
+
+    def test_query_and_replace_all(self, store):
+        """测试索引字段筛选和整体覆盖"""
+        store.upsert_many([make_score(1), make_score(2, exam_id=102)])
+        assert [s["id"] for s in store.query(exam_id=102)] == [2]
+
+        result = store.replace_all([make_score(2, 60)])
+        assert result["deleted"] == 1
+        assert store.count() == 1
+
+    def test_legacy_json_migrated_once(self, temp_dir):
+        """测试旧版scores.json只迁移一次"""
+        legacy = temp_dir / "scores.json"
+        legacy.write_text(json.dumps({"scores": [make_score(1)]}), encoding="utf-8")
+        store = ScoreStore(str(temp_dir / "legacy.db"), legacy_file=str(legacy))
+        store.delete([1])
+        store.close()
+
+        reopened = ScoreStore(str(temp_dir / "legacy.db"), legacy_file=str(legacy))
+        assert reopened.count() == 0
+        reopened.close()
+
+    def test_import_pending_files(self, store, temp_dir):
+        """测试导入目录中的文件增量写入成绩库"""
+        importer = ScoreImporter(store=store, base_dir=str(temp_dir))
+        store.upsert_many([make_score(1)])
+        (temp_dir / "imports" / "batch.json").write_text(
+            json.dumps({"scores": [make_score(1, 70), make_score(2)]}), encoding="utf-8")
+
+        assert importer.import_all_pending_files() is True
+        assert store.count() == 2
+        assert store.get(1)["score"] == 70
+        assert (temp_dir / "imports_backup" / "batch.json").exists()
@@ -0,0 +1,182 @@
+"""
+安全管理单元测试
+
+测试common/security_manager.py的密码验证线程池、最后登录时间延迟写入与签名令牌。
+"""
+
+import json
+import time
+import threading
+import pytest
+
+try:
+    from common.security_manager import (
+        UserManager, PasswordManager, PasswordVerifier, LoginBusyError,
+        TokenManager, TokenDenylist
+    )
+except ImportError as e:
+    pytest.skip(f"无法导入安全管理模块: {e}", allow_module_level=True)
+
+
+class BlockingPasswordManager(PasswordManager):
+    """验证时阻塞直到放行的密码管理器"""
+
+    def __init__(self):
+        super().__init__(iterations=1000)
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def verify_password(self, password, hash_password, salt):
+        self.started.set()
+        self.release.wait(5)
+        return super().verify_password(password, hash_password, salt)
+
+
+@pytest.mark.unit
+class TestPasswordVerifier:
+    """密码验证线程池测试"""
+
+    def test_verify_results_and_metrics(self):
+        """测试验证结果与指标"""
+        manager = PasswordManager(iterations=1000)
+        verifier = PasswordVerifier(manager, workers=2)
+        hash_password, salt = manager.hash_password("secret")
+        try:
+            assert verifier.verify("secret", hash_password, salt)
+            assert not verifier.verify("wrong", hash_password, salt)
+            stats = verifier.stats()
+            assert stats["completed"] == 2 and stats["rejected"] == 0
+            assert stats["running"] == 0 and stats["waiting"] == 0
+        finally:
+            verifier.shutdown()
+
+    def test_admission_timeout_when_saturated(self):
+        """测试名额占满时排队超时被拒绝"""
+        manager = BlockingPasswordManager()
+        verifier = PasswordVerifier(manager, workers=1, max_pending=1)
+        hash_password, salt = manager.hash_password("secret")
+        results = []
+        worker = threading.Thread(target=lambda: results.append(
+            verifier.verify("secret", hash_password, salt)))
+        worker.start()
+        try:
+            assert manager.started.wait(5)
+            with pytest.raises(LoginBusyError):
+                verifier.verify("secret", hash_password, salt, timeout=0.05)
+            assert verifier.stats()["rejected"] == 1
+        finally:
+            manager.release.set()
+            worker.join()
+            verifier.shutdown()
+        assert results == [True]
+
+
+@pytest.mark.unit
+class TestUserManagerLastLogin:
+    """最后登录时间延迟写入测试"""
+
+    def test_last_login_written_in_batches(self, temp_dir):
+        """测试登录只更新内存，批量写入文件"""
+        users_file = temp_dir / "users.json"
+        verifier = PasswordVerifier(workers=1)
+        manager = UserManager(str(users_file), verifier=verifier, last_login_flush_interval=60)
+        try:
+            assert manager.create_user("alice", "pw123")
+            assert manager.authenticate("alice", "pw123")
+            assert not manager.authenticate("alice", "bad")
+
+            assert manager.get_user("alice")["last_login"] is not None
+            with open(users_file, encoding="utf-8") as f:
+                assert json.load(f)["alice"]["last_login"] is None
+
+            assert manager.flush_last_login()
+            assert not manager.flush_last_login()
+            with open(users_file, encoding="utf-8") as f:
+                assert json.load(f)["alice"]["last_login"] is not None
+        finally:
+            manager.close()
+            verifier.shutdown()
+
+
+@pytest.mark.unit
+class TestSignedTokens:
+    """签名令牌测试"""
+
+    def test_any_process_with_secret_can_verify(self):
+        """测试持有相同密钥的实例可独立验证，篡改或密钥不同则失败"""
+        issuer = TokenManager("shared-secret", signed=True)
+        verifier = TokenManager("shared-secret", signed=True)
+        token = issuer.generate_token("张三", {"role": "student", "department": "一车间"})
+
+        token_data = verifier.verify_token(token)
+        assert token_data["user_id"] == "张三"
+        assert token_data["data"] == {"role": "student"}
+
+        assert TokenManager("other-secret", signed=True).verify_token(token) is None
+        payload, signature = token.rsplit(".", 1)
+        forged = payload.replace(payload.split(".")[2], "YWRtaW4") + "." + signature
+        assert verifier.verify_token(forged) is None
+        assert verifier.verify_token("garbage") is None
+
+    def test_expired_and_revoked_tokens_rejected(self, temp_dir):
+        """测试过期令牌与共享黑名单中的令牌被拒绝"""
+        expired = TokenManager("secret", token_expiry=-1, signed=True)
+        assert expired.verify_token(expired.generate_token("u1")) is None
+
+        db_path = str(temp_dir / "revoked.db")
+        issuer = TokenManager("secret", signed=True, denylist=TokenDenylist(db_path=db_path))
+        other = TokenManager("secret", signed=True,
+                             denylist=TokenDenylist(db_path=db_path, sync_interval=0))
+        token = issuer.generate_token("u1", {"role": "admin"})
+        assert other.verify_token(token) is not None
+
+        assert issuer.revoke_token(token)
+        assert issuer.verify_token(token) is None
+        assert other.verify_token(token) is None
+
+    def test_reissue_revokes_previous_token(self, temp_dir):
+        """测试重新签发令牌后原令牌在所有实例上失效，refresh_token仍返回布尔值"""
+        db_path = str(temp_dir / "revoked.db")
+        issuer = TokenManager("secret", signed=True, denylist=TokenDenylist(db_path=db_path))
+        other = TokenManager("secret", signed=True,
+                             denylist=TokenDenylist(db_path=db_path, sync_interval=0))
+        token = issuer.generate_token("u1", {"role": "admin"})
+        assert issuer.refresh_token(token) is False
+
+        new_token = issuer.reissue_token(token)
+        assert new_token != token
+        assert other.verify_token(new_token)["data"] == {"role": "admin"}
+        assert other.verify_token(token) is None
+        assert issuer.reissue_token(token) is None
+        assert TokenManager("secret").reissue_token(token) is None
+
+    def test_denylist_cleanup_drops_expired_buckets(self):
+        """测试黑名单按桶清理"""
+        denylist = TokenDenylist(bucket_seconds=60)
+        now = time.time()
+        denylist.add("a", now + 30)
+        denylist.add("b", now + 3600)
+        assert len(denylist) == 2
+        assert denylist.cleanup(now + 200) == 1
+        assert not denylist.contains("a", now + 30)
+        assert denylist.contains("b", now + 3600)
+
+    def test_revocation_synced_after_cleanup(self, temp_dir):
+        """测试清理全部过期记录后新增的撤销仍能同步到其它实例"""
+        db_path = str(temp_dir / "revoked.db")
+        writer = TokenDenylist(db_path=db_path, bucket_seconds=60)
+        reader = TokenDenylist(db_path=db_path, bucket_seconds=60, sync_interval=0)
+        now = time.time()
+        for jti in ("j1", "j2", "j3"):
+            writer.add(jti, now + 30)
+        assert reader.contains("j3", now + 30)
+
+        writer.cleanup(now + 200)
+        writer.add("j4", now + 3600)
+        assert reader.contains("j4", now + 3600)
+
+    def test_non_ascii_signature_rejected(self):
+        """测试签名段含非ASCII字符的令牌判为无效而不是抛出异常"""
+        manager = TokenManager("k", signed=True)
+        assert manager.verify_token("v1.YQ.Yg.9999999999.ab.é") is None
+        assert manager.verify_token("v1.YQ.Yg.9999999999.abé.sig") is None
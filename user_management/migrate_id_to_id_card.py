@@ -67,6 +67,9 @@ def migrate_id_to_id_card():
         # 删除原表，重命名新表
         cursor.execute("DROP TABLE users")
         cursor.execute("ALTER TABLE users_new RENAME TO users")
+        # 原表的索引随表删除，重新创建客户端登录查询使用的索引
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_id_card ON users (id_card)")
         
         conn.commit()
         print("成功移除ID字段，迁移完成")
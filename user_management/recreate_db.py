@@ -44,6 +44,9 @@ def recreate_database():
                 updated_at TEXT
             )
         ''')
+        # 客户端登录按用户名、身份证号查找用户
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_id_card ON users (id_card)")
         conn.commit()
         print("创建新数据库表结构成功")
         
@@ -74,6 +74,9 @@ class SimpleUserManager:
                     created_at TEXT NOT NULL
                 )
             ''')
+            # 客户端登录按用户名、身份证号查找用户
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_id_card ON users (id_card)")
             conn.commit()
             
             # 检查是否需要从JSON导入数据